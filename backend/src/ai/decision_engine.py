@@ -7,6 +7,7 @@ from datetime import datetime, timezone
 from typing import Any
 
 from backend.src.config import settings
+from backend.src.data.kline_cache import KlineArrays
 from backend.src.mind.market_mind import inject_to_prompt
 from backend.src.quant.library import STRATEGY_WEIGHTS, summarize_quant_signals
 
@@ -16,8 +17,8 @@ class DecisionContext:
     """AI决策所需的完整上下文，包含市场数据、持仓和认知状态。"""
 
     market_mind: dict[str, Any]
-    daily_klines: list[dict[str, Any]]
-    hourly_klines: list[dict[str, Any]]
+    daily_klines: list[dict[str, Any]] | KlineArrays
+    hourly_klines: list[dict[str, Any]] | KlineArrays
     quant_signals: list[dict[str, Any]]
     portfolio: dict[str, Any]
     recent_decisions: list[dict[str, Any]]
@@ -31,8 +32,10 @@ def _safe_float(value: Any, default: float = 0.0) -> float:
         return default
 
 
-def _close_series(klines: list[dict[str, Any]]) -> list[float]:
+def _close_series(klines: list[dict[str, Any]] | KlineArrays) -> list[float]:
     """从K线数据中提取收盘价序列，过滤无效值。"""
+    if isinstance(klines, KlineArrays):
+        return klines.close[klines.close > 0].tolist()
     closes: list[float] = []
     for row in klines:
         close = _safe_float(row.get("close"))
@@ -41,6 +44,13 @@ def _close_series(klines: list[dict[str, Any]]) -> list[float]:
     return closes
 
 
+def _recent_rows(klines: list[dict[str, Any]] | KlineArrays, count: int) -> list[dict[str, Any]]:
+    """取最后count根K线的字典形式，列式K线只转换这一部分。"""
+    if isinstance(klines, KlineArrays):
+        return klines.tail(count).to_records()
+    return klines[-count:]
+
+
 def _mean(values: list[float]) -> float:
     """计算数值列表的算术平均值。"""
     return sum(values) / len(values) if values else 0.0
@@ -64,8 +74,8 @@ def build_prompt(context: DecisionContext) -> str:
     """根据决策上下文构建LLM提示词，注入Market Mind认知状态和市场数据。"""
     mind_prompt = inject_to_prompt(context.market_mind)
     payload = {
-        "daily_klines": context.daily_klines[-30:],
-        "hourly_klines": context.hourly_klines[-24:],
+        "daily_klines": _recent_rows(context.daily_klines, 30),
+        "hourly_klines": _recent_rows(context.hourly_klines, 24),
         "quant_signals": context.quant_signals,
         "portfolio": context.portfolio,
         "recent_decisions": context.recent_decisions[-5:],
@@ -306,8 +316,8 @@ def generate_decision(context: DecisionContext) -> dict[str, Any]:
 
     input_payload = {
         "mind": context.market_mind,
-        "daily_klines": context.daily_klines[-30:],
-        "hourly_klines": context.hourly_klines[-24:],
+        "daily_klines": _recent_rows(context.daily_klines, 30),
+        "hourly_klines": _recent_rows(context.hourly_klines, 24),
         "quant_signals": context.quant_signals,
         "quant_signals_filtered": filtered_view["signals"],
         "portfolio": context.portfolio,
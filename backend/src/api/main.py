@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import json
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 from typing import Any
 
 from fastapi import Depends, FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
@@ -12,16 +12,22 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from backend.src.config import settings
-from backend.src.data.binance_client import BinanceAPIError
+from backend.src.data.binance_client import BinanceAPIError, get_shared_rate_limiter
+from backend.src.data.gaps import gap_index
+from backend.src.data.kline_cache import kline_cache
 from backend.src.data.kline_service import (
     fallback_mock_klines,
     fetch_and_store_klines,
+    get_recent_kline_arrays,
     get_recent_klines,
+    kline_data_revision,
     latest_price_from_db,
 )
+from backend.src.data.kline_stream import kline_stream_status, start_kline_stream, stop_kline_stream
+from backend.src.data.resample import fold_limits_into_native, select_base_timeframe
 from backend.src.db.database import SessionLocal, get_db
 from backend.src.db.init_db import init_db
-from backend.src.db.models import Decision, Kline, MarketMindHistory, Trade
+from backend.src.db.models import Decision, Kline, MarketMindHistory, PaperOrder, Trade
 from backend.src.mind.market_mind import (
     inject_to_prompt,
     load as load_market_mind,
@@ -30,8 +36,20 @@ from backend.src.mind.market_mind import (
     validate_market_mind,
 )
 from backend.src.orchestrator.service import run_analysis_cycle, scheduler_status, start_scheduler, stop_scheduler
-from backend.src.quant.library import build_quant_signal_markers, build_quant_snapshot, get_quant_strategy_catalog
-from backend.src.trading.paper_engine import get_portfolio_snapshot
+from backend.src.quant.backtest import run_backtests
+from backend.src.quant.batch import build_batch_snapshots
+from backend.src.quant.cache import cached_quant_signal_markers, cached_quant_snapshot, signal_cache
+from backend.src.quant.library import (
+    STRATEGY_CATALOG,
+    build_quant_signal_markers,
+    build_quant_snapshot,
+    get_quant_strategy_catalog,
+)
+from backend.src.quant.walk_forward import run_walk_forward
+from backend.src.trading.journal import equity_curve as journal_equity_curve
+from backend.src.trading.orders import cancel_order, list_orders, place_order
+from backend.src.trading.paper_engine import get_portfolio_snapshot, get_portfolio_snapshot_as_of
+from backend.src.trading.protective import list_protective_orders, protective_book
 
 app = FastAPI(title=settings.app_name, version=settings.app_version)
 
@@ -51,6 +69,13 @@ class MindUpdateRequest(BaseModel):
     change_summary: str | None = None
 
 
+class OrderRequest(BaseModel):
+    side: str
+    order_type: str
+    price: float
+    quantity: float
+
+
 class ConfigUpdateRequest(BaseModel):
     analysis_interval_hours: int | None = None
     max_position_pct: float | None = None
@@ -94,20 +119,50 @@ def _serialize_trade(row: Trade) -> dict[str, Any]:
     }
 
 
+def _serialize_order(row: PaperOrder) -> dict[str, Any]:
+    return {
+        "id": row.id,
+        "symbol": row.symbol,
+        "side": row.side,
+        "order_type": row.order_type,
+        "price": row.price,
+        "quantity": row.quantity,
+        "filled_qty": row.filled_qty,
+        "avg_fill_price": row.avg_fill_price,
+        "status": row.status,
+        "decision_id": row.decision_id,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+        "close_reason": row.close_reason,
+    }
+
+
 def _latest_decision(db: Session) -> Decision | None:
     return db.execute(select(Decision).order_by(Decision.timestamp.desc(), Decision.id.desc()).limit(1)).scalars().first()
 
 
+def _validate_timeframe(timeframe: str) -> None:
+    """原生存储的周期或可由其合成的整数倍周期（如2h、8h、3d、1w）才允许查询。"""
+    if timeframe in settings.kline_native_timeframes:
+        return
+    try:
+        select_base_timeframe(timeframe, settings.kline_native_timeframes)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
 @app.on_event("startup")
-def on_startup() -> None:
+async def on_startup() -> None:
     init_db()
     load_market_mind()
     start_scheduler()
+    start_kline_stream()
 
 
 @app.on_event("shutdown")
-def on_shutdown() -> None:
+async def on_shutdown() -> None:
     stop_scheduler()
+    await stop_kline_stream()
 
 
 @app.get("/api/system/health")
@@ -135,6 +190,13 @@ def health_check(db: Session = Depends(get_db)) -> dict[str, Any]:
     else:
         checks["data_freshness"] = {"latest_kline_age_hours": None, "stale": True}
 
+    checks["binance_rate_limit"] = get_shared_rate_limiter().snapshot()
+    checks["kline_stream"] = kline_stream_status()
+    checks["kline_cache"] = kline_cache.snapshot()
+    checks["kline_gaps"] = gap_index.snapshot()
+    checks["protective_orders"] = protective_book.snapshot()
+    checks["signal_cache"] = signal_cache.snapshot()
+
     sched = scheduler_status()
     overall = "ok" if checks["database"] == "ok" and sched.get("status") != "error" else "degraded"
 
@@ -154,18 +216,21 @@ def get_klines(
     refresh: bool = Query(default=False),
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
-    if timeframe not in {"1h", "4h", "1d"}:
-        raise HTTPException(status_code=400, detail="timeframe must be one of: 1h, 4h, 1d")
+    _validate_timeframe(timeframe)
 
     refresh_result: dict[str, Any] = {"requested": refresh}
     if refresh:
         try:
-            count = fetch_and_store_klines(
-                db=db,
-                symbol=settings.trading_pair,
-                timeframe=timeframe,
-                limit=max(limit, 60),
-            )
+            # 合成周期刷新其基础周期，不单独请求Binance
+            plan = fold_limits_into_native({timeframe: max(limit, 60)}, settings.kline_native_timeframes)
+            count = 0
+            for native_timeframe, native_limit in plan.items():
+                count += fetch_and_store_klines(
+                    db=db,
+                    symbol=settings.trading_pair,
+                    timeframe=native_timeframe,
+                    limit=native_limit,
+                )
             refresh_result["stored"] = count
         except BinanceAPIError as exc:
             refresh_result["error"] = str(exc)
@@ -207,6 +272,15 @@ def get_decision_detail(decision_id: int, db: Session = Depends(get_db)) -> dict
     return _serialize_decision(row)
 
 
+@app.get("/api/decisions/{decision_id}/portfolio")
+def get_decision_portfolio(decision_id: int, db: Session = Depends(get_db)) -> dict[str, Any]:
+    """返回该决策记录生成时的投资组合快照（由最近的账户检查点加尾部交易重建）。"""
+    try:
+        return get_portfolio_snapshot_as_of(db=db, symbol=settings.trading_pair, decision_id=decision_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail="Decision not found") from exc
+
+
 @app.get("/api/trades")
 def get_trades(
     page: int = Query(default=1, ge=1),
@@ -218,60 +292,85 @@ def get_trades(
     return {"items": [_serialize_trade(row) for row in rows], "page": page, "limit": limit}
 
 
+@app.get("/api/orders")
+def get_orders(
+    status: str | None = Query(default=None),
+    limit: int = Query(default=50, ge=1, le=200),
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
+    rows = list_orders(db=db, symbol=settings.trading_pair, status=status, limit=limit)
+    return {"items": [_serialize_order(row) for row in rows]}
+
+
+@app.post("/api/orders")
+def post_order(payload: OrderRequest, db: Session = Depends(get_db)) -> dict[str, Any]:
+    try:
+        order = place_order(
+            db=db,
+            symbol=settings.trading_pair,
+            side=payload.side,
+            order_type=payload.order_type,
+            price=payload.price,
+            quantity=payload.quantity,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return _serialize_order(order)
+
+
+@app.delete("/api/orders/{order_id}")
+def delete_order(order_id: int, db: Session = Depends(get_db)) -> dict[str, Any]:
+    try:
+        order = cancel_order(db=db, order_id=order_id, reason="cancelled_by_user")
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    return _serialize_order(order)
+
+
+@app.get("/api/protective-orders")
+def get_protective_orders(limit: int = Query(default=20, ge=1, le=200), db: Session = Depends(get_db)) -> dict[str, Any]:
+    rows = list_protective_orders(db=db, symbol=settings.trading_pair, limit=limit)
+    return {
+        "items": [
+            {
+                "id": row.id,
+                "symbol": row.symbol,
+                "kind": row.kind,
+                "trigger_price": row.trigger_price,
+                "status": row.status,
+                "decision_id": row.decision_id,
+                "trade_id": row.trade_id,
+                "fill_reference_price": row.fill_reference_price,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+                "closed_at": row.closed_at.isoformat() if row.closed_at else None,
+                "close_reason": row.close_reason,
+            }
+            for row in rows
+        ]
+    }
+
+
 @app.get("/api/performance")
 def get_performance(db: Session = Depends(get_db)) -> dict[str, Any]:
     """计算真实的绩效指标，包括权益曲线、最大回撤、胜率和盈亏比。"""
     mark_price = latest_price_from_db(db=db, symbol=settings.trading_pair) or 0.0
     portfolio = get_portfolio_snapshot(db=db, symbol=settings.trading_pair, mark_price=mark_price)
 
-    # 获取所有交易记录，按时间排序
-    all_trades = db.execute(
-        select(Trade).where(Trade.symbol == settings.trading_pair).order_by(Trade.timestamp.asc())
-    ).scalars().all()
-
-    # 构建真实权益曲线（基于每笔交易后的权益变化）
-    equity_curve: list[dict[str, Any]] = []
-    running_equity = settings.initial_balance
-    seen_dates: set[str] = set()
-
-    # 起始点
-    if all_trades and all_trades[0].timestamp:
-        start_date = (all_trades[0].timestamp.date() - timedelta(days=1)).isoformat()
+    # 权益曲线由交易日志重放生成（每日取最后一笔交易后的权益）
+    equity_curve = journal_equity_curve(db=db, symbol=settings.trading_pair)
+    if equity_curve:
+        start_date = (date.fromisoformat(equity_curve[0]["date"]) - timedelta(days=1)).isoformat()
     else:
         start_date = (datetime.now(timezone.utc).date() - timedelta(days=1)).isoformat()
-    equity_curve.append({"date": start_date, "equity": round(settings.initial_balance, 2)})
-    seen_dates.add(start_date)
-
-    for trade in all_trades:
-        pnl = float(trade.pnl or 0.0)
-        fee = float(trade.fee or 0.0)
-        if trade.side == "sell":
-            running_equity += pnl
-        else:
-            running_equity -= fee
-
-        if trade.timestamp:
-            date_key = trade.timestamp.date().isoformat()
-            if date_key not in seen_dates:
-                equity_curve.append({"date": date_key, "equity": round(running_equity, 2)})
-                seen_dates.add(date_key)
-            else:
-                # 更新当天最后一个值
-                for point in reversed(equity_curve):
-                    if point["date"] == date_key:
-                        point["equity"] = round(running_equity, 2)
-                        break
+    equity_curve.insert(0, {"date": start_date, "equity": round(settings.initial_balance, 2)})
 
     # 添加当前权益
     today_key = datetime.now(timezone.utc).date().isoformat()
     current_equity = float(portfolio["equity"])
-    if today_key not in seen_dates:
-        equity_curve.append({"date": today_key, "equity": round(current_equity, 2)})
+    if equity_curve[-1]["date"] == today_key:
+        equity_curve[-1]["equity"] = round(current_equity, 2)
     else:
-        for point in reversed(equity_curve):
-            if point["date"] == today_key:
-                point["equity"] = round(current_equity, 2)
-                break
+        equity_curve.append({"date": today_key, "equity": round(current_equity, 2)})
 
     # 计算最大回撤
     max_drawdown_pct = 0.0
@@ -285,7 +384,9 @@ def get_performance(db: Session = Depends(get_db)) -> dict[str, Any]:
             max_drawdown_pct = max(max_drawdown_pct, drawdown)
 
     # 计算胜率和盈亏比
-    sells = [t for t in all_trades if t.side == "sell"]
+    sells = db.execute(
+        select(Trade).where(Trade.symbol == settings.trading_pair, Trade.side == "sell").order_by(Trade.id.asc())
+    ).scalars().all()
     win_count = sum(1 for t in sells if float(t.pnl or 0.0) > 0)
     win_rate = (win_count / len(sells)) if sells else 0.0
 
@@ -319,17 +420,17 @@ def get_signals(
     limit: int = Query(default=120, ge=30, le=500),
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
-    if timeframe not in {"1h", "4h", "1d"}:
-        raise HTTPException(status_code=400, detail="timeframe must be one of: 1h, 4h, 1d")
+    _validate_timeframe(timeframe)
 
-    klines = get_recent_klines(db=db, symbol=settings.trading_pair, timeframe=timeframe, limit=limit)
+    symbol = settings.trading_pair
     source = "database"
-    if not klines:
-        klines = fallback_mock_klines(timeframe=timeframe, limit=limit, symbol=settings.trading_pair)
+    snapshot = cached_quant_snapshot(db=db, symbol=symbol, timeframe=timeframe, limit=limit)
+    markers = cached_quant_signal_markers(db=db, symbol=symbol, timeframe=timeframe, limit=limit, max_points=300)
+    if snapshot is None or markers is None:
+        klines = fallback_mock_klines(timeframe=timeframe, limit=limit, symbol=symbol)
         source = "mock_fallback"
-
-    snapshot = build_quant_snapshot(symbol=settings.trading_pair, timeframe=timeframe, klines=klines)
-    markers = build_quant_signal_markers(symbol=settings.trading_pair, timeframe=timeframe, klines=klines, max_points=300)
+        snapshot = build_quant_snapshot(symbol=symbol, timeframe=timeframe, klines=klines)
+        markers = build_quant_signal_markers(symbol=symbol, timeframe=timeframe, klines=klines, max_points=300)
     return {
         "items": snapshot["signals"],
         "summary": snapshot["summary"],
@@ -339,6 +440,93 @@ def get_signals(
     }
 
 
+def _watchlist_symbols(symbols: str | None) -> list[str]:
+    """显式传入的逗号分隔标的，否则为交易对加Market Mind的active_watchlist（元素可为字符串或含symbol的对象）。"""
+    if symbols:
+        raw: list[Any] = symbols.split(",")
+    else:
+        watchlist = load_market_mind().get("active_watchlist", [])
+        raw = [settings.trading_pair, *(watchlist if isinstance(watchlist, list) else [])]
+    names: list[str] = []
+    for item in raw:
+        name = str(item.get("symbol", "") if isinstance(item, dict) else item).strip().upper()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+@app.get("/api/signals/batch")
+def get_batch_signals(
+    symbols: str | None = Query(default=None),
+    timeframe: str = Query(default="1d"),
+    limit: int = Query(default=120, ge=30, le=500),
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
+    """多个标的的量化信号快照，所有标的在一次批量计算中完成；本地没有K线的标的列在missing中。"""
+    _validate_timeframe(timeframe)
+    names = _watchlist_symbols(symbols)
+    if len(names) > 100:
+        raise HTTPException(status_code=400, detail="一次最多计算100个标的")
+
+    arrays = [get_recent_kline_arrays(db=db, symbol=name, timeframe=timeframe, limit=limit) for name in names]
+    snapshots = build_batch_snapshots([item for item in arrays if len(item) > 0])
+    return {
+        "items": [{"symbol": name, **snapshots[name]} for name in names if name in snapshots],
+        "missing": [name for name in names if name not in snapshots],
+        "timeframe": timeframe,
+    }
+
+
+@app.get("/api/backtest")
+def get_backtest(
+    strategy: str | None = Query(default=None),
+    timeframe: str = Query(default="1h"),
+    limit: int = Query(default=8760, ge=60, le=100_000),
+    allow_short: bool = Query(default=False),
+    equity_points: int = Query(default=200, ge=0, le=2000),
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
+    """用本地K线回测量化策略库（默认全部策略），手续费和滑点取当前配置。"""
+    _validate_timeframe(timeframe)
+    if strategy is not None and strategy not in STRATEGY_CATALOG:
+        raise HTTPException(status_code=400, detail=f"未知的策略: {strategy}")
+
+    klines = get_recent_kline_arrays(db=db, symbol=settings.trading_pair, timeframe=timeframe, limit=limit)
+    results = run_backtests(klines, strategy_names=[strategy] if strategy else None, allow_short=allow_short)
+    return {
+        "items": [result.to_dict(equity_points=equity_points) for result in results],
+        "fee_pct": settings.trading_fee_pct,
+        "slippage_pct": settings.slippage_pct,
+    }
+
+
+@app.get("/api/walk-forward")
+def get_walk_forward(
+    timeframe: str = Query(default="1d"),
+    limit: int = Query(default=2000, ge=60, le=100_000),
+    train_bars: int = Query(default=365, ge=30),
+    test_bars: int = Query(default=90, ge=5),
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
+    """
+    滚动优化策略权重并返回样本外表现，结果中的patch/change_summary可直接提交给PUT /api/mind。
+
+    同一数据版本下的重复请求直接命中信号缓存。
+    """
+    _validate_timeframe(timeframe)
+    symbol = settings.trading_pair
+    key = ("walk_forward", kline_data_revision(db=db, symbol=symbol, timeframe=timeframe), timeframe, limit, train_bars, test_bars)
+
+    def compute() -> dict[str, Any]:
+        klines = get_recent_kline_arrays(db=db, symbol=symbol, timeframe=timeframe, limit=limit)
+        return run_walk_forward(klines, train_bars=train_bars, test_bars=test_bars).to_dict()
+
+    try:
+        return signal_cache.get_or_compute(key, compute)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
 @app.get("/api/mind")
 def get_market_mind() -> dict[str, Any]:
     market_mind = load_market_mind()
@@ -25,9 +25,34 @@ class Settings:
     max_stop_loss_pct: float = float(os.getenv("MAX_STOP_LOSS_PCT", "0.08"))
     trading_fee_pct: float = float(os.getenv("TRADING_FEE_PCT", "0.001"))
     slippage_pct: float = float(os.getenv("SLIPPAGE_PCT", "0.0005"))
+    account_checkpoint_interval: int = int(os.getenv("ACCOUNT_CHECKPOINT_INTERVAL", "500"))
+    protective_orders_enabled: bool = os.getenv("PROTECTIVE_ORDERS_ENABLED", "true").lower() == "true"
+    protective_check_interval_sec: int = int(os.getenv("PROTECTIVE_CHECK_INTERVAL_SEC", "15"))
+    order_participation_rate: float = float(os.getenv("ORDER_PARTICIPATION_RATE", "0.1"))
+    quant_incremental_enabled: bool = os.getenv("QUANT_INCREMENTAL_ENABLED", "true").lower() == "true"
+    quant_cache_max_entries: int = int(os.getenv("QUANT_CACHE_MAX_ENTRIES", "256"))
+    quant_sweep_workers: int = int(os.getenv("QUANT_SWEEP_WORKERS", "0"))
     ai_model: str = os.getenv("AI_MODEL", "claude-sonnet-4-5-20250929")
 
     binance_base_url: str = os.getenv("BINANCE_BASE_URL", "https://api.binance.com")
+    binance_pool_size: int = int(os.getenv("BINANCE_POOL_SIZE", "10"))
+    binance_pool_per_host: int = int(os.getenv("BINANCE_POOL_PER_HOST", "4"))
+    binance_connect_timeout_sec: float = float(os.getenv("BINANCE_CONNECT_TIMEOUT_SEC", "3"))
+    binance_read_timeout_sec: float = float(os.getenv("BINANCE_READ_TIMEOUT_SEC", "10"))
+    binance_accept_gzip: bool = os.getenv("BINANCE_ACCEPT_GZIP", "true").lower() == "true"
+    binance_weight_limit: int = int(os.getenv("BINANCE_WEIGHT_LIMIT", "6000"))
+    binance_weight_budget_ratio: float = float(os.getenv("BINANCE_WEIGHT_BUDGET_RATIO", "0.8"))
+    binance_ws_url: str = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443")
+    kline_stream_enabled: bool = os.getenv("KLINE_STREAM_ENABLED", "false").lower() == "true"
+    live_price_max_age_sec: float = float(os.getenv("LIVE_PRICE_MAX_AGE_SEC", "10"))
+    kline_cache_max_bars: int = int(os.getenv("KLINE_CACHE_MAX_BARS", "5000"))
+    # 缓存与数据库核对的最短间隔（秒），用于发现回填CLI等其他进程写入的K线
+    kline_cache_verify_sec: float = float(os.getenv("KLINE_CACHE_VERIFY_SEC", "2"))
+    kline_fetch_concurrency: int = int(os.getenv("KLINE_FETCH_CONCURRENCY", "4"))
+    kline_gap_repair_max_requests: int = int(os.getenv("KLINE_GAP_REPAIR_MAX_REQUESTS", "10"))
+    kline_native_timeframes: tuple[str, ...] = tuple(
+        item.strip() for item in os.getenv("KLINE_NATIVE_TIMEFRAMES", "1h,4h,1d").split(",") if item.strip()
+    )
     anthropic_api_key: str = os.getenv("ANTHROPIC_API_KEY", "")
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     scheduler_enabled: bool = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
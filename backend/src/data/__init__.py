@@ -1,7 +1,18 @@
-from backend.src.data.binance_client import BinanceAPIError, BinanceKlineClient
+from backend.src.data.backfill import BackfillResult, backfill_klines
+from backend.src.data.binance_client import BinanceAPIError, BinanceKlineClient, BinanceRateLimitError
+from backend.src.data.gaps import KlineGap, find_kline_gaps, gap_index, repair_kline_gaps
+from backend.src.data.kline_cache import KlineArrays, kline_cache
 from backend.src.data.kline_service import (
+    KlineFetchRequest,
+    KlineUpsertStats,
+    bulk_upsert_klines,
     fetch_and_store_klines,
+    fetch_klines_concurrently,
+    get_recent_kline_arrays,
     get_recent_klines,
+    latest_open_time,
     latest_price_from_db,
     maybe_backfill_initial_klines,
+    sync_klines_concurrently,
 )
+from backend.src.data.resample import resample_klines, select_base_timeframe
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import argparse
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.src.data.binance_client import (
+    MAX_KLINES_PER_REQUEST,
+    BinanceKlineClient,
+    datetime_to_ms,
+    timeframe_to_ms,
+)
+from backend.src.data.kline_service import upsert_klines
+from backend.src.db.models import KlineBackfillCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BackfillResult:
+    """一次回填调用的执行结果。"""
+
+    symbol: str
+    timeframe: str
+    requests: int
+    rows_written: int
+    next_start_ms: int
+    end_ms: int
+    completed: bool
+
+
+def _load_checkpoint(db: Session, symbol: str, timeframe: str) -> KlineBackfillCheckpoint | None:
+    return (
+        db.execute(
+            select(KlineBackfillCheckpoint).where(
+                KlineBackfillCheckpoint.symbol == symbol,
+                KlineBackfillCheckpoint.timeframe == timeframe,
+            )
+        )
+        .scalars()
+        .first()
+    )
+
+
+def _prepare_checkpoint(
+    db: Session,
+    symbol: str,
+    timeframe: str,
+    start_ms: int,
+    end_ms: int,
+) -> KlineBackfillCheckpoint:
+    """
+    获取或初始化检查点。
+
+    同一起点的检查点直接续传（终点向后延伸时重新打开已完成的检查点），
+    起点不同则视为新的回填任务，从新起点重新开始。
+    """
+    checkpoint = _load_checkpoint(db=db, symbol=symbol, timeframe=timeframe)
+    if checkpoint is None:
+        checkpoint = KlineBackfillCheckpoint(
+            symbol=symbol,
+            timeframe=timeframe,
+            start_ms=start_ms,
+            end_ms=end_ms,
+            next_start_ms=start_ms,
+            rows_written=0,
+            completed=False,
+        )
+        db.add(checkpoint)
+    elif checkpoint.start_ms != start_ms:
+        checkpoint.start_ms = start_ms
+        checkpoint.end_ms = end_ms
+        checkpoint.next_start_ms = start_ms
+        checkpoint.rows_written = 0
+        checkpoint.completed = False
+    elif end_ms > checkpoint.end_ms:
+        checkpoint.end_ms = end_ms
+        checkpoint.completed = checkpoint.next_start_ms > end_ms
+    db.commit()
+    return checkpoint
+
+
+def backfill_klines(
+    db: Session,
+    symbol: str,
+    timeframe: str,
+    start: datetime,
+    end: datetime | None = None,
+    client: BinanceKlineClient | None = None,
+    max_requests: int | None = None,
+) -> BackfillResult:
+    """
+    按startTime/endTime窗口分页回填历史K线，每个窗口最多1000根。
+
+    每个窗口的K线写入与检查点推进在同一事务中提交，进程中断后再次调用
+    会从检查点记录的位置继续，而不是从头开始。max_requests用于限制单次调用的请求数。
+    """
+    symbol = symbol.upper()
+    client = client or BinanceKlineClient()
+    step_ms = timeframe_to_ms(timeframe)
+    start_ms = datetime_to_ms(start)
+    end_ms = datetime_to_ms(end or datetime.now(timezone.utc))
+    if end_ms < start_ms:
+        raise ValueError("回填终点不能早于起点")
+
+    checkpoint = _prepare_checkpoint(db=db, symbol=symbol, timeframe=timeframe, start_ms=start_ms, end_ms=end_ms)
+    requests = 0
+    rows_written = 0
+
+    while not checkpoint.completed:
+        if max_requests is not None and requests >= max_requests:
+            break
+
+        window_start = checkpoint.next_start_ms
+        window_end = min(window_start + step_ms * MAX_KLINES_PER_REQUEST - 1, checkpoint.end_ms)
+        klines = client.fetch_klines(
+            symbol=symbol,
+            timeframe=timeframe,
+            limit=MAX_KLINES_PER_REQUEST,
+            start_time_ms=window_start,
+            end_time_ms=window_end,
+        )
+        requests += 1
+
+        written = upsert_klines(db=db, klines=klines, commit=False)
+        if klines:
+            next_start = datetime_to_ms(klines[-1]["open_time"]) + step_ms
+        else:
+            # 交易对上市前或停机区间没有数据，直接跳过整个窗口
+            next_start = window_end + 1
+        checkpoint.next_start_ms = max(next_start, window_start + 1)
+        checkpoint.rows_written = int(checkpoint.rows_written or 0) + written
+        checkpoint.completed = checkpoint.next_start_ms > checkpoint.end_ms
+        db.commit()
+        rows_written += written
+
+        logger.info(
+            "K线回填进度 %s %s: 窗口=%d条, 游标=%s",
+            symbol,
+            timeframe,
+            len(klines),
+            datetime.fromtimestamp(checkpoint.next_start_ms / 1000, tz=timezone.utc).isoformat(),
+        )
+
+    return BackfillResult(
+        symbol=symbol,
+        timeframe=timeframe,
+        requests=requests,
+        rows_written=rows_written,
+        next_start_ms=checkpoint.next_start_ms,
+        end_ms=checkpoint.end_ms,
+        completed=bool(checkpoint.completed),
+    )
+
+
+def _parse_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def main() -> None:
+    from backend.src.config import settings
+    from backend.src.db.database import SessionLocal
+    from backend.src.db.init_db import init_db
+
+    parser = argparse.ArgumentParser(description="分页回填Binance历史K线，支持断点续传")
+    parser.add_argument("--symbol", default=settings.trading_pair)
+    parser.add_argument("--timeframe", action="append", dest="timeframes", help="可重复指定，默认1h/4h/1d")
+    parser.add_argument("--start", required=True, help="起始时间 (ISO格式, 如 2020-01-01)")
+    parser.add_argument("--end", default=None, help="结束时间 (ISO格式, 默认当前时间)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    db = SessionLocal()
+    try:
+        for timeframe in args.timeframes or ["1h", "4h", "1d"]:
+            result = backfill_klines(
+                db=db,
+                symbol=args.symbol,
+                timeframe=timeframe,
+                start=_parse_date(args.start),
+                end=_parse_date(args.end) if args.end else None,
+            )
+            print(
+                f"{result.symbol} {result.timeframe}: requests={result.requests}, "
+                f"rows={result.rows_written}, completed={result.completed}"
+            )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,154 @@
 from __future__ import annotations
 
+import http.client
 import json
 import logging
+import threading
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Any
-from urllib.error import URLError
 from urllib.parse import urlencode
-from urllib.request import urlopen
 
 from backend.src.config import settings
+from backend.src.data.http_pool import HTTPConnectionPool
+from backend.src.data.rate_limiter import WeightRateLimiter
 
 logger = logging.getLogger(__name__)
 
 
+# Binance单次K线请求的最大返回条数
+MAX_KLINES_PER_REQUEST = 1000
+
+# /api/v3/klines 的请求权重
+KLINE_REQUEST_WEIGHT = 2
+
+# K线周期对应的毫秒数，用于计算startTime/endTime窗口
+TIMEFRAME_MS: dict[str, int] = {
+    "1m": 60_000,
+    "3m": 3 * 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1h": 3_600_000,
+    "2h": 2 * 3_600_000,
+    "4h": 4 * 3_600_000,
+    "6h": 6 * 3_600_000,
+    "8h": 8 * 3_600_000,
+    "12h": 12 * 3_600_000,
+    "1d": 86_400_000,
+    "3d": 3 * 86_400_000,
+    "1w": 7 * 86_400_000,
+}
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """返回K线周期的毫秒长度，不支持的周期抛出ValueError。"""
+    try:
+        return TIMEFRAME_MS[timeframe]
+    except KeyError as exc:
+        raise ValueError(f"不支持的K线周期: {timeframe}") from exc
+
+
+def datetime_to_ms(value: datetime) -> int:
+    """将datetime转换为Binance使用的毫秒时间戳，naive时间按UTC处理。"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
 class BinanceAPIError(RuntimeError):
     """Binance API请求失败时抛出的异常。"""
 
 
+class BinanceRateLimitError(BinanceAPIError):
+    """Binance返回429/418（权重超限或IP封禁）时抛出的异常。"""
+
+
+_shared_pool: HTTPConnectionPool | None = None
+_shared_lock = threading.Lock()
+_shared_limiter: WeightRateLimiter | None = None
+
+
+def get_shared_http_pool() -> HTTPConnectionPool:
+    """返回进程内共享的Binance连接池，按配置延迟创建。"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = HTTPConnectionPool(
+                pool_size=settings.binance_pool_size,
+                max_per_host=settings.binance_pool_per_host,
+                connect_timeout_sec=settings.binance_connect_timeout_sec,
+                read_timeout_sec=settings.binance_read_timeout_sec,
+                accept_gzip=settings.binance_accept_gzip,
+            )
+        return _shared_pool
+
+
+def get_shared_rate_limiter() -> WeightRateLimiter:
+    """返回进程内共享的请求权重限流器，所有Binance请求共用同一预算。"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = WeightRateLimiter(
+                weight_limit=settings.binance_weight_limit,
+                budget_ratio=settings.binance_weight_budget_ratio,
+            )
+        return _shared_limiter
+
+
 @dataclass
 class BinanceKlineClient:
-    """Binance REST API K线数据客户端，支持重试和超时控制。"""
+    """Binance REST API K线数据客户端，支持重试、连接复用、权重限流和超时控制。"""
 
     base_url: str = settings.binance_base_url
-    timeout_sec: int = 10
     max_retries: int = 3
+    pool: HTTPConnectionPool = field(default_factory=get_shared_http_pool)
+    rate_limiter: WeightRateLimiter = field(default_factory=get_shared_rate_limiter)
 
-    def fetch_klines(self, symbol: str, timeframe: str, limit: int) -> list[dict[str, Any]]:
+    def fetch_klines(
+        self,
+        symbol: str,
+        timeframe: str,
+        limit: int,
+        start_time_ms: int | None = None,
+        end_time_ms: int | None = None,
+    ) -> list[dict[str, Any]]:
         """
         从Binance获取K线数据，支持自动重试。
 
-        失败时按指数退避重试最多max_retries次，每次等待2^attempt秒。
+        可选的start_time_ms/end_time_ms对应Binance的startTime/endTime参数，
+        用于分页拉取历史区间。每次请求前向共享限流器申请权重；
+        失败时按指数退避重试最多max_retries次，每次等待2^attempt秒，
+        429/418响应则由限流器按Retry-After暂停后再重试。
         """
-        params = urlencode({"symbol": symbol.upper(), "interval": timeframe, "limit": limit})
+        query: dict[str, Any] = {"symbol": symbol.upper(), "interval": timeframe, "limit": limit}
+        if start_time_ms is not None:
+            query["startTime"] = int(start_time_ms)
+        if end_time_ms is not None:
+            query["endTime"] = int(end_time_ms)
+        params = urlencode(query)
         url = f"{self.base_url}/api/v3/klines?{params}"
 
         last_error: Exception | None = None
         for attempt in range(self.max_retries + 1):
             try:
-                with urlopen(url, timeout=self.timeout_sec) as response:
-                    payload = response.read().decode("utf-8")
+                self.rate_limiter.acquire(KLINE_REQUEST_WEIGHT)
+                response = self.pool.get(url)
+                self.rate_limiter.observe(response.headers, response.status)
+                if response.status in {418, 429}:
+                    raise BinanceRateLimitError(
+                        f"HTTP {response.status}: 请求权重超限, Retry-After={response.header('retry-after')}"
+                    )
+                if response.status >= 400:
+                    raise BinanceAPIError(f"HTTP {response.status}: {response.body[:200]!r}")
+                payload = response.body.decode("utf-8", errors="replace")
                 break
-            except URLError as exc:
+            except (OSError, http.client.HTTPException, BinanceAPIError) as exc:
                 last_error = exc
-                if attempt < self.max_retries:
+                if attempt < self.max_retries and isinstance(exc, BinanceRateLimitError):
+                    logger.warning("Binance请求权重超限 (尝试 %d/%d): %s", attempt + 1, self.max_retries + 1, exc)
+                elif attempt < self.max_retries:
                     wait = 2 ** attempt
                     logger.warning(
                         "Binance API请求失败 (尝试 %d/%d), %d秒后重试: %s",
@@ -54,7 +158,10 @@ class BinanceKlineClient:
         else:
             raise BinanceAPIError(f"Binance API请求在{self.max_retries + 1}次尝试后仍然失败: {last_error}") from last_error
 
-        raw = json.loads(payload)
+        try:
+            raw = json.loads(payload)
+        except ValueError as exc:
+            raise BinanceAPIError(f"Binance返回了无法解析的响应: {payload[:200]!r}") from exc
         if not isinstance(raw, list):
             raise BinanceAPIError(f"Binance返回了意外的响应格式: {raw}")
 
@@ -62,17 +169,20 @@ class BinanceKlineClient:
         for row in raw:
             # Binance kline schema:
             # [open_time, open, high, low, close, volume, close_time, ...]
-            open_time_ms = int(row[0])
-            klines.append(
-                {
-                    "symbol": symbol.upper(),
-                    "timeframe": timeframe,
-                    "open_time": datetime.fromtimestamp(open_time_ms / 1000, tz=timezone.utc),
-                    "open": float(row[1]),
-                    "high": float(row[2]),
-                    "low": float(row[3]),
-                    "close": float(row[4]),
-                    "volume": float(row[5]),
-                }
-            )
+            try:
+                open_time_ms = int(row[0])
+                klines.append(
+                    {
+                        "symbol": symbol.upper(),
+                        "timeframe": timeframe,
+                        "open_time": datetime.fromtimestamp(open_time_ms / 1000, tz=timezone.utc),
+                        "open": float(row[1]),
+                        "high": float(row[2]),
+                        "low": float(row[3]),
+                        "close": float(row[4]),
+                        "volume": float(row[5]),
+                    }
+                )
+            except (TypeError, ValueError, IndexError, OverflowError) as exc:
+                raise BinanceAPIError(f"Binance返回了无法解析的K线: {row!r}") from exc
         return klines
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.src.config import settings
+from backend.src.data.binance_client import (
+    MAX_KLINES_PER_REQUEST,
+    BinanceAPIError,
+    BinanceKlineClient,
+    timeframe_to_ms,
+)
+from backend.src.data.kline_cache import RAW_OPEN_TIME
+from backend.src.data.kline_service import KlineFetchRequest, fetch_klines_concurrently, upsert_klines
+from backend.src.db.models import Kline
+
+logger = logging.getLogger(__name__)
+
+SeriesKey = tuple[str, str]
+
+
+@dataclass(frozen=True)
+class KlineGap:
+    """一段连续缺失的K线，start_ms/end_ms为首尾缺失K线的open_time（含）。"""
+
+    symbol: str
+    timeframe: str
+    start_ms: int
+    end_ms: int
+    missing: int
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["start"] = datetime.fromtimestamp(self.start_ms / 1000, tz=timezone.utc).isoformat()
+        data["end"] = datetime.fromtimestamp(self.end_ms / 1000, tz=timezone.utc).isoformat()
+        return data
+
+
+def _load_open_times(db: Session, symbol: str, timeframe: str) -> np.ndarray:
+    rows = db.execute(
+        select(RAW_OPEN_TIME).where(Kline.symbol == symbol, Kline.timeframe == timeframe).order_by(Kline.open_time)
+    ).scalars()
+    return np.fromiter(rows, dtype=np.int64)
+
+
+def find_kline_gaps(db: Session, symbol: str, timeframe: str) -> list[KlineGap]:
+    """
+    一次向量化扫描找出本地K线序列内部的缺口。
+
+    只检查首尾两根已存储K线之间的区间；最新K线之后的部分由增量同步负责。
+    """
+    times = _load_open_times(db=db, symbol=symbol, timeframe=timeframe)
+    if times.shape[0] < 2:
+        return []
+    step_ms = timeframe_to_ms(timeframe)
+    deltas = np.diff(times)
+    positions = np.flatnonzero(deltas > step_ms)
+    return [
+        KlineGap(
+            symbol=symbol,
+            timeframe=timeframe,
+            start_ms=int(times[index] + step_ms),
+            end_ms=int(times[index + 1] - step_ms),
+            missing=int(deltas[index] // step_ms - 1),
+        )
+        for index in positions.tolist()
+        if deltas[index] // step_ms > 1
+    ]
+
+
+def plan_gap_fetches(gaps: list[KlineGap], max_requests: int | None = None) -> list[tuple[KlineGap, KlineFetchRequest]]:
+    """把缺口拆分为带startTime/endTime的区间请求，每个请求最多1000根，最近的缺口优先。"""
+    planned: list[tuple[KlineGap, KlineFetchRequest]] = []
+    for gap in sorted(gaps, key=lambda item: item.end_ms, reverse=True):
+        step_ms = timeframe_to_ms(gap.timeframe)
+        cursor = gap.start_ms
+        while cursor <= gap.end_ms:
+            if max_requests is not None and len(planned) >= max_requests:
+                return planned
+            window = int(min((gap.end_ms - cursor) // step_ms + 1, MAX_KLINES_PER_REQUEST))
+            request = KlineFetchRequest(
+                symbol=gap.symbol,
+                timeframe=gap.timeframe,
+                limit=window,
+                start_time_ms=cursor,
+                end_time_ms=cursor + (window - 1) * step_ms,
+            )
+            planned.append((gap, request))
+            cursor += window * step_ms
+    return planned
+
+
+class KlineGapIndex:
+    """
+    各(symbol, timeframe)的缺口索引。
+
+    记录最近一次扫描结果；交易所本身没有数据的区间（补拉返回空）标记为无法修复，
+    之后的扫描不再重复请求。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._gaps: dict[SeriesKey, list[KlineGap]] = {}
+        self._unfillable: dict[SeriesKey, set[tuple[int, int]]] = {}
+        self._scanned_at: dict[SeriesKey, datetime] = {}
+        self.stats = {"scans": 0, "requests": 0, "rows_repaired": 0}
+
+    def scan(self, db: Session, symbol: str, timeframe: str) -> list[KlineGap]:
+        """重新扫描缺口，返回仍需修复的部分。"""
+        key = (symbol, timeframe)
+        gaps = find_kline_gaps(db=db, symbol=symbol, timeframe=timeframe)
+        with self._lock:
+            self.stats["scans"] += 1
+            self._gaps[key] = gaps
+            self._scanned_at[key] = datetime.now(timezone.utc)
+            unfillable = self._unfillable.get(key, set())
+            return [gap for gap in gaps if (gap.start_ms, gap.end_ms) not in unfillable]
+
+    def mark_unfillable(self, gap: KlineGap) -> None:
+        with self._lock:
+            self._unfillable.setdefault((gap.symbol, gap.timeframe), set()).add((gap.start_ms, gap.end_ms))
+
+    def record_repair(self, requests: int, rows: int) -> None:
+        with self._lock:
+            self.stats["requests"] += requests
+            self.stats["rows_repaired"] += rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self._gaps.clear()
+            self._unfillable.clear()
+            self._scanned_at.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        """返回各序列最近一次扫描的缺口概况，用于健康检查。"""
+        with self._lock:
+            series: dict[str, Any] = {}
+            for key, gaps in self._gaps.items():
+                unfillable = self._unfillable.get(key, set())
+                open_gaps = [gap for gap in gaps if (gap.start_ms, gap.end_ms) not in unfillable]
+                series[f"{key[0]} {key[1]}"] = {
+                    "gaps": len(open_gaps),
+                    "missing_bars": sum(gap.missing for gap in open_gaps),
+                    "unfillable": len(gaps) - len(open_gaps),
+                    "oldest_gap": open_gaps[0].to_dict() if open_gaps else None,
+                    "scanned_at": self._scanned_at[key].isoformat(),
+                }
+            return {**self.stats, "series": series}
+
+
+gap_index = KlineGapIndex()
+
+
+def repair_kline_gaps(
+    db: Session,
+    symbol: str,
+    timeframes: list[str] | None = None,
+    client: BinanceKlineClient | None = None,
+    max_requests: int | None = None,
+) -> dict[str, Any]:
+    """
+    扫描并补齐内部缺口：只对缺失区间发起startTime/endTime请求，并发拉取后在单个事务中写入。
+
+    每轮最多发起max_requests个请求，剩余部分留到下一轮，适合在每个分析周期调用。
+    """
+    timeframes = timeframes or list(settings.kline_native_timeframes)
+    max_requests = settings.kline_gap_repair_max_requests if max_requests is None else max_requests
+
+    gaps: list[KlineGap] = []
+    for timeframe in timeframes:
+        gaps.extend(gap_index.scan(db=db, symbol=symbol, timeframe=timeframe))
+    result: dict[str, Any] = {"gaps": len(gaps), "missing_bars": sum(gap.missing for gap in gaps), "written": 0, "errors": []}
+    if not gaps or max_requests <= 0:
+        return result
+
+    planned = plan_gap_fetches(gaps, max_requests=max_requests)
+    fetched = fetch_klines_concurrently(requests=[request for _, request in planned], client=client)
+
+    returned: dict[KlineGap, int] = {}
+    failed: set[KlineGap] = set()
+    try:
+        for gap, request in planned:
+            rows = fetched[request]
+            if isinstance(rows, BinanceAPIError):
+                failed.add(gap)
+                result["errors"].append(f"{request.symbol} {request.timeframe}: {rows}")
+                continue
+            returned[gap] = returned.get(gap, 0) + len(rows)
+            result["written"] += upsert_klines(db=db, klines=rows, commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # 请求全部成功却没有返回任何K线，说明交易所在该区间本身没有数据
+    fully_planned = {gap for gap, request in planned if request.end_time_ms == gap.end_ms}
+    for gap, count in returned.items():
+        if count == 0 and gap not in failed and gap in fully_planned:
+            gap_index.mark_unfillable(gap)
+            logger.info("K线缺口无法修复(交易所无数据): %s %s %s", gap.symbol, gap.timeframe, gap.to_dict()["start"])
+    gap_index.record_repair(requests=len(planned), rows=result["written"])
+    return result
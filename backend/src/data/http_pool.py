@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import gzip
+import http.client
+import queue
+import threading
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+# 复用的空闲连接在服务端已关闭时会抛出这些异常，换新连接重试一次即可
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+HostKey = tuple[str, str, int]
+
+
+@dataclass
+class PooledResponse:
+    """已完整读取的HTTP响应，body已按Content-Encoding解码。"""
+
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+    def header(self, name: str, default: str | None = None) -> str | None:
+        return self.headers.get(name.lower(), default)
+
+
+@dataclass
+class _HostPool:
+    idle: queue.LifoQueue[http.client.HTTPConnection]
+    slots: threading.BoundedSemaphore
+    stats: dict[str, int] = field(default_factory=lambda: {"created": 0, "reused": 0})
+
+
+class HTTPConnectionPool:
+    """
+    基于http.client的keep-alive连接池，线程安全。
+
+    每个host最多max_per_host个并发连接，所有host合计最多保留pool_size个空闲连接。
+    连接超时和读取超时分开设置；accept_gzip=True时请求gzip压缩并自动解码。
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        max_per_host: int = 4,
+        connect_timeout_sec: float = 3.0,
+        read_timeout_sec: float = 10.0,
+        accept_gzip: bool = True,
+    ) -> None:
+        self.pool_size = max(1, pool_size)
+        self.max_per_host = max(1, max_per_host)
+        self.connect_timeout_sec = connect_timeout_sec
+        self.read_timeout_sec = read_timeout_sec
+        self.accept_gzip = accept_gzip
+        self._hosts: dict[HostKey, _HostPool] = {}
+        self._lock = threading.Lock()
+        self._idle_total = 0
+
+    def _host_pool(self, key: HostKey) -> _HostPool:
+        with self._lock:
+            pool = self._hosts.get(key)
+            if pool is None:
+                pool = _HostPool(idle=queue.LifoQueue(), slots=threading.BoundedSemaphore(self.max_per_host))
+                self._hosts[key] = pool
+            return pool
+
+    def _new_connection(self, key: HostKey) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        connection_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        connection = connection_cls(host, port, timeout=self.connect_timeout_sec)
+        connection.connect()
+        if connection.sock is not None:
+            connection.sock.settimeout(self.read_timeout_sec)
+        return connection
+
+    def _checkout(self, key: HostKey, pool: _HostPool) -> tuple[http.client.HTTPConnection, bool]:
+        try:
+            connection = pool.idle.get_nowait()
+        except queue.Empty:
+            self._count(pool, "created")
+            return self._new_connection(key), False
+        with self._lock:
+            self._idle_total -= 1
+            pool.stats["reused"] += 1
+        return connection, True
+
+    def _count(self, pool: _HostPool, name: str) -> None:
+        with self._lock:
+            pool.stats[name] += 1
+
+    def _checkin(self, pool: _HostPool, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if self._idle_total >= self.pool_size:
+                connection.close()
+                return
+            self._idle_total += 1
+        pool.idle.put(connection)
+
+    def _send(self, connection: http.client.HTTPConnection, path: str, headers: dict[str, str]) -> tuple[PooledResponse, bool]:
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        response_headers = {name.lower(): value for name, value in response.getheaders()}
+        if response_headers.get("content-encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        return PooledResponse(status=response.status, headers=response_headers, body=body), bool(response.will_close)
+
+    def get(self, url: str, headers: dict[str, str] | None = None) -> PooledResponse:
+        """发送GET请求并读取完整响应，连接在响应读完后归还连接池。"""
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key: HostKey = (scheme, parts.hostname or "", port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        request_headers = {"Connection": "keep-alive"}
+        if self.accept_gzip:
+            request_headers["Accept-Encoding"] = "gzip"
+        request_headers.update(headers or {})
+
+        pool = self._host_pool(key)
+        with pool.slots:
+            connection, reused = self._checkout(key, pool)
+            try:
+                try:
+                    response, will_close = self._send(connection, path, request_headers)
+                except _STALE_CONNECTION_ERRORS:
+                    if not reused:
+                        raise
+                    connection.close()
+                    self._count(pool, "created")
+                    connection = self._new_connection(key)
+                    response, will_close = self._send(connection, path, request_headers)
+            except BaseException:
+                connection.close()
+                raise
+
+            if will_close:
+                connection.close()
+            else:
+                self._checkin(pool, connection)
+            return response
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """返回各host的连接创建/复用次数和当前空闲连接数。"""
+        with self._lock:
+            return {
+                f"{scheme}://{host}:{port}": {**pool.stats, "idle": pool.idle.qsize()}
+                for (scheme, host, port), pool in self._hosts.items()
+            }
+
+    def close(self) -> None:
+        """关闭所有空闲连接。"""
+        with self._lock:
+            for pool in self._hosts.values():
+                while True:
+                    try:
+                        pool.idle.get_nowait().close()
+                    except queue.Empty:
+                        break
+            self._idle_total = 0
@@ -0,0 +1,429 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+from sqlalchemy import BigInteger, event, func, select, type_coerce
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend.src.config import settings
+from backend.src.data.binance_client import datetime_to_ms
+from backend.src.db.models import Kline
+
+SeriesKey = tuple[str, str]
+
+_PENDING_KEY = "kline_cache_pending"
+_PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+@dataclass(frozen=True)
+class KlineArrays:
+    """按时间正序排列的列式K线数据，open_time为UTC毫秒时间戳。"""
+
+    symbol: str
+    timeframe: str
+    open_time: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.open_time.shape[0])
+
+    def tail(self, limit: int) -> KlineArrays:
+        """返回最后limit根K线的视图，不复制数据。"""
+        start = max(0, len(self) - max(0, limit))
+        return KlineArrays(
+            symbol=self.symbol,
+            timeframe=self.timeframe,
+            open_time=self.open_time[start:],
+            open=self.open[start:],
+            high=self.high[start:],
+            low=self.low[start:],
+            close=self.close[start:],
+            volume=self.volume[start:],
+        )
+
+    def to_records(self) -> list[dict[str, Any]]:
+        """转换为get_recent_klines使用的字典列表格式。"""
+        columns = [self.open.tolist(), self.high.tolist(), self.low.tolist(), self.close.tolist(), self.volume.tolist()]
+        return [
+            {
+                "symbol": self.symbol,
+                "timeframe": self.timeframe,
+                "open_time": datetime.fromtimestamp(open_ms / 1000, tz=timezone.utc).isoformat(),
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "volume": volume,
+            }
+            for open_ms, open_, high, low, close, volume in zip(self.open_time.tolist(), *columns)
+        ]
+
+
+def empty_kline_arrays(symbol: str, timeframe: str) -> KlineArrays:
+    empty = np.empty(0, dtype=np.float64)
+    return KlineArrays(symbol, timeframe, np.empty(0, dtype=np.int64), empty, empty, empty, empty, empty)
+
+
+@dataclass(frozen=True)
+class _Fingerprint:
+    """
+    缓存序列应对应的数据库状态：整个序列最早的open_time、缓存区间（since_ms起，完整序列为全部）内的行数
+    和最新open_time，以及最新一根K线的OHLCV。
+    """
+
+    first_ms: int | None
+    since_ms: int | None
+    count: int
+    last_ms: int | None
+    last_values: tuple[float, ...] | None
+
+
+class _CachedSeries:
+    """
+    单个(symbol, timeframe)的列式缓冲区。
+
+    追加写在预留空间内原地完成，已发出的视图不受影响；修改已有K线或合并乱序数据时
+    重新分配缓冲区（写时复制），保证调用方持有的切片不会被改动。
+    first_ms记录数据库中该序列最早的open_time（缓存被截断时早于缓冲区起点）。
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        timeframe: str,
+        times: np.ndarray,
+        values: np.ndarray,
+        complete: bool,
+        capacity: int,
+        first_ms: int | None,
+    ) -> None:
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.capacity = capacity
+        self.complete = complete
+        self.first_ms = first_ms
+        self.verified_at = time.monotonic()
+        self._reset(times, values)
+
+    def _reset(self, times: np.ndarray, values: np.ndarray) -> None:
+        size = int(times.shape[0])
+        reserved = max(size * 2, 64)
+        self._times = np.empty(reserved, dtype=np.int64)
+        self._values = np.empty((len(_PRICE_COLUMNS), reserved), dtype=np.float64)
+        self._times[:size] = times
+        self._values[:, :size] = values
+        self.size = size
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times[: self.size]
+
+    def view(self) -> KlineArrays:
+        values = self._values[:, : self.size]
+        return KlineArrays(self.symbol, self.timeframe, self._times[: self.size], *values)
+
+    def fingerprint(self) -> _Fingerprint:
+        size = self.size
+        if size == 0:
+            return _Fingerprint(first_ms=self.first_ms, since_ms=None, count=0, last_ms=None, last_values=None)
+        return _Fingerprint(
+            first_ms=self.first_ms,
+            since_ms=None if self.complete else int(self._times[0]),
+            count=size,
+            last_ms=int(self._times[size - 1]),
+            last_values=tuple(self._values[:, size - 1].tolist()),
+        )
+
+    def merge(self, times: np.ndarray, values: np.ndarray) -> None:
+        """合并已提交的K线（times已排序去重），超出容量时丢弃最旧的部分。"""
+        if times.shape[0] > 0:
+            earliest = int(times[0])
+            self.first_ms = earliest if self.first_ms is None else min(self.first_ms, earliest)
+        current = self.times
+        if not self.complete and self.size > 0:
+            keep = times >= current[0]
+            times, values = times[keep], values[:, keep]
+        if times.shape[0] == 0:
+            return
+
+        if self.size == 0 or times[0] > current[-1]:
+            needed = self.size + times.shape[0]
+            if needed > self._times.shape[0]:
+                self._reset(np.concatenate([current, times]), np.concatenate([self._values[:, : self.size], values], axis=1))
+            else:
+                self._times[self.size : needed] = times
+                self._values[:, self.size : needed] = values
+                self.size = needed
+        else:
+            all_times = np.concatenate([current, times])
+            all_values = np.concatenate([self._values[:, : self.size], values], axis=1)
+            # 稳定排序后取每个open_time最后出现的一行，即新数据覆盖旧数据
+            order = np.argsort(all_times, kind="stable")
+            all_times, all_values = all_times[order], all_values[:, order]
+            last_of_group = np.append(all_times[1:] != all_times[:-1], True)
+            self._reset(all_times[last_of_group], all_values[:, last_of_group])
+        self._trim()
+
+    def _trim(self) -> None:
+        if self.size <= self.capacity:
+            return
+        start = self.size - self.capacity
+        self._reset(self._times[start : self.size].copy(), self._values[:, start : self.size].copy())
+        self.complete = False
+
+
+class KlineCache:
+    """
+    进程级列式K线缓存，按数据库引擎隔离。
+
+    每个(symbol, timeframe)保留最近capacity根K线的NumPy数组，读取最近N根只做切片；
+    upsert_klines写入的数据在事务提交后合并进缓存，回滚则丢弃。
+
+    其他进程（回填CLI、迁移脚本）的写入不会触发提交钩子，因此读取缓存前用一次廉价查询核对数据库
+    （每个序列每verify_interval_sec秒至多一次，0为每次读取都核对）：
+    序列最早的open_time（主键定位）、缓存区间内的行数和最新open_time（最多扫描capacity行）以及最新一根K线的值。
+    不一致时丢弃该序列并增大其版本号，按未命中重新加载。缓存区间之前的历史K线只核对最早时间，
+    外部进程在该区间内部补洞或改写不会被发现。
+    """
+
+    def __init__(self, capacity: int = 5000, verify_interval_sec: float = 0.0) -> None:
+        self.capacity = max(1, capacity)
+        self.verify_interval_sec = max(0.0, verify_interval_sec)
+        self._engines: weakref.WeakKeyDictionary[Engine, dict[SeriesKey, _CachedSeries]] = weakref.WeakKeyDictionary()
+        # 每个序列最近一次已提交写入的数据版本号（进程内单调递增），用于丢弃加载期间被并发写入覆盖的结果，
+        # 也作为派生计算结果（如量化信号）的缓存键
+        self._write_counts: weakref.WeakKeyDictionary[Engine, dict[SeriesKey, int]] = weakref.WeakKeyDictionary()
+        self._revision = 0
+        self._engine_tokens: weakref.WeakKeyDictionary[Engine, int] = weakref.WeakKeyDictionary()
+        self._token_sequence = itertools.count(1)
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "bypass": 0, "merges": 0, "stale": 0}
+
+    def _series_map(self, engine: Engine) -> dict[SeriesKey, _CachedSeries]:
+        series_map = self._engines.get(engine)
+        if series_map is None:
+            series_map = {}
+            self._engines[engine] = series_map
+        return series_map
+
+    def _bump_revision(self, engine: Engine, key: SeriesKey) -> None:
+        self._revision += 1
+        self._write_counts.setdefault(engine, {})[key] = self._revision
+
+    def _verified_series(self, db: Session, engine: Engine, key: SeriesKey) -> _CachedSeries | None:
+        """返回与数据库一致的已缓存序列；不一致时丢弃该序列、增大版本号并返回None。"""
+        with self._lock:
+            series = self._series_map(engine).get(key)
+            if series is None:
+                return None
+            now = time.monotonic()
+            if now - series.verified_at < self.verify_interval_sec:
+                return series
+            expected = series.fingerprint()
+        if _matches_database(db, key[0], key[1], expected):
+            series.verified_at = now
+            return series
+        with self._lock:
+            series_map = self._series_map(engine)
+            if series_map.get(key) is series:
+                del series_map[key]
+            self._bump_revision(engine, key)
+            self.stats["stale"] += 1
+        return None
+
+    def _load(self, db: Session, engine: Engine, key: SeriesKey) -> KlineArrays:
+        """从数据库加载最近capacity根K线并放入缓存；加载期间有新的提交时只返回结果而不缓存。"""
+        symbol, timeframe = key
+        with self._lock:
+            writes_before = self._write_counts.get(engine, {}).get(key, 0)
+        times, values = _load_columns(db=db, symbol=symbol, timeframe=timeframe, limit=self.capacity)
+        complete = times.shape[0] < self.capacity
+        if complete:
+            first_ms = int(times[0]) if times.shape[0] else None
+        else:
+            first_ms = _first_open_ms(db=db, symbol=symbol, timeframe=timeframe)
+        with self._lock:
+            self.stats["misses"] += 1
+            if self._write_counts.get(engine, {}).get(key, 0) != writes_before:
+                return KlineArrays(symbol, timeframe, times, *values)
+            series = _CachedSeries(
+                symbol=symbol,
+                timeframe=timeframe,
+                times=times,
+                values=values,
+                complete=complete,
+                capacity=self.capacity,
+                first_ms=first_ms,
+            )
+            self._series_map(engine)[key] = series
+            return series.view()
+
+    def get_recent(self, db: Session, symbol: str, timeframe: str, limit: int) -> KlineArrays:
+        """返回最近limit根K线（时间正序），缓存未命中或与数据库不一致时从数据库加载。"""
+        engine = _session_engine(db)
+        key = (symbol, timeframe)
+        series = self._verified_series(db, engine, key)
+        if series is not None:
+            with self._lock:
+                if series.size >= limit or series.complete:
+                    self.stats["hits"] += 1
+                    return series.view().tail(limit)
+
+        if limit > self.capacity:
+            with self._lock:
+                self.stats["bypass"] += 1
+            times, values = _load_columns(db=db, symbol=symbol, timeframe=timeframe, limit=limit)
+            return KlineArrays(symbol, timeframe, times, *values)
+        return self._load(db, engine, key).tail(limit)
+
+    def apply_committed(self, engine: Engine, klines: list[dict[str, Any]]) -> None:
+        """把已提交的K线合并进已缓存的序列，未缓存的序列不做处理。"""
+        grouped: dict[SeriesKey, list[dict[str, Any]]] = {}
+        for item in klines:
+            grouped.setdefault((str(item["symbol"]), str(item["timeframe"])), []).append(item)
+
+        with self._lock:
+            for key in grouped:
+                self._bump_revision(engine, key)
+            series_map = self._engines.get(engine)
+            if not series_map:
+                return
+            for key, rows in grouped.items():
+                series = series_map.get(key)
+                if series is None:
+                    continue
+                times, values = _rows_to_columns(rows)
+                series.merge(times, values)
+                self.stats["merges"] += 1
+
+    def revision(self, db: Session, symbol: str, timeframe: str) -> tuple[int, int]:
+        """
+        返回(数据库引擎编号, 序列数据版本号)。
+
+        upsert_klines每次提交实际变化的K线都会让对应序列的版本号增大；其他进程写入的K线在核对数据库时
+        发现，同样增大版本号。两次调用返回值相同说明数据未变。引擎编号区分同一进程中的不同数据库，
+        未写入过的序列版本号为0。序列尚未缓存时先加载，使之后的核对有基准可比。
+        """
+        engine = _session_engine(db)
+        key = (symbol, timeframe)
+        if self._verified_series(db, engine, key) is None:
+            self._load(db, engine, key)
+        with self._lock:
+            token = self._engine_tokens.get(engine)
+            if token is None:
+                token = next(self._token_sequence)
+                self._engine_tokens[engine] = token
+            return token, self._write_counts.get(engine, {}).get((symbol, timeframe), 0)
+
+    def invalidate(self, engine: Engine | None = None, symbol: str | None = None, timeframe: str | None = None) -> None:
+        """清除缓存；不传参数时清空全部。"""
+        with self._lock:
+            engines = [engine] if engine is not None else list(self._engines.keys())
+            for item in engines:
+                series_map = self._engines.get(item)
+                if not series_map:
+                    continue
+                for key in list(series_map):
+                    if (symbol is None or key[0] == symbol) and (timeframe is None or key[1] == timeframe):
+                        del series_map[key]
+                        # 重新加载时可能已包含外部写入，旧版本号上的派生结果不能再命中
+                        self._bump_revision(item, key)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            series_count = sum(len(series_map) for series_map in self._engines.values())
+            return {**self.stats, "series": series_count, "capacity": self.capacity}
+
+
+def _session_engine(db: Session) -> Engine:
+    bind = db.get_bind()
+    return getattr(bind, "engine", bind)
+
+
+# 直接读取open_time的毫秒整数，省去逐行构造datetime
+RAW_OPEN_TIME = type_coerce(Kline.open_time, BigInteger)
+
+
+def _load_columns(db: Session, symbol: str, timeframe: str, limit: int) -> tuple[np.ndarray, np.ndarray]:
+    rows = db.execute(
+        select(RAW_OPEN_TIME, Kline.open, Kline.high, Kline.low, Kline.close, Kline.volume)
+        .where(Kline.symbol == symbol, Kline.timeframe == timeframe)
+        .order_by(Kline.open_time.desc())
+        .limit(limit)
+    ).all()
+    rows.reverse()
+    times = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(_PRICE_COLUMNS)).T
+    return times, np.ascontiguousarray(values)
+
+
+def _first_open_ms(db: Session, symbol: str, timeframe: str) -> int | None:
+    return db.execute(
+        select(func.min(RAW_OPEN_TIME)).where(Kline.symbol == symbol, Kline.timeframe == timeframe)
+    ).scalar()
+
+
+def _matches_database(db: Session, symbol: str, timeframe: str, expected: _Fingerprint) -> bool:
+    """核对缓存序列与数据库是否一致，只做主键定位和缓存区间内的计数，不读取历史K线。"""
+    series_filter = (Kline.symbol == symbol, Kline.timeframe == timeframe)
+    if expected.since_ms is not None and _first_open_ms(db=db, symbol=symbol, timeframe=timeframe) != expected.first_ms:
+        return False
+    window = select(func.count(), func.max(RAW_OPEN_TIME)).where(*series_filter)
+    if expected.since_ms is not None:
+        window = window.where(RAW_OPEN_TIME >= expected.since_ms)
+    count, last_ms = db.execute(window).one()
+    if count != expected.count or last_ms != expected.last_ms:
+        return False
+    if last_ms is None:
+        return True
+    last_row = db.execute(
+        select(Kline.open, Kline.high, Kline.low, Kline.close, Kline.volume).where(*series_filter, RAW_OPEN_TIME == last_ms)
+    ).one_or_none()
+    return last_row is not None and tuple(last_row) == expected.last_values
+
+
+def _rows_to_columns(rows: list[dict[str, Any]]) -> tuple[np.ndarray, np.ndarray]:
+    latest: dict[int, dict[str, Any]] = {}
+    for item in rows:
+        open_time = item["open_time"]
+        open_ms = datetime_to_ms(open_time) if isinstance(open_time, datetime) else int(open_time)
+        latest[open_ms] = item
+    ordered = sorted(latest)
+    times = np.array(ordered, dtype=np.int64)
+    values = np.array(
+        [[float(latest[open_ms][column]) for open_ms in ordered] for column in _PRICE_COLUMNS],
+        dtype=np.float64,
+    ).reshape(len(_PRICE_COLUMNS), len(ordered))
+    return times, values
+
+
+kline_cache = KlineCache(capacity=settings.kline_cache_max_bars, verify_interval_sec=settings.kline_cache_verify_sec)
+
+
+def track_pending_klines(db: Session, klines: list[dict[str, Any]]) -> None:
+    """登记本事务写入的K线，提交后再合并进缓存。"""
+    db.info.setdefault(_PENDING_KEY, []).extend(klines)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_klines(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        kline_cache.apply_committed(_session_engine(session), pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_klines(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -1,69 +1,223 @@
 from __future__ import annotations
 
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
-from sqlalchemy import Select, select
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from backend.src.config import settings
-from backend.src.data.binance_client import BinanceKlineClient
+from backend.src.data.binance_client import (
+    MAX_KLINES_PER_REQUEST,
+    BinanceAPIError,
+    BinanceKlineClient,
+    datetime_to_ms,
+    timeframe_to_ms,
+)
+from backend.src.data.kline_cache import RAW_OPEN_TIME, KlineArrays, kline_cache, track_pending_klines
+from backend.src.data.resample import (
+    base_bars_needed,
+    fold_limits_into_native,
+    parse_timeframe_ms,
+    resample_tail,
+    select_base_timeframe,
+)
 from backend.src.db.models import Kline
 
+logger = logging.getLogger(__name__)
+
 INITIAL_BACKFILL_LIMITS = {
     "1d": 90,
     "4h": 42,   # 7 days * 6
     "1h": 168,  # 7 days * 24
 }
 
+# 增量同步时本地无数据的兜底拉取数量
+INCREMENTAL_SYNC_LIMITS = {
+    "1h": 200,
+    "4h": 120,
+    "1d": 90,
+}
 
-def _query_klines(db: Session, symbol: str, timeframe: str, limit: int) -> Select[tuple[Kline]]:
-    return (
-        select(Kline)
-        .where(Kline.symbol == symbol, Kline.timeframe == timeframe)
-        .order_by(Kline.open_time.desc())
-        .limit(limit)
-    )
+# K线推送流写入的实时价格: symbol -> (价格, time.monotonic()时间戳)
+_live_prices: dict[str, tuple[float, float]] = {}
+
+# 进程级并发上限，所有并发拉取共享，避免多个调用方叠加后超出限制
+_fetch_slots = threading.BoundedSemaphore(max(1, settings.kline_fetch_concurrency))
+
+
+@dataclass(frozen=True)
+class KlineFetchRequest:
+    """单个(symbol, timeframe)的K线拉取请求。"""
+
+    symbol: str
+    timeframe: str
+    limit: int
+    start_time_ms: int | None = None
+    end_time_ms: int | None = None
+
+
+def get_recent_kline_arrays(db: Session, symbol: str, timeframe: str, limit: int) -> KlineArrays:
+    """
+    以列式数组返回最近N根K线（时间正序），优先从进程内缓存切片。
+
+    非原生存储的周期（如2h、8h、3d、1w）由基础周期在本地合成，不产生网络请求。
+    """
+    native = settings.kline_native_timeframes
+    if timeframe in native:
+        return kline_cache.get_recent(db=db, symbol=symbol, timeframe=timeframe, limit=limit)
+    try:
+        base_timeframe = select_base_timeframe(timeframe, native)
+    except ValueError:
+        return kline_cache.get_recent(db=db, symbol=symbol, timeframe=timeframe, limit=limit)
+
+    base_limit = base_bars_needed(timeframe, base_timeframe, limit)
+    base = kline_cache.get_recent(db=db, symbol=symbol, timeframe=base_timeframe, limit=base_limit)
+    return resample_tail(base, timeframe, limit=limit, truncated=len(base) >= base_limit)
+
+
+def kline_data_revision(db: Session, symbol: str, timeframe: str) -> tuple[int, int]:
+    """
+    返回该周期K线数据的版本标识，数据未变化时保持不变，可作为派生结果的缓存键。
+
+    非原生周期由基础周期合成，使用基础周期的版本号。
+    """
+    native = settings.kline_native_timeframes
+    source_timeframe = timeframe
+    if timeframe not in native:
+        try:
+            source_timeframe = select_base_timeframe(timeframe, native)
+        except ValueError:
+            source_timeframe = timeframe
+    return kline_cache.revision(db=db, symbol=symbol, timeframe=source_timeframe)
 
 
 def get_recent_klines(db: Session, symbol: str, timeframe: str, limit: int) -> list[dict[str, Any]]:
     """查询最近N根K线数据，按时间正序返回。"""
-    rows = db.execute(_query_klines(db=db, symbol=symbol, timeframe=timeframe, limit=limit)).scalars().all()
-    rows = list(reversed(rows))
-    return [
-        {
-            "symbol": row.symbol,
-            "timeframe": row.timeframe,
-            "open_time": row.open_time.isoformat(),
-            "open": row.open,
-            "high": row.high,
-            "low": row.low,
-            "close": row.close,
-            "volume": row.volume,
-        }
-        for row in rows
-    ]
+    return get_recent_kline_arrays(db=db, symbol=symbol, timeframe=timeframe, limit=limit).to_records()
 
 
-def upsert_klines(db: Session, klines: list[dict[str, Any]]) -> int:
-    """批量插入或更新K线数据，通过(symbol, timeframe, open_time)去重。"""
+@dataclass
+class KlineUpsertStats:
+    """bulk_upsert_klines的写入统计。"""
+
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated
+
+
+_KLINE_TABLE = Kline.__table__
+_VALUE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# executemany按行绑定参数，不受SQLite单条语句变量上限（SQLITE_MAX_VARIABLE_NUMBER）影响；
+# 分块用于限制比对查询的区间和单批内存
+BULK_UPSERT_CHUNK_ROWS = 5000
+
+_INSERT_KLINE = sqlite_insert(_KLINE_TABLE)
+_INSERT_KLINE = _INSERT_KLINE.on_conflict_do_update(
+    index_elements=["symbol", "timeframe", "open_time"],
+    set_={column: getattr(_INSERT_KLINE.excluded, column) for column in _VALUE_COLUMNS},
+)
+_UPDATE_KLINE = update(_KLINE_TABLE).where(
+    _KLINE_TABLE.c.symbol == bindparam("key_symbol"),
+    _KLINE_TABLE.c.timeframe == bindparam("key_timeframe"),
+    _KLINE_TABLE.c.open_time == bindparam("key_open_time"),
+)
+
+
+def _existing_values(db: Session, symbol: str, timeframe: str, start: datetime, end: datetime) -> dict[int, tuple[float, ...]]:
+    rows = db.execute(
+        select(RAW_OPEN_TIME, Kline.open, Kline.high, Kline.low, Kline.close, Kline.volume).where(
+            Kline.symbol == symbol,
+            Kline.timeframe == timeframe,
+            Kline.open_time >= start,
+            Kline.open_time <= end,
+        )
+    ).all()
+    return {int(row[0]): tuple(row[1:]) for row in rows}
+
+
+def bulk_upsert_klines(db: Session, klines: list[dict[str, Any]], commit: bool = True) -> KlineUpsertStats:
+    """
+    分块批量写入K线，返回新增/更新/未变化行数。
+
+    先按区间查询已有K线并逐行比对OHLCV，新行用executemany插入，变化的行按主键executemany更新，
+    值完全相同的行不产生写入。输入中重复的(symbol, timeframe, open_time)以最后一行为准。
+    """
+    stats = KlineUpsertStats()
     if not klines:
-        return 0
-    statement = sqlite_insert(Kline).values(klines)
-    statement = statement.on_conflict_do_update(
-        index_elements=["symbol", "timeframe", "open_time"],
-        set_={
-            "open": statement.excluded.open,
-            "high": statement.excluded.high,
-            "low": statement.excluded.low,
-            "close": statement.excluded.close,
-            "volume": statement.excluded.volume,
-        },
-    )
-    result = db.execute(statement)
-    db.commit()
-    return result.rowcount or 0
+        return stats
+
+    series: dict[tuple[str, str], dict[int, dict[str, Any]]] = {}
+    for item in klines:
+        open_time = item["open_time"]
+        row = {
+            "symbol": item["symbol"],
+            "timeframe": item["timeframe"],
+            "open_time": open_time,
+            **{column: float(item[column]) for column in _VALUE_COLUMNS},
+        }
+        series.setdefault((row["symbol"], row["timeframe"]), {})[datetime_to_ms(open_time)] = row
+
+    changed: list[dict[str, Any]] = []
+    for (symbol, timeframe), rows_by_ms in series.items():
+        ordered = sorted(rows_by_ms)
+        for offset in range(0, len(ordered), BULK_UPSERT_CHUNK_ROWS):
+            chunk = ordered[offset : offset + BULK_UPSERT_CHUNK_ROWS]
+            existing = _existing_values(
+                db, symbol, timeframe, rows_by_ms[chunk[0]]["open_time"], rows_by_ms[chunk[-1]]["open_time"]
+            )
+            inserts: list[dict[str, Any]] = []
+            updates: list[dict[str, Any]] = []
+            for open_ms in chunk:
+                row = rows_by_ms[open_ms]
+                previous = existing.get(open_ms)
+                if previous is None:
+                    inserts.append(row)
+                elif previous == tuple(row[column] for column in _VALUE_COLUMNS):
+                    stats.unchanged += 1
+                else:
+                    updates.append(
+                        {
+                            "key_symbol": symbol,
+                            "key_timeframe": timeframe,
+                            "key_open_time": row["open_time"],
+                            **{column: row[column] for column in _VALUE_COLUMNS},
+                        }
+                    )
+                    changed.append(row)
+            if inserts:
+                db.execute(_INSERT_KLINE, inserts)
+                changed.extend(inserts)
+            if updates:
+                db.execute(_UPDATE_KLINE, updates)
+            stats.inserted += len(inserts)
+            stats.updated += len(updates)
+
+    if changed:
+        track_pending_klines(db, changed)
+    if commit:
+        db.commit()
+    return stats
+
+
+def upsert_klines(db: Session, klines: list[dict[str, Any]], commit: bool = True) -> int:
+    """
+    批量插入或更新K线数据，通过(symbol, timeframe, open_time)去重，返回实际新增和更新的行数。
+
+    commit=False时只执行写入，由调用方在同一事务中提交（例如连同回填检查点一起提交）。
+    """
+    return bulk_upsert_klines(db=db, klines=klines, commit=commit).written
 
 
 def fetch_and_store_klines(
@@ -73,10 +227,144 @@ def fetch_and_store_klines(
     limit: int,
     client: BinanceKlineClient | None = None,
 ) -> int:
-    """从Binance获取K线数据并存入数据库，返回写入行数。"""
+    """
+    从Binance获取最近limit根K线并存入数据库，返回写入行数。
+
+    超过单次请求上限（1000根）时从对应起点按窗口向后分页拉取。
+    """
+    client = client or BinanceKlineClient()
+    if limit <= MAX_KLINES_PER_REQUEST:
+        klines = client.fetch_klines(symbol=symbol, timeframe=timeframe, limit=limit)
+        return upsert_klines(db=db, klines=klines)
+
+    step_ms = timeframe_to_ms(timeframe)
+    now_ms = datetime_to_ms(datetime.now(timezone.utc))
+    start_ms = now_ms // step_ms * step_ms - (limit - 1) * step_ms
+    written = 0
+    while start_ms <= now_ms:
+        window = int(min((now_ms - start_ms) // step_ms + 1, MAX_KLINES_PER_REQUEST))
+        klines = client.fetch_klines(symbol=symbol, timeframe=timeframe, limit=window, start_time_ms=start_ms)
+        written += upsert_klines(db=db, klines=klines)
+        if len(klines) < window or not klines:
+            break
+        start_ms = datetime_to_ms(klines[-1]["open_time"]) + step_ms
+    return written
+
+
+def latest_open_time(db: Session, symbol: str, timeframe: str) -> datetime | None:
+    """查询本地已存储的最新K线开盘时间，无数据时返回None。"""
+    return db.execute(
+        select(Kline.open_time)
+        .where(Kline.symbol == symbol, Kline.timeframe == timeframe)
+        .order_by(Kline.open_time.desc())
+        .limit(1)
+    ).scalar()
+
+
+def plan_incremental_fetch(
+    db: Session,
+    symbol: str,
+    timeframe: str,
+    fallback_limit: int,
+    now: datetime | None = None,
+) -> KlineFetchRequest:
+    """
+    根据本地最新open_time生成增量拉取请求。
+
+    单次请求最多覆盖1000根K线，更长的缺口由回填任务补齐。
+    """
+    last_open = latest_open_time(db=db, symbol=symbol, timeframe=timeframe)
+    if last_open is None:
+        return KlineFetchRequest(symbol=symbol, timeframe=timeframe, limit=min(fallback_limit, MAX_KLINES_PER_REQUEST))
+
+    start_ms = datetime_to_ms(last_open)
+    now_ms = datetime_to_ms(now or datetime.now(timezone.utc))
+    missing = max(0, now_ms - start_ms) // timeframe_to_ms(timeframe) + 1
+    return KlineFetchRequest(
+        symbol=symbol,
+        timeframe=timeframe,
+        limit=int(min(missing, MAX_KLINES_PER_REQUEST)),
+        start_time_ms=start_ms,
+    )
+
+
+def _fetch_with_slot(client: BinanceKlineClient, request: KlineFetchRequest) -> list[dict[str, Any]]:
+    with _fetch_slots:
+        return client.fetch_klines(
+            symbol=request.symbol,
+            timeframe=request.timeframe,
+            limit=request.limit,
+            start_time_ms=request.start_time_ms,
+            end_time_ms=request.end_time_ms,
+        )
+
+
+def fetch_klines_concurrently(
+    requests: list[KlineFetchRequest],
+    client: BinanceKlineClient | None = None,
+    max_workers: int | None = None,
+) -> dict[KlineFetchRequest, list[dict[str, Any]] | BinanceAPIError]:
+    """
+    并发执行多个K线拉取请求，总耗时约等于最慢的单个请求。
+
+    并发数受进程级信号量限制；单个请求失败（包括非BinanceAPIError的意外异常）时对应结果为BinanceAPIError，
+    不影响其他请求。
+    """
     client = client or BinanceKlineClient()
-    klines = client.fetch_klines(symbol=symbol, timeframe=timeframe, limit=limit)
-    return upsert_klines(db=db, klines=klines)
+    results: dict[KlineFetchRequest, list[dict[str, Any]] | BinanceAPIError] = {}
+    if not requests:
+        return results
+
+    workers = max(1, min(len(requests), max_workers or settings.kline_fetch_concurrency))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kline-fetch") as executor:
+        futures = {request: executor.submit(_fetch_with_slot, client, request) for request in requests}
+        for request, future in futures.items():
+            try:
+                results[request] = future.result()
+            except BinanceAPIError as exc:
+                results[request] = exc
+            except Exception as exc:
+                logger.exception("K线拉取出现意外错误: %s %s", request.symbol, request.timeframe)
+                error = BinanceAPIError(f"{type(exc).__name__}: {exc}")
+                error.__cause__ = exc
+                results[request] = error
+    return results
+
+
+def sync_klines_concurrently(
+    db: Session,
+    symbols: list[str],
+    limits: dict[str, int] | None = None,
+    client: BinanceKlineClient | None = None,
+    now: datetime | None = None,
+) -> dict[str, Any]:
+    """
+    并发增量同步多个(symbol, timeframe)，网络请求并行执行，数据库写入在单个事务中串行完成。
+
+    返回 {"written": {symbol: {timeframe: rows}}, "errors": [...]}。
+    """
+    limits = fold_limits_into_native(limits or INCREMENTAL_SYNC_LIMITS, settings.kline_native_timeframes)
+    requests = [
+        plan_incremental_fetch(db=db, symbol=symbol, timeframe=timeframe, fallback_limit=limit, now=now)
+        for symbol in symbols
+        for timeframe, limit in limits.items()
+    ]
+    fetched = fetch_klines_concurrently(requests=requests, client=client)
+
+    written: dict[str, dict[str, int]] = {symbol: {} for symbol in symbols}
+    errors: list[str] = []
+    try:
+        for request in requests:
+            result = fetched[request]
+            if isinstance(result, BinanceAPIError):
+                errors.append(f"{request.symbol} {request.timeframe}: {result}")
+                continue
+            written[request.symbol][request.timeframe] = upsert_klines(db=db, klines=result, commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"written": written, "errors": errors}
 
 
 def maybe_backfill_initial_klines(db: Session, symbol: str | None = None) -> dict[str, int]:
@@ -84,7 +372,7 @@ def maybe_backfill_initial_klines(db: Session, symbol: str | None = None) -> dic
     symbol = symbol or settings.trading_pair
     inserted: dict[str, int] = {}
 
-    for timeframe, limit in INITIAL_BACKFILL_LIMITS.items():
+    for timeframe, limit in fold_limits_into_native(INITIAL_BACKFILL_LIMITS, settings.kline_native_timeframes).items():
         existing_count = db.query(Kline).filter(Kline.symbol == symbol, Kline.timeframe == timeframe).count()
         if existing_count >= limit:
             inserted[timeframe] = 0
@@ -93,9 +381,32 @@ def maybe_backfill_initial_klines(db: Session, symbol: str | None = None) -> dic
     return inserted
 
 
+def record_live_price(symbol: str, price: float) -> None:
+    """记录实时推送的最新成交价，供latest_price_from_db优先使用。"""
+    if price > 0:
+        _live_prices[symbol.upper()] = (float(price), time.monotonic())
+
+
+def get_live_price(symbol: str, max_age_sec: float | None = None) -> float | None:
+    """返回未过期的实时价格，没有或已过期时返回None。"""
+    entry = _live_prices.get(symbol.upper())
+    if entry is None:
+        return None
+    price, recorded_at = entry
+    max_age = settings.live_price_max_age_sec if max_age_sec is None else max_age_sec
+    if time.monotonic() - recorded_at > max_age:
+        return None
+    return price
+
+
 def latest_price_from_db(db: Session, symbol: str | None = None) -> float | None:
-    """从数据库获取最新价格，优先使用1h K线，回退到任意时间周期。"""
+    """
+    获取最新价格：优先使用K线推送流的实时价格，其次数据库中的1h K线，最后回退到任意时间周期。
+    """
     symbol = symbol or settings.trading_pair
+    live_price = get_live_price(symbol)
+    if live_price is not None:
+        return live_price
     row = (
         db.execute(
             select(Kline)
@@ -128,7 +439,10 @@ def fallback_mock_klines(timeframe: str, limit: int, symbol: str | None = None)
     """生成模拟K线数据，用于数据库无数据时的前端展示降级。"""
     symbol = symbol or settings.trading_pair
     now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
-    step = {"1h": timedelta(hours=1), "4h": timedelta(hours=4), "1d": timedelta(days=1)}.get(timeframe, timedelta(hours=1))
+    try:
+        step = timedelta(milliseconds=parse_timeframe_ms(timeframe)[0])
+    except ValueError:
+        step = timedelta(hours=1)
     base_price = 3200.0
     items: list[dict[str, Any]] = []
     for index in range(limit):
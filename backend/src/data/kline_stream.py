@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from backend.src.config import settings
+from backend.src.data.binance_client import BinanceAPIError, BinanceKlineClient
+from backend.src.data.kline_service import INCREMENTAL_SYNC_LIMITS, record_live_price, sync_klines_concurrently, upsert_klines
+from backend.src.db.database import SessionLocal
+from backend.src.trading.orders import ORDER_MATCH_TIMEFRAME, match_stored_klines
+from backend.src.trading.protective import PriceRange, check_protective_orders, protective_book
+
+logger = logging.getLogger(__name__)
+
+try:
+    import websockets
+except Exception:  # pragma: no cover
+    websockets = None  # type: ignore[assignment]
+
+
+def build_stream_url(base_url: str, symbol: str, timeframes: list[str]) -> str:
+    """构造Binance组合K线流地址，例如 /stream?streams=ethusdt@kline_1h/ethusdt@kline_4h。"""
+    streams = "/".join(f"{symbol.lower()}@kline_{timeframe}" for timeframe in timeframes)
+    return f"{base_url.rstrip('/')}/stream?streams={streams}"
+
+
+def parse_kline_event(message: dict[str, Any]) -> tuple[dict[str, Any], bool] | None:
+    """
+    解析K线推送消息，返回(K线字典, 是否已收盘)。
+
+    同时支持组合流格式 {"stream": ..., "data": {...}} 和单流格式，非K线消息返回None。
+    """
+    payload = message.get("data", message)
+    if not isinstance(payload, dict) or payload.get("e") != "kline":
+        return None
+    raw = payload.get("k") or {}
+    try:
+        kline = {
+            "symbol": str(raw.get("s") or payload.get("s")).upper(),
+            "timeframe": str(raw["i"]),
+            "open_time": datetime.fromtimestamp(int(raw["t"]) / 1000, tz=timezone.utc),
+            "open": float(raw["o"]),
+            "high": float(raw["h"]),
+            "low": float(raw["l"]),
+            "close": float(raw["c"]),
+            "volume": float(raw["v"]),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+    return kline, bool(raw.get("x"))
+
+
+class KlineStreamIngestor:
+    """
+    订阅Binance K线推送并写入SQLite。
+
+    未收盘K线只保存在内存中（同时刷新实时价格并检查止损/止盈），收盘K线通过upsert_klines落库并撮合挂单；
+    每次（重新）连接成功后先用REST增量同步补齐断线期间错过的K线。
+    """
+
+    def __init__(
+        self,
+        symbol: str | None = None,
+        timeframes: list[str] | None = None,
+        ws_base_url: str | None = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        client: BinanceKlineClient | None = None,
+        reconnect_delay_sec: float = 1.0,
+        max_reconnect_delay_sec: float = 30.0,
+    ) -> None:
+        self.symbol = (symbol or settings.trading_pair).upper()
+        self.timeframes = timeframes or list(settings.kline_native_timeframes)
+        self.url = build_stream_url(ws_base_url or settings.binance_ws_url, self.symbol, self.timeframes)
+        self.session_factory = session_factory
+        self.client = client
+        self.reconnect_delay_sec = reconnect_delay_sec
+        self.max_reconnect_delay_sec = max_reconnect_delay_sec
+        self.live_candles: dict[str, dict[str, Any]] = {}
+        self.stats: dict[str, int] = {
+            "messages": 0,
+            "closed_written": 0,
+            "connections": 0,
+            "catch_ups": 0,
+            "protective_triggers": 0,
+            "order_fills": 0,
+        }
+        self._stopped = asyncio.Event()
+
+    def _catch_up(self) -> dict[str, Any]:
+        db = self.session_factory()
+        try:
+            limits = {timeframe: INCREMENTAL_SYNC_LIMITS.get(timeframe, 200) for timeframe in self.timeframes}
+            return sync_klines_concurrently(db=db, symbols=[self.symbol], limits=limits, client=self.client)
+        finally:
+            db.close()
+
+    def _store_closed(self, kline: dict[str, Any]) -> int:
+        db = self.session_factory()
+        try:
+            written = upsert_klines(db=db, klines=[kline])
+            if kline["timeframe"] == ORDER_MATCH_TIMEFRAME:
+                self.stats["order_fills"] += len(match_stored_klines(db=db, symbol=kline["symbol"])["fills"])
+            return written
+        finally:
+            db.close()
+
+    def _check_protective(self, symbol: str, price_range: PriceRange) -> None:
+        db = self.session_factory()
+        try:
+            if check_protective_orders(db=db, symbol=symbol, price_range=price_range) is not None:
+                self.stats["protective_triggers"] += 1
+        except Exception as exc:
+            logger.error("保护单检查失败: %s", exc, exc_info=True)
+        finally:
+            db.close()
+
+    async def handle_message(self, raw: str | bytes) -> bool:
+        """处理一条推送消息，收盘K线写库时返回True。"""
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            return False
+        parsed = parse_kline_event(message)
+        if parsed is None:
+            return False
+
+        kline, closed = parsed
+        self.stats["messages"] += 1
+        record_live_price(kline["symbol"], kline["close"])
+        if settings.protective_orders_enabled:
+            price_range = PriceRange.candle(kline) if closed else PriceRange.tick(kline["close"])
+            if protective_book.would_trigger(kline["symbol"], price_range):
+                await asyncio.to_thread(self._check_protective, kline["symbol"], price_range)
+        if not closed:
+            self.live_candles[kline["timeframe"]] = kline
+            return False
+
+        live = self.live_candles.get(kline["timeframe"])
+        if live is not None and live["open_time"] <= kline["open_time"]:
+            self.live_candles.pop(kline["timeframe"], None)
+        await asyncio.to_thread(self._store_closed, kline)
+        self.stats["closed_written"] += 1
+        return True
+
+    async def _consume(self) -> None:
+        async with websockets.connect(self.url, ping_interval=20, ping_timeout=20) as connection:
+            self.stats["connections"] += 1
+            try:
+                result = await asyncio.to_thread(self._catch_up)
+                self.stats["catch_ups"] += 1
+                if result["errors"]:
+                    logger.warning("K线流REST补齐部分失败: %s", result["errors"])
+            except BinanceAPIError as exc:
+                logger.warning("K线流REST补齐失败: %s", exc)
+
+            async for raw in connection:
+                await self.handle_message(raw)
+                if self._stopped.is_set():
+                    return
+
+    async def run(self) -> None:
+        """持续消费K线推送，断线后按指数退避重连，直到调用stop()。"""
+        if websockets is None:
+            raise RuntimeError("websockets is not installed")
+
+        delay = self.reconnect_delay_sec
+        while not self._stopped.is_set():
+            try:
+                await self._consume()
+                delay = self.reconnect_delay_sec
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("K线流连接中断, %.1f秒后重连: %s", delay, exc)
+            if self._stopped.is_set():
+                break
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_reconnect_delay_sec)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+_ingestor: KlineStreamIngestor | None = None
+_ingestor_task: asyncio.Task[None] | None = None
+
+
+def start_kline_stream() -> dict[str, Any]:
+    """在当前事件循环中启动K线流采集任务（需在async上下文中调用）。"""
+    global _ingestor, _ingestor_task
+    if not settings.kline_stream_enabled:
+        return {"status": "disabled", "reason": "KLINE_STREAM_ENABLED=false"}
+    if websockets is None:
+        return {"status": "unavailable", "reason": "websockets is not installed"}
+    if _ingestor_task is not None and not _ingestor_task.done():
+        return {"status": "running"}
+
+    _ingestor = KlineStreamIngestor()
+    _ingestor_task = asyncio.get_running_loop().create_task(_ingestor.run())
+    logger.info("K线流采集已启动: %s", _ingestor.url)
+    return {"status": "running", "url": _ingestor.url}
+
+
+async def stop_kline_stream() -> dict[str, Any]:
+    """停止K线流采集任务。"""
+    global _ingestor, _ingestor_task
+    if _ingestor is not None:
+        _ingestor.stop()
+    if _ingestor_task is not None:
+        _ingestor_task.cancel()
+        try:
+            await _ingestor_task
+        except (asyncio.CancelledError, Exception):
+            pass
+    _ingestor = None
+    _ingestor_task = None
+    return {"status": "stopped"}
+
+
+def kline_stream_status() -> dict[str, Any]:
+    """返回K线流采集状态和计数。"""
+    if _ingestor is None or _ingestor_task is None or _ingestor_task.done():
+        return {"status": "stopped" if settings.kline_stream_enabled else "disabled"}
+    return {
+        "status": "running",
+        "url": _ingestor.url,
+        "stats": dict(_ingestor.stats),
+        "live_candles": {
+            timeframe: {"open_time": candle["open_time"].isoformat(), "close": candle["close"]}
+            for timeframe, candle in _ingestor.live_candles.items()
+        },
+    }
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+
+class WeightRateLimiter:
+    """
+    Binance请求权重令牌桶限流器，线程安全，供所有客户端共享。
+
+    令牌按 budget/window_sec 的速率匀速补充，每次请求按权重扣减；
+    响应头中的X-MBX-USED-WEIGHT-1M会校正本地估算，429/418响应的Retry-After
+    会暂停所有请求直到封禁结束。
+    """
+
+    def __init__(
+        self,
+        weight_limit: int = 6000,
+        window_sec: float = 60.0,
+        budget_ratio: float = 0.8,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.weight_limit = weight_limit
+        self.window_sec = window_sec
+        self.budget = max(1.0, weight_limit * budget_ratio)
+        self._refill_per_sec = self.budget / window_sec
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.budget
+        self._updated_at = clock()
+        self._blocked_until = 0.0
+        self._server_used_weight: int | None = None
+        self._throttled_requests = 0
+        self._total_wait_sec = 0.0
+        self._rate_limited_responses = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(self.budget, self._tokens + elapsed * self._refill_per_sec)
+        self._updated_at = now
+
+    def acquire(self, weight: int = 1) -> float:
+        """阻塞直到预算允许发送该权重的请求，返回实际等待秒数。"""
+        weight = min(float(weight), self.budget)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                wait = max(0.0, self._blocked_until - now)
+                if wait <= 0 and self._tokens >= weight:
+                    self._tokens -= weight
+                    if waited > 0:
+                        self._throttled_requests += 1
+                        self._total_wait_sec += waited
+                    return waited
+                if wait <= 0:
+                    wait = (weight - self._tokens) / self._refill_per_sec
+            self._sleep(wait)
+            waited += wait
+
+    def observe(self, headers: dict[str, str], status: int) -> None:
+        """根据响应头校正已用权重，429/418时按Retry-After暂停请求。"""
+        used_raw = headers.get("x-mbx-used-weight-1m") or headers.get("x-mbx-used-weight")
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if used_raw is not None:
+                try:
+                    used = int(used_raw)
+                except ValueError:
+                    used = None
+                if used is not None:
+                    self._server_used_weight = used
+                    self._tokens = min(self._tokens, max(0.0, self.budget - used))
+
+            if status in {418, 429}:
+                self._rate_limited_responses += 1
+                retry_after = _parse_retry_after(headers.get("retry-after"))
+                self._blocked_until = max(self._blocked_until, now + (retry_after if retry_after is not None else self.window_sec))
+                self._tokens = 0.0
+
+    def snapshot(self) -> dict[str, Any]:
+        """返回当前权重使用情况，用于健康检查和监控。"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            return {
+                "weight_limit_per_window": self.weight_limit,
+                "window_sec": self.window_sec,
+                "budget": round(self.budget, 2),
+                "available_weight": round(self._tokens, 2),
+                "server_used_weight": self._server_used_weight,
+                "blocked_for_sec": round(max(0.0, self._blocked_until - now), 2),
+                "throttled_requests": self._throttled_requests,
+                "total_wait_sec": round(self._total_wait_sec, 3),
+                "rate_limited_responses": self._rate_limited_responses,
+            }
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
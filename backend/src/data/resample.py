@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import re
+
+import numpy as np
+
+from backend.src.data.kline_cache import KlineArrays
+
+_TIMEFRAME_PATTERN = re.compile(r"^(\d+)([mhdw])$")
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 7 * 86_400_000}
+
+# Binance周线从周一00:00 UTC开始，1970-01-01是周四，需偏移4天
+_WEEK_OFFSET_MS = 4 * 86_400_000
+
+
+def parse_timeframe_ms(timeframe: str) -> tuple[int, int]:
+    """
+    解析周期字符串，返回(周期毫秒数, 分桶对齐偏移毫秒数)。
+
+    支持 Nm/Nh/Nd/Nw 形式；周线按周一对齐，其余按UTC纪元对齐，与Binance分桶一致。
+    """
+    match = _TIMEFRAME_PATTERN.match(timeframe)
+    if match is None or int(match.group(1)) <= 0:
+        raise ValueError(f"不支持的K线周期: {timeframe}")
+    count, unit = int(match.group(1)), match.group(2)
+    offset = _WEEK_OFFSET_MS if unit == "w" else 0
+    return count * _UNIT_MS[unit], offset
+
+
+def bucket_open_times(open_time: np.ndarray, timeframe: str) -> np.ndarray:
+    """计算每根K线所属目标周期桶的开盘时间（UTC毫秒）。"""
+    step_ms, offset_ms = parse_timeframe_ms(timeframe)
+    return (open_time - offset_ms) // step_ms * step_ms + offset_ms
+
+
+def select_base_timeframe(timeframe: str, native_timeframes: tuple[str, ...]) -> str:
+    """从原生存储的周期中选出能整除目标周期且桶边界对齐的最大周期，用作合成基础。"""
+    target_ms, target_offset = parse_timeframe_ms(timeframe)
+    for base in sorted(native_timeframes, key=lambda item: parse_timeframe_ms(item)[0], reverse=True):
+        base_ms, base_offset = parse_timeframe_ms(base)
+        if target_ms % base_ms == 0 and (target_offset - base_offset) % base_ms == 0:
+            return base
+    raise ValueError(f"无法由已存储周期 {', '.join(native_timeframes)} 合成 {timeframe}")
+
+
+def base_bars_needed(timeframe: str, base_timeframe: str, limit: int) -> int:
+    """合成limit根目标K线所需的基础K线数量（多取一个桶，用于丢弃不完整的首桶）。"""
+    ratio = parse_timeframe_ms(timeframe)[0] // parse_timeframe_ms(base_timeframe)[0]
+    return (limit + 1) * ratio
+
+
+def resample_klines(base: KlineArrays, timeframe: str) -> KlineArrays:
+    """
+    将基础周期K线向量化合成为更高周期。
+
+    open取桶内第一根、close取最后一根、high/low取极值、volume求和；
+    最后一个桶可能尚未走完，与Binance返回未收盘K线的语义一致。
+    """
+    if len(base) == 0:
+        return KlineArrays(
+            base.symbol, timeframe, base.open_time[:0], base.open[:0], base.high[:0], base.low[:0], base.close[:0], base.volume[:0]
+        )
+    buckets = bucket_open_times(base.open_time, timeframe)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(base)] - 1
+    return KlineArrays(
+        symbol=base.symbol,
+        timeframe=timeframe,
+        open_time=buckets[starts],
+        open=base.open[starts],
+        high=np.maximum.reduceat(base.high, starts),
+        low=np.minimum.reduceat(base.low, starts),
+        close=base.close[ends],
+        volume=np.add.reduceat(base.volume, starts),
+    )
+
+
+def resample_tail(base: KlineArrays, timeframe: str, limit: int, truncated: bool) -> KlineArrays:
+    """
+    合成最近limit根目标K线。
+
+    truncated=True表示base只是更长历史的尾部，此时首个桶可能缺少开头的K线，需要丢弃；
+    否则base就是全部历史，首个桶按实际数据保留。
+    """
+    if truncated and len(base) > 0:
+        step_ms, _ = parse_timeframe_ms(timeframe)
+        first_bucket = int(bucket_open_times(base.open_time[:1], timeframe)[0])
+        if int(base.open_time[0]) != first_bucket:
+            first_full = int(np.searchsorted(base.open_time, first_bucket + step_ms))
+            base = base.tail(len(base) - first_full)
+    return resample_klines(base, timeframe).tail(limit)
+
+
+def fold_limits_into_native(limits: dict[str, int], native_timeframes: tuple[str, ...]) -> dict[str, int]:
+    """
+    把非原生周期的拉取数量折算到其基础周期上，返回只包含原生周期的拉取计划。
+
+    例如只存储1h时，{"1h": 200, "1d": 90} 折算为 {"1h": 2184}，4h/1d不再单独请求。
+    """
+    folded: dict[str, int] = {}
+    for timeframe, limit in limits.items():
+        if timeframe in native_timeframes:
+            folded[timeframe] = max(folded.get(timeframe, 0), limit)
+            continue
+        try:
+            base = select_base_timeframe(timeframe, native_timeframes)
+        except ValueError:
+            folded[timeframe] = max(folded.get(timeframe, 0), limit)
+            continue
+        folded[base] = max(folded.get(base, 0), base_bars_needed(timeframe, base, limit))
+    return folded
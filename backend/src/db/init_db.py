@@ -2,12 +2,27 @@ from __future__ import annotations
 
 from backend.src.config import settings
 from backend.src.db.database import Base, engine
-from backend.src.db.models import Decision, Kline, MarketMindHistory, Performance, Trade
+from backend.src.db.migrate_klines import migrate_klines
+from backend.src.db.models import (
+    AccountCheckpoint,
+    AccountLedger,
+    BacktestSweepResult,
+    Decision,
+    IndicatorState,
+    Kline,
+    KlineBackfillCheckpoint,
+    MarketMindHistory,
+    PaperOrder,
+    Performance,
+    ProtectiveOrder,
+    Trade,
+)
 
 
 def init_db() -> None:
-    _ = (Kline, Decision, Trade, Performance, MarketMindHistory)
+    _ = (AccountCheckpoint, AccountLedger, Kline, KlineBackfillCheckpoint, Decision, Trade, Performance, MarketMindHistory, ProtectiveOrder, PaperOrder, IndicatorState, BacktestSweepResult)
     settings.ensure_runtime_paths()
+    migrate_klines(engine)
     Base.metadata.create_all(bind=engine)
 
 
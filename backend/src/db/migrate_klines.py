@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from typing import Any
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from backend.src.db.models import Kline
+
+logger = logging.getLogger(__name__)
+
+_LEGACY_TABLE = "klines_legacy"
+
+
+def needs_migration(engine: Engine) -> bool:
+    """旧版klines表带自增id列、open_time为文本时间，需要迁移。"""
+    inspector = inspect(engine)
+    if not inspector.has_table(Kline.__tablename__):
+        return False
+    columns = {column["name"] for column in inspector.get_columns(Kline.__tablename__)}
+    return "id" in columns
+
+
+def migrate_klines(engine: Engine) -> dict[str, Any]:
+    """
+    把旧版klines表迁移为以(symbol, timeframe, open_time毫秒)为主键的WITHOUT ROWID表。
+
+    在单个事务中完成：重命名旧表 → 建新表和索引 → 按主键顺序整表转换 → 删除旧表。
+    文本时间按UTC解析为毫秒整数，已迁移的库直接跳过。
+    """
+    if engine.dialect.name != "sqlite":
+        return {"migrated": False, "reason": f"unsupported dialect: {engine.dialect.name}"}
+    if not needs_migration(engine):
+        return {"migrated": False, "reason": "already up to date"}
+
+    started = time.monotonic()
+    table = Kline.__table__
+    with engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {_LEGACY_TABLE}"))
+        # 旧表的索引随表一起重命名，需先删除以免与新索引重名
+        legacy_indexes = connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"),
+            {"table": _LEGACY_TABLE},
+        ).scalars().all()
+        for index_name in legacy_indexes:
+            connection.execute(text(f'DROP INDEX "{index_name}"'))
+
+        table.create(connection)
+        connection.execute(
+            text(
+                f"""
+                INSERT INTO {table.name} (symbol, timeframe, open_time, open, high, low, close, volume, created_at)
+                SELECT symbol, timeframe,
+                       CAST(ROUND((julianday(open_time) - 2440587.5) * 86400000) AS INTEGER),
+                       open, high, low, close, volume, created_at
+                FROM {_LEGACY_TABLE}
+                ORDER BY symbol, timeframe, open_time
+                """
+            )
+        )
+        rows = connection.execute(text(f"SELECT COUNT(*) FROM {table.name}")).scalar_one()
+        connection.execute(text(f"DROP TABLE {_LEGACY_TABLE}"))
+
+    elapsed = time.monotonic() - started
+    logger.info("klines表迁移完成: %s行, 耗时%.2f秒", rows, elapsed)
+    return {"migrated": True, "rows": int(rows), "elapsed_sec": round(elapsed, 3)}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="将klines表迁移为整数毫秒主键的WITHOUT ROWID表")
+    parser.add_argument("--vacuum", action="store_true", help="迁移后执行VACUUM回收旧表占用的空间")
+    args = parser.parse_args(argv)
+
+    from backend.src.db.database import engine
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    result = migrate_klines(engine)
+    print(result)
+    if args.vacuum and result["migrated"]:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
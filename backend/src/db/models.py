@@ -2,20 +2,30 @@ from __future__ import annotations
 
 from datetime import date, datetime
 
-from sqlalchemy import Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from backend.src.db.database import Base
+from backend.src.db.types import EpochMillis
 
 
 class Kline(Base):
-    __tablename__ = "klines"
-    __table_args__ = (UniqueConstraint("symbol", "timeframe", "open_time", name="uq_klines_symbol_tf_time"),)
+    """
+    K线数据，以(symbol, timeframe, open_time)为聚簇主键的WITHOUT ROWID表。
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    symbol: Mapped[str] = mapped_column(String(24), index=True)
-    timeframe: Mapped[str] = mapped_column(String(8), index=True)
-    open_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    open_time按UTC毫秒整数存储，最近N根和区间查询直接按主键顺序扫描；
+    旧库（自增id + 文本时间）由 db/migrate_klines.py 迁移。
+    """
+
+    __tablename__ = "klines"
+    __table_args__ = (
+        Index("ix_klines_symbol_open_time", "symbol", "open_time"),
+        {"sqlite_with_rowid": False},
+    )
+
+    symbol: Mapped[str] = mapped_column(String(24), primary_key=True)
+    timeframe: Mapped[str] = mapped_column(String(8), primary_key=True)
+    open_time: Mapped[datetime] = mapped_column(EpochMillis, primary_key=True)
     open: Mapped[float] = mapped_column(Float)
     high: Mapped[float] = mapped_column(Float)
     low: Mapped[float] = mapped_column(Float)
@@ -24,6 +34,23 @@ class Kline(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+class KlineBackfillCheckpoint(Base):
+    """历史K线回填进度检查点，每个(symbol, timeframe)一条，用于中断后续传。"""
+
+    __tablename__ = "kline_backfill_checkpoints"
+    __table_args__ = (UniqueConstraint("symbol", "timeframe", name="uq_backfill_symbol_tf"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    symbol: Mapped[str] = mapped_column(String(24))
+    timeframe: Mapped[str] = mapped_column(String(8))
+    start_ms: Mapped[int] = mapped_column(BigInteger)
+    end_ms: Mapped[int] = mapped_column(BigInteger)
+    next_start_ms: Mapped[int] = mapped_column(BigInteger)
+    rows_written: Mapped[int] = mapped_column(Integer, default=0)
+    completed: Mapped[bool] = mapped_column(Boolean, default=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 class Decision(Base):
     __tablename__ = "decisions"
 
@@ -61,6 +88,137 @@ class Trade(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+class AccountLedger(Base):
+    """模拟账户的物化状态，每个品种一行，与交易记录在同一事务中更新。"""
+
+    __tablename__ = "account_ledgers"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    symbol: Mapped[str] = mapped_column(String(24), unique=True)
+    initial_balance: Mapped[float] = mapped_column(Float)
+    cash: Mapped[float] = mapped_column(Float)
+    position_qty: Mapped[float] = mapped_column(Float, default=0.0)
+    avg_entry_price: Mapped[float] = mapped_column(Float, default=0.0)
+    realized_pnl: Mapped[float] = mapped_column(Float, default=0.0)
+    day_realized_pnl: Mapped[float] = mapped_column(Float, default=0.0)
+    pnl_day: Mapped[date | None] = mapped_column(Date, nullable=True)
+    last_trade_id: Mapped[int] = mapped_column(Integer, default=0)
+    trade_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class AccountCheckpoint(Base):
+    """交易日志的账户状态检查点，记录应用完trade_id这笔交易后的状态，用于按时间点快速重建。"""
+
+    __tablename__ = "account_checkpoints"
+    __table_args__ = (UniqueConstraint("symbol", "initial_balance", "trade_id", name="uq_checkpoint_symbol_trade"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    symbol: Mapped[str] = mapped_column(String(24))
+    initial_balance: Mapped[float] = mapped_column(Float)
+    trade_id: Mapped[int] = mapped_column(Integer)
+    trade_count: Mapped[int] = mapped_column(Integer)
+    trade_timestamp: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    cash: Mapped[float] = mapped_column(Float)
+    position_qty: Mapped[float] = mapped_column(Float)
+    avg_entry_price: Mapped[float] = mapped_column(Float)
+    realized_pnl: Mapped[float] = mapped_column(Float)
+    day_realized_pnl: Mapped[float] = mapped_column(Float, default=0.0)
+    pnl_day: Mapped[date | None] = mapped_column(Date, nullable=True)
+    last_price: Mapped[float] = mapped_column(Float, default=0.0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class ProtectiveOrder(Base):
+    """
+    持仓的保护性止损/止盈单，由买入决策的stop_loss/take_profit生成。
+
+    同一品种的未触发订单互为OCO：任一触发平仓后其余订单随即撤销。
+    """
+
+    __tablename__ = "protective_orders"
+    __table_args__ = (Index("ix_protective_orders_symbol_status", "symbol", "status"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    symbol: Mapped[str] = mapped_column(String(24))
+    kind: Mapped[str] = mapped_column(String(16))
+    trigger_price: Mapped[float] = mapped_column(Float)
+    status: Mapped[str] = mapped_column(String(16), default="open")
+    decision_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("decisions.id"), nullable=True)
+    trade_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("trades.id"), nullable=True)
+    fill_reference_price: Mapped[float | None] = mapped_column(Float, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    closed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    close_reason: Mapped[str] = mapped_column(String(64), default="")
+
+
+class PaperOrder(Base):
+    """
+    模拟盘挂单（限价单/止损单），由后续K线的高低点和成交量撮合，可分多次部分成交。
+
+    (symbol, status, price)索引用于按价位查询某品种的未完成挂单；
+    matched_until_ms记录已参与撮合的最后一根K线，避免重复成交。
+    """
+
+    __tablename__ = "paper_orders"
+    __table_args__ = (Index("ix_paper_orders_symbol_status_price", "symbol", "status", "price"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    symbol: Mapped[str] = mapped_column(String(24))
+    side: Mapped[str] = mapped_column(String(8))
+    order_type: Mapped[str] = mapped_column(String(8))
+    price: Mapped[float] = mapped_column(Float)
+    quantity: Mapped[float] = mapped_column(Float)
+    filled_qty: Mapped[float] = mapped_column(Float, default=0.0)
+    avg_fill_price: Mapped[float] = mapped_column(Float, default=0.0)
+    status: Mapped[str] = mapped_column(String(16), default="open")
+    decision_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("decisions.id"), nullable=True)
+    matched_until_ms: Mapped[int] = mapped_column(BigInteger, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    close_reason: Mapped[str] = mapped_column(String(64), default="")
+
+
+class IndicatorState(Base):
+    """量化指标的增量计算状态，每个(symbol, timeframe)一行，state_json为IndicatorEngine的序列化结果。"""
+
+    __tablename__ = "indicator_states"
+    __table_args__ = (UniqueConstraint("symbol", "timeframe", name="uq_indicator_state_symbol_tf"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    symbol: Mapped[str] = mapped_column(String(24))
+    timeframe: Mapped[str] = mapped_column(String(8))
+    version: Mapped[int] = mapped_column(Integer, default=1)
+    bars: Mapped[int] = mapped_column(Integer, default=0)
+    last_open_ms: Mapped[int] = mapped_column(BigInteger, default=0)
+    state_json: Mapped[str] = mapped_column(Text)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class BacktestSweepResult(Base):
+    """参数扫描中单个参数组合的回测指标，同一次扫描的结果共享sweep_id，按指标排序取最优组合。"""
+
+    __tablename__ = "backtest_sweep_results"
+    __table_args__ = (Index("ix_sweep_results_sweep_sharpe", "sweep_id", "sharpe"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    sweep_id: Mapped[str] = mapped_column(String(32), index=True)
+    strategy_name: Mapped[str] = mapped_column(String(64))
+    symbol: Mapped[str] = mapped_column(String(24))
+    timeframe: Mapped[str] = mapped_column(String(8))
+    parameters_json: Mapped[str] = mapped_column(Text)
+    bars: Mapped[int] = mapped_column(Integer, default=0)
+    total_return: Mapped[float] = mapped_column(Float, default=0.0)
+    annual_return: Mapped[float] = mapped_column(Float, default=0.0)
+    max_drawdown: Mapped[float] = mapped_column(Float, default=0.0)
+    sharpe: Mapped[float] = mapped_column(Float, default=0.0)
+    win_rate: Mapped[float] = mapped_column(Float, default=0.0)
+    trades: Mapped[int] = mapped_column(Integer, default=0)
+    turnover: Mapped[float] = mapped_column(Float, default=0.0)
+    exposure: Mapped[float] = mapped_column(Float, default=0.0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
 class Performance(Base):
     __tablename__ = "performance"
 
@@ -12,13 +12,29 @@ from sqlalchemy.orm import Session
 from backend.src.ai.decision_engine import DecisionContext, generate_decision
 from backend.src.config import settings
 from backend.src.data.binance_client import BinanceAPIError
-from backend.src.data.kline_service import fetch_and_store_klines, get_recent_klines, latest_price_from_db, maybe_backfill_initial_klines
+from backend.src.data.gaps import repair_kline_gaps
+from backend.src.data.kline_service import (
+    INCREMENTAL_SYNC_LIMITS,
+    get_recent_kline_arrays,
+    latest_price_from_db,
+    maybe_backfill_initial_klines,
+    sync_klines_concurrently,
+)
 from backend.src.db.database import SessionLocal
 from backend.src.db.models import Decision
 from backend.src.mind.market_mind import load as load_market_mind
+from backend.src.quant.cache import cached_quant_snapshot
+from backend.src.quant.incremental import build_incremental_snapshot
 from backend.src.quant.library import build_quant_snapshot
 from backend.src.risk.engine import apply_risk_checks
+from backend.src.trading.orders import match_stored_klines
 from backend.src.trading.paper_engine import execute_decision, get_portfolio_snapshot
+from backend.src.trading.protective import (
+    cancel_protective_orders,
+    place_protective_orders,
+    poll_protective_orders,
+    sweep_protective_orders,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -62,25 +78,30 @@ def _load_recent_decisions(db: Session, limit: int = 5) -> list[dict[str, Any]]:
 
 
 def _sync_latest_klines(db: Session, symbol: str) -> dict[str, Any]:
-    """同步最新K线数据，包括首次回填和增量更新，记录各阶段错误。"""
-    updates: dict[str, Any] = {"initial_backfill": {}, "incremental": {}, "errors": []}
+    """
+    同步最新K线数据，包括首次回填和增量更新，记录各阶段错误。
+
+    增量更新只拉取本地最新K线之后的缺失部分和当前未收盘K线，避免每个周期重复下载并覆盖数百根未变化的K线。
+    各时间周期并发拉取，写入在同一事务中完成；最后扫描并补齐序列内部的缺口。
+    """
+    updates: dict[str, Any] = {"initial_backfill": {}, "incremental": {}, "gap_repair": {}, "errors": []}
     try:
         updates["initial_backfill"] = maybe_backfill_initial_klines(db=db, symbol=symbol)
     except BinanceAPIError as exc:
         logger.warning("K线初始回填失败: %s", exc)
         updates["errors"].append(f"backfill: {exc}")
 
-    for timeframe, limit in {"1h": 200, "4h": 120, "1d": 90}.items():
-        try:
-            updates["incremental"][timeframe] = fetch_and_store_klines(
-                db=db,
-                symbol=symbol,
-                timeframe=timeframe,
-                limit=limit,
-            )
-        except BinanceAPIError as exc:
-            logger.warning("K线增量更新失败 (%s): %s", timeframe, exc)
-            updates["errors"].append(f"{timeframe}: {exc}")
+    result = sync_klines_concurrently(db=db, symbols=[symbol], limits=INCREMENTAL_SYNC_LIMITS)
+    updates["incremental"] = result["written"][symbol]
+    for error in result["errors"]:
+        logger.warning("K线增量更新失败 (%s)", error)
+        updates["errors"].append(error)
+
+    gap_repair = repair_kline_gaps(db=db, symbol=symbol)
+    updates["gap_repair"] = {key: gap_repair[key] for key in ("gaps", "missing_bars", "written")}
+    for error in gap_repair["errors"]:
+        logger.warning("K线缺口修复失败 (%s)", error)
+        updates["errors"].append(f"gap: {error}")
     return updates
 
 
@@ -101,10 +122,24 @@ def run_analysis_cycle(db: Session, source: str = "scheduler") -> dict[str, Any]
     if sync_status["errors"]:
         logger.warning("数据同步有错误: %s", sync_status["errors"])
 
+    # 用同步后的K线补查周期之间的止损/止盈，并撮合挂单
+    protective_result = None
+    if settings.protective_orders_enabled:
+        protective_result = sweep_protective_orders(db=db, symbol=symbol)
+    order_matches = match_stored_klines(db=db, symbol=symbol)
+    if order_matches["fills"]:
+        logger.info("挂单成交%d笔", len(order_matches["fills"]))
+
     # 阶段2: 构建决策上下文
-    daily_klines = get_recent_klines(db=db, symbol=symbol, timeframe="1d", limit=120)
-    hourly_klines = get_recent_klines(db=db, symbol=symbol, timeframe="1h", limit=24)
-    quant_snapshot = build_quant_snapshot(symbol=symbol, timeframe="1d", klines=daily_klines)
+    daily_klines = get_recent_kline_arrays(db=db, symbol=symbol, timeframe="1d", limit=120)
+    hourly_klines = get_recent_kline_arrays(db=db, symbol=symbol, timeframe="1h", limit=24)
+    if settings.quant_incremental_enabled:
+        # 指标状态跨周期持久化，每个周期只推进新收盘的K线
+        quant_snapshot = build_incremental_snapshot(db=db, symbol=symbol, timeframe="1d")
+    else:
+        quant_snapshot = cached_quant_snapshot(db=db, symbol=symbol, timeframe="1d", limit=120) or build_quant_snapshot(
+            symbol=symbol, timeframe="1d", klines=daily_klines
+        )
     market_price = latest_price_from_db(db=db, symbol=symbol) or 0.0
 
     if market_price <= 0:
@@ -188,6 +223,20 @@ def run_analysis_cycle(db: Session, source: str = "scheduler") -> dict[str, Any]
     db.commit()
     db.refresh(decision_row)
 
+    # 阶段7: 买入后挂出保护单，主动卖出后撤销
+    executed_trade = trade_result.get("executed_trade")
+    if settings.protective_orders_enabled and executed_trade:
+        if executed_trade["side"] == "buy":
+            place_protective_orders(
+                db=db,
+                symbol=symbol,
+                stop_loss=float(final_decision.get("stop_loss", 0.0)),
+                take_profit=float(final_decision.get("take_profit", 0.0)),
+                decision_id=decision_row.id,
+            )
+        else:
+            cancel_protective_orders(db=db, symbol=symbol, reason="closed_by_decision")
+
     elapsed = time.monotonic() - cycle_start
     _last_cycle_at = datetime.now(timezone.utc)
     _consecutive_failures = 0
@@ -197,6 +246,8 @@ def run_analysis_cycle(db: Session, source: str = "scheduler") -> dict[str, Any]
         "source": source,
         "symbol": symbol,
         "sync_status": sync_status,
+        "protective_orders": protective_result,
+        "order_matches": order_matches,
         "market_price": market_price,
         "quant_snapshot": quant_snapshot,
         "decision_id": decision_row.id,
@@ -227,6 +278,18 @@ def run_analysis_cycle_with_new_session(source: str = "scheduler") -> dict[str,
         db.close()
 
 
+def run_protective_check_with_new_session() -> dict[str, Any] | None:
+    """定时轮询保护单（K线推送运行时由推送消息实时检查，这里只做兜底）。"""
+    db = SessionLocal()
+    try:
+        return poll_protective_orders(db=db, symbol=settings.trading_pair)
+    except Exception as exc:
+        logger.error("保护单检查失败: %s", exc, exc_info=True)
+        return {"error": str(exc)}
+    finally:
+        db.close()
+
+
 def start_scheduler() -> dict[str, Any]:
     """启动定时分析调度器。"""
     global scheduler
@@ -248,6 +311,16 @@ def start_scheduler() -> dict[str, Any]:
         replace_existing=True,
         kwargs={"source": "scheduler"},
     )
+    if settings.protective_orders_enabled and settings.protective_check_interval_sec > 0 and not settings.kline_stream_enabled:
+        scheduler.add_job(
+            run_protective_check_with_new_session,
+            trigger="interval",
+            seconds=settings.protective_check_interval_sec,
+            id="protective-orders",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
     scheduler.start()
     logger.info("调度器已启动, 间隔=%s小时", settings.analysis_interval_hours)
     return {"status": "running", "interval_hours": settings.analysis_interval_hours}
@@ -1,13 +1,50 @@
+from backend.src.quant.backtest import BacktestResult, run_backtest, run_backtests
+from backend.src.quant.batch import KlineTensor, build_batch_snapshots, compute_batch_signals
+from backend.src.quant.incremental import IndicatorEngine, advance_indicator_state, build_incremental_snapshot
+from backend.src.quant.indicators import (
+    bollinger_bands,
+    directional_indicators,
+    ema,
+    rolling_max,
+    rolling_min,
+    rsi,
+    wilder_adx,
+    wilder_atr,
+)
 from backend.src.quant.library import (
     build_quant_signal_markers,
     build_quant_snapshot,
     get_quant_strategy_catalog,
+    strategy_parameters,
     summarize_quant_signals,
+    supertrend_arrays,
 )
+from backend.src.quant.walk_forward import WalkForwardReport, run_walk_forward
 
 __all__ = [
+    "BacktestResult",
+    "IndicatorEngine",
+    "KlineTensor",
+    "WalkForwardReport",
+    "advance_indicator_state",
+    "bollinger_bands",
+    "build_batch_snapshots",
+    "build_incremental_snapshot",
     "build_quant_signal_markers",
     "build_quant_snapshot",
+    "compute_batch_signals",
+    "directional_indicators",
+    "ema",
     "get_quant_strategy_catalog",
+    "rolling_max",
+    "rolling_min",
+    "rsi",
+    "run_backtest",
+    "run_backtests",
+    "run_walk_forward",
+    "strategy_parameters",
     "summarize_quant_signals",
+    "supertrend_arrays",
+    "wilder_adx",
+    "wilder_atr",
 ]
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+import numpy as np
+
+from backend.src.config import settings
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.data.resample import parse_timeframe_ms
+from backend.src.quant.library import STRATEGY_CATALOG, compute_signal_series, strategy_parameters
+
+YEAR_MS = 365 * 86_400_000
+
+
+@dataclass(frozen=True)
+class BacktestResult:
+    """
+    单个策略在一段K线上的回测结果。
+
+    收益率、回撤等均为比例（0.1表示10%）；equity为每根K线结束时的净值（初始为1），
+    turnover为累计换手（每次开/平一个完整仓位计1）。
+    """
+
+    strategy_name: str
+    symbol: str
+    timeframe: str
+    bars: int
+    start_ms: int
+    end_ms: int
+    total_return: float
+    annual_return: float
+    max_drawdown: float
+    sharpe: float
+    win_rate: float
+    trades: int
+    turnover: float
+    exposure: float
+    benchmark_return: float
+    equity: np.ndarray
+    parameters: dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self, equity_points: int = 0) -> dict[str, Any]:
+        """转换为API输出格式；equity_points>0时附带等间隔抽样的净值曲线。"""
+        payload: dict[str, Any] = {
+            "strategy_name": self.strategy_name,
+            "display_name": str(STRATEGY_CATALOG.get(self.strategy_name, {}).get("display_name", self.strategy_name)),
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "bars": self.bars,
+            "start_ms": self.start_ms,
+            "end_ms": self.end_ms,
+            "total_return_pct": round(self.total_return * 100, 4),
+            "annual_return_pct": round(self.annual_return * 100, 4),
+            "max_drawdown_pct": round(self.max_drawdown * 100, 4),
+            "sharpe": round(self.sharpe, 4),
+            "win_rate": round(self.win_rate, 4),
+            "trades": self.trades,
+            "turnover": round(self.turnover, 4),
+            "exposure": round(self.exposure, 4),
+            "benchmark_return_pct": round(self.benchmark_return * 100, 4),
+            "parameters": dict(self.parameters),
+        }
+        if equity_points > 0 and self.bars > 0:
+            step_ms, _ = parse_timeframe_ms(self.timeframe)
+            index = np.unique(np.linspace(0, self.bars - 1, min(equity_points, self.bars)).astype(np.int64))
+            payload["equity_curve"] = [
+                {"open_time_ms": self.start_ms + int(position) * step_ms, "equity": round(float(self.equity[position]), 6)}
+                for position in index
+            ]
+        return payload
+
+
+def bars_per_year(timeframe: str) -> float:
+    step_ms, _ = parse_timeframe_ms(timeframe)
+    return YEAR_MS / step_ms
+
+
+def performance_stats(growth: np.ndarray, periods_per_year: float) -> dict[str, float]:
+    """由逐根K线的净值增长因子计算总收益、年化收益、最大回撤和年化夏普。"""
+    if growth.shape[0] == 0:
+        return {"total_return": 0.0, "annual_return": 0.0, "max_drawdown": 0.0, "sharpe": 0.0}
+    equity = np.cumprod(growth)
+    years = growth.shape[0] / periods_per_year
+    final = float(equity[-1])
+    peak = np.maximum.accumulate(np.concatenate([[1.0], equity]))[1:]
+    bar_returns = growth - 1
+    deviation = float(bar_returns.std())
+    return {
+        "total_return": final - 1,
+        "annual_return": final ** (1 / years) - 1 if years > 0 and final > 0 else -1.0,
+        "max_drawdown": float(np.max(1 - equity / peak)),
+        "sharpe": float(bar_returns.mean() / deviation * math.sqrt(periods_per_year)) if deviation > 0 else 0.0,
+    }
+
+
+def signal_codes(
+    klines: KlineArrays,
+    strategy_name: str,
+    parameters: dict[str, Any] | None = None,
+    cache: dict[Any, Any] | None = None,
+) -> np.ndarray:
+    """策略在每根K线收盘时的信号代码（1买入/-1卖出/0观望），数据不足的K线为0。"""
+    series = compute_signal_series(strategy_name, klines, parameters=parameters, cache=cache)
+    if series is None:
+        return np.zeros(len(klines), dtype=np.int8)
+    return series.actions()
+
+
+def target_positions(codes: np.ndarray, allow_short: bool = False) -> np.ndarray:
+    """
+    把信号代码转换为每根K线收盘后的目标仓位：买入信号持多（1），卖出信号平仓（0）或持空（-1），观望保持原仓位。
+    """
+    count = codes.shape[0]
+    if count == 0:
+        return np.zeros(0, dtype=np.float64)
+    mapped = np.where(codes > 0, 1.0, -1.0 if allow_short else 0.0)
+    has_signal = codes != 0
+    last_signal = np.maximum.accumulate(np.where(has_signal, np.arange(count), -1))
+    return np.where(last_signal >= 0, mapped[np.maximum(last_signal, 0)], 0.0)
+
+
+def simulate_positions(
+    klines: KlineArrays,
+    targets: np.ndarray,
+    fee_pct: float,
+    slippage_pct: float,
+) -> dict[str, np.ndarray]:
+    """
+    按目标仓位向量化模拟交易，返回每根K线的净值、仓位和成本。
+
+    第i根收盘产生的目标仓位在第i+1根开盘成交（避免用到当根收盘后的信息）；仓位在开盘价之间持有，
+    最后一根持有到收盘。每次调仓按变动的仓位比例扣除手续费和滑点。
+    """
+    count = len(klines)
+    prices = np.concatenate([klines.open, klines.close[-1:]])
+    interval_returns = prices[1:] / prices[:-1] - 1
+
+    held = np.concatenate([[0.0], targets[:-1]])
+    previous = np.concatenate([[0.0], held[:-1]])
+    changed = held != previous
+    exit_units = np.where(changed, np.abs(previous), 0.0)
+    entry_units = np.where(changed, np.abs(held), 0.0)
+    cost_rate = fee_pct + slippage_pct
+    exit_cost = exit_units * cost_rate
+    entry_cost = entry_units * cost_rate
+
+    growth = (1 - exit_cost) * (1 - entry_cost) * (1 + held * interval_returns)
+    equity = np.cumprod(growth) if count else np.zeros(0)
+    return {
+        "equity": equity,
+        "held": held,
+        "growth": growth,
+        "interval_returns": interval_returns,
+        "exit_cost": exit_cost,
+        "entry_cost": entry_cost,
+        "turnover": exit_units + entry_units,
+    }
+
+
+def _trade_returns(held: np.ndarray, interval_returns: np.ndarray, entry_cost: np.ndarray, exit_cost: np.ndarray) -> np.ndarray:
+    """每笔已平仓交易的收益率（含开平仓成本），持仓期间的各区间收益按交易编号分组连乘。"""
+    previous = np.concatenate([[0.0], held[:-1]])
+    entries = (held != 0) & (held != previous)
+    exits = (previous != 0) & (held != previous)
+    if not exits.any():
+        return np.zeros(0)
+
+    trade_id = np.cumsum(entries)
+    in_trade = held != 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_hold = np.where(in_trade, np.log1p(held * interval_returns) + np.log1p(-entry_cost), 0.0)
+        log_exit = np.log1p(-exit_cost)
+    # 平仓成本属于上一笔交易：平仓发生的区间里trade_id已指向新交易（反手时）或保持不变（平仓到空仓）
+    exit_owner = np.where(entries, trade_id - 1, trade_id)
+    total = np.bincount(trade_id[in_trade], weights=log_hold[in_trade], minlength=int(trade_id[-1]) + 1)
+    total += np.bincount(exit_owner[exits], weights=log_exit[exits], minlength=total.shape[0])
+    closed = np.unique(exit_owner[exits])
+    return np.expm1(total[closed])
+
+
+def run_backtest(
+    klines: KlineArrays,
+    strategy_name: str,
+    fee_pct: float | None = None,
+    slippage_pct: float | None = None,
+    allow_short: bool = False,
+    parameters: dict[str, Any] | None = None,
+    cache: dict[Any, Any] | None = None,
+) -> BacktestResult:
+    """
+    对一段K线回测一个策略：一次计算全序列信号，再向量化模拟仓位和成本。
+
+    手续费和滑点默认取settings.trading_fee_pct/slippage_pct；默认只做多（卖出信号平仓），与模拟盘一致。
+    parameters覆盖策略默认参数，cache见compute_signal_series。
+    """
+    resolved = strategy_parameters(strategy_name, parameters)
+    fee_pct = settings.trading_fee_pct if fee_pct is None else fee_pct
+    slippage_pct = settings.slippage_pct if slippage_pct is None else slippage_pct
+
+    count = len(klines)
+    if count == 0:
+        return BacktestResult(
+            strategy_name=strategy_name,
+            symbol=klines.symbol,
+            timeframe=klines.timeframe,
+            bars=0,
+            start_ms=0,
+            end_ms=0,
+            total_return=0.0,
+            annual_return=0.0,
+            max_drawdown=0.0,
+            sharpe=0.0,
+            win_rate=0.0,
+            trades=0,
+            turnover=0.0,
+            exposure=0.0,
+            benchmark_return=0.0,
+            equity=np.zeros(0),
+            parameters=resolved,
+        )
+
+    codes = signal_codes(klines, strategy_name, parameters=parameters, cache=cache)
+    targets = target_positions(codes, allow_short=allow_short)
+    result = summarize_backtest(klines, strategy_name, targets, fee_pct=fee_pct, slippage_pct=slippage_pct)
+    return replace(result, parameters=resolved)
+
+
+def summarize_backtest(
+    klines: KlineArrays,
+    strategy_name: str,
+    targets: np.ndarray,
+    fee_pct: float,
+    slippage_pct: float,
+) -> BacktestResult:
+    """由目标仓位序列计算回测指标。"""
+    simulation = simulate_positions(klines, targets, fee_pct=fee_pct, slippage_pct=slippage_pct)
+    stats = performance_stats(simulation["growth"], bars_per_year(klines.timeframe))
+    count = len(klines)
+
+    trade_returns = _trade_returns(
+        simulation["held"], simulation["interval_returns"], simulation["entry_cost"], simulation["exit_cost"]
+    )
+    win_rate = float((trade_returns > 0).mean()) if trade_returns.size else 0.0
+
+    return BacktestResult(
+        strategy_name=strategy_name,
+        symbol=klines.symbol,
+        timeframe=klines.timeframe,
+        bars=count,
+        start_ms=int(klines.open_time[0]),
+        end_ms=int(klines.open_time[-1]),
+        total_return=stats["total_return"],
+        annual_return=stats["annual_return"],
+        max_drawdown=stats["max_drawdown"],
+        sharpe=stats["sharpe"],
+        win_rate=win_rate,
+        trades=int(trade_returns.size),
+        turnover=float(simulation["turnover"].sum()),
+        exposure=float(np.mean(simulation["held"] != 0)),
+        benchmark_return=float(klines.close[-1] / klines.open[0] - 1),
+        equity=simulation["equity"],
+    )
+
+
+def run_backtests(
+    klines: KlineArrays,
+    strategy_names: list[str] | None = None,
+    fee_pct: float | None = None,
+    slippage_pct: float | None = None,
+    allow_short: bool = False,
+) -> list[BacktestResult]:
+    """依次回测多个策略（默认STRATEGY_CATALOG中的全部策略）。"""
+    names = strategy_names or list(STRATEGY_CATALOG)
+    return [
+        run_backtest(klines, name, fee_pct=fee_pct, slippage_pct=slippage_pct, allow_short=allow_short) for name in names
+    ]
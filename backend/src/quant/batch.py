@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.quant.incremental import build_signals_from_engine
+from backend.src.quant.indicators import wilder_adx, wilder_atr
+from backend.src.quant.library import STRATEGY_CATALOG, STRATEGY_SERIES, supertrend_arrays
+
+_COLUMNS = ("open_time", "open", "high", "low", "close", "volume")
+# 递推类指标按时间逐列向量化时，每一步的numpy调用开销与标的数无关；标的较少时逐行调用单标的内核更快
+VECTOR_MIN_ROWS = 16
+
+
+@dataclass(frozen=True)
+class KlineTensor:
+    """
+    多个标的的列式K线，各列形状为(标的数, K线数)。
+
+    每行就是该标的自己的K线序列（各标的的open_time不要求对齐），只要求K线数量相同。
+    """
+
+    symbols: tuple[str, ...]
+    timeframe: str
+    open_time: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @property
+    def bars(self) -> int:
+        return int(self.close.shape[1])
+
+    def asset(self, index: int) -> KlineArrays:
+        return KlineArrays(
+            symbol=self.symbols[index],
+            timeframe=self.timeframe,
+            **{column: getattr(self, column)[index] for column in _COLUMNS},
+        )
+
+    @classmethod
+    def stack(cls, items: list[KlineArrays]) -> KlineTensor:
+        """把多个等长、同周期的KlineArrays堆叠为二维数组；长度或周期不一致时抛出ValueError。"""
+        if not items:
+            raise ValueError("至少需要一个标的")
+        if len({len(item) for item in items}) > 1 or len({item.timeframe for item in items}) > 1:
+            raise ValueError("批量计算要求各标的K线数量和周期相同")
+        columns = {
+            column: np.stack([np.asarray(getattr(item, column)) for item in items]).astype(
+                np.int64 if column == "open_time" else np.float64
+            )
+            for column in _COLUMNS
+        }
+        return cls(symbols=tuple(item.symbol for item in items), timeframe=items[0].timeframe, **columns)
+
+
+def _row_seeds(series: np.ndarray, window: int, reduce: str) -> np.ndarray:
+    # 二维数组按行sum/mean的累加顺序与一维不同，末位可能不一致；初值逐行计算以保持与单标的内核逐位相同
+    return np.asarray([getattr(row[:window], reduce)() for row in series], dtype=np.float64)
+
+
+def batch_ema(close: np.ndarray, window: int) -> np.ndarray:
+    """
+    按行计算与ta.trend.EMAIndicator逐位一致的EMA，前window-1列为NaN。
+
+    ta内部就是pandas ewm(span, adjust=False, min_periods=window)，这里对(K线数, 标的数)的DataFrame按列一次计算。
+    """
+    if close.shape[1] == 0:
+        return np.full(close.shape, np.nan)
+    frame = pd.DataFrame(close.T)
+    return frame.ewm(span=window, min_periods=window, adjust=False).mean().to_numpy(dtype=np.float64).T.copy()
+
+
+def batch_wilder_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int) -> np.ndarray:
+    """按行计算与indicators.wilder_atr逐位一致的ATR。"""
+    rows, count = close.shape
+    if rows < VECTOR_MIN_ROWS:
+        return np.stack([wilder_atr(high[row], low[row], close[row], window) for row in range(rows)]).reshape(rows, count)
+    atr = np.zeros((rows, count))
+    if count < window or window <= 0:
+        return atr
+    prev_close = np.concatenate([np.full((rows, 1), np.nan), close[:, :-1]], axis=1)
+    true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+    head = true_range[:, :window]
+    valid = ~np.isnan(head)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        current = _row_seeds(np.where(valid, head, 0.0), window, "sum") / valid.sum(axis=1)
+    atr[:, window - 1] = current
+    ranges = np.ascontiguousarray(true_range.T)
+    out = np.zeros((count, rows))
+    divisor = float(window)
+    for index in range(window, count):
+        current = (current * (window - 1) + ranges[index]) / divisor
+        out[index] = current
+    atr[:, window:] = out[window:].T
+    return atr
+
+
+def _wilder_sums(series: np.ndarray, window: int) -> np.ndarray:
+    """以前window个值之和为初值，按 s - s/window + x 平滑；第k列对应输入的第window-1+k列。"""
+    rows, count = series.shape
+    columns = np.ascontiguousarray(series.T)
+    out = np.empty((count - window + 1, rows))
+    current = _row_seeds(series, window, "sum")
+    out[0] = current
+    divisor = float(window)
+    for index in range(window, count):
+        current = current - (current / divisor) + columns[index]
+        out[index - window + 1] = current
+    return out.T
+
+
+def batch_wilder_adx(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int) -> np.ndarray:
+    """按行计算与indicators.wilder_adx（即ta.trend.ADXIndicator）逐位一致的ADX，前2*window-1列为0。"""
+    rows, count = close.shape
+    if rows < VECTOR_MIN_ROWS:
+        return np.stack([wilder_adx(high[row], low[row], close[row], window) for row in range(rows)]).reshape(rows, count)
+    adx = np.zeros((rows, count))
+    if window <= 0 or count < 2 * window:
+        return adx
+
+    prev_close = close[:, :-1]
+    movement = np.maximum(high[:, 1:], prev_close) - np.minimum(low[:, 1:], prev_close)
+    diff_up = high[:, 1:] - high[:, :-1]
+    diff_down = low[:, :-1] - low[:, 1:]
+    pos = np.where((diff_up > diff_down) & (diff_up > 0), np.abs(diff_up), 0.0)
+    neg = np.where((diff_down > diff_up) & (diff_down > 0), np.abs(diff_down), 0.0)
+    trs, dip, din = (_wilder_sums(series, window) for series in (movement, pos, neg))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        plus_di = np.where(trs != 0, 100 * (dip / trs), 0.0)
+        minus_di = np.where(trs != 0, 100 * (din / trs), 0.0)
+        total = plus_di + minus_di
+        dx = np.where(total != 0, 100 * np.abs((plus_di - minus_di) / total), 0.0)
+
+    current = _row_seeds(dx, window, "mean")
+    adx[:, 2 * window - 1] = current
+    columns = np.ascontiguousarray(dx.T)
+    divisor = float(window)
+    for index in range(2 * window, count):
+        current = ((current * (window - 1)) + columns[index - window]) / divisor
+        adx[:, index] = current
+    return adx
+
+
+def batch_supertrend(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    period: int = 10,
+    multiplier: float = 3.0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """按行计算与library.supertrend_arrays逐位一致的Supertrend线和方向。"""
+    rows, count = close.shape
+    if count == 0:
+        return np.full((rows, 0), np.nan), np.ones((rows, 0), dtype=np.int8)
+    if rows < VECTOR_MIN_ROWS:
+        pairs = [supertrend_arrays(high[row], low[row], close[row], period=period, multiplier=multiplier) for row in range(rows)]
+        return np.stack([line for line, _ in pairs]), np.stack([trend for _, trend in pairs])
+
+    atr = batch_wilder_atr(high, low, close, window=period)
+    hl2 = (high + low) / 2
+    upper = np.ascontiguousarray((hl2 + multiplier * atr).T)
+    lower = np.ascontiguousarray((hl2 - multiplier * atr).T)
+    valid = np.ascontiguousarray(~np.isnan(atr).T)
+    closes = np.ascontiguousarray(close.T)
+
+    final_upper = upper.copy()
+    final_lower = lower.copy()
+    supertrend = np.full((count, rows), np.nan)
+    direction = np.ones((count, rows), dtype=np.int8)
+    supertrend[0] = np.where(valid[0], lower[0], np.nan)
+
+    for index in range(1, count):
+        ok = valid[index]
+        prev_close = closes[index - 1]
+        prev_upper = np.where(np.isnan(final_upper[index - 1]), upper[index - 1], final_upper[index - 1])
+        prev_lower = np.where(np.isnan(final_lower[index - 1]), lower[index - 1], final_lower[index - 1])
+
+        current_upper = upper[index]
+        current_lower = lower[index]
+        band_upper = np.where((current_upper < prev_upper) | (prev_close > prev_upper), current_upper, prev_upper)
+        band_lower = np.where((current_lower > prev_lower) | (prev_close < prev_lower), current_lower, prev_lower)
+        final_upper[index] = np.where(ok, band_upper, current_upper)
+        final_lower[index] = np.where(ok, band_lower, current_lower)
+
+        trend = direction[index - 1]
+        close_price = closes[index]
+        flipped = np.where((trend == -1) & (close_price > band_upper), 1, np.where((trend == 1) & (close_price < band_lower), -1, trend))
+        direction[index] = np.where(ok, flipped, trend)
+        supertrend[index] = np.where(ok, np.where(direction[index] == 1, band_lower, band_upper), np.nan)
+
+    return np.ascontiguousarray(supertrend.T), np.ascontiguousarray(direction.T)
+
+
+def batch_donchian(high: np.ndarray, low: np.ndarray, lookback: int = 20) -> tuple[np.ndarray, np.ndarray]:
+    """前lookback根K线（不含当根）的最高价和最低价，与rolling(lookback).max/min().shift(1)一致。"""
+    rows, count = high.shape
+    upper = np.full((rows, count), np.nan)
+    lower = np.full((rows, count), np.nan)
+    if count > lookback:
+        upper[:, lookback:] = sliding_window_view(high, lookback, axis=1).max(axis=2)[:, :-1]
+        lower[:, lookback:] = sliding_window_view(low, lookback, axis=1).min(axis=2)[:, :-1]
+    return upper, lower
+
+
+@dataclass(frozen=True)
+class BatchSignals:
+    """
+    批量计算的结果：values为各指标的(标的数, K线数)数组，键与IndicatorEngine.values()一致；
+    codes为各策略逐根K线的信号代码（1/-1/0，数据不足或指标无效为0）。
+    """
+
+    tensor: KlineTensor
+    values: dict[str, np.ndarray]
+    codes: dict[str, np.ndarray]
+
+    def latest_values(self, index: int) -> dict[str, float]:
+        return {name: float(series[index, -1]) for name, series in self.values.items()}
+
+
+def compute_batch_signals(tensor: KlineTensor) -> BatchSignals:
+    """对所有标的一次计算三个策略的指标和逐根信号，参数取策略目录中的默认值。"""
+    high, low, close = tensor.high, tensor.low, tensor.close
+    ema_adx = STRATEGY_CATALOG["ema_adx_daily"]["parameters"]
+    supertrend_params = STRATEGY_CATALOG["supertrend_daily"]["parameters"]
+    supertrend, direction = batch_supertrend(
+        high, low, close, period=supertrend_params["atr_period"], multiplier=supertrend_params["multiplier"]
+    )
+    upper, lower = batch_donchian(high, low, lookback=STRATEGY_CATALOG["donchian_breakout_daily"]["parameters"]["lookback"])
+    values = {
+        "fast": batch_ema(close, ema_adx["ema_fast"]),
+        "slow": batch_ema(close, ema_adx["ema_slow"]),
+        "adx": batch_wilder_adx(high, low, close, ema_adx["adx_window"]),
+        "supertrend": supertrend,
+        "direction": direction.astype(np.float64),
+        "upper": upper,
+        "lower": lower,
+        "close": close,
+    }
+
+    ready_base = np.arange(tensor.bars) + 1
+    codes: dict[str, np.ndarray] = {}
+    for name, spec in STRATEGY_SERIES.items():
+        series = spec.rules(**{key: values[key] for key in spec.inputs})
+        ready = (ready_base >= spec.min_bars) & series.valid
+        codes[name] = np.where(ready, series.signal, 0).astype(np.int8)
+    return BatchSignals(tensor=tensor, values=values, codes=codes)
+
+
+def _timestamp(open_ms: int) -> str:
+    return datetime.fromtimestamp(open_ms / 1000, tz=timezone.utc).isoformat()
+
+
+def build_batch_snapshots(items: list[KlineArrays]) -> dict[str, dict[str, Any]]:
+    """
+    多标的的量化信号快照（按输入顺序），逐标的结果与build_quant_snapshot相同。
+
+    周期和K线数量都相同的标的堆叠成一个二维数组一次计算；其余按(周期, 数量)分组计算，不截断任何标的的历史。
+    结果按symbol索引，symbol重复时抛出ValueError。
+    """
+    symbols = [item.symbol for item in items]
+    duplicates = sorted({symbol for symbol in symbols if symbols.count(symbol) > 1})
+    if duplicates:
+        raise ValueError(f"标的重复: {', '.join(duplicates)}")
+
+    snapshots: dict[str, dict[str, Any]] = {}
+    groups: dict[tuple[str, int], list[KlineArrays]] = defaultdict(list)
+    for item in items:
+        groups[(item.timeframe, len(item))].append(item)
+
+    for (_, bars), group in groups.items():
+        if bars == 0:
+            for item in group:
+                snapshots[item.symbol] = build_signals_from_engine({}, bars=0, symbol=item.symbol, timeframe=item.timeframe, timestamp=None)
+            continue
+        batch = compute_batch_signals(KlineTensor.stack(group))
+        for index, item in enumerate(group):
+            snapshots[item.symbol] = build_signals_from_engine(
+                batch.latest_values(index),
+                bars=bars,
+                symbol=item.symbol,
+                timeframe=item.timeframe,
+                timestamp=_timestamp(int(item.open_time[-1])),
+            )
+    return {item.symbol: snapshots[item.symbol] for item in items}
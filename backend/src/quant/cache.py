@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from backend.src.config import settings
+from backend.src.data.kline_service import get_recent_kline_arrays, kline_data_revision
+from backend.src.quant.library import build_quant_signal_markers, build_quant_snapshot
+
+
+class SignalCache:
+    """
+    量化信号结果的有界LRU缓存。
+
+    键中包含K线数据版本号（kline_data_revision），K线写入后旧键自然不再命中，随LRU淘汰；
+    缓存的结果由多个调用方共享，调用方不应修改返回的对象。
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+            self.stats["misses"] += 1
+
+        # 计算在锁外进行，并发未命中时可能重复计算，但结果相同
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+signal_cache = SignalCache(max_entries=settings.quant_cache_max_entries)
+
+
+def cached_quant_snapshot(db: Session, symbol: str, timeframe: str, limit: int) -> dict[str, Any] | None:
+    """
+    最近limit根K线上的量化信号快照，数据版本不变时直接返回缓存结果。
+
+    本地没有该周期K线时返回None，由调用方决定降级方式（降级数据不进入缓存）。
+    """
+    key = ("snapshot", kline_data_revision(db=db, symbol=symbol, timeframe=timeframe), symbol, timeframe, limit)
+
+    def compute() -> dict[str, Any] | None:
+        klines = get_recent_kline_arrays(db=db, symbol=symbol, timeframe=timeframe, limit=limit)
+        if len(klines) == 0:
+            return None
+        return build_quant_snapshot(symbol=symbol, timeframe=timeframe, klines=klines)
+
+    return signal_cache.get_or_compute(key, compute)
+
+
+def cached_quant_signal_markers(
+    db: Session,
+    symbol: str,
+    timeframe: str,
+    limit: int,
+    max_points: int = 240,
+) -> list[dict[str, Any]] | None:
+    """最近limit根K线上的信号标记，缓存规则同cached_quant_snapshot。"""
+    revision = kline_data_revision(db=db, symbol=symbol, timeframe=timeframe)
+    key = ("markers", revision, symbol, timeframe, limit, max_points)
+
+    def compute() -> list[dict[str, Any]] | None:
+        klines = get_recent_kline_arrays(db=db, symbol=symbol, timeframe=timeframe, limit=limit)
+        if len(klines) == 0:
+            return None
+        return build_quant_signal_markers(symbol=symbol, timeframe=timeframe, klines=klines, max_points=max_points)
+
+    return signal_cache.get_or_compute(key, compute)
@@ -0,0 +1,470 @@
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import math
+from collections import deque
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from backend.src.config import settings
+from backend.src.data.binance_client import datetime_to_ms
+from backend.src.data.resample import parse_timeframe_ms
+from backend.src.db.models import IndicatorState, Kline
+from backend.src.quant.cache import cached_quant_snapshot
+from backend.src.quant.library import STRATEGY_CATALOG, build_signal_from_values, summarize_quant_signals
+
+logger = logging.getLogger(__name__)
+
+# 状态结构或指标参数变化时递增，已持久化的旧版本状态会被丢弃并从K线历史重建
+ENGINE_VERSION = 2
+
+
+def _state_dict(obj: Any) -> dict[str, Any]:
+    result: dict[str, Any] = {}
+    for item in fields(obj):
+        value = getattr(obj, item.name)
+        if isinstance(value, deque):
+            value = [list(entry) for entry in value]
+        elif hasattr(value, "__dataclass_fields__"):
+            value = _state_dict(value)
+        result[item.name] = value
+    return result
+
+
+@dataclass
+class EmaState:
+    """
+    与ta.trend.EMAIndicator（pandas ewm(span, adjust=False, min_periods=window)）逐位一致的递推EMA。
+
+    以第一根收盘价为初值；前window-1根输出NaN。
+    """
+
+    window: int
+    value: float = math.nan
+    count: int = 0
+
+    def update(self, price: float) -> float:
+        # 与pandas的ewm实现保持相同的alpha推导和归一化顺序，保证结果逐位相同
+        alpha = 1.0 / (1.0 + (self.window - 1) / 2.0)
+        if math.isnan(self.value):
+            self.value = price
+        elif self.value != price:
+            old_weight = 1.0 - alpha
+            self.value = (old_weight * self.value + alpha * price) / (old_weight + alpha)
+        self.count += 1
+        return self.current()
+
+    def current(self) -> float:
+        return self.value if self.count >= self.window else math.nan
+
+
+@dataclass
+class WilderAtrState:
+    """与indicators.wilder_atr逐位一致的ATR：前window-1根为0，第window根为真实波幅均值，之后Wilder平滑。"""
+
+    window: int
+    value: float = 0.0
+    count: int = 0
+    prev_close: float = math.nan
+    warmup: list[float] = field(default_factory=list)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        true_range = high - low
+        if not math.isnan(self.prev_close):
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.count += 1
+        if self.count < self.window:
+            self.warmup.append(true_range)
+        elif self.count == self.window:
+            self.warmup.append(true_range)
+            self.value = float(np.asarray(self.warmup, dtype=np.float64).sum() / len(self.warmup))
+            self.warmup = []
+        else:
+            self.value = (self.value * (self.window - 1) + true_range) / float(self.window)
+        return self.value
+
+
+@dataclass
+class AdxState:
+    """
+    与ta.trend.ADXIndicator逐位一致的ADX。
+
+    第1~window根的TR/+DM/-DM求和作为初值，之后按 s - s/window + x 平滑；DX的前window个值取均值
+    作为第一个ADX（第2*window-1根），之后Wilder平滑。更早的K线ADX为0，与ta相同。
+    """
+
+    window: int
+    value: float = 0.0
+    count: int = 0
+    prev_high: float = math.nan
+    prev_low: float = math.nan
+    prev_close: float = math.nan
+    trs: float = 0.0
+    dip: float = 0.0
+    din: float = 0.0
+    tr_warmup: list[float] = field(default_factory=list)
+    pos_warmup: list[float] = field(default_factory=list)
+    neg_warmup: list[float] = field(default_factory=list)
+    dx_warmup: list[float] = field(default_factory=list)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        index = self.count
+        self.count += 1
+        if index == 0:
+            self.prev_high, self.prev_low, self.prev_close = high, low, close
+            return self.value
+
+        movement = max(high, self.prev_close) - min(low, self.prev_close)
+        diff_up = high - self.prev_high
+        diff_down = self.prev_low - low
+        pos = abs(diff_up) if diff_up > diff_down and diff_up > 0 else 0.0
+        neg = abs(diff_down) if diff_down > diff_up and diff_down > 0 else 0.0
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+
+        window = self.window
+        if index < window:
+            self.tr_warmup.append(movement)
+            self.pos_warmup.append(pos)
+            self.neg_warmup.append(neg)
+            return self.value
+        if index == window:
+            self.tr_warmup.append(movement)
+            self.pos_warmup.append(pos)
+            self.neg_warmup.append(neg)
+            self.trs = float(np.asarray(self.tr_warmup, dtype=np.float64).sum())
+            self.dip = float(np.asarray(self.pos_warmup, dtype=np.float64).sum())
+            self.din = float(np.asarray(self.neg_warmup, dtype=np.float64).sum())
+            self.tr_warmup, self.pos_warmup, self.neg_warmup = [], [], []
+        else:
+            self.trs = self.trs - (self.trs / float(window)) + movement
+            self.dip = self.dip - (self.dip / float(window)) + pos
+            self.din = self.din - (self.din / float(window)) + neg
+
+        plus_di = 100 * (self.dip / self.trs) if self.trs != 0 else 0.0
+        minus_di = 100 * (self.din / self.trs) if self.trs != 0 else 0.0
+        total = plus_di + minus_di
+        dx = 100 * abs((plus_di - minus_di) / total) if total != 0 else 0.0
+
+        if index < 2 * window - 1:
+            self.dx_warmup.append(dx)
+        elif index == 2 * window - 1:
+            self.dx_warmup.append(dx)
+            self.value = float(np.asarray(self.dx_warmup, dtype=np.float64).mean())
+            self.dx_warmup = []
+        else:
+            self.value = ((self.value * (window - 1)) + dx) / float(window)
+        return self.value
+
+
+@dataclass
+class DonchianState:
+    """
+    前window根K线（不含当前）的最高价/最低价，用单调队列维护，每根K线均摊O(1)。
+
+    队列元素为[K线序号, 价格]；不足window根时通道为NaN，与rolling(window).max().shift(1)一致。
+    """
+
+    window: int
+    count: int = 0
+    upper: float = math.nan
+    lower: float = math.nan
+    highs: deque = field(default_factory=deque)
+    lows: deque = field(default_factory=deque)
+
+    def __post_init__(self) -> None:
+        self.highs = deque(list(entry) for entry in self.highs)
+        self.lows = deque(list(entry) for entry in self.lows)
+
+    def update(self, high: float, low: float) -> tuple[float, float]:
+        index = self.count
+        while self.highs and self.highs[0][0] < index - self.window:
+            self.highs.popleft()
+        while self.lows and self.lows[0][0] < index - self.window:
+            self.lows.popleft()
+        if index >= self.window:
+            self.upper, self.lower = self.highs[0][1], self.lows[0][1]
+
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append([index, high])
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append([index, low])
+        self.count += 1
+        return self.upper, self.lower
+
+
+@dataclass
+class SupertrendState:
+    """与library.supertrend_arrays逐位一致的Supertrend递推，保存上一根的最终上下轨和方向。"""
+
+    multiplier: float
+    atr: WilderAtrState
+    count: int = 0
+    value: float = math.nan
+    direction: int = 1
+    prev_close: float = math.nan
+    prev_upper: float = math.nan
+    prev_lower: float = math.nan
+    final_upper: float = math.nan
+    final_lower: float = math.nan
+
+    def __post_init__(self) -> None:
+        if isinstance(self.atr, dict):
+            self.atr = WilderAtrState(**self.atr)
+
+    def update(self, high: float, low: float, close: float) -> tuple[float, int]:
+        atr = self.atr.update(high, low, close)
+        hl2 = (high + low) / 2
+        upper = hl2 + self.multiplier * atr
+        lower = hl2 - self.multiplier * atr
+        index = self.count
+        self.count += 1
+
+        if math.isnan(atr):
+            self.value = math.nan
+            band_upper, band_lower = upper, lower
+        elif index == 0:
+            self.value = lower
+            band_upper, band_lower = upper, lower
+        else:
+            prev_upper = self.prev_upper if math.isnan(self.final_upper) else self.final_upper
+            prev_lower = self.prev_lower if math.isnan(self.final_lower) else self.final_lower
+            band_upper = upper if upper < prev_upper or self.prev_close > prev_upper else prev_upper
+            band_lower = lower if lower > prev_lower or self.prev_close < prev_lower else prev_lower
+            if self.direction == -1 and close > band_upper:
+                self.direction = 1
+            elif self.direction == 1 and close < band_lower:
+                self.direction = -1
+            self.value = band_lower if self.direction == 1 else band_upper
+
+        self.final_upper, self.final_lower = band_upper, band_lower
+        self.prev_upper, self.prev_lower = upper, lower
+        self.prev_close = close
+        return self.value, self.direction
+
+
+@dataclass
+class IndicatorEngine:
+    """
+    一个(symbol, timeframe)上全部量化策略所需指标的增量状态。
+
+    每根新K线只做常数次运算；状态可序列化为JSON，在分析周期之间持久化到indicator_states表。
+    """
+
+    ema_fast: EmaState = field(default_factory=lambda: EmaState(window=20))
+    ema_slow: EmaState = field(default_factory=lambda: EmaState(window=50))
+    adx: AdxState = field(default_factory=lambda: AdxState(window=14))
+    supertrend: SupertrendState = field(
+        default_factory=lambda: SupertrendState(multiplier=3.0, atr=WilderAtrState(window=10))
+    )
+    donchian: DonchianState = field(default_factory=lambda: DonchianState(window=20))
+    bars: int = 0
+    first_open_ms: int = 0
+    last_open_ms: int = 0
+    last_high: float = math.nan
+    last_low: float = math.nan
+    last_close: float = math.nan
+
+    def update(self, open_ms: int, high: float, low: float, close: float) -> dict[str, float]:
+        """推进一根已收盘K线，返回该K线上的最新指标值。"""
+        if self.bars == 0:
+            self.first_open_ms = open_ms
+        self.ema_fast.update(close)
+        self.ema_slow.update(close)
+        self.adx.update(high, low, close)
+        self.supertrend.update(high, low, close)
+        self.donchian.update(high, low)
+        self.bars += 1
+        self.last_open_ms = open_ms
+        self.last_high, self.last_low, self.last_close = high, low, close
+        return self.values()
+
+    def peek(self, open_ms: int, high: float, low: float, close: float) -> tuple[dict[str, float], int]:
+        """在状态副本上推进一根未收盘K线，返回(指标值, K线总数)，不改变自身状态。"""
+        preview = copy.deepcopy(self)
+        values = preview.update(open_ms, high, low, close)
+        return values, preview.bars
+
+    def values(self) -> dict[str, float]:
+        return {
+            "fast": self.ema_fast.current(),
+            "slow": self.ema_slow.current(),
+            "adx": self.adx.value,
+            "supertrend": self.supertrend.value,
+            "direction": float(self.supertrend.direction),
+            "upper": self.donchian.upper,
+            "lower": self.donchian.lower,
+            "close": self.last_close,
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        return _state_dict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> IndicatorEngine:
+        return cls(
+            ema_fast=EmaState(**data["ema_fast"]),
+            ema_slow=EmaState(**data["ema_slow"]),
+            adx=AdxState(**data["adx"]),
+            supertrend=SupertrendState(**data["supertrend"]),
+            donchian=DonchianState(**data["donchian"]),
+            bars=int(data["bars"]),
+            first_open_ms=int(data["first_open_ms"]),
+            last_open_ms=int(data["last_open_ms"]),
+            last_high=float(data["last_high"]),
+            last_low=float(data["last_low"]),
+            last_close=float(data["last_close"]),
+        )
+
+
+def build_signals_from_engine(
+    values: dict[str, float],
+    bars: int,
+    symbol: str,
+    timeframe: str,
+    timestamp: str | None,
+) -> dict[str, Any]:
+    """把引擎输出的最新指标值转换为与build_quant_snapshot相同结构的信号快照。"""
+    signals = [
+        build_signal_from_values(name, symbol=symbol, timeframe=timeframe, timestamp=timestamp, bars=bars, values=values)
+        for name in STRATEGY_CATALOG
+    ]
+    return {"signals": signals, "summary": summarize_quant_signals(signals)}
+
+
+def _ms_to_datetime(value_ms: int) -> datetime:
+    return datetime.fromtimestamp(value_ms / 1000, tz=timezone.utc)
+
+
+def _load_row(db: Session, symbol: str, timeframe: str) -> IndicatorState | None:
+    return db.execute(
+        select(IndicatorState).where(IndicatorState.symbol == symbol, IndicatorState.timeframe == timeframe)
+    ).scalar_one_or_none()
+
+
+def load_indicator_engine(db: Session, symbol: str, timeframe: str) -> IndicatorEngine:
+    """读取持久化的指标状态，不存在或版本不符时返回空引擎。"""
+    row = _load_row(db, symbol, timeframe)
+    if row is None or row.version != ENGINE_VERSION:
+        return IndicatorEngine()
+    return IndicatorEngine.from_dict(json.loads(row.state_json))
+
+
+def save_indicator_engine(db: Session, symbol: str, timeframe: str, engine: IndicatorEngine, commit: bool = True) -> None:
+    row = _load_row(db, symbol, timeframe)
+    if row is None:
+        row = IndicatorState(symbol=symbol, timeframe=timeframe)
+        db.add(row)
+    row.version = ENGINE_VERSION
+    row.bars = engine.bars
+    row.last_open_ms = engine.last_open_ms
+    row.state_json = json.dumps(engine.to_dict(), allow_nan=True)
+    row.updated_at = datetime.now(timezone.utc)
+    if commit:
+        db.commit()
+
+
+def _matches_stored(db: Session, symbol: str, timeframe: str, engine: IndicatorEngine) -> bool:
+    """
+    已计入状态的K线在本地是否未变：last_open_ms及之前的K线数等于引擎推进过的根数，
+    且最后一根的高低收与计入时相同。补洞、补入更早历史或最后一根计入后被同步改写都会返回False。
+    """
+    last_time = _ms_to_datetime(engine.last_open_ms)
+    scope = (Kline.symbol == symbol, Kline.timeframe == timeframe)
+    count = db.execute(select(func.count()).select_from(Kline).where(*scope, Kline.open_time <= last_time)).scalar()
+    if count != engine.bars:
+        return False
+    last = db.execute(select(Kline.high, Kline.low, Kline.close).where(*scope, Kline.open_time == last_time)).first()
+    return last is not None and (float(last.high), float(last.low), float(last.close)) == (
+        engine.last_high,
+        engine.last_low,
+        engine.last_close,
+    )
+
+
+def _stored_klines_after(db: Session, symbol: str, timeframe: str, after_ms: int | None) -> list[Kline]:
+    statement = select(Kline).where(Kline.symbol == symbol, Kline.timeframe == timeframe)
+    if after_ms is not None:
+        statement = statement.where(Kline.open_time > _ms_to_datetime(after_ms))
+    return list(db.execute(statement.order_by(Kline.open_time)).scalars())
+
+
+def advance_indicator_state(
+    db: Session,
+    symbol: str,
+    timeframe: str,
+    now_ms: int | None = None,
+) -> tuple[IndicatorEngine, Kline | None]:
+    """
+    用本地K线把持久化的指标状态推进到最新一根已收盘K线，并返回(引擎, 未收盘的最新K线或None)。
+
+    只读取上次推进之后的K线，每根新K线O(1)；首次运行，或已计入的区间内K线有增删改
+    （补洞、补入更早历史、最后一根计入后被同步改写）时从头重建。
+    """
+    now_ms = now_ms if now_ms is not None else datetime_to_ms(datetime.now(timezone.utc))
+    step_ms, _ = parse_timeframe_ms(timeframe)
+    engine = load_indicator_engine(db, symbol, timeframe)
+
+    if engine.bars and not _matches_stored(db, symbol, timeframe, engine):
+        logger.info("已计入区间内的K线有变化，重建指标状态: %s %s", symbol, timeframe)
+        engine = IndicatorEngine()
+
+    rows = _stored_klines_after(db, symbol, timeframe, engine.last_open_ms if engine.bars else None)
+    live: Kline | None = None
+    advanced = 0
+    for row in rows:
+        open_ms = datetime_to_ms(row.open_time)
+        if open_ms + step_ms > now_ms:
+            live = row
+            break
+        engine.update(open_ms, float(row.high), float(row.low), float(row.close))
+        advanced += 1
+
+    if advanced:
+        save_indicator_engine(db, symbol, timeframe, engine)
+    return engine, live
+
+
+def build_incremental_snapshot(
+    db: Session,
+    symbol: str,
+    timeframe: str,
+    now_ms: int | None = None,
+    fallback_limit: int = 120,
+) -> dict[str, Any]:
+    """
+    基于增量指标状态生成量化信号快照，结构与build_quant_snapshot相同。
+
+    已收盘K线推进持久化状态；未收盘的最新K线只在状态副本上试算，下个周期收盘后再正式计入。
+    非原生周期在本地没有K线，改用重采样后最近fallback_limit根K线的全量快照。
+    """
+    if timeframe not in settings.kline_native_timeframes:
+        snapshot = cached_quant_snapshot(db=db, symbol=symbol, timeframe=timeframe, limit=fallback_limit)
+        if snapshot is not None:
+            return snapshot
+
+    engine, live = advance_indicator_state(db, symbol, timeframe, now_ms=now_ms)
+    if live is not None:
+        open_ms = datetime_to_ms(live.open_time)
+        values, bars = engine.peek(open_ms, float(live.high), float(live.low), float(live.close))
+    else:
+        open_ms, values, bars = engine.last_open_ms, engine.values(), engine.bars
+    timestamp = _ms_to_datetime(open_ms).isoformat() if bars else None
+    return build_signals_from_engine(values, bars=bars, symbol=symbol, timeframe=timeframe, timestamp=timestamp)
+
+
+def reset_indicator_state(db: Session, symbol: str, timeframe: str) -> None:
+    """删除持久化的指标状态，下次推进时从K线历史重建。"""
+    row = _load_row(db, symbol, timeframe)
+    if row is not None:
+        db.delete(row)
+        db.commit()
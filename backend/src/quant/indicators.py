@@ -0,0 +1,238 @@
+"""
+策略热路径用到的技术指标，直接在连续的float64数组上计算，不依赖ta库。
+
+每个函数的输出都与ta库（0.11）对应指标逐位一致（布林带为浮点误差内一致），空值约定也相同：
+EMA/RSI/滚动极值/布林带在数据不足时为NaN，ATR/ADX/DI按ta的写法填0。
+Wilder平滑在Python浮点列表上逐根递推，EMA类递推调用pandas编译好的ewm，其余部分向量化。
+输入按有限值设计，不处理NaN。
+out参数可传入预先分配好的float64数组（长度与输入相同），结果直接写入并返回，便于循环中复用缓冲区。
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def _as_array(values: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _output(out: np.ndarray | None, count: int, fill: float) -> np.ndarray:
+    if out is None:
+        return np.full(count, fill, dtype=np.float64)
+    if out.shape != (count,) or out.dtype != np.float64:
+        raise ValueError(f"out必须是长度为{count}的float64数组")
+    out.fill(fill)
+    return out
+
+
+def _ewm(values: np.ndarray, com: float, min_periods: int) -> np.ndarray:
+    """
+    pandas ewm(com=com, adjust=False)，直接调用pandas编译好的递推（ta内部用的也是它），省去ta的Series包装开销。
+
+    pandas把span/alpha都先换算为com再求alpha，这里同样以com为参数，保证alpha与ta逐位相同。
+    """
+    return pd.Series(values, copy=False).ewm(com=com, adjust=False, min_periods=min_periods).mean().to_numpy()
+
+
+def ema(close: np.ndarray, window: int, out: np.ndarray | None = None) -> np.ndarray:
+    """与ta.trend.EMAIndicator(window).ema_indicator()逐位一致的EMA，前window-1根为NaN。"""
+    close = _as_array(close)
+    count = close.shape[0]
+    result = _output(out, count, np.nan)
+    if count == 0 or window <= 0:
+        return result
+    result[:] = _ewm(close, (window - 1) / 2.0, window)
+    return result
+
+
+def rsi(close: np.ndarray, window: int = 14, out: np.ndarray | None = None) -> np.ndarray:
+    """与ta.momentum.RSIIndicator(window).rsi()逐位一致的RSI，前window-1根为NaN，无下跌时为100。"""
+    close = _as_array(close)
+    count = close.shape[0]
+    result = _output(out, count, np.nan)
+    if count == 0 or window <= 0:
+        return result
+    diff = np.empty(count, dtype=np.float64)
+    diff[0] = 0.0
+    np.subtract(close[1:], close[:-1], out=diff[1:])
+    up = np.where(diff > 0, diff, 0.0)
+    down = -np.where(diff < 0, diff, 0.0)
+    alpha = 1.0 / window
+    com = (1.0 - alpha) / alpha
+    up_ema = _ewm(up, com, window)
+    down_ema = _ewm(down, com, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result[:] = np.where(down_ema == 0, 100.0, 100.0 - 100.0 / (1.0 + up_ema / down_ema))
+    return result
+
+
+def _rolling_extreme(values: np.ndarray, window: int, op: np.ufunc, pad: float, out: np.ndarray | None) -> np.ndarray:
+    """
+    van Herk/Gil-Werman滚动极值：按window分块求块内前缀和后缀极值，每个窗口恰好跨越相邻两块，
+    取后缀与前缀的极值即可，与窗口长度无关的O(n)。极值运算没有舍入，结果与逐窗口比较完全相同。
+    """
+    values = _as_array(values)
+    count = values.shape[0]
+    result = _output(out, count, np.nan)
+    if not 0 < window <= count:
+        return result
+    blocks = -(-count // window)
+    padded = np.full(blocks * window, pad, dtype=np.float64)
+    padded[:count] = values
+    grid = padded.reshape(blocks, window)
+    prefix = op.accumulate(grid, axis=1).ravel()
+    suffix = op.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()
+    op(suffix[: count - window + 1], prefix[window - 1 : count], out=result[window - 1 :])
+    return result
+
+
+def rolling_max(values: np.ndarray, window: int, out: np.ndarray | None = None) -> np.ndarray:
+    """与Series.rolling(window).max()一致的滚动最大值，前window-1根为NaN。"""
+    return _rolling_extreme(values, window, np.maximum, -np.inf, out)
+
+
+def rolling_min(values: np.ndarray, window: int, out: np.ndarray | None = None) -> np.ndarray:
+    """与Series.rolling(window).min()一致的滚动最小值，前window-1根为NaN。"""
+    return _rolling_extreme(values, window, np.minimum, np.inf, out)
+
+
+def bollinger_bands(
+    close: np.ndarray, window: int = 20, window_dev: float = 2.0
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    与ta.volatility.BollingerBands一致的(中轨, 上轨, 下轨)，标准差为总体标准差(ddof=0)，前window-1根为NaN。
+
+    窗口和与离差平方和由window次错位的向量加法求得（两遍算法）。pandas的滚动均值/方差按增量更新，
+    均值只差末位；方差在窗口内价格接近时有抵消误差（约sqrt(eps)*价格量级），这里的结果更精确。
+    """
+    close = _as_array(close)
+    count = close.shape[0]
+    middle = np.full(count, np.nan, dtype=np.float64)
+    deviation = np.full(count, np.nan, dtype=np.float64)
+    if 0 < window <= count:
+        spans = count - window + 1
+        total = close[:spans].copy()
+        for offset in range(1, window):
+            total += close[offset : offset + spans]
+        mean = total / window
+        squares = np.square(close[:spans] - mean)
+        for offset in range(1, window):
+            squares += np.square(close[offset : offset + spans] - mean)
+        middle[window - 1 :] = mean
+        np.sqrt(squares / window, out=deviation[window - 1 :])
+    return middle, middle + window_dev * deviation, middle - window_dev * deviation
+
+
+def wilder_atr(
+    high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int, out: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    与ta.volatility.AverageTrueRange逐位一致的ATR：前window-1根为0，第window根为真实波幅均值，之后Wilder平滑。
+
+    平滑递推按ta的运算顺序在Python浮点上逐根计算，避免pandas的逐元素访问开销。
+    """
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    count = close.shape[0]
+    atr = _output(out, count, 0.0)
+    if count < window or window <= 0:
+        return atr
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+    head = true_range[:window]
+    valid = ~np.isnan(head)
+    seed = np.where(valid, head, 0.0).sum() / valid.sum() if valid.any() else np.nan
+    values = [0.0] * count
+    values[window - 1] = float(seed)
+    ranges = true_range.tolist()
+    divisor = float(window)
+    for index in range(window, count):
+        values[index] = (values[index - 1] * (window - 1) + ranges[index]) / divisor
+    atr[:] = values
+    return atr
+
+
+def _directional_index(
+    high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    ADX的+DI/-DI（第k个值对应第window+k根K线），要求至少window+1根K线。
+
+    TR/+DM/-DM以第1~window根之和为初值，按 s - s/window + x 平滑后换算为DI。
+    """
+    prev_close = close[:-1]
+    movement = np.maximum(high[1:], prev_close) - np.minimum(low[1:], prev_close)
+    diff_up = high[1:] - high[:-1]
+    diff_down = low[:-1] - low[1:]
+    pos = np.where((diff_up > diff_down) & (diff_up > 0), np.abs(diff_up), 0.0)
+    neg = np.where((diff_down > diff_up) & (diff_down > 0), np.abs(diff_down), 0.0)
+
+    divisor = float(window)
+    smoothed = []
+    for series in (movement, pos, neg):
+        values = series.tolist()
+        current = float(series[:window].sum())
+        sums = [current]
+        for index in range(window, len(values)):
+            current = current - (current / divisor) + values[index]
+            sums.append(current)
+        smoothed.append(np.asarray(sums, dtype=np.float64))
+    trs, dip, din = smoothed
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        plus_di = np.where(trs != 0, 100 * (dip / trs), 0.0)
+        minus_di = np.where(trs != 0, 100 * (din / trs), 0.0)
+    return plus_di, minus_di
+
+
+def directional_indicators(
+    high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    与ta.trend.ADXIndicator的adx_pos()/adx_neg()逐位一致的(+DI, -DI)。
+
+    ta只填充第window+1根至最后一根，其余位置为0，这里保持相同的布局。
+    """
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    count = close.shape[0]
+    plus = np.zeros(count, dtype=np.float64)
+    minus = np.zeros(count, dtype=np.float64)
+    if window <= 0 or count < window + 2:
+        return plus, minus
+    plus_di, minus_di = _directional_index(high, low, close, window)
+    plus[window + 1 :] = plus_di[1:]
+    minus[window + 1 :] = minus_di[1:]
+    return plus, minus
+
+
+def wilder_adx(
+    high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int, out: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    与ta.trend.ADXIndicator.adx()逐位一致的ADX，前2*window-1根为0。
+
+    DX由平滑后的DI向量化计算；前window个DX的均值作为第一个ADX，之后Wilder平滑。
+    """
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    count = close.shape[0]
+    adx = _output(out, count, 0.0)
+    if window <= 0 or count < 2 * window:
+        return adx
+
+    plus_di, minus_di = _directional_index(high, low, close, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = plus_di + minus_di
+        dx = np.where(total != 0, 100 * np.abs((plus_di - minus_di) / total), 0.0)
+
+    divisor = float(window)
+    values = [0.0] * count
+    current = float(dx[:window].mean())
+    values[2 * window - 1] = current
+    dx_list = dx.tolist()
+    for index in range(2 * window, count):
+        current = ((current * (window - 1)) + dx_list[index - window]) / divisor
+        values[index] = current
+    adx[:] = values
+    return adx
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 import math
+from collections.abc import Callable
+from dataclasses import dataclass, replace
 from typing import Any, Literal
 
+import numpy as np
 import pandas as pd
-from ta.trend import ADXIndicator, EMAIndicator
-from ta.volatility import AverageTrueRange
+
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.quant.indicators import ema, rolling_max, rolling_min, wilder_adx, wilder_atr
 
 SignalAction = Literal["buy", "sell", "hold"]
 
@@ -110,7 +114,10 @@ def _signal_value(signal: str) -> float:
     return 0.0
 
 
-def _build_dataframe(klines: list[dict[str, Any]]) -> pd.DataFrame:
+def _build_dataframe(klines: list[dict[str, Any]] | KlineArrays) -> pd.DataFrame:
+    if isinstance(klines, KlineArrays):
+        return _frame_from_arrays(klines)
+
     rows: list[dict[str, Any]] = []
     for item in klines:
         open_time = pd.to_datetime(item.get("open_time"), utc=True, errors="coerce")
@@ -137,6 +144,22 @@ def _build_dataframe(klines: list[dict[str, Any]]) -> pd.DataFrame:
     )
 
 
+def _frame_from_arrays(klines: KlineArrays) -> pd.DataFrame:
+    """列式K线（已按时间正序去重）直接组装DataFrame，不经过字符串时间的解析和逐行字典。"""
+    if len(klines) == 0:
+        return pd.DataFrame(columns=["open_time", "open", "high", "low", "close", "volume"])
+    return pd.DataFrame(
+        {
+            "open_time": pd.to_datetime(klines.open_time, unit="ms", utc=True),
+            "open": klines.open,
+            "high": klines.high,
+            "low": klines.low,
+            "close": klines.close,
+            "volume": klines.volume,
+        }
+    )
+
+
 def _build_signal(
     strategy_name: str,
     symbol: str,
@@ -175,174 +198,407 @@ def _hold_signal(strategy_name: str, symbol: str, timeframe: str, reason: str) -
     )
 
 
-def _ema_adx_signal(symbol: str, timeframe: str, df: pd.DataFrame) -> dict[str, Any]:
-    strategy = "ema_adx_daily"
-    if len(df) < 60:
-        return _hold_signal(strategy, symbol, timeframe, "insufficient_klines_for_ema_adx")
-
-    close = df["close"]
-    high = df["high"]
-    low = df["low"]
-
-    ema_fast = EMAIndicator(close=close, window=20).ema_indicator()
-    ema_slow = EMAIndicator(close=close, window=50).ema_indicator()
-    adx = ADXIndicator(high=high, low=low, close=close, window=14).adx()
-
-    fast = _safe_float(ema_fast.iloc[-1])
-    slow = _safe_float(ema_slow.iloc[-1])
-    adx_latest = _safe_float(adx.iloc[-1])
-    if fast <= 0 or slow <= 0:
-        return _hold_signal(strategy, symbol, timeframe, "invalid_indicator_values")
+@dataclass(frozen=True)
+class SignalSeries:
+    """
+    策略在每根K线上的信号序列，第i个元素等于只用前i+1根K线计算出的信号。
 
-    trend_gap = (fast - slow) / slow
-    signal: SignalAction = "hold"
-    if adx_latest >= 25 and trend_gap > 0:
-        signal = "buy"
-    elif adx_latest >= 25 and trend_gap < 0:
-        signal = "sell"
+    signal为1/-1/0（buy/sell/hold），strength为未截断的信号强度；valid为False表示该位置指标无效，
+    前min_bars-1根K线数据不足，两种情况都视为hold。values保存生成reasoning所需的指标序列。
+    """
 
-    strength = abs(trend_gap) * 14 + max(0.0, adx_latest - 20) / 40
-    reasoning = f"ema_fast={fast:.2f}, ema_slow={slow:.2f}, adx={adx_latest:.2f}, gap={trend_gap:.4f}"
-    return _build_signal(
-        strategy_name=strategy,
-        symbol=symbol,
-        timeframe=timeframe,
-        timestamp=df["open_time"].iloc[-1].isoformat(),
-        signal=signal,
+    strategy_name: str
+    signal: np.ndarray
+    strength: np.ndarray
+    valid: np.ndarray
+    values: dict[str, np.ndarray]
+    min_bars: int = 0
+
+    def action_at(self, index: int) -> SignalAction:
+        if index + 1 < self.min_bars or not self.valid[index]:
+            return "hold"
+        code = int(self.signal[index])
+        return "buy" if code > 0 else "sell" if code < 0 else "hold"
+
+    def actions(self) -> np.ndarray:
+        """逐根K线的信号代码，数据不足或指标无效的位置为0。"""
+        ready = (np.arange(self.signal.shape[0]) + 1 >= self.min_bars) & self.valid
+        return np.where(ready, self.signal, 0).astype(np.int8)
+
+
+def _cached(cache: dict[Any, Any] | None, key: tuple[Any, ...], compute: Callable[[], Any]) -> Any:
+    """cache不为None时按key复用指标数组（调用方保证同一个cache只用于同一段K线）。"""
+    if cache is None:
+        return compute()
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def _ema_adx_series(
+    df: pd.DataFrame,
+    cache: dict[Any, Any] | None = None,
+    ema_fast: int = 20,
+    ema_slow: int = 50,
+    adx_window: int = 14,
+    adx_trigger: float = 25,
+) -> SignalSeries:
+    close = df["close"].to_numpy(dtype=np.float64)
+    fast = _cached(cache, ("ema", ema_fast), lambda: ema(close, ema_fast))
+    slow = _cached(cache, ("ema", ema_slow), lambda: ema(close, ema_slow))
+    adx = _cached(
+        cache,
+        ("adx", adx_window),
+        lambda: wilder_adx(
+            df["high"].to_numpy(dtype=np.float64),
+            df["low"].to_numpy(dtype=np.float64),
+            close,
+            window=adx_window,
+        ),
+    )
+    return _ema_adx_rules(fast=fast, slow=slow, adx=adx, adx_trigger=adx_trigger)
+
+
+def _ema_adx_rules(fast: np.ndarray, slow: np.ndarray, adx: np.ndarray, adx_trigger: float = 25) -> SignalSeries:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        trend_gap = (fast - slow) / slow
+        trending = adx >= adx_trigger
+        signal = np.where(trending & (trend_gap > 0), 1, np.where(trending & (trend_gap < 0), -1, 0))
+        valid = ~((fast <= 0) | (slow <= 0))
+        strength = np.abs(trend_gap) * 14 + np.fmax(0.0, adx - 20) / 40
+    return SignalSeries(
+        strategy_name="ema_adx_daily",
+        signal=signal.astype(np.int8),
         strength=strength,
-        indicators={
-            "ema_fast": round(fast, 4),
-            "ema_slow": round(slow, 4),
-            "adx": round(adx_latest, 4),
-            "trend_gap": round(trend_gap, 6),
-        },
-        reasoning=reasoning,
+        valid=valid,
+        values={"ema_fast": fast, "ema_slow": slow, "adx": adx, "trend_gap": trend_gap},
     )
 
 
-def _compute_supertrend(df: pd.DataFrame, period: int = 10, multiplier: float = 3.0) -> tuple[pd.Series, pd.Series]:
-    atr = AverageTrueRange(high=df["high"], low=df["low"], close=df["close"], window=period).average_true_range()
-    hl2 = (df["high"] + df["low"]) / 2
-    upper = hl2 + multiplier * atr
-    lower = hl2 - multiplier * atr
-
-    final_upper = upper.copy()
-    final_lower = lower.copy()
-    supertrend: list[float] = [math.nan] * len(df)
-    direction: list[int] = [1] * len(df)
+def _describe_ema_adx(values: dict[str, np.ndarray], index: int) -> tuple[dict[str, float], str]:
+    fast = float(values["ema_fast"][index])
+    slow = float(values["ema_slow"][index])
+    adx_latest = float(values["adx"][index])
+    trend_gap = float(values["trend_gap"][index])
+    indicators = {
+        "ema_fast": round(fast, 4),
+        "ema_slow": round(slow, 4),
+        "adx": round(adx_latest, 4),
+        "trend_gap": round(trend_gap, 6),
+    }
+    return indicators, f"ema_fast={fast:.2f}, ema_slow={slow:.2f}, adx={adx_latest:.2f}, gap={trend_gap:.4f}"
 
-    if len(df) > 0 and not pd.isna(atr.iloc[0]):
-        supertrend[0] = lower.iloc[0]
 
-    for index in range(1, len(df)):
-        if pd.isna(atr.iloc[index]):
+def _ema_adx_signal(symbol: str, timeframe: str, df: pd.DataFrame) -> dict[str, Any]:
+    return _latest_signal("ema_adx_daily", symbol=symbol, timeframe=timeframe, df=df)
+
+
+def supertrend_arrays(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    period: int = 10,
+    multiplier: float = 3.0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    计算完整的Supertrend线和方向序列（1为多头，-1为空头）。
+
+    上下轨由向量化的hl2 ± multiplier * ATR得到；最终轨道和方向的递推依赖前一根的结果，
+    在预先取出的Python浮点列表上逐根完成。
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    count = close.shape[0]
+    if count == 0:
+        return np.full(0, np.nan), np.ones(0, dtype=np.int8)
+
+    atr = wilder_atr(high, low, close, window=period)
+    hl2 = (high + low) / 2
+    upper = (hl2 + multiplier * atr).tolist()
+    lower = (hl2 - multiplier * atr).tolist()
+    valid = (~np.isnan(atr)).tolist()
+    closes = close.tolist()
+
+    final_upper = list(upper)
+    final_lower = list(lower)
+    supertrend = [math.nan] * count
+    direction = [1] * count
+    if valid[0]:
+        supertrend[0] = lower[0]
+
+    for index in range(1, count):
+        if not valid[index]:
             direction[index] = direction[index - 1]
             continue
 
-        prev_close = _safe_float(df["close"].iloc[index - 1])
+        prev_close = closes[index - 1]
+        prev_upper = final_upper[index - 1]
+        prev_lower = final_lower[index - 1]
+        if math.isnan(prev_upper):
+            prev_upper = upper[index - 1]
+        if math.isnan(prev_lower):
+            prev_lower = lower[index - 1]
+
+        current_upper = upper[index]
+        current_lower = lower[index]
+        band_upper = current_upper if current_upper < prev_upper or prev_close > prev_upper else prev_upper
+        band_lower = current_lower if current_lower > prev_lower or prev_close < prev_lower else prev_lower
+        final_upper[index] = band_upper
+        final_lower[index] = band_lower
+
+        trend = direction[index - 1]
+        close_price = closes[index]
+        if trend == -1 and close_price > band_upper:
+            trend = 1
+        elif trend == 1 and close_price < band_lower:
+            trend = -1
+        direction[index] = trend
+        supertrend[index] = band_lower if trend == 1 else band_upper
+
+    return np.asarray(supertrend, dtype=np.float64), np.asarray(direction, dtype=np.int8)
 
-        prev_upper = final_upper.iloc[index - 1]
-        prev_lower = final_lower.iloc[index - 1]
-        if pd.isna(prev_upper):
-            prev_upper = upper.iloc[index - 1]
-        if pd.isna(prev_lower):
-            prev_lower = lower.iloc[index - 1]
 
-        current_upper = upper.iloc[index]
-        current_lower = lower.iloc[index]
+def _compute_supertrend(df: pd.DataFrame, period: int = 10, multiplier: float = 3.0) -> tuple[pd.Series, pd.Series]:
+    supertrend, direction = supertrend_arrays(
+        high=df["high"].to_numpy(dtype=np.float64),
+        low=df["low"].to_numpy(dtype=np.float64),
+        close=df["close"].to_numpy(dtype=np.float64),
+        period=period,
+        multiplier=multiplier,
+    )
+    return pd.Series(supertrend, index=df.index), pd.Series(direction.astype(np.int64), index=df.index)
 
-        final_upper.iloc[index] = current_upper if current_upper < prev_upper or prev_close > prev_upper else prev_upper
-        final_lower.iloc[index] = current_lower if current_lower > prev_lower or prev_close < prev_lower else prev_lower
 
-        prev_direction = direction[index - 1]
-        close_price = _safe_float(df["close"].iloc[index])
-        if prev_direction == -1 and close_price > _safe_float(final_upper.iloc[index]):
-            direction[index] = 1
-        elif prev_direction == 1 and close_price < _safe_float(final_lower.iloc[index]):
-            direction[index] = -1
-        else:
-            direction[index] = prev_direction
+def _supertrend_series(
+    df: pd.DataFrame,
+    cache: dict[Any, Any] | None = None,
+    atr_period: int = 10,
+    multiplier: float = 3.0,
+) -> SignalSeries:
+    close = df["close"].to_numpy(dtype=np.float64)
+    supertrend, direction = _cached(
+        cache,
+        ("supertrend", atr_period, multiplier),
+        lambda: supertrend_arrays(
+            high=df["high"].to_numpy(dtype=np.float64),
+            low=df["low"].to_numpy(dtype=np.float64),
+            close=close,
+            period=atr_period,
+            multiplier=multiplier,
+        ),
+    )
+    return _supertrend_rules(supertrend=supertrend, direction=direction, close=close)
+
+
+def _supertrend_rules(supertrend: np.ndarray, direction: np.ndarray, close: np.ndarray) -> SignalSeries:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        distance_ratio = np.abs((close - supertrend) / close)
+        valid = ~((supertrend <= 0) | (close <= 0))
+    return SignalSeries(
+        strategy_name="supertrend_daily",
+        signal=np.where(direction == 1, 1, -1).astype(np.int8),
+        strength=distance_ratio * 25,
+        valid=valid,
+        values={"supertrend": supertrend, "direction": direction, "close": close, "distance_ratio": distance_ratio},
+    )
 
-        supertrend[index] = _safe_float(final_lower.iloc[index]) if direction[index] == 1 else _safe_float(final_upper.iloc[index])
 
-    return pd.Series(supertrend, index=df.index), pd.Series(direction, index=df.index)
+def _describe_supertrend(values: dict[str, np.ndarray], index: int) -> tuple[dict[str, float], str]:
+    latest_supertrend = float(values["supertrend"][index])
+    latest_close = float(values["close"][index])
+    latest_direction = int(values["direction"][index])
+    distance_ratio = float(values["distance_ratio"][index])
+    indicators = {
+        "supertrend": round(latest_supertrend, 4),
+        "direction": float(latest_direction),
+        "distance_ratio": round(distance_ratio, 6),
+    }
+    return indicators, f"close={latest_close:.2f}, supertrend={latest_supertrend:.2f}, direction={latest_direction}"
 
 
 def _supertrend_signal(symbol: str, timeframe: str, df: pd.DataFrame) -> dict[str, Any]:
-    strategy = "supertrend_daily"
-    if len(df) < 30:
-        return _hold_signal(strategy, symbol, timeframe, "insufficient_klines_for_supertrend")
+    return _latest_signal("supertrend_daily", symbol=symbol, timeframe=timeframe, df=df)
 
-    supertrend, direction = _compute_supertrend(df=df, period=10, multiplier=3.0)
-    latest_supertrend = _safe_float(supertrend.iloc[-1])
-    latest_close = _safe_float(df["close"].iloc[-1])
-    latest_direction = int(direction.iloc[-1]) if len(direction) > 0 else 1
 
-    if latest_supertrend <= 0 or latest_close <= 0:
-        return _hold_signal(strategy, symbol, timeframe, "invalid_indicator_values")
+def _shifted(values: np.ndarray) -> np.ndarray:
+    """后移一根（与Series.shift(1)相同，首位补NaN）。"""
+    shifted = np.empty_like(values)
+    shifted[0:1] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
 
-    signal: SignalAction = "buy" if latest_direction == 1 else "sell"
-    distance_ratio = abs((latest_close - latest_supertrend) / latest_close)
-    strength = distance_ratio * 25
-    reasoning = f"close={latest_close:.2f}, supertrend={latest_supertrend:.2f}, direction={latest_direction}"
-    return _build_signal(
-        strategy_name=strategy,
-        symbol=symbol,
-        timeframe=timeframe,
-        timestamp=df["open_time"].iloc[-1].isoformat(),
-        signal=signal,
-        strength=strength,
-        indicators={
-            "supertrend": round(latest_supertrend, 4),
-            "direction": float(latest_direction),
-            "distance_ratio": round(distance_ratio, 6),
-        },
-        reasoning=reasoning,
+
+def _donchian_series(df: pd.DataFrame, cache: dict[Any, Any] | None = None, lookback: int = 20) -> SignalSeries:
+    upper = _cached(cache, ("donchian_upper", lookback), lambda: _shifted(rolling_max(df["high"].to_numpy(), lookback)))
+    lower = _cached(cache, ("donchian_lower", lookback), lambda: _shifted(rolling_min(df["low"].to_numpy(), lookback)))
+    return _donchian_rules(upper=upper, lower=lower, close=df["close"].to_numpy(dtype=np.float64))
+
+
+def _donchian_rules(upper: np.ndarray, lower: np.ndarray, close: np.ndarray) -> SignalSeries:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        breakout_up = close > upper
+        breakout_down = ~breakout_up & (close < lower)
+        breakout_pct = np.where(
+            breakout_up, (close - upper) / close, np.where(breakout_down, (lower - close) / close, 0.0)
+        )
+        valid = ~((upper <= 0) | (lower <= 0) | (close <= 0))
+    return SignalSeries(
+        strategy_name="donchian_breakout_daily",
+        signal=np.where(breakout_up, 1, np.where(breakout_down, -1, 0)).astype(np.int8),
+        strength=breakout_pct * 35,
+        valid=valid,
+        values={"upper": upper, "lower": lower, "close": close, "breakout_pct": breakout_pct},
     )
 
 
-def _donchian_signal(symbol: str, timeframe: str, df: pd.DataFrame) -> dict[str, Any]:
-    strategy = "donchian_breakout_daily"
-    if len(df) < 25:
-        return _hold_signal(strategy, symbol, timeframe, "insufficient_klines_for_donchian")
+def _describe_donchian(values: dict[str, np.ndarray], index: int) -> tuple[dict[str, float], str]:
+    upper = float(values["upper"][index])
+    lower = float(values["lower"][index])
+    latest_close = float(values["close"][index])
+    breakout_pct = float(values["breakout_pct"][index])
+    indicators = {
+        "donchian_upper_prev": round(upper, 4),
+        "donchian_lower_prev": round(lower, 4),
+        "breakout_pct": round(breakout_pct, 6),
+    }
+    reasoning = f"close={latest_close:.2f}, upper_prev={upper:.2f}, lower_prev={lower:.2f}, breakout={breakout_pct:.4f}"
+    return indicators, reasoning
 
-    upper_prev = df["high"].rolling(window=20).max().shift(1)
-    lower_prev = df["low"].rolling(window=20).min().shift(1)
 
-    upper = _safe_float(upper_prev.iloc[-1])
-    lower = _safe_float(lower_prev.iloc[-1])
-    latest_close = _safe_float(df["close"].iloc[-1])
+def _donchian_signal(symbol: str, timeframe: str, df: pd.DataFrame) -> dict[str, Any]:
+    return _latest_signal("donchian_breakout_daily", symbol=symbol, timeframe=timeframe, df=df)
+
+
+@dataclass(frozen=True)
+class _SeriesSpec:
+    build: Callable[..., SignalSeries]
+    rules: Callable[..., SignalSeries]
+    inputs: tuple[str, ...]
+    describe: Callable[[dict[str, np.ndarray], int], tuple[dict[str, float], str]]
+    min_bars: int
+    insufficient_reason: str
+    warmup: Callable[[dict[str, Any]], int]
+
+
+STRATEGY_SERIES: dict[str, _SeriesSpec] = {
+    "ema_adx_daily": _SeriesSpec(
+        _ema_adx_series,
+        _ema_adx_rules,
+        ("fast", "slow", "adx"),
+        _describe_ema_adx,
+        60,
+        "insufficient_klines_for_ema_adx",
+        lambda params: max(int(params["ema_fast"]), int(params["ema_slow"]), 2 * int(params["adx_window"])) + 10,
+    ),
+    "supertrend_daily": _SeriesSpec(
+        _supertrend_series,
+        _supertrend_rules,
+        ("supertrend", "direction", "close"),
+        _describe_supertrend,
+        30,
+        "insufficient_klines_for_supertrend",
+        lambda params: 3 * int(params["atr_period"]),
+    ),
+    "donchian_breakout_daily": _SeriesSpec(
+        _donchian_series,
+        _donchian_rules,
+        ("upper", "lower", "close"),
+        _describe_donchian,
+        25,
+        "insufficient_klines_for_donchian",
+        lambda params: int(params["lookback"]) + 5,
+    ),
+}
 
-    if upper <= 0 or lower <= 0 or latest_close <= 0:
-        return _hold_signal(strategy, symbol, timeframe, "invalid_indicator_values")
 
-    signal: SignalAction = "hold"
-    breakout_pct = 0.0
-    if latest_close > upper:
-        signal = "buy"
-        breakout_pct = (latest_close - upper) / latest_close
-    elif latest_close < lower:
-        signal = "sell"
-        breakout_pct = (lower - latest_close) / latest_close
+def strategy_parameters(strategy_name: str, overrides: dict[str, Any] | None = None) -> dict[str, Any]:
+    """STRATEGY_CATALOG中的默认参数合并overrides；策略或参数名未知时抛出ValueError。"""
+    if strategy_name not in STRATEGY_CATALOG:
+        raise ValueError(f"未知的策略: {strategy_name}")
+    params = dict(STRATEGY_CATALOG[strategy_name]["parameters"])
+    unknown = sorted(set(overrides or {}) - set(params))
+    if unknown:
+        raise ValueError(f"策略{strategy_name}没有参数: {', '.join(unknown)}")
+    params.update(overrides or {})
+    return params
 
-    strength = breakout_pct * 35
-    reasoning = f"close={latest_close:.2f}, upper_prev={upper:.2f}, lower_prev={lower:.2f}, breakout={breakout_pct:.4f}"
+
+def compute_signal_series(
+    strategy_name: str,
+    df: pd.DataFrame | KlineArrays,
+    parameters: dict[str, Any] | None = None,
+    cache: dict[Any, Any] | None = None,
+) -> SignalSeries | None:
+    """
+    一次计算整段K线上的指标和逐根信号；K线数量不足该策略的最少根数时返回None。
+
+    parameters覆盖目录中的默认参数（参数扫描用），最少根数随参数的预热长度调整；
+    cache用于在同一段K线的多次调用间复用指标数组。
+    """
+    if isinstance(df, KlineArrays):
+        df = _frame_from_arrays(df)
+    spec = STRATEGY_SERIES[strategy_name]
+    if parameters:
+        params = strategy_parameters(strategy_name, parameters)
+        min_bars = max(spec.min_bars, spec.warmup(params))
+    else:
+        params, min_bars = {}, spec.min_bars
+    if len(df) < min_bars:
+        return None
+    return replace(spec.build(df, cache=cache, **params), min_bars=min_bars)
+
+
+def _signal_at(series: SignalSeries, symbol: str, timeframe: str, index: int, timestamp: str | None) -> dict[str, Any]:
+    strategy = series.strategy_name
+    spec = STRATEGY_SERIES[strategy]
+    if index + 1 < series.min_bars:
+        return _hold_signal(strategy, symbol, timeframe, spec.insufficient_reason)
+    if not series.valid[index]:
+        return _hold_signal(strategy, symbol, timeframe, "invalid_indicator_values")
+    indicators, reasoning = spec.describe(series.values, index)
     return _build_signal(
         strategy_name=strategy,
         symbol=symbol,
         timeframe=timeframe,
-        timestamp=df["open_time"].iloc[-1].isoformat(),
-        signal=signal,
-        strength=strength,
-        indicators={
-            "donchian_upper_prev": round(upper, 4),
-            "donchian_lower_prev": round(lower, 4),
-            "breakout_pct": round(breakout_pct, 6),
-        },
+        timestamp=timestamp,
+        signal=series.action_at(index),
+        strength=float(series.strength[index]),
+        indicators=indicators,
         reasoning=reasoning,
     )
 
 
+def _latest_signal(strategy_name: str, symbol: str, timeframe: str, df: pd.DataFrame) -> dict[str, Any]:
+    series = compute_signal_series(strategy_name, df)
+    if series is None:
+        return _hold_signal(strategy_name, symbol, timeframe, STRATEGY_SERIES[strategy_name].insufficient_reason)
+    index = len(df) - 1
+    return _signal_at(series, symbol=symbol, timeframe=timeframe, index=index, timestamp=df["open_time"].iloc[index].isoformat())
+
+
+def build_signal_from_values(
+    strategy_name: str,
+    symbol: str,
+    timeframe: str,
+    timestamp: str | None,
+    bars: int,
+    values: dict[str, float],
+) -> dict[str, Any]:
+    """
+    用最新一根K线上的指标值（如增量引擎的输出）生成信号，判定规则与全序列计算共用。
+
+    bars为参与计算的K线总数，不足策略最少根数时返回hold；values需包含该策略规则所需的全部指标。
+    """
+    spec = STRATEGY_SERIES[strategy_name]
+    if bars <= 0:
+        return _hold_signal(strategy_name, symbol, timeframe, "no_klines")
+    if bars < spec.min_bars:
+        return _hold_signal(strategy_name, symbol, timeframe, spec.insufficient_reason)
+    series = spec.rules(**{name: np.asarray([values[name]], dtype=np.float64) for name in spec.inputs})
+    return _signal_at(series, symbol=symbol, timeframe=timeframe, index=0, timestamp=timestamp)
+
+
 def summarize_quant_signals(
     signals: list[dict[str, Any]],
     strategy_weights: dict[str, float] | None = None,
@@ -406,7 +662,7 @@ def summarize_quant_signals(
     }
 
 
-def build_quant_snapshot(symbol: str, timeframe: str, klines: list[dict[str, Any]]) -> dict[str, Any]:
+def build_quant_snapshot(symbol: str, timeframe: str, klines: list[dict[str, Any]] | KlineArrays) -> dict[str, Any]:
     df = _build_dataframe(klines)
     if df.empty:
         signals = [
@@ -430,30 +686,25 @@ def _build_markers_for_strategy(
     timeframe: str,
     df: pd.DataFrame,
 ) -> list[dict[str, Any]]:
-    build_signal_fn = {
-        "ema_adx_daily": _ema_adx_signal,
-        "supertrend_daily": _supertrend_signal,
-        "donchian_breakout_daily": _donchian_signal,
-    }.get(strategy_name)
-    if build_signal_fn is None:
-        return []
-
-    markers: list[dict[str, Any]] = []
-    previous_signal: str = "hold"
+    """
+    信号发生变化且变为buy/sell的K线生成一个标记。
 
-    for index in range(len(df)):
-        current_df = df.iloc[: index + 1]
-        signal_item = build_signal_fn(symbol=symbol, timeframe=timeframe, df=current_df)
-        signal = str(signal_item.get("signal", "hold")).lower()
-        if signal == previous_signal:
-            continue
-        previous_signal = signal
+    指标只在整段K线上计算一次，再由逐根信号序列的差分找出变化点，复杂度O(n)。
+    """
+    if strategy_name not in STRATEGY_SERIES:
+        return []
+    series = compute_signal_series(strategy_name, df)
+    if series is None:
+        return []
 
-        if signal not in {"buy", "sell"}:
-            continue
+    actions = series.actions()
+    previous = np.concatenate(([0], actions[:-1]))
+    changed = np.flatnonzero((actions != previous) & (actions != 0))
 
-        timestamp_raw = signal_item.get("timestamp")
-        timestamp = str(timestamp_raw) if timestamp_raw else str(df["open_time"].iloc[index].isoformat())
+    markers: list[dict[str, Any]] = []
+    for index in changed.tolist():
+        timestamp = df["open_time"].iloc[index].isoformat()
+        signal_item = _signal_at(series, symbol=symbol, timeframe=timeframe, index=index, timestamp=timestamp)
         markers.append(
             {
                 "strategy_name": strategy_name,
@@ -461,20 +712,19 @@ def _build_markers_for_strategy(
                 "category": signal_item.get("category", "unknown"),
                 "symbol": symbol,
                 "timeframe": timeframe,
-                "timestamp": timestamp,
-                "signal": signal,
-                "strength": _clip_strength(_safe_float(signal_item.get("strength", 0.0))),
+                "timestamp": str(signal_item["timestamp"]),
+                "signal": signal_item["signal"],
+                "strength": signal_item["strength"],
                 "reasoning": signal_item.get("reasoning", ""),
             }
         )
-
     return markers
 
 
 def build_quant_signal_markers(
     symbol: str,
     timeframe: str,
-    klines: list[dict[str, Any]],
+    klines: list[dict[str, Any]] | KlineArrays,
     max_points: int = 240,
 ) -> list[dict[str, Any]]:
     df = _build_dataframe(klines)
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import argparse
+import atexit
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import uuid
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.src.config import settings
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.db.models import BacktestSweepResult
+from backend.src.quant.backtest import BacktestResult, run_backtest
+from backend.src.quant.library import STRATEGY_CATALOG, strategy_parameters
+
+logger = logging.getLogger(__name__)
+
+# 排序方向：回撤越小越好，其余指标越大越好
+SWEEP_METRICS: dict[str, bool] = {
+    "sharpe": True,
+    "total_return": True,
+    "annual_return": True,
+    "win_rate": True,
+    "max_drawdown": False,
+}
+
+_COLUMNS = ("open_time", "open", "high", "low", "close", "volume")
+# 每个工作进程缓存的指标数组上限，超过后整体清空（按参数顺序分块，相邻组合的指标基本都能命中）
+_WORKER_CACHE_MAX_ENTRIES = 64
+
+
+@dataclass(frozen=True)
+class SweepResult:
+    """一次参数扫描的执行结果。"""
+
+    sweep_id: str
+    strategy_name: str
+    combinations: int
+    workers: int
+
+
+def expand_grid(strategy_name: str, grid: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    """
+    把参数网格展开为参数组合列表，未出现在grid中的参数取策略默认值。
+
+    展开顺序与目录中的参数顺序一致（最后一个参数变化最快），相邻组合共享尽量多的指标参数。
+    """
+    defaults = strategy_parameters(strategy_name, dict.fromkeys(grid))
+    names = [name for name in defaults if name in grid]
+    return [
+        {**defaults, **dict(zip(names, values, strict=True))}
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+
+class SharedKlineArrays:
+    """
+    把KlineArrays的6列拷贝进一块共享内存，工作进程按名字映射为数组视图，不再逐个pickle整段K线。
+
+    open_time按float64存储（毫秒时间戳小于2^53，可无损转换）。用作上下文管理器，退出时释放共享内存。
+    """
+
+    def __init__(self, klines: KlineArrays) -> None:
+        count = len(klines)
+        self.symbol = klines.symbol
+        self.timeframe = klines.timeframe
+        self.count = count
+        self._shm = SharedMemory(create=True, size=max(1, len(_COLUMNS) * count * 8))
+        block = np.ndarray((len(_COLUMNS), count), dtype=np.float64, buffer=self._shm.buf)
+        for row, column in enumerate(_COLUMNS):
+            block[row] = getattr(klines, column)
+
+    @property
+    def descriptor(self) -> tuple[str, int, str, str]:
+        return self._shm.name, self.count, self.symbol, self.timeframe
+
+    def close(self) -> None:
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> SharedKlineArrays:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def attach_shared_klines(
+    descriptor: tuple[str, int, str, str], track: bool = True
+) -> tuple[SharedMemory, KlineArrays]:
+    """
+    按描述符映射共享内存中的K线；返回的SharedMemory需在使用期间保持引用。
+
+    track=False表示共享内存由创建方负责unlink，映射方不向resource_tracker登记（Python 3.13起支持）。
+    更早的版本映射时总会登记，但spawn出的工作进程与主进程共用同一个resource_tracker，
+    按名字登记是幂等的，仍由主进程unlink时撤销；此时若在工作进程里撤销登记，
+    会把主进程的登记一并删掉，主进程unlink时resource_tracker报KeyError。
+    """
+    name, count, symbol, timeframe = descriptor
+    shm = SharedMemory(name=name, track=track) if sys.version_info >= (3, 13) else SharedMemory(name=name)
+    block = np.ndarray((len(_COLUMNS), count), dtype=np.float64, buffer=shm.buf)
+    columns = {column: block[row] for row, column in enumerate(_COLUMNS)}
+    columns["open_time"] = columns["open_time"].astype(np.int64)
+    return shm, KlineArrays(symbol=symbol, timeframe=timeframe, **columns)
+
+
+# 工作进程内的全局状态，由_init_worker在进程启动时设置一次
+_worker: dict[str, Any] = {}
+
+
+def _init_worker(descriptor: tuple[str, int, str, str], options: dict[str, Any]) -> None:
+    shm, klines = attach_shared_klines(descriptor, track=False)
+    atexit.register(_close_worker_memory)
+    _worker.update(shm=shm, klines=klines, options=options, cache={})
+
+
+def _close_worker_memory() -> None:
+    """工作进程退出时关闭共享内存映射；先丢弃引用它的数组视图，否则close会抛BufferError。"""
+    shm = _worker.pop("shm", None)
+    _worker.clear()
+    if shm is not None:
+        shm.close()
+
+
+def _evaluate(
+    klines: KlineArrays,
+    strategy_name: str,
+    combos: list[dict[str, Any]],
+    options: dict[str, Any],
+    cache: dict[Any, Any],
+) -> list[dict[str, Any]]:
+    rows: list[dict[str, Any]] = []
+    for params in combos:
+        if len(cache) > _WORKER_CACHE_MAX_ENTRIES:
+            cache.clear()
+        result = run_backtest(klines, strategy_name, parameters=params, cache=cache, **options)
+        rows.append(_result_row(result))
+    return rows
+
+
+def _run_chunk(strategy_name: str, combos: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return _evaluate(_worker["klines"], strategy_name, combos, _worker["options"], _worker["cache"])
+
+
+def _result_row(result: BacktestResult) -> dict[str, Any]:
+    return {
+        "strategy_name": result.strategy_name,
+        "symbol": result.symbol,
+        "timeframe": result.timeframe,
+        "parameters_json": json.dumps(result.parameters, sort_keys=True),
+        "bars": result.bars,
+        "total_return": result.total_return,
+        "annual_return": result.annual_return,
+        "max_drawdown": result.max_drawdown,
+        "sharpe": result.sharpe,
+        "win_rate": result.win_rate,
+        "trades": result.trades,
+        "turnover": result.turnover,
+        "exposure": result.exposure,
+    }
+
+
+def _chunks(items: list[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _resolve_workers(workers: int | None) -> int:
+    configured = settings.quant_sweep_workers if workers is None else workers
+    return configured if configured > 0 else os.cpu_count() or 1
+
+
+def run_parameter_sweep(
+    db: Session,
+    klines: KlineArrays,
+    strategy_name: str,
+    grid: dict[str, list[Any]],
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    fee_pct: float | None = None,
+    slippage_pct: float | None = None,
+    allow_short: bool = False,
+    on_rows: Callable[[list[dict[str, Any]]], None] | None = None,
+) -> SweepResult:
+    """
+    在一段K线上回测参数网格中的每个组合，结果逐块写入backtest_sweep_results表。
+
+    workers默认取settings.quant_sweep_workers（0为CPU核心数）；大于1时K线放入共享内存，
+    由spawn方式启动的进程池分块计算，每个工作进程只映射一次K线并在块内复用指标数组。
+    每完成一块就提交一次并调用on_rows，调用方可以在扫描过程中读取已完成的排名。
+    """
+    combos = expand_grid(strategy_name, grid)
+    worker_count = min(_resolve_workers(workers), max(1, len(combos)))
+    size = chunk_size or max(1, min(64, len(combos) // (worker_count * 4) or 1))
+    options = {"fee_pct": fee_pct, "slippage_pct": slippage_pct, "allow_short": allow_short}
+    sweep_id = uuid.uuid4().hex
+
+    def store(rows: list[dict[str, Any]]) -> None:
+        db.add_all(BacktestSweepResult(sweep_id=sweep_id, **row) for row in rows)
+        db.commit()
+        if on_rows is not None:
+            on_rows(rows)
+
+    if worker_count <= 1:
+        cache: dict[Any, Any] = {}
+        for chunk in _chunks(combos, size):
+            store(_evaluate(klines, strategy_name, chunk, options, cache))
+    else:
+        context = multiprocessing.get_context("spawn")
+        with SharedKlineArrays(klines) as shared, ProcessPoolExecutor(
+            max_workers=worker_count, mp_context=context, initializer=_init_worker, initargs=(shared.descriptor, options)
+        ) as executor:
+            pending = {executor.submit(_run_chunk, strategy_name, chunk) for chunk in _chunks(combos, size)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    store(future.result())
+
+    logger.info("参数扫描完成: %s %s组参数, %s个进程, sweep_id=%s", strategy_name, len(combos), worker_count, sweep_id)
+    return SweepResult(sweep_id=sweep_id, strategy_name=strategy_name, combinations=len(combos), workers=worker_count)
+
+
+def ranked_sweep_results(db: Session, sweep_id: str, metric: str = "sharpe", limit: int = 20) -> list[dict[str, Any]]:
+    """按指标排序返回一次扫描的前limit个参数组合（回撤升序，其余指标降序）。"""
+    if metric not in SWEEP_METRICS:
+        raise ValueError(f"不支持的排序指标: {metric}")
+    column = getattr(BacktestSweepResult, metric)
+    order = column.desc() if SWEEP_METRICS[metric] else column.asc()
+    rows = db.execute(
+        select(BacktestSweepResult)
+        .where(BacktestSweepResult.sweep_id == sweep_id)
+        .order_by(order, BacktestSweepResult.id)
+        .limit(limit)
+    ).scalars()
+    return [
+        {
+            "rank": rank,
+            "strategy_name": row.strategy_name,
+            "parameters": json.loads(row.parameters_json),
+            "total_return_pct": round(row.total_return * 100, 4),
+            "annual_return_pct": round(row.annual_return * 100, 4),
+            "max_drawdown_pct": round(row.max_drawdown * 100, 4),
+            "sharpe": round(row.sharpe, 4),
+            "win_rate": round(row.win_rate, 4),
+            "trades": row.trades,
+            "turnover": round(row.turnover, 4),
+            "exposure": round(row.exposure, 4),
+        }
+        for rank, row in enumerate(rows, start=1)
+    ]
+
+
+def main() -> None:
+    from backend.src.data.kline_service import get_recent_kline_arrays
+    from backend.src.db.database import SessionLocal
+    from backend.src.db.init_db import init_db
+
+    parser = argparse.ArgumentParser(description="在本地K线上并行扫描量化策略参数")
+    parser.add_argument("--strategy", required=True, choices=list(STRATEGY_CATALOG))
+    parser.add_argument("--grid", required=True, help='JSON参数网格, 如 {"ema_fast": [10, 20], "ema_slow": [50, 100]}')
+    parser.add_argument("--symbol", default=settings.trading_pair)
+    parser.add_argument("--timeframe", default="1h")
+    parser.add_argument("--limit", type=int, default=87_600)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--metric", default="sharpe", choices=list(SWEEP_METRICS))
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    db = SessionLocal()
+    try:
+        klines = get_recent_kline_arrays(db=db, symbol=args.symbol, timeframe=args.timeframe, limit=args.limit)
+        result = run_parameter_sweep(db, klines, args.strategy, json.loads(args.grid), workers=args.workers)
+        for item in ranked_sweep_results(db, result.sweep_id, metric=args.metric, limit=args.top):
+            print(json.dumps(item, ensure_ascii=False))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
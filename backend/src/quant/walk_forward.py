@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import itertools
+import math
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from backend.src.config import settings
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.quant.backtest import bars_per_year, performance_stats, signal_codes, simulate_positions, target_positions
+from backend.src.quant.library import STRATEGY_CATALOG, STRATEGY_WEIGHTS
+
+# Market Mind中strategy_weights是乘在信号强度上的系数，决策引擎会把组合系数截断到[0.15, 2]
+MIND_WEIGHT_MAX = 2.0
+
+
+@dataclass(frozen=True)
+class WalkForwardFold:
+    """一个训练/检验窗口：训练窗口上选出的权重及其在随后检验窗口上的样本外表现。"""
+
+    train_start_ms: int
+    train_end_ms: int
+    test_start_ms: int
+    test_end_ms: int
+    weights: dict[str, float]
+    train_sharpe: float
+    oos: dict[str, float]
+    baseline_oos: dict[str, float]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "train_start_ms": self.train_start_ms,
+            "train_end_ms": self.train_end_ms,
+            "test_start_ms": self.test_start_ms,
+            "test_end_ms": self.test_end_ms,
+            "weights": self.weights,
+            "train_sharpe": round(self.train_sharpe, 4),
+            "oos": _rounded(self.oos),
+            "baseline_oos": _rounded(self.baseline_oos),
+        }
+
+
+@dataclass(frozen=True)
+class WalkForwardReport:
+    """
+    滚动优化的结果。
+
+    oos/baseline_oos为把各检验窗口首尾相接后的样本外表现（优化权重 vs 静态STRATEGY_WEIGHTS）；
+    proposed_weights为最近一个训练窗口上的最优权重，patch可直接传给market_mind.update；
+    outperforms_baseline表示优化权重的样本外夏普是否高于静态权重，供调用方决定是否采纳。
+    """
+
+    symbol: str
+    timeframe: str
+    train_bars: int
+    test_bars: int
+    folds: list[WalkForwardFold]
+    oos: dict[str, float]
+    baseline_oos: dict[str, float]
+    proposed_weights: dict[str, float]
+    patch: dict[str, Any]
+    change_summary: str
+
+    @property
+    def outperforms_baseline(self) -> bool:
+        return bool(self.folds) and self.oos["sharpe"] > self.baseline_oos["sharpe"]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "train_bars": self.train_bars,
+            "test_bars": self.test_bars,
+            "folds": [fold.to_dict() for fold in self.folds],
+            "oos": _rounded(self.oos),
+            "baseline_oos": _rounded(self.baseline_oos),
+            "proposed_weights": self.proposed_weights,
+            "outperforms_baseline": self.outperforms_baseline,
+            "patch": self.patch,
+            "change_summary": self.change_summary,
+        }
+
+
+def _rounded(stats: dict[str, float]) -> dict[str, float]:
+    return {key: round(value, 6) for key, value in stats.items()}
+
+
+def strategy_growth_matrix(
+    klines: KlineArrays,
+    strategy_names: list[str],
+    fee_pct: float,
+    slippage_pct: float,
+) -> np.ndarray:
+    """
+    各策略单独持仓时逐根K线的净值增长因子，形状为(K线数, 策略数)。
+
+    指标和信号都只依赖当前及之前的K线，在整段K线上算一次后按窗口切片，与逐窗口重算（并用窗口前的K线预热）
+    结果相同，重叠的训练/检验窗口不再重复计算指标；同一策略的多个指标数组也经cache共享。
+    """
+    cache: dict[Any, Any] = {}
+    columns = []
+    for name in strategy_names:
+        targets = target_positions(signal_codes(klines, name, cache=cache))
+        columns.append(simulate_positions(klines, targets, fee_pct=fee_pct, slippage_pct=slippage_pct)["growth"])
+    return np.column_stack(columns) if columns else np.ones((len(klines), 0))
+
+
+def weight_grid(count: int, step: float = 0.1) -> np.ndarray:
+    """权重单纯形上的网格（每行非负且和为1），形状为(组合数, count)。"""
+    units = max(1, round(1 / step))
+    rows = [combo for combo in itertools.product(range(units + 1), repeat=count) if sum(combo) == units]
+    return np.asarray(rows, dtype=np.float64) / units
+
+
+def _sharpe_columns(returns: np.ndarray) -> np.ndarray:
+    deviation = returns.std(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(deviation > 0, returns.mean(axis=0) / deviation, 0.0)
+
+
+def _optimize(growth: np.ndarray, grid: np.ndarray) -> tuple[np.ndarray, float]:
+    """在训练窗口上选出组合收益夏普最高的权重（每根K线按权重再平衡各策略仓位）。"""
+    portfolio = (growth - 1) @ grid.T
+    sharpe = _sharpe_columns(portfolio)
+    best = int(np.argmax(sharpe))
+    return grid[best], float(sharpe[best])
+
+
+def mind_weight_patch(
+    weights: dict[str, float],
+    reason: str,
+    static_weights: dict[str, float] | None = None,
+) -> dict[str, Any]:
+    """
+    把组合权重转换为Market Mind的strategy_weights补丁。
+
+    决策引擎的有效权重为静态STRATEGY_WEIGHTS乘以Market Mind系数，因此系数取 目标权重/静态权重，
+    并截断到[0, MIND_WEIGHT_MAX]。
+    """
+    static = static_weights or STRATEGY_WEIGHTS
+    total = sum(static.get(name, 0.0) for name in weights) or 1.0
+    entries = {}
+    for name, weight in weights.items():
+        base = static.get(name, 0.0) / total
+        multiplier = weight / base if base > 0 else 1.0
+        entries[name] = {"weight": round(min(MIND_WEIGHT_MAX, max(0.0, multiplier)), 4), "reason": reason}
+    return {"strategy_weights": entries}
+
+
+def run_walk_forward(
+    klines: KlineArrays,
+    train_bars: int = 365,
+    test_bars: int = 90,
+    step_bars: int | None = None,
+    strategy_names: list[str] | None = None,
+    weight_step: float = 0.1,
+    fee_pct: float | None = None,
+    slippage_pct: float | None = None,
+) -> WalkForwardReport:
+    """
+    滚动窗口优化策略权重：每个训练窗口上搜索权重网格，在紧随其后的检验窗口上评估样本外表现。
+
+    窗口每次前移step_bars根（默认等于test_bars，检验窗口互不重叠）。最终建议的权重取最近train_bars根K线上的最优解。
+    K线不足一个训练窗口时抛出ValueError。
+    """
+    names = strategy_names or list(STRATEGY_CATALOG)
+    unknown = [name for name in names if name not in STRATEGY_CATALOG]
+    if unknown:
+        raise ValueError(f"未知的策略: {', '.join(unknown)}")
+    if train_bars <= 1 or test_bars <= 0:
+        raise ValueError("train_bars必须大于1且test_bars必须为正")
+    count = len(klines)
+    if count < train_bars:
+        raise ValueError(f"K线不足: 需要至少{train_bars}根, 实际{count}根")
+
+    fee_pct = settings.trading_fee_pct if fee_pct is None else fee_pct
+    slippage_pct = settings.slippage_pct if slippage_pct is None else slippage_pct
+    step = step_bars or test_bars
+    periods = bars_per_year(klines.timeframe)
+
+    growth = strategy_growth_matrix(klines, names, fee_pct=fee_pct, slippage_pct=slippage_pct)
+    grid = weight_grid(len(names), step=weight_step)
+    static = np.asarray([STRATEGY_WEIGHTS.get(name, 0.0) for name in names])
+    static = static / static.sum() if static.sum() > 0 else np.full(len(names), 1 / len(names))
+
+    folds: list[WalkForwardFold] = []
+    oos_growth: list[np.ndarray] = []
+    baseline_growth: list[np.ndarray] = []
+    open_time = klines.open_time
+    for start in range(0, count - train_bars - test_bars + 1, step):
+        train_end = start + train_bars
+        test_end = train_end + test_bars
+        weights, train_sharpe = _optimize(growth[start:train_end], grid)
+        test = growth[train_end:test_end] - 1
+        fold_growth = 1 + test @ weights
+        fold_baseline = 1 + test @ static
+        oos_growth.append(fold_growth)
+        baseline_growth.append(fold_baseline)
+        folds.append(
+            WalkForwardFold(
+                train_start_ms=int(open_time[start]),
+                train_end_ms=int(open_time[train_end - 1]),
+                test_start_ms=int(open_time[train_end]),
+                test_end_ms=int(open_time[test_end - 1]),
+                weights={name: round(float(value), 4) for name, value in zip(names, weights, strict=True)},
+                train_sharpe=train_sharpe * math.sqrt(periods),
+                oos=performance_stats(fold_growth, periods),
+                baseline_oos=performance_stats(fold_baseline, periods),
+            )
+        )
+
+    oos = performance_stats(np.concatenate(oos_growth) if oos_growth else np.ones(0), periods)
+    baseline_oos = performance_stats(np.concatenate(baseline_growth) if baseline_growth else np.ones(0), periods)
+    latest, _ = _optimize(growth[count - train_bars :], grid)
+    proposed = {name: round(float(value), 4) for name, value in zip(names, latest, strict=True)}
+
+    reason = (
+        f"walk-forward优化: 训练{train_bars}根/检验{test_bars}根{klines.timeframe}K线, {len(folds)}个窗口, "
+        f"样本外夏普{oos['sharpe']:.2f}(静态权重{baseline_oos['sharpe']:.2f})"
+    )
+    return WalkForwardReport(
+        symbol=klines.symbol,
+        timeframe=klines.timeframe,
+        train_bars=train_bars,
+        test_bars=test_bars,
+        folds=folds,
+        oos=oos,
+        baseline_oos=baseline_oos,
+        proposed_weights=proposed,
+        patch=mind_weight_patch(proposed, reason=reason),
+        change_summary=reason,
+    )
@@ -1 +1,7 @@
-from backend.src.trading.paper_engine import execute_decision, get_portfolio_snapshot
+from backend.src.trading.journal import account_state_as_of, equity_curve
+from backend.src.trading.paper_engine import (
+    execute_decision,
+    get_portfolio_snapshot,
+    get_portfolio_snapshot_as_of,
+    load_account_state,
+)
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Any
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from backend.src.config import settings
+from backend.src.db.models import AccountCheckpoint, Trade
+
+# 重放只读取计算账户状态所需的列，避免为每笔交易构造ORM对象
+_TRADE_COLUMNS = (Trade.id, Trade.timestamp, Trade.side, Trade.quantity, Trade.price, Trade.fee, Trade.slippage)
+_REPLAY_BATCH = 10_000
+
+
+@dataclass
+class AccountState:
+    """模拟账户状态快照，由账本读取或遍历历史交易记录重建。"""
+
+    cash: float
+    position_qty: float
+    avg_entry_price: float
+    realized_pnl: float
+    day_realized_pnl: float
+
+
+def initial_account_state() -> AccountState:
+    return AccountState(
+        cash=settings.initial_balance,
+        position_qty=0.0,
+        avg_entry_price=0.0,
+        realized_pnl=0.0,
+        day_realized_pnl=0.0,
+    )
+
+
+def round_account_state(state: AccountState) -> AccountState:
+    return AccountState(
+        cash=round(state.cash, 8),
+        position_qty=round(state.position_qty, 8),
+        avg_entry_price=round(state.avg_entry_price, 8),
+        realized_pnl=round(state.realized_pnl, 8),
+        day_realized_pnl=round(state.day_realized_pnl, 8),
+    )
+
+
+def apply_trade(state: AccountState, trade: Any, today: date) -> None:
+    """
+    把一笔交易计入账户状态（原地修改），当日卖出的盈亏同时计入day_realized_pnl。
+
+    trade可以是Trade对象，也可以是带同名属性的查询结果行。
+    """
+    side = trade.side.lower()
+    quantity = float(trade.quantity)
+    price = float(trade.price)
+    fee = float(trade.fee or 0.0)
+    slippage = float(trade.slippage or 0.0)
+
+    if side == "buy":
+        total_cost = quantity * price + fee + slippage
+        new_qty = state.position_qty + quantity
+        if new_qty > 0:
+            state.avg_entry_price = ((state.avg_entry_price * state.position_qty) + (price * quantity)) / new_qty
+        state.position_qty = new_qty
+        state.cash -= total_cost
+    elif side == "sell":
+        quantity = min(quantity, state.position_qty)
+        proceeds = quantity * price - fee - slippage
+        trade_pnl = (price - state.avg_entry_price) * quantity - fee - slippage
+        state.realized_pnl += trade_pnl
+        state.cash += proceeds
+        state.position_qty -= quantity
+        if state.position_qty <= 1e-12:
+            state.position_qty = 0.0
+            state.avg_entry_price = 0.0
+        if trade.timestamp and trade.timestamp.date() == today:
+            state.day_realized_pnl += trade_pnl
+
+
+@dataclass
+class JournalCursor:
+    """
+    按交易id顺序重放日志的游标。
+
+    state.day_realized_pnl 是 pnl_day 当天（最后一笔交易所在日期）的已实现盈亏，
+    last_price 为最后一笔交易的成交价，用于在没有行情时估算权益。
+    """
+
+    state: AccountState = field(default_factory=initial_account_state)
+    trade_id: int = 0
+    trade_count: int = 0
+    timestamp: datetime | None = None
+    pnl_day: date | None = None
+    last_price: float = 0.0
+
+    def apply(self, trade: Any) -> None:
+        traded_on = trade.timestamp.date() if trade.timestamp else self.pnl_day
+        if traded_on != self.pnl_day:
+            self.state.day_realized_pnl = 0.0
+            self.pnl_day = traded_on
+        apply_trade(self.state, trade, traded_on or date.min)
+        self.trade_id = trade.id
+        self.trade_count += 1
+        self.timestamp = trade.timestamp
+        self.last_price = float(trade.price)
+
+    def equity(self, mark_price: float | None = None) -> float:
+        mark = mark_price if mark_price and mark_price > 0 else self.last_price
+        return self.state.cash + self.state.position_qty * mark
+
+    def day_realized_pnl_on(self, day: date) -> float:
+        return self.state.day_realized_pnl if self.pnl_day == day else 0.0
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint: AccountCheckpoint | None) -> JournalCursor:
+        if checkpoint is None:
+            return cls()
+        return cls(
+            state=AccountState(
+                cash=checkpoint.cash,
+                position_qty=checkpoint.position_qty,
+                avg_entry_price=checkpoint.avg_entry_price,
+                realized_pnl=checkpoint.realized_pnl,
+                day_realized_pnl=checkpoint.day_realized_pnl,
+            ),
+            trade_id=checkpoint.trade_id,
+            trade_count=checkpoint.trade_count,
+            timestamp=checkpoint.trade_timestamp,
+            pnl_day=checkpoint.pnl_day,
+            last_price=checkpoint.last_price,
+        )
+
+    def to_checkpoint(self, symbol: str) -> AccountCheckpoint:
+        return AccountCheckpoint(
+            symbol=symbol,
+            initial_balance=settings.initial_balance,
+            trade_id=self.trade_id,
+            trade_count=self.trade_count,
+            trade_timestamp=self.timestamp,
+            cash=self.state.cash,
+            position_qty=self.state.position_qty,
+            avg_entry_price=self.state.avg_entry_price,
+            realized_pnl=self.state.realized_pnl,
+            day_realized_pnl=self.state.day_realized_pnl,
+            pnl_day=self.pnl_day,
+            last_price=self.last_price,
+        )
+
+
+@event.listens_for(Trade, "before_update")
+def _reject_trade_update(mapper: Any, connection: Any, target: Trade) -> None:
+    raise ValueError("交易日志只允许追加，不能修改已有交易记录")
+
+
+@event.listens_for(Trade, "before_delete")
+def _reject_trade_delete(mapper: Any, connection: Any, target: Trade) -> None:
+    raise ValueError("交易日志只允许追加，不能删除已有交易记录")
+
+
+def latest_checkpoint(db: Session, symbol: str, max_trade_id: int | None = None) -> AccountCheckpoint | None:
+    """返回trade_id不超过max_trade_id的最近检查点（只匹配当前初始资金）。"""
+    statement = select(AccountCheckpoint).where(
+        AccountCheckpoint.symbol == symbol,
+        AccountCheckpoint.initial_balance == settings.initial_balance,
+    )
+    if max_trade_id is not None:
+        statement = statement.where(AccountCheckpoint.trade_id <= max_trade_id)
+    return db.execute(statement.order_by(AccountCheckpoint.trade_id.desc()).limit(1)).scalars().first()
+
+
+def iter_trades(db: Session, symbol: str, after_id: int, until_id: int | None = None) -> Iterable[Any]:
+    """按id顺序分批读取交易日志中id在(after_id, until_id]之间的记录。"""
+    statement = select(*_TRADE_COLUMNS).where(Trade.symbol == symbol, Trade.id > after_id)
+    if until_id is not None:
+        statement = statement.where(Trade.id <= until_id)
+    return db.execute(statement.order_by(Trade.id).execution_options(yield_per=_REPLAY_BATCH))
+
+
+def extend_checkpoints(db: Session, symbol: str, interval: int | None = None) -> int:
+    """
+    从最近的检查点重放到日志末尾，每interval笔交易写入一个检查点，返回新增数量。
+
+    只写入不提交，由调用方和交易记录在同一事务中提交。
+    """
+    interval = max(1, interval or settings.account_checkpoint_interval)
+    cursor = JournalCursor.from_checkpoint(latest_checkpoint(db=db, symbol=symbol))
+    written = 0
+    for row in iter_trades(db=db, symbol=symbol, after_id=cursor.trade_id):
+        cursor.apply(row)
+        if cursor.trade_count % interval == 0:
+            db.add(cursor.to_checkpoint(symbol))
+            written += 1
+    return written
+
+
+def _to_utc_naive(value: datetime) -> datetime:
+    # Trade.timestamp在SQLite中按不带时区的UTC文本存储，比较前统一转换
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def last_trade_id_at(db: Session, symbol: str, at: datetime) -> int:
+    """返回at时刻（含）之前最后一笔交易的id，没有交易时返回0。"""
+    value = db.execute(
+        select(func.max(Trade.id)).where(Trade.symbol == symbol, Trade.timestamp <= _to_utc_naive(at))
+    ).scalar()
+    return int(value or 0)
+
+
+def account_state_as_of(
+    db: Session,
+    symbol: str,
+    trade_id: int | None = None,
+    at: datetime | None = None,
+) -> JournalCursor:
+    """
+    重建应用完trade_id（或at时刻之前最后一笔交易）后的账户状态。
+
+    从不晚于目标的最近检查点开始，只重放两者之间的交易。
+    """
+    if at is not None:
+        trade_id = last_trade_id_at(db=db, symbol=symbol, at=at)
+    cursor = JournalCursor.from_checkpoint(latest_checkpoint(db=db, symbol=symbol, max_trade_id=trade_id))
+    for row in iter_trades(db=db, symbol=symbol, after_id=cursor.trade_id, until_id=trade_id):
+        cursor.apply(row)
+    return cursor
+
+
+def equity_curve(
+    db: Session,
+    symbol: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """
+    按日生成权益曲线，每天取最后一笔交易后的权益（持仓按该笔成交价估值）。
+
+    指定start时从start之前最近的检查点开始重放，不必从第一笔交易算起。
+    """
+    cursor = account_state_as_of(db=db, symbol=symbol, at=start) if start is not None else JournalCursor()
+    until_id = last_trade_id_at(db=db, symbol=symbol, at=end) if end is not None else None
+
+    points: list[dict[str, Any]] = []
+    if cursor.trade_count > 0 and cursor.timestamp is not None:
+        points.append({"date": cursor.timestamp.date().isoformat(), "equity": round(cursor.equity(), 2)})
+    for row in iter_trades(db=db, symbol=symbol, after_id=cursor.trade_id, until_id=until_id):
+        cursor.apply(row)
+        if cursor.timestamp is None:
+            continue
+        day_key = cursor.timestamp.date().isoformat()
+        point = {"date": day_key, "equity": round(cursor.equity(), 2)}
+        if points and points[-1]["date"] == day_key:
+            points[-1] = point
+        else:
+            points.append(point)
+    return points
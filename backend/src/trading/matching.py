@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from backend.src.data.kline_cache import KlineArrays
+
+
+@dataclass(frozen=True)
+class OrderBatch:
+    """
+    一批挂单的列式表示。
+
+    side为+1（买）或-1（卖）；is_stop为True时是止损/突破单，否则是限价单；
+    quantity为剩余未成交数量；只有open_time不早于active_from_ms的K线参与撮合。
+    """
+
+    side: np.ndarray
+    is_stop: np.ndarray
+    price: np.ndarray
+    quantity: np.ndarray
+    active_from_ms: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.price.shape[0])
+
+    @classmethod
+    def from_lists(
+        cls,
+        sides: list[str],
+        order_types: list[str],
+        prices: list[float],
+        quantities: list[float],
+        active_from_ms: list[int] | None = None,
+    ) -> OrderBatch:
+        count = len(prices)
+        return cls(
+            side=np.array([1 if side == "buy" else -1 for side in sides], dtype=np.int8),
+            is_stop=np.array([order_type == "stop" for order_type in order_types], dtype=bool),
+            price=np.asarray(prices, dtype=np.float64),
+            quantity=np.asarray(quantities, dtype=np.float64),
+            active_from_ms=np.asarray(active_from_ms if active_from_ms is not None else [0] * count, dtype=np.int64),
+        )
+
+
+@dataclass(frozen=True)
+class FillMatrix:
+    """撮合结果，quantity/price形状为(订单数, K线数)，未成交处数量为0。"""
+
+    quantity: np.ndarray
+    price: np.ndarray
+
+    def filled(self) -> np.ndarray:
+        return self.quantity.sum(axis=1)
+
+    def average_price(self) -> np.ndarray:
+        """各订单的成交均价，未成交订单为NaN。"""
+        filled = self.filled()
+        notional = (self.quantity * np.nan_to_num(self.price)).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(filled > 0, notional / filled, np.nan)
+
+
+def match_orders(orders: OrderBatch, candles: KlineArrays, participation: float) -> FillMatrix:
+    """
+    按K线的开高低量一次性撮合一批挂单，全部运算在(订单数, K线数)矩阵上完成。
+
+    - 限价买单在low<=价格时成交，成交价min(open, 价格)；限价卖单在high>=价格时成交，成交价max(open, 价格)
+    - 止损买单在high>=价格时触发，止损卖单在low<=价格时触发；触发K线按max/min(open, 价格)成交
+      （跳空时按开盘价，结果更差），触发后剩余数量视为市价单，在后续K线按开盘价继续成交
+    - 每根K线最多成交 volume * participation，累计到订单数量为止；participation<=0表示不限量
+
+    各订单之间相互独立，资金和持仓约束由调用方在按时间顺序入账时处理。
+    """
+    n_orders, n_candles = len(orders), len(candles)
+    if n_orders == 0 or n_candles == 0:
+        empty = np.zeros((n_orders, n_candles), dtype=np.float64)
+        return FillMatrix(quantity=empty, price=np.full_like(empty, np.nan))
+
+    open_ = candles.open[None, :]
+    high = candles.high[None, :]
+    low = candles.low[None, :]
+    price = orders.price[:, None]
+    is_buy = orders.side[:, None] > 0
+    is_stop = orders.is_stop[:, None]
+    # 限价买和止损卖在价格向下触及时生效，其余两类在向上触及时生效
+    triggers_below = is_buy ^ is_stop
+
+    eligible = candles.open_time[None, :] >= orders.active_from_ms[:, None]
+    hit = np.where(triggers_below, low <= price, high >= price) & eligible
+    triggered = np.logical_or.accumulate(hit, axis=1)
+    active = np.where(is_stop, triggered, hit)
+
+    touch_price = np.where(triggers_below, np.minimum(open_, price), np.maximum(open_, price))
+    triggered_before = np.zeros_like(triggered)
+    triggered_before[:, 1:] = triggered[:, :-1]
+    fill_price = np.where(is_stop & triggered_before, open_, touch_price)
+
+    if participation > 0:
+        capacity = np.where(active, candles.volume[None, :] * participation, 0.0)
+    else:
+        capacity = np.where(active, np.inf, 0.0)
+    cumulative = np.minimum(np.cumsum(capacity, axis=1), orders.quantity[:, None])
+    quantity = np.diff(cumulative, axis=1, prepend=0.0)
+    return FillMatrix(quantity=quantity, price=np.where(quantity > 0, fill_price, np.nan))
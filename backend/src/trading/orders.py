@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.src.config import settings
+from backend.src.data.binance_client import datetime_to_ms
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.data.kline_service import get_recent_kline_arrays
+from backend.src.data.resample import parse_timeframe_ms
+from backend.src.db.models import PaperOrder
+from backend.src.trading.matching import OrderBatch, match_orders
+from backend.src.trading.paper_engine import fill_order
+
+logger = logging.getLogger(__name__)
+
+ORDER_SIDES = ("buy", "sell")
+ORDER_TYPES = ("limit", "stop")
+OPEN_STATUSES = ("open", "partially_filled")
+# 挂单只用一个周期撮合，matched_until_ms在不同周期之间没有可比性
+ORDER_MATCH_TIMEFRAME = "1h"
+
+
+def place_order(
+    db: Session,
+    symbol: str,
+    side: str,
+    order_type: str,
+    price: float,
+    quantity: float,
+    decision_id: int | None = None,
+) -> PaperOrder:
+    """挂出一笔限价单或止损单，参数不合法时抛出ValueError。"""
+    side = side.lower()
+    order_type = order_type.lower()
+    if side not in ORDER_SIDES:
+        raise ValueError(f"不支持的订单方向: {side}")
+    if order_type not in ORDER_TYPES:
+        raise ValueError(f"不支持的订单类型: {order_type}")
+    if price <= 0 or quantity <= 0:
+        raise ValueError("订单价格和数量必须大于0")
+
+    order = PaperOrder(
+        symbol=symbol,
+        side=side,
+        order_type=order_type,
+        price=float(price),
+        quantity=float(quantity),
+        filled_qty=0.0,
+        avg_fill_price=0.0,
+        status="open",
+        decision_id=decision_id,
+        matched_until_ms=0,
+        created_at=datetime.now(timezone.utc),
+    )
+    db.add(order)
+    db.commit()
+    db.refresh(order)
+    logger.info("挂单: %s %s %s %.8f @ %.2f", symbol, order_type, side, quantity, price)
+    return order
+
+
+def cancel_order(db: Session, order_id: int, reason: str = "cancelled") -> PaperOrder:
+    """撤销未完成的挂单（已部分成交的部分保留），订单不存在或已结束时抛出ValueError。"""
+    order = db.get(PaperOrder, order_id)
+    if order is None:
+        raise ValueError(f"订单不存在: {order_id}")
+    if order.status not in OPEN_STATUSES:
+        raise ValueError(f"订单已结束: {order_id} ({order.status})")
+    _close(order, status="cancelled", reason=reason)
+    db.commit()
+    return order
+
+
+def list_orders(db: Session, symbol: str, status: str | None = None, limit: int = 50) -> list[PaperOrder]:
+    statement = select(PaperOrder).where(PaperOrder.symbol == symbol)
+    if status == "open":
+        statement = statement.where(PaperOrder.status.in_(OPEN_STATUSES))
+    elif status is not None:
+        statement = statement.where(PaperOrder.status == status)
+    return list(db.execute(statement.order_by(PaperOrder.id.desc()).limit(limit)).scalars())
+
+
+def open_orders(db: Session, symbol: str) -> list[PaperOrder]:
+    return list(
+        db.execute(
+            select(PaperOrder)
+            .where(PaperOrder.symbol == symbol, PaperOrder.status.in_(OPEN_STATUSES))
+            .order_by(PaperOrder.id)
+        ).scalars()
+    )
+
+
+def _close(order: PaperOrder, status: str, reason: str) -> None:
+    order.status = status
+    order.close_reason = reason
+    order.updated_at = datetime.now(timezone.utc)
+
+
+def _closed_candles(candles: KlineArrays, now_ms: int) -> KlineArrays:
+    # 未收盘K线的高低点和成交量还会变化，只撮合已收盘的部分
+    step_ms, _ = parse_timeframe_ms(candles.timeframe)
+    count = int(np.searchsorted(candles.open_time, now_ms - step_ms, side="right"))
+    return replace(
+        candles,
+        open_time=candles.open_time[:count],
+        open=candles.open[:count],
+        high=candles.high[:count],
+        low=candles.low[:count],
+        close=candles.close[:count],
+        volume=candles.volume[:count],
+    )
+
+
+def _order_batch(orders: list[PaperOrder]) -> OrderBatch:
+    return OrderBatch.from_lists(
+        sides=[order.side for order in orders],
+        order_types=[order.order_type for order in orders],
+        prices=[order.price for order in orders],
+        quantities=[max(order.quantity - order.filled_qty, 0.0) for order in orders],
+        active_from_ms=[max(int(order.matched_until_ms or 0) + 1, datetime_to_ms(order.created_at)) for order in orders],
+    )
+
+
+def match_open_orders(
+    db: Session,
+    symbol: str,
+    candles: KlineArrays,
+    now_ms: int | None = None,
+    participation: float | None = None,
+) -> dict[str, Any]:
+    """
+    用已收盘K线撮合该品种全部未完成挂单，按K线时间顺序逐笔入账。
+
+    每根K线的可成交量受ORDER_PARTICIPATION_RATE限制，超出部分留到后续K线；
+    入账时现金或持仓不足会缩减成交量并撤销剩余部分。返回本次的成交明细。
+    """
+    orders = open_orders(db=db, symbol=symbol)
+    result: dict[str, Any] = {"orders": len(orders), "candles": 0, "fills": []}
+    if not orders or len(candles) == 0:
+        return result
+
+    now_ms = now_ms if now_ms is not None else datetime_to_ms(datetime.now(timezone.utc))
+    closed = _closed_candles(candles, now_ms)
+    result["candles"] = len(closed)
+    if len(closed) == 0:
+        return result
+
+    participation = settings.order_participation_rate if participation is None else participation
+    fills = match_orders(_order_batch(orders), closed, participation=participation)
+
+    # 转置后nonzero按(K线, 订单)排序，即先按时间再按下单顺序入账
+    candle_index, order_index = np.nonzero(fills.quantity.T)
+    for candle_pos, order_pos in zip(candle_index.tolist(), order_index.tolist()):
+        order = orders[order_pos]
+        if order.status not in OPEN_STATUSES:
+            continue
+        requested = float(fills.quantity[order_pos, candle_pos])
+        executed = fill_order(
+            db=db,
+            symbol=symbol,
+            side=order.side,
+            quantity=requested,
+            price=float(fills.price[order_pos, candle_pos]),
+            notes=f"{order.order_type}_order#{order.id}",
+            slippage_pct=settings.slippage_pct if order.order_type == "stop" else 0.0,
+            decision_id=order.decision_id,
+        )
+        order.matched_until_ms = int(closed.open_time[candle_pos])
+        if executed is None:
+            _close(order, status="cancelled", reason="insufficient_cash" if order.side == "buy" else "no_position")
+            db.commit()
+            continue
+
+        filled = order.filled_qty + executed["quantity"]
+        order.avg_fill_price = (order.avg_fill_price * order.filled_qty + executed["price"] * executed["quantity"]) / filled
+        order.filled_qty = filled
+        order.updated_at = datetime.now(timezone.utc)
+        if order.quantity - filled <= order.quantity * 1e-9:
+            _close(order, status="filled", reason="")
+        elif executed["quantity"] < requested * (1 - 1e-9):
+            # 资金或持仓不足，保留已成交部分并撤销剩余数量
+            _close(order, status="cancelled", reason="insufficient_cash" if order.side == "buy" else "no_position")
+        else:
+            order.status = "partially_filled"
+        db.commit()
+        result["fills"].append(
+            {
+                "order_id": order.id,
+                "decision_id": order.decision_id,
+                "side": order.side,
+                "order_type": order.order_type,
+                "trade_id": executed["id"],
+                "quantity": round(executed["quantity"], 8),
+                "price": round(executed["price"], 2),
+                "status": order.status,
+                "open_time_ms": int(closed.open_time[candle_pos]),
+            }
+        )
+
+    last_ms = int(closed.open_time[-1])
+    for order in orders:
+        if order.status in OPEN_STATUSES:
+            order.matched_until_ms = max(int(order.matched_until_ms or 0), last_ms)
+    db.commit()
+    return result
+
+
+def match_stored_klines(db: Session, symbol: str, max_bars: int = 1000) -> dict[str, Any]:
+    """用本地已存储的ORDER_MATCH_TIMEFRAME K线撮合未完成挂单，没有挂单时不读取K线。"""
+    if not open_orders(db=db, symbol=symbol):
+        return {"orders": 0, "candles": 0, "fills": []}
+    candles = get_recent_kline_arrays(db=db, symbol=symbol, timeframe=ORDER_MATCH_TIMEFRAME, limit=max_bars)
+    return match_open_orders(db=db, symbol=symbol, candles=candles)
@@ -1,81 +1,178 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime, timezone
+import threading
+from dataclasses import replace
+from datetime import date, datetime, timezone
 from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
 from backend.src.config import settings
-from backend.src.db.models import Trade
+from backend.src.db.models import AccountLedger, Decision, Trade
+from backend.src.trading.journal import (
+    AccountState,
+    JournalCursor,
+    account_state_as_of,
+    apply_trade,
+    extend_checkpoints,
+    latest_checkpoint,
+    round_account_state,
+)
 
 
-@dataclass
-class AccountState:
-    """模拟账户状态快照，通过遍历全部历史交易记录重建。"""
+# 同一进程内按品种串行化“读取账户状态→计算成交数量→写入交易”：
+# 分析周期、止损止盈检查线程、K线推送和API下单共用这把锁，避免基于过期持仓重复平仓或超额买入
+_account_locks: dict[str, threading.RLock] = {}
+_account_locks_guard = threading.Lock()
 
-    cash: float
-    position_qty: float
-    avg_entry_price: float
-    realized_pnl: float
-    day_realized_pnl: float
 
+def account_lock(symbol: str) -> threading.RLock:
+    """品种的账户写锁（可重入），持有期间本进程内没有其他交易写入该品种。"""
+    with _account_locks_guard:
+        return _account_locks.setdefault(symbol, threading.RLock())
 
-def _rebuild_account_state(db: Session, symbol: str) -> AccountState:
+
+def _ledger_state(ledger: AccountLedger, today: date) -> AccountState:
+    return AccountState(
+        cash=ledger.cash,
+        position_qty=ledger.position_qty,
+        avg_entry_price=ledger.avg_entry_price,
+        realized_pnl=ledger.realized_pnl,
+        day_realized_pnl=ledger.day_realized_pnl if ledger.pnl_day == today else 0.0,
+    )
+
+
+def _store_ledger(ledger: AccountLedger, state: AccountState, today: date) -> None:
+    ledger.cash = state.cash
+    ledger.position_qty = state.position_qty
+    ledger.avg_entry_price = state.avg_entry_price
+    ledger.realized_pnl = state.realized_pnl
+    ledger.day_realized_pnl = state.day_realized_pnl
+    ledger.pnl_day = today
+
+
+def _load_ledger(db: Session, symbol: str) -> tuple[AccountLedger, AccountState, bool]:
     """
-    从交易历史记录重建当前账户状态。
+    读取账本并补记尚未计入的交易（id大于last_trade_id），返回(账本, 未取整状态, 是否有变更)。
 
-    遍历该品种的所有交易记录，按时间顺序计算现金余额、持仓数量、
-    均价、已实现盈亏和当日盈亏。
+    交易按追加顺序（id）计入，与检查点和历史时点查询的顺序一致；时间戳早于已计入交易的补录交易
+    同样排在已计入交易之后，而不是按时间戳插回历史中重算。
+
+    账本缺失或初始资金配置变化时，从最近的检查点恢复后只重放其后的交易。
+    账本总是从数据库重新读取，不使用会话中可能已过期的对象。
     """
-    cash = settings.initial_balance
-    position_qty = 0.0
-    avg_entry_price = 0.0
-    realized_pnl = 0.0
-    day_realized_pnl = 0.0
     today = datetime.now(timezone.utc).date()
+    ledger = db.execute(
+        select(AccountLedger).where(AccountLedger.symbol == symbol).execution_options(populate_existing=True)
+    ).scalars().first()
+    changed = False
+    if ledger is None or ledger.initial_balance != settings.initial_balance:
+        cursor = JournalCursor.from_checkpoint(latest_checkpoint(db=db, symbol=symbol))
+        if ledger is None:
+            ledger = AccountLedger(symbol=symbol)
+            db.add(ledger)
+        state = cursor.state
+        state.day_realized_pnl = cursor.day_realized_pnl_on(today)
+        ledger.initial_balance = settings.initial_balance
+        ledger.last_trade_id = cursor.trade_id
+        ledger.trade_count = cursor.trade_count
+        _store_ledger(ledger, state, today)
+        changed = True
+    else:
+        state = _ledger_state(ledger, today)
+        changed = ledger.pnl_day != today
 
-    rows = db.execute(select(Trade).where(Trade.symbol == symbol).order_by(Trade.timestamp.asc(), Trade.id.asc())).scalars().all()
-    for row in rows:
-        side = row.side.lower()
-        quantity = float(row.quantity)
-        price = float(row.price)
-        fee = float(row.fee or 0.0)
-        slippage = float(row.slippage or 0.0)
+    tail = db.execute(
+        select(Trade).where(Trade.symbol == symbol, Trade.id > ledger.last_trade_id).order_by(Trade.id.asc())
+    ).scalars().all()
+    for trade in tail:
+        apply_trade(state, trade, today)
+        ledger.last_trade_id = trade.id
+        ledger.trade_count = (ledger.trade_count or 0) + 1
+    if tail:
+        extend_checkpoints(db=db, symbol=symbol)
+        changed = True
+    if changed:
+        _store_ledger(ledger, state, today)
+    return ledger, state, changed
 
-        if side == "buy":
-            total_cost = quantity * price + fee + slippage
-            new_qty = position_qty + quantity
-            if new_qty > 0:
-                avg_entry_price = ((avg_entry_price * position_qty) + (price * quantity)) / new_qty
-            position_qty = new_qty
-            cash -= total_cost
-        elif side == "sell":
-            quantity = min(quantity, position_qty)
-            proceeds = quantity * price - fee - slippage
-            trade_pnl = (price - avg_entry_price) * quantity - fee - slippage
-            realized_pnl += trade_pnl
-            cash += proceeds
-            position_qty -= quantity
-            if position_qty <= 1e-12:
-                position_qty = 0.0
-                avg_entry_price = 0.0
-            if row.timestamp and row.timestamp.date() == today:
-                day_realized_pnl += trade_pnl
 
-    return AccountState(
-        cash=round(cash, 8),
-        position_qty=round(position_qty, 8),
-        avg_entry_price=round(avg_entry_price, 8),
-        realized_pnl=round(realized_pnl, 8),
-        day_realized_pnl=round(day_realized_pnl, 8),
+def load_account_state(db: Session, symbol: str) -> AccountState:
+    """
+    读取当前账户状态，耗时与历史交易数量无关。
+
+    账本落后于交易表时（例如直接写入的交易记录）先补记再返回，补记结果随即提交。
+    """
+    _, state, changed = _load_ledger(db=db, symbol=symbol)
+    if changed:
+        db.commit()
+    return round_account_state(state)
+
+
+def _claim_ledger(db: Session, symbol: str) -> None:
+    """
+    对账本行执行一次空更新，在读取账本之前取得写锁，直到本事务提交或回滚。
+
+    SQLite上为整个数据库的写锁，其他数据库上为行锁；其他会话（包括其他进程）的交易写入会等待，
+    因此读取的账本和未计入交易在本事务提交前不会再变化，不会出现last_trade_id越过别人交易的情况。
+    """
+    db.execute(
+        update(AccountLedger)
+        .where(AccountLedger.symbol == symbol)
+        .values(last_trade_id=AccountLedger.last_trade_id)
+        .execution_options(synchronize_session=False)
     )
 
 
-def get_portfolio_snapshot(db: Session, symbol: str, mark_price: float | None) -> dict[str, Any]:
-    """获取当前投资组合快照，包括余额、权益、敞口和持仓明细。"""
-    state = _rebuild_account_state(db=db, symbol=symbol)
+def _record_trade(
+    db: Session,
+    symbol: str,
+    side: str,
+    quantity: float,
+    price: float,
+    fee: float,
+    slippage: float,
+    pnl: float,
+    notes: str,
+    decision_id: int | None = None,
+) -> tuple[Trade, AccountState]:
+    """
+    追加一笔交易并在同一事务中更新账本，返回(交易记录, 交易后的账户状态)。
+
+    每累计account_checkpoint_interval笔交易同时写入一个检查点。
+    先取得账本写锁再读取账本，并发写入的交易按提交顺序依次计入。
+    """
+    _claim_ledger(db=db, symbol=symbol)
+    ledger, state, _ = _load_ledger(db=db, symbol=symbol)
+    now = datetime.now(timezone.utc)
+    trade = Trade(
+        timestamp=now,
+        symbol=symbol,
+        side=side,
+        quantity=quantity,
+        price=price,
+        fee=fee,
+        slippage=slippage,
+        pnl=pnl,
+        decision_id=decision_id,
+        notes=notes,
+    )
+    db.add(trade)
+    db.flush()
+
+    apply_trade(state, trade, now.date())
+    ledger.last_trade_id = trade.id
+    ledger.trade_count = (ledger.trade_count or 0) + 1
+    _store_ledger(ledger, state, now.date())
+    if ledger.trade_count % max(1, settings.account_checkpoint_interval) == 0:
+        extend_checkpoints(db=db, symbol=symbol)
+    db.commit()
+    db.refresh(trade)
+    return trade, round_account_state(state)
+
+
+def _snapshot_from_state(state: AccountState, symbol: str, mark_price: float | None) -> dict[str, Any]:
     mark = float(mark_price or 0.0)
     unrealized_pnl = (mark - state.avg_entry_price) * state.position_qty if state.position_qty > 0 and mark > 0 else 0.0
     position_value = state.position_qty * mark if mark > 0 else 0.0
@@ -108,78 +205,195 @@ def get_portfolio_snapshot(db: Session, symbol: str, mark_price: float | None) -
     }
 
 
-def execute_decision(db: Session, decision: dict[str, Any], symbol: str, market_price: float) -> dict[str, Any]:
+def get_portfolio_snapshot(db: Session, symbol: str, mark_price: float | None) -> dict[str, Any]:
+    """获取当前投资组合快照，包括余额、权益、敞口和持仓明细。"""
+    return _snapshot_from_state(load_account_state(db=db, symbol=symbol), symbol=symbol, mark_price=mark_price)
+
+
+def get_portfolio_snapshot_as_of(
+    db: Session,
+    symbol: str,
+    at: datetime | None = None,
+    decision_id: int | None = None,
+    mark_price: float | None = None,
+) -> dict[str, Any]:
     """
-    执行交易决策（模拟交易），根据buy/sell/hold动作创建交易记录。
+    重建历史时间点（或某条决策记录生成时）的投资组合快照。
 
-    包含滑点和手续费模拟，sell时自动平仓全部持仓。
-    返回执行前后的投资组合快照。
+    未指定mark_price时，按决策的入场价或最后一笔交易的成交价估值。
     """
-    action = str(decision.get("decision", "hold")).lower()
-    state = _rebuild_account_state(db=db, symbol=symbol)
-    snapshot = get_portfolio_snapshot(db=db, symbol=symbol, mark_price=market_price)
-    equity = float(snapshot["equity"])
-    executed_trade: dict[str, Any] | None = None
-
-    if action == "buy":
-        position_pct = max(float(decision.get("position_size_pct", 0.0)), 0.0)
-        desired_notional = equity * (position_pct / 100)
-        buy_notional = min(desired_notional, state.cash)
-        execution_price = market_price * (1 + settings.slippage_pct)
-        quantity = buy_notional / execution_price if execution_price > 0 else 0.0
-        if quantity > 0:
-            fee = quantity * execution_price * settings.trading_fee_pct
-            slippage = quantity * market_price * settings.slippage_pct
-            trade = Trade(
-                symbol=symbol,
-                side="buy",
-                quantity=quantity,
-                price=execution_price,
-                fee=fee,
-                slippage=slippage,
-                pnl=0.0,
-                notes="executed_by_paper_engine",
-            )
-            db.add(trade)
-            db.commit()
-            db.refresh(trade)
-            executed_trade = {
-                "id": trade.id,
-                "side": trade.side,
-                "quantity": round(quantity, 8),
-                "price": round(execution_price, 2),
-                "fee": round(fee, 4),
-                "slippage": round(slippage, 4),
-            }
-    elif action == "sell" and state.position_qty > 0:
-        quantity = state.position_qty
-        execution_price = market_price * (1 - settings.slippage_pct)
+    if decision_id is not None:
+        decision = db.get(Decision, decision_id)
+        if decision is None:
+            raise ValueError(f"决策记录不存在: {decision_id}")
+        at = decision.timestamp
+        if mark_price is None and decision.entry_price:
+            mark_price = float(decision.entry_price)
+    at = at or datetime.now(timezone.utc)
+
+    cursor = account_state_as_of(db=db, symbol=symbol, at=at)
+    state = round_account_state(cursor.state)
+    state.day_realized_pnl = round(cursor.day_realized_pnl_on(at.date()), 8)
+    snapshot = _snapshot_from_state(state, symbol=symbol, mark_price=mark_price or cursor.last_price)
+    snapshot["as_of"] = at.isoformat()
+    snapshot["trade_id"] = cursor.trade_id
+    snapshot["trade_count"] = cursor.trade_count
+    return snapshot
+
+
+def _sell_position(
+    db: Session,
+    symbol: str,
+    state: AccountState,
+    market_price: float,
+    notes: str,
+    decision_id: int | None = None,
+) -> tuple[dict[str, Any], AccountState]:
+    """按市场价（含滑点和手续费）卖出全部持仓，返回(成交明细, 交易后的账户状态)。"""
+    quantity = state.position_qty
+    execution_price = market_price * (1 - settings.slippage_pct)
+    fee = quantity * execution_price * settings.trading_fee_pct
+    slippage = quantity * market_price * settings.slippage_pct
+    realized = (execution_price - state.avg_entry_price) * quantity - fee - slippage
+    trade, after_state = _record_trade(
+        db=db,
+        symbol=symbol,
+        side="sell",
+        quantity=quantity,
+        price=execution_price,
+        fee=fee,
+        slippage=slippage,
+        pnl=realized,
+        notes=notes,
+        decision_id=decision_id,
+    )
+    executed = {
+        "id": trade.id,
+        "side": trade.side,
+        "quantity": round(quantity, 8),
+        "price": round(execution_price, 2),
+        "fee": round(fee, 4),
+        "slippage": round(slippage, 4),
+        "realized_pnl": round(realized, 2),
+    }
+    return executed, after_state
+
+
+def close_position(
+    db: Session,
+    symbol: str,
+    market_price: float,
+    notes: str,
+    decision_id: int | None = None,
+) -> dict[str, Any] | None:
+    """
+    平掉全部持仓（止损/止盈触发时使用），没有持仓时返回None。
+
+    会话中尚未提交的修改与交易记录在同一事务中提交。
+    """
+    with account_lock(symbol):
+        state = load_account_state(db=db, symbol=symbol)
+        if state.position_qty <= 0 or market_price <= 0:
+            return None
+        executed, _ = _sell_position(
+            db=db, symbol=symbol, state=state, market_price=market_price, notes=notes, decision_id=decision_id
+        )
+        return executed
+
+
+def fill_order(
+    db: Session,
+    symbol: str,
+    side: str,
+    quantity: float,
+    price: float,
+    notes: str,
+    slippage_pct: float = 0.0,
+    decision_id: int | None = None,
+) -> dict[str, Any] | None:
+    """
+    按撮合价格成交一笔挂单（可以是部分数量），买入受可用现金限制，卖出受持仓限制。
+
+    限价成交不计滑点（slippage_pct=0）；止损单触发后按市价处理，由调用方传入settings.slippage_pct。
+    返回未取整的成交数量和价格，没有可成交数量时返回None。
+    """
+    with account_lock(symbol):
+        state = load_account_state(db=db, symbol=symbol)
+        if side == "buy":
+            execution_price = price * (1 + slippage_pct)
+            unit_cost = execution_price * (1 + settings.trading_fee_pct) + price * slippage_pct
+            quantity = min(quantity, state.cash / unit_cost) if unit_cost > 0 else 0.0
+        else:
+            execution_price = price * (1 - slippage_pct)
+            quantity = min(quantity, state.position_qty)
+        if quantity <= 1e-12:
+            return None
+
         fee = quantity * execution_price * settings.trading_fee_pct
-        slippage = quantity * market_price * settings.slippage_pct
-        realized = (execution_price - state.avg_entry_price) * quantity - fee - slippage
-        trade = Trade(
+        slippage = quantity * price * slippage_pct
+        realized = (execution_price - state.avg_entry_price) * quantity - fee - slippage if side == "sell" else 0.0
+        trade, _ = _record_trade(
+            db=db,
             symbol=symbol,
-            side="sell",
+            side=side,
             quantity=quantity,
             price=execution_price,
             fee=fee,
             slippage=slippage,
             pnl=realized,
-            notes="executed_by_paper_engine",
+            notes=notes,
+            decision_id=decision_id,
         )
-        db.add(trade)
-        db.commit()
-        db.refresh(trade)
-        executed_trade = {
-            "id": trade.id,
-            "side": trade.side,
-            "quantity": round(quantity, 8),
-            "price": round(execution_price, 2),
-            "fee": round(fee, 4),
-            "slippage": round(slippage, 4),
-            "realized_pnl": round(realized, 2),
-        }
-
-    after = get_portfolio_snapshot(db=db, symbol=symbol, mark_price=market_price)
-    return {"executed_trade": executed_trade, "portfolio_before": snapshot, "portfolio_after": after}
+        return {"id": trade.id, "side": side, "quantity": quantity, "price": execution_price, "fee": fee, "realized_pnl": realized}
+
+
+def execute_decision(db: Session, decision: dict[str, Any], symbol: str, market_price: float) -> dict[str, Any]:
+    """
+    执行交易决策（模拟交易），根据buy/sell/hold动作创建交易记录。
+
+    包含滑点和手续费模拟，sell时自动平仓全部持仓。
+    返回执行前后的投资组合快照。
+    """
+    with account_lock(symbol):
+        action = str(decision.get("decision", "hold")).lower()
+        state = load_account_state(db=db, symbol=symbol)
+        snapshot = _snapshot_from_state(state, symbol=symbol, mark_price=market_price)
+        after_state = replace(state)
+        equity = float(snapshot["equity"])
+        executed_trade: dict[str, Any] | None = None
+
+        if action == "buy":
+            position_pct = max(float(decision.get("position_size_pct", 0.0)), 0.0)
+            desired_notional = equity * (position_pct / 100)
+            buy_notional = min(desired_notional, state.cash)
+            execution_price = market_price * (1 + settings.slippage_pct)
+            quantity = buy_notional / execution_price if execution_price > 0 else 0.0
+            if quantity > 0:
+                fee = quantity * execution_price * settings.trading_fee_pct
+                slippage = quantity * market_price * settings.slippage_pct
+                trade, after_state = _record_trade(
+                    db=db,
+                    symbol=symbol,
+                    side="buy",
+                    quantity=quantity,
+                    price=execution_price,
+                    fee=fee,
+                    slippage=slippage,
+                    pnl=0.0,
+                    notes="executed_by_paper_engine",
+                )
+                executed_trade = {
+                    "id": trade.id,
+                    "side": trade.side,
+                    "quantity": round(quantity, 8),
+                    "price": round(execution_price, 2),
+                    "fee": round(fee, 4),
+                    "slippage": round(slippage, 4),
+                }
+        elif action == "sell" and state.position_qty > 0:
+            executed_trade, after_state = _sell_position(
+                db=db, symbol=symbol, state=state, market_price=market_price, notes="executed_by_paper_engine"
+            )
 
+        after = _snapshot_from_state(after_state, symbol=symbol, mark_price=market_price)
+        return {"executed_trade": executed_trade, "portfolio_before": snapshot, "portfolio_after": after}
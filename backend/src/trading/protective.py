@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.src.data.binance_client import BinanceAPIError, BinanceKlineClient, datetime_to_ms, timeframe_to_ms
+from backend.src.data.kline_service import get_live_price
+from backend.src.db.models import Kline, ProtectiveOrder
+from backend.src.trading.paper_engine import close_position
+
+logger = logging.getLogger(__name__)
+
+STOP_LOSS = "stop_loss"
+TAKE_PROFIT = "take_profit"
+
+
+@dataclass(frozen=True)
+class PriceRange:
+    """
+    一段时间内观察到的价格：first/last为首末价格，high/low为区间极值。
+
+    实时成交价的四个价格相同；K线的start_ms为开盘时间，创建时间晚于它的订单
+    不能用这根K线的极值触发（极值可能出现在下单之前），只按last判断。
+    """
+
+    first: float
+    high: float
+    low: float
+    last: float
+    start_ms: int | None = None
+
+    @classmethod
+    def tick(cls, price: float) -> PriceRange:
+        return cls(first=price, high=price, low=price, last=price)
+
+    @classmethod
+    def candle(cls, kline: dict[str, Any]) -> PriceRange:
+        return cls(
+            first=float(kline["open"]),
+            high=float(kline["high"]),
+            low=float(kline["low"]),
+            last=float(kline["close"]),
+            start_ms=datetime_to_ms(kline["open_time"]),
+        )
+
+
+@dataclass(frozen=True)
+class ProtectiveLevel:
+    """订单簿中的一个触发价位。"""
+
+    order_id: int
+    symbol: str
+    kind: str
+    trigger_price: float
+    created_ms: int
+
+    def crossed_by(self, price: float) -> bool:
+        return price <= self.trigger_price if self.kind == STOP_LOSS else price >= self.trigger_price
+
+    def fill_price(self, price_range: PriceRange) -> float:
+        """触发后的成交参考价：区间开头已越过触发价（跳空）时按首价成交，否则按触发价。"""
+        if price_range.start_ms is not None and self.created_ms > price_range.start_ms:
+            return price_range.last
+        if self.crossed_by(price_range.first):
+            return price_range.first
+        return self.trigger_price
+
+
+def _level_from_order(order: ProtectiveOrder) -> ProtectiveLevel:
+    return ProtectiveLevel(
+        order_id=order.id,
+        symbol=order.symbol,
+        kind=order.kind,
+        trigger_price=float(order.trigger_price),
+        created_ms=datetime_to_ms(order.created_at),
+    )
+
+
+class ProtectiveOrderBook:
+    """
+    按价格索引的内存订单簿：每个品种一个止损最大堆和一个止盈最小堆。
+
+    检查新价格时只看堆顶，未越过触发价即返回（O(1)），每个被触发的价位出堆O(log n)；
+    撤销的订单只从_levels中删除，出堆时再惰性丢弃。数据库是唯一的事实来源，进程启动后首次检查时加载。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stops: dict[str, list[tuple[float, int]]] = {}
+        self._targets: dict[str, list[tuple[float, int]]] = {}
+        self._levels: dict[int, ProtectiveLevel] = {}
+        self.loaded = False
+        self.stats = {"checks": 0, "triggered": 0}
+
+    def load(self, db: Session) -> None:
+        orders = db.execute(select(ProtectiveOrder).where(ProtectiveOrder.status == "open")).scalars().all()
+        with self._lock:
+            self._stops.clear()
+            self._targets.clear()
+            self._levels.clear()
+            for order in orders:
+                self._push(_level_from_order(order))
+            self.loaded = True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stops.clear()
+            self._targets.clear()
+            self._levels.clear()
+            self.loaded = False
+            self.stats = {"checks": 0, "triggered": 0}
+
+    def _push(self, level: ProtectiveLevel) -> None:
+        self._levels[level.order_id] = level
+        if level.kind == STOP_LOSS:
+            heapq.heappush(self._stops.setdefault(level.symbol, []), (-level.trigger_price, level.order_id))
+        else:
+            heapq.heappush(self._targets.setdefault(level.symbol, []), (level.trigger_price, level.order_id))
+
+    def add(self, level: ProtectiveLevel) -> None:
+        with self._lock:
+            self._push(level)
+
+    def discard_symbol(self, symbol: str) -> None:
+        with self._lock:
+            self._stops.pop(symbol, None)
+            self._targets.pop(symbol, None)
+            for order_id in [key for key, level in self._levels.items() if level.symbol == symbol]:
+                del self._levels[order_id]
+
+    def _top_crossed(self, symbol: str, price_range: PriceRange) -> bool:
+        stops = self._stops.get(symbol)
+        targets = self._targets.get(symbol)
+        return bool((stops and -stops[0][0] >= price_range.low) or (targets and targets[0][0] <= price_range.high))
+
+    def would_trigger(self, symbol: str, price_range: PriceRange) -> bool:
+        """只比较堆顶，供行情推送的热路径在进入数据库前快速判断；尚未加载时返回True。"""
+        with self._lock:
+            return not self.loaded or self._top_crossed(symbol, price_range)
+
+    def claim(self, symbol: str, price_range: PriceRange) -> list[ProtectiveLevel]:
+        """取出被该价格区间触发的价位（从簿中移除，执行失败时由调用方放回）。"""
+        claimed: list[ProtectiveLevel] = []
+        deferred: list[ProtectiveLevel] = []
+        with self._lock:
+            self.stats["checks"] += 1
+            if not self._top_crossed(symbol, price_range):
+                return claimed
+            for heap, crossed in (
+                (self._stops.get(symbol, []), lambda key: -key >= price_range.low),
+                (self._targets.get(symbol, []), lambda key: key <= price_range.high),
+            ):
+                while heap and crossed(heap[0][0]):
+                    _, order_id = heapq.heappop(heap)
+                    level = self._levels.pop(order_id, None)
+                    if level is None:
+                        continue
+                    eligible = (
+                        price_range.start_ms is None
+                        or level.created_ms <= price_range.start_ms
+                        or level.crossed_by(price_range.last)
+                    )
+                    (claimed if eligible else deferred).append(level)
+            for level in deferred:
+                self._push(level)
+            self.stats["triggered"] += len(claimed)
+        return claimed
+
+    def symbols(self) -> set[str]:
+        with self._lock:
+            return {level.symbol for level in self._levels.values()}
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {"loaded": self.loaded, "open_orders": len(self._levels), **self.stats}
+
+
+protective_book = ProtectiveOrderBook()
+
+
+def ensure_loaded(db: Session) -> None:
+    if not protective_book.loaded:
+        protective_book.load(db)
+
+
+def _close_open_orders(db: Session, symbol: str, status: str, reason: str, exclude_id: int | None = None) -> int:
+    orders = db.execute(
+        select(ProtectiveOrder).where(ProtectiveOrder.symbol == symbol, ProtectiveOrder.status == "open")
+    ).scalars().all()
+    now = datetime.now(timezone.utc)
+    closed = 0
+    for order in orders:
+        if order.id == exclude_id:
+            continue
+        order.status = status
+        order.closed_at = now
+        order.close_reason = reason
+        closed += 1
+    return closed
+
+
+def cancel_protective_orders(db: Session, symbol: str, reason: str, commit: bool = True) -> int:
+    """撤销该品种全部未触发的保护单（例如决策主动卖出后），返回撤销数量。"""
+    cancelled = _close_open_orders(db=db, symbol=symbol, status="cancelled", reason=reason)
+    if commit:
+        db.commit()
+    protective_book.discard_symbol(symbol)
+    return cancelled
+
+
+def place_protective_orders(
+    db: Session,
+    symbol: str,
+    stop_loss: float,
+    take_profit: float,
+    decision_id: int | None = None,
+) -> list[ProtectiveOrder]:
+    """
+    为当前持仓挂出止损/止盈单，替换该品种已有的保护单。
+
+    卖出总是平掉全部持仓，因此新的价位覆盖整个仓位；价格不大于0的一侧不挂单。
+    """
+    ensure_loaded(db)
+    _close_open_orders(db=db, symbol=symbol, status="cancelled", reason="replaced")
+    now = datetime.now(timezone.utc)
+    orders = [
+        ProtectiveOrder(symbol=symbol, kind=kind, trigger_price=float(price), decision_id=decision_id, created_at=now)
+        for kind, price in ((STOP_LOSS, stop_loss), (TAKE_PROFIT, take_profit))
+        if price and price > 0
+    ]
+    db.add_all(orders)
+    db.commit()
+
+    protective_book.discard_symbol(symbol)
+    for order in orders:
+        protective_book.add(_level_from_order(order))
+    if orders:
+        logger.info("保护单已挂出: %s 止损=%.2f 止盈=%.2f", symbol, stop_loss, take_profit)
+    return orders
+
+
+def check_protective_orders(db: Session, symbol: str, price_range: PriceRange) -> dict[str, Any] | None:
+    """
+    用新价格（实时成交价或K线高低点）检查保护单，触发时通过paper_engine平仓。
+
+    同一区间同时越过止损和止盈时按止损处理（无法得知先后，取保守结果）。
+    未触发时返回None，触发时返回订单和成交明细。
+    """
+    ensure_loaded(db)
+    claimed = protective_book.claim(symbol, price_range)
+    if not claimed:
+        return None
+    claimed.sort(key=lambda level: level.kind != STOP_LOSS)
+
+    try:
+        for level in claimed:
+            order = db.get(ProtectiveOrder, level.order_id)
+            if order is None or order.status != "open":
+                continue
+            fill = level.fill_price(price_range)
+            order.status = "triggered"
+            order.closed_at = datetime.now(timezone.utc)
+            order.fill_reference_price = fill
+            order.close_reason = f"{level.kind} @ {level.trigger_price:.2f}"
+            _close_open_orders(db=db, symbol=symbol, status="cancelled", reason="oco", exclude_id=order.id)
+            executed = close_position(
+                db=db,
+                symbol=symbol,
+                market_price=fill,
+                notes=f"protective_{level.kind}#{order.id}",
+                decision_id=order.decision_id,
+            )
+            if executed is None:
+                order.status = "cancelled"
+                order.close_reason = "no_position"
+            else:
+                order.trade_id = executed["id"]
+                logger.info("保护单触发: %s %s 触发价=%.2f 成交参考价=%.2f", symbol, level.kind, level.trigger_price, fill)
+            db.commit()
+            protective_book.discard_symbol(symbol)
+            return {"order_id": order.id, "kind": level.kind, "status": order.status, "trade": executed}
+    except Exception:
+        db.rollback()
+        for level in claimed:
+            protective_book.add(level)
+        raise
+    return None
+
+
+def sweep_protective_orders(db: Session, symbol: str, timeframe: str = "1h") -> dict[str, Any] | None:
+    """用本地已存储的K线按时间顺序补查保护单，覆盖行情推送未运行期间的价格。"""
+    ensure_loaded(db)
+    if symbol not in protective_book.symbols():
+        return None
+    earliest = db.execute(
+        select(ProtectiveOrder.created_at)
+        .where(ProtectiveOrder.symbol == symbol, ProtectiveOrder.status == "open")
+        .order_by(ProtectiveOrder.created_at)
+        .limit(1)
+    ).scalar()
+    if earliest is None:
+        return None
+    if earliest.tzinfo is None:
+        earliest = earliest.replace(tzinfo=timezone.utc)
+    rows = db.execute(
+        select(Kline)
+        .where(
+            Kline.symbol == symbol,
+            Kline.timeframe == timeframe,
+            Kline.open_time >= earliest - timedelta(milliseconds=timeframe_to_ms(timeframe)),
+        )
+        .order_by(Kline.open_time)
+    ).scalars().all()
+    for row in rows:
+        candle = {"open": row.open, "high": row.high, "low": row.low, "close": row.close, "open_time": row.open_time}
+        result = check_protective_orders(db=db, symbol=symbol, price_range=PriceRange.candle(candle))
+        if result is not None:
+            return result
+    return None
+
+
+def poll_protective_orders(db: Session, symbol: str, client: BinanceKlineClient | None = None) -> dict[str, Any] | None:
+    """
+    行情推送未启用时的轮询检查：拉取最近两根1m K线并按高低点检查，再用实时价格（如有）检查。
+
+    没有未触发保护单时不发起请求。
+    """
+    ensure_loaded(db)
+    if symbol not in protective_book.symbols():
+        return None
+    client = client or BinanceKlineClient()
+    try:
+        candles = client.fetch_klines(symbol=symbol, timeframe="1m", limit=2)
+    except BinanceAPIError as exc:
+        logger.warning("保护单轮询获取1m K线失败: %s", exc)
+        candles = []
+    for candle in candles:
+        result = check_protective_orders(db=db, symbol=symbol, price_range=PriceRange.candle(candle))
+        if result is not None:
+            return result
+    live_price = get_live_price(symbol)
+    if live_price is not None:
+        return check_protective_orders(db=db, symbol=symbol, price_range=PriceRange.tick(live_price))
+    return None
+
+
+def list_protective_orders(db: Session, symbol: str, limit: int = 20) -> list[ProtectiveOrder]:
+    return list(
+        db.execute(
+            select(ProtectiveOrder)
+            .where(ProtectiveOrder.symbol == symbol)
+            .order_by(ProtectiveOrder.id.desc())
+            .limit(limit)
+        ).scalars()
+    )
@@ -0,0 +1,105 @@
+"""测试辅助对象。"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.src.data.binance_client import timeframe_to_ms
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.db.models import Trade
+from backend.src.trading.journal import AccountState, apply_trade, initial_account_state, round_account_state
+
+
+class FakeKlineClient:
+    """按startTime/endTime生成连续K线的测试客户端，记录每次请求参数。"""
+
+    def __init__(
+        self,
+        listed_at: datetime = datetime(2024, 1, 1, tzinfo=timezone.utc),
+        now: datetime = datetime(2024, 6, 1, tzinfo=timezone.utc),
+    ) -> None:
+        self.calls: list[dict[str, Any]] = []
+        self.listed_at_ms = int(listed_at.timestamp() * 1000)
+        self.now_ms = int(now.timestamp() * 1000)
+
+    def fetch_klines(
+        self,
+        symbol: str,
+        timeframe: str,
+        limit: int,
+        start_time_ms: int | None = None,
+        end_time_ms: int | None = None,
+    ) -> list[dict[str, Any]]:
+        self.calls.append({"start": start_time_ms, "end": end_time_ms, "limit": limit})
+        step = timeframe_to_ms(timeframe)
+        end = min(int(end_time_ms), self.now_ms) if end_time_ms is not None else self.now_ms
+        if start_time_ms is None:
+            start_time_ms = end - end % step - (limit - 1) * step
+        cursor = max(int(start_time_ms), self.listed_at_ms)
+        if (cursor - self.listed_at_ms) % step:
+            cursor += step - (cursor - self.listed_at_ms) % step
+        rows: list[dict[str, Any]] = []
+        while cursor <= end and len(rows) < limit:
+            price = 3000.0 + len(rows)
+            rows.append(
+                {
+                    "symbol": symbol,
+                    "timeframe": timeframe,
+                    "open_time": datetime.fromtimestamp(cursor / 1000, tz=timezone.utc),
+                    "open": price,
+                    "high": price + 5,
+                    "low": price - 5,
+                    "close": price + 1,
+                    "volume": 10.0,
+                }
+            )
+            cursor += step
+        return rows
+
+
+def random_walk_arrays(
+    seed: int,
+    count: int,
+    timeframe: str = "1d",
+    sigma: float = 0.02,
+    drift: float = 0.0,
+    symbol: str = "ETHUSDT",
+    open_jitter: float = 0.0,
+    flat_at: int | None = None,
+) -> KlineArrays:
+    """
+    从2020-01-01开始的对数随机游走K线，开盘价为上一根收盘价。
+
+    open_jitter给开盘价加上相对扰动（制造跳空）；flat_at起的5根收盘价保持不变（覆盖平盘分支）。
+    """
+    rng = np.random.default_rng(seed)
+    closes = 3000 * np.exp(np.cumsum(rng.normal(drift, sigma, count)))
+    if flat_at is not None and count > flat_at + 5:
+        closes[flat_at : flat_at + 5] = closes[flat_at - 1]
+    opens = np.concatenate([[3000.0], closes[:-1]])[:count]
+    if open_jitter:
+        opens = opens * (1 + rng.normal(0, open_jitter, count))
+    spread = closes * rng.uniform(0.002, 0.03, count)
+    return KlineArrays(
+        symbol=symbol,
+        timeframe=timeframe,
+        open_time=1_577_836_800_000 + np.arange(count, dtype=np.int64) * timeframe_to_ms(timeframe),
+        open=opens,
+        high=np.maximum(opens, closes) + spread,
+        low=np.minimum(opens, closes) - spread,
+        close=closes,
+        volume=np.ones(count),
+    )
+
+
+def replay_account_state(db: Session, symbol: str) -> AccountState:
+    """按追加顺序（id）逐笔重放全部交易得到的账户状态，作为账本和检查点的参照。"""
+    state = initial_account_state()
+    today = datetime.now(timezone.utc).date()
+    for trade in db.execute(select(Trade).where(Trade.symbol == symbol).order_by(Trade.id)).scalars():
+        apply_trade(state, trade, today)
+    return round_account_state(state)
@@ -0,0 +1,169 @@
+"""Binance客户端与连接池单元测试（使用本地HTTP服务）。"""
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.src.data.binance_client import BinanceAPIError, BinanceKlineClient
+from backend.src.data.http_pool import HTTPConnectionPool
+from backend.src.data.rate_limiter import WeightRateLimiter
+
+KLINE_ROWS = [
+    [1704067200000, "3000.0", "3010.0", "2990.0", "3005.0", "12.5", 1704070799999],
+    [1704070800000, "3005.0", "3020.0", "3000.0", "3015.0", "8.0", 1704074399999],
+]
+
+
+class _KlineHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    client_ports: list[int] = []
+    rate_limited_responses = 0
+    body_override: bytes | None = None
+
+    def do_GET(self) -> None:  # noqa: N802
+        type(self).client_ports.append(self.client_address[1])
+        if type(self).rate_limited_responses > 0:
+            type(self).rate_limited_responses -= 1
+            self.send_response(429)
+            self.send_header("Retry-After", "7")
+            self.send_header("X-MBX-USED-WEIGHT-1M", "6100")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = type(self).body_override or json.dumps(KLINE_ROWS).encode("utf-8")
+        self.send_response(200)
+        self.send_header("X-MBX-USED-WEIGHT-1M", "42")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        return
+
+
+@pytest.fixture()
+def kline_server() -> Iterator[str]:
+    _KlineHandler.client_ports = []
+    _KlineHandler.rate_limited_responses = 0
+    _KlineHandler.body_override = None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KlineHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class TestHTTPConnectionPool:
+    """连接池测试。"""
+
+    def test_reuses_keep_alive_connection(self, kline_server: str) -> None:
+        """连续请求应复用同一条TCP连接。"""
+        pool = HTTPConnectionPool(pool_size=2, max_per_host=2)
+        for _ in range(3):
+            response = pool.get(f"{kline_server}/api/v3/klines")
+            assert response.status == 200
+        stats = next(iter(pool.stats().values()))
+        assert stats["created"] == 1
+        assert stats["reused"] == 2
+        assert len(set(_KlineHandler.client_ports)) == 1
+        pool.close()
+
+    def test_decodes_gzip(self, kline_server: str) -> None:
+        """gzip响应应被自动解码。"""
+        pool = HTTPConnectionPool(accept_gzip=True)
+        response = pool.get(f"{kline_server}/api/v3/klines")
+        assert response.header("content-encoding") == "gzip"
+        assert json.loads(response.body) == KLINE_ROWS
+        pool.close()
+
+
+class FakeClock:
+    """可手动推进的时钟，sleep直接推进时间。"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestWeightRateLimiter:
+    """请求权重限流器测试。"""
+
+    def test_waits_when_budget_exhausted(self) -> None:
+        """预算用尽后应等待令牌补充而不是继续发送。"""
+        clock = FakeClock()
+        limiter = WeightRateLimiter(weight_limit=100, window_sec=60, budget_ratio=1.0, clock=clock, sleep=clock.sleep)
+        for _ in range(50):
+            assert limiter.acquire(2) == 0.0
+        waited = limiter.acquire(2)
+        assert waited == pytest.approx(1.2)
+        assert limiter.snapshot()["throttled_requests"] == 1
+
+    def test_server_used_weight_overrides_local_estimate(self) -> None:
+        """服务端报告的已用权重应压低本地可用额度。"""
+        clock = FakeClock()
+        limiter = WeightRateLimiter(weight_limit=1000, budget_ratio=0.5, clock=clock, sleep=clock.sleep)
+        limiter.observe({"x-mbx-used-weight-1m": "450"}, status=200)
+        snapshot = limiter.snapshot()
+        assert snapshot["server_used_weight"] == 450
+        assert snapshot["available_weight"] == 50
+
+    def test_retry_after_blocks_requests(self) -> None:
+        """429响应后在Retry-After到期前不应发送请求。"""
+        clock = FakeClock()
+        limiter = WeightRateLimiter(clock=clock, sleep=clock.sleep)
+        limiter.observe({"retry-after": "30"}, status=429)
+        assert limiter.snapshot()["blocked_for_sec"] == 30
+        limiter.acquire(2)
+        assert clock.now >= 30
+
+
+class TestBinanceKlineClient:
+    """K线客户端解析测试。"""
+
+    def test_fetch_klines_parses_rows(self, kline_server: str) -> None:
+        client = BinanceKlineClient(base_url=kline_server, pool=HTTPConnectionPool())
+        klines = client.fetch_klines(symbol="ethusdt", timeframe="1h", limit=2)
+        assert len(klines) == 2
+        assert klines[0]["symbol"] == "ETHUSDT"
+        assert klines[0]["close"] == 3005.0
+        assert klines[1]["open_time"].hour == 1
+
+    def test_rate_limited_response_honors_retry_after(self, kline_server: str) -> None:
+        """429响应后应按Retry-After暂停，再重试成功。"""
+        _KlineHandler.rate_limited_responses = 1
+        clock = FakeClock()
+        limiter = WeightRateLimiter(clock=clock, sleep=clock.sleep)
+        client = BinanceKlineClient(base_url=kline_server, pool=HTTPConnectionPool(), rate_limiter=limiter)
+        klines = client.fetch_klines(symbol="ETHUSDT", timeframe="1h", limit=2)
+        assert len(klines) == 2
+        assert sum(clock.sleeps) >= 7
+        snapshot = limiter.snapshot()
+        assert snapshot["rate_limited_responses"] == 1
+        assert snapshot["server_used_weight"] == 42
+
+    @pytest.mark.parametrize("body", [b"<html>bad gateway</html>", b'[[1704067200000, "x"]]', b"\xff\xfe"])
+    def test_malformed_payload_raises_api_error(self, kline_server: str, body: bytes) -> None:
+        """无法解析的响应体或K线行统一抛出BinanceAPIError，而不是JSON/数值解析异常。"""
+        _KlineHandler.body_override = body
+        client = BinanceKlineClient(base_url=kline_server, pool=HTTPConnectionPool())
+        with pytest.raises(BinanceAPIError):
+            client.fetch_klines(symbol="ETHUSDT", timeframe="1h", limit=2)
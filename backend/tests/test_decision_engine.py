@@ -1,6 +1,8 @@
 """决策引擎单元测试。"""
 from __future__ import annotations
 
+import numpy as np
+
 from backend.src.ai.decision_engine import (
     DecisionContext,
     _close_series,
@@ -11,6 +13,7 @@ from backend.src.ai.decision_engine import (
     build_prompt,
     generate_decision,
 )
+from backend.src.data.kline_cache import KlineArrays
 
 
 class TestHelpers:
@@ -33,6 +36,11 @@ class TestHelpers:
     def test_close_series_empty(self) -> None:
         assert _close_series([]) == []
 
+    def test_close_series_accepts_columnar_klines(self) -> None:
+        closes = np.array([100.0, 0.0, 200.0])
+        klines = KlineArrays("ETHUSDT", "1d", np.arange(3, dtype=np.int64), closes, closes, closes, closes, closes)
+        assert _close_series(klines) == [100.0, 200.0]
+
     def test_mean_normal(self) -> None:
         assert _mean([10.0, 20.0, 30.0]) == 20.0
 
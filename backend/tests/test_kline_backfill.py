@@ -0,0 +1,68 @@
+"""历史K线分页回填单元测试。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+
+from backend.src.data.backfill import backfill_klines
+from backend.src.db.models import Kline, KlineBackfillCheckpoint
+from backend.tests.helpers import FakeKlineClient
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class TestBackfillKlines:
+    """分页回填与断点续传测试。"""
+
+    def test_walks_windows_of_1000_bars(self, db: Session) -> None:
+        """2500根1h K线应分3个窗口拉取并全部写入。"""
+        client = FakeKlineClient()
+        end = START + timedelta(hours=2499)
+        result = backfill_klines(db=db, symbol="ETHUSDT", timeframe="1h", start=START, end=end, client=client)
+
+        assert result.completed is True
+        assert result.requests == 3
+        assert db.query(Kline).count() == 2500
+        assert all(call["limit"] == 1000 for call in client.calls)
+        assert client.calls[1]["start"] == client.calls[0]["start"] + 1000 * 3_600_000
+
+    def test_resumes_from_checkpoint(self, db: Session) -> None:
+        """中断后再次调用应从检查点继续，而不是重新请求已完成的窗口。"""
+        end = START + timedelta(hours=2499)
+        first_client = FakeKlineClient()
+        first = backfill_klines(
+            db=db, symbol="ETHUSDT", timeframe="1h", start=START, end=end, client=first_client, max_requests=1
+        )
+        assert first.completed is False
+        assert db.query(Kline).count() == 1000
+
+        second_client = FakeKlineClient()
+        second = backfill_klines(db=db, symbol="ETHUSDT", timeframe="1h", start=START, end=end, client=second_client)
+        assert second.completed is True
+        assert second.requests == 2
+        assert second_client.calls[0]["start"] == first.next_start_ms
+        assert db.query(Kline).count() == 2500
+
+        checkpoint = db.query(KlineBackfillCheckpoint).one()
+        assert checkpoint.rows_written == 2500
+
+    def test_completed_backfill_extends_to_new_end(self, db: Session) -> None:
+        """已完成的检查点在终点后移时只拉取新增区间。"""
+        client = FakeKlineClient()
+        backfill_klines(db=db, symbol="ETHUSDT", timeframe="1d", start=START, end=START + timedelta(days=9), client=client)
+        later = backfill_klines(
+            db=db, symbol="ETHUSDT", timeframe="1d", start=START, end=START + timedelta(days=14), client=client
+        )
+        assert later.requests == 1
+        assert client.calls[-1]["start"] == int((START + timedelta(days=10)).timestamp() * 1000)
+        assert db.query(Kline).filter(Kline.timeframe == "1d").count() == 15
+
+    def test_skips_windows_before_listing(self, db: Session) -> None:
+        """上市前的空窗口应被跳过并继续推进游标。"""
+        client = FakeKlineClient(listed_at=START + timedelta(hours=1500))
+        result = backfill_klines(
+            db=db, symbol="ETHUSDT", timeframe="1h", start=START, end=START + timedelta(hours=1999), client=client
+        )
+        assert result.completed is True
+        assert result.requests == 2
+        assert db.query(Kline).count() == 500
@@ -0,0 +1,183 @@
+"""列式K线缓存单元测试。"""
+from __future__ import annotations
+
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.src.data.kline_cache import KlineCache, kline_cache
+from backend.src.data.kline_service import get_recent_kline_arrays, get_recent_klines, upsert_klines
+from backend.src.db.database import Base
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _klines(count: int, offset: int = 0, close_shift: float = 0.0) -> list[dict[str, Any]]:
+    rows: list[dict[str, Any]] = []
+    for index in range(offset, offset + count):
+        price = 3000.0 + index
+        rows.append(
+            {
+                "symbol": "ETHUSDT",
+                "timeframe": "1h",
+                "open_time": START + timedelta(hours=index),
+                "open": price,
+                "high": price + 5,
+                "low": price - 5,
+                "close": price + 1 + close_shift,
+                "volume": 10.0 + index,
+            }
+        )
+    return rows
+
+
+class TestKlineCache:
+    """缓存命中、提交后合并和回滚丢弃测试。"""
+
+    def test_second_read_hits_cache(self, db: Session) -> None:
+        upsert_klines(db=db, klines=_klines(50))
+        before = dict(kline_cache.stats)
+        first = get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="1h", limit=20)
+        second = get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="1h", limit=10)
+
+        assert kline_cache.stats["misses"] == before["misses"] + 1
+        assert kline_cache.stats["hits"] == before["hits"] + 1
+        assert len(first) == 20
+        assert second.close.tolist() == first.close[-10:].tolist()
+
+    def test_records_match_database_order_and_format(self, db: Session) -> None:
+        upsert_klines(db=db, klines=_klines(5))
+        items = get_recent_klines(db=db, symbol="ETHUSDT", timeframe="1h", limit=3)
+        assert [item["open_time"] for item in items] == [
+            (START + timedelta(hours=index)).isoformat() for index in range(2, 5)
+        ]
+        assert items[-1]["close"] == 3005.0
+
+    def test_commit_appends_and_updates_cached_series(self, db: Session) -> None:
+        upsert_klines(db=db, klines=_klines(10))
+        held = get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="1h", limit=10)
+
+        # 覆盖最后一根（未收盘K线更新）并追加两根新K线
+        upsert_klines(db=db, klines=_klines(3, offset=9, close_shift=0.5))
+        latest = get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="1h", limit=12)
+
+        assert len(latest) == 12
+        assert latest.close[-4] == 3009.0
+        assert latest.close[-3] == 3010.5
+        assert latest.close[-1] == 3012.5
+        assert held.close[-1] == 3010.0  # 已发出的视图不受写时复制影响
+
+    def test_rollback_discards_pending_rows(self, db: Session) -> None:
+        upsert_klines(db=db, klines=_klines(5))
+        get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="1h", limit=5)
+
+        upsert_klines(db=db, klines=_klines(1, offset=5), commit=False)
+        db.rollback()
+        cached = get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="1h", limit=10)
+        assert len(cached) == 5
+
+    def test_capacity_trims_oldest_rows(self, db: Session) -> None:
+        cache = KlineCache(capacity=8)
+        upsert_klines(db=db, klines=_klines(6))
+        assert len(cache.get_recent(db=db, symbol="ETHUSDT", timeframe="1h", limit=8)) == 6
+
+        rows = _klines(5, offset=6)
+        upsert_klines(db=db, klines=rows)
+        cache.apply_committed(db.get_bind(), rows)  # type: ignore[arg-type]
+        tail = cache.get_recent(db=db, symbol="ETHUSDT", timeframe="1h", limit=8)
+        assert len(tail) == 8
+        assert tail.close[-1] == 3011.0
+        assert cache.stats["stale"] == 0  # 截断后的缓存仍与数据库一致，不触发重新加载
+
+
+@pytest.fixture()
+def shared_db(tmp_path: Path) -> Iterator[tuple[Session, Session]]:
+    """同一个SQLite文件上的两个引擎：前者供缓存读取，后者模拟回填CLI等其他进程的写入。"""
+    url = f"sqlite:///{tmp_path / 'klines.db'}"
+    reader_engine, writer_engine = create_engine(url), create_engine(url)
+    Base.metadata.create_all(reader_engine)
+    reader, writer = Session(reader_engine), Session(writer_engine)
+    try:
+        yield reader, writer
+    finally:
+        reader.close()
+        writer.close()
+        reader_engine.dispose()
+        writer_engine.dispose()
+
+
+class TestExternalWrites:
+    """其他连接写入的K线在下一次读取时被发现。"""
+
+    def _read(self, cache: KlineCache, db: Session, limit: int = 50) -> list[float]:
+        return cache.get_recent(db=db, symbol="ETHUSDT", timeframe="1h", limit=limit).close.tolist()
+
+    def test_unchanged_database_keeps_hitting(self, shared_db: tuple[Session, Session]) -> None:
+        reader, writer = shared_db
+        cache = KlineCache(capacity=100)
+        upsert_klines(db=writer, klines=_klines(20))
+        self._read(cache, reader)
+        revision = cache.revision(db=reader, symbol="ETHUSDT", timeframe="1h")
+        self._read(cache, reader)
+        assert cache.stats["misses"] == 1 and cache.stats["hits"] == 1 and cache.stats["stale"] == 0
+        assert cache.revision(db=reader, symbol="ETHUSDT", timeframe="1h") == revision
+
+    @pytest.mark.parametrize(
+        "rows",
+        [
+            _klines(3, offset=20),  # 追加
+            [_klines(1, offset=19, close_shift=0.5)[0]],  # 改写最新一根
+        ],
+    )
+    def test_append_or_update_is_detected(self, shared_db: tuple[Session, Session], rows: list[dict[str, Any]]) -> None:
+        reader, writer = shared_db
+        cache = KlineCache(capacity=100)
+        upsert_klines(db=writer, klines=_klines(20))
+        self._read(cache, reader)
+        revision = cache.revision(db=reader, symbol="ETHUSDT", timeframe="1h")
+
+        upsert_klines(db=writer, klines=rows)
+        closes = self._read(cache, reader)
+        assert closes[-1] == rows[-1]["close"]
+        assert cache.stats["stale"] == 1
+        assert cache.revision(db=reader, symbol="ETHUSDT", timeframe="1h") != revision
+
+    def test_gap_fill_is_detected(self, shared_db: tuple[Session, Session]) -> None:
+        reader, writer = shared_db
+        cache = KlineCache(capacity=100)
+        rows = _klines(30)
+        upsert_klines(db=writer, klines=rows[:10] + rows[15:])
+        assert len(self._read(cache, reader)) == 25
+
+        upsert_klines(db=writer, klines=rows[10:15])
+        assert self._read(cache, reader) == [row["close"] for row in rows]
+
+    def test_history_backfill_before_truncated_cache_changes_revision(self, shared_db: tuple[Session, Session]) -> None:
+        """缓存只保留最近capacity根时，更早的历史回填通过最早open_time发现。"""
+        reader, writer = shared_db
+        cache = KlineCache(capacity=8)
+        upsert_klines(db=writer, klines=_klines(20, offset=10))
+        self._read(cache, reader, limit=8)
+        revision = cache.revision(db=reader, symbol="ETHUSDT", timeframe="1h")
+
+        upsert_klines(db=writer, klines=_klines(10))
+        assert cache.revision(db=reader, symbol="ETHUSDT", timeframe="1h") != revision
+        assert len(self._read(cache, reader, limit=8)) == 8
+
+    def test_verify_interval_limits_database_checks(self, shared_db: tuple[Session, Session]) -> None:
+        """核对间隔内直接使用缓存，不为每次读取查询数据库。"""
+        reader, writer = shared_db
+        cache = KlineCache(capacity=100, verify_interval_sec=3600)
+        upsert_klines(db=writer, klines=_klines(20))
+        self._read(cache, reader)
+        upsert_klines(db=writer, klines=_klines(1, offset=20))
+        assert len(self._read(cache, reader)) == 20
+
+        cache.verify_interval_sec = 0
+        assert len(self._read(cache, reader)) == 21
@@ -0,0 +1,110 @@
+"""K线缺口检测与修复单元测试。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.src.data.binance_client import datetime_to_ms
+from backend.src.data.gaps import find_kline_gaps, gap_index, plan_gap_fetches, repair_kline_gaps
+from backend.src.data.kline_service import upsert_klines
+from backend.tests.helpers import FakeKlineClient
+
+START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+HOUR_MS = 3_600_000
+
+
+def _hourly(hours: list[int]) -> list[dict[str, Any]]:
+    return [
+        {
+            "symbol": "ETHUSDT",
+            "timeframe": "1h",
+            "open_time": START + timedelta(hours=hour),
+            "open": 3000.0,
+            "high": 3005.0,
+            "low": 2995.0,
+            "close": 3001.0,
+            "volume": 10.0,
+        }
+        for hour in hours
+    ]
+
+
+class EmptyRangeClient(FakeKlineClient):
+    """模拟交易所在某段时间本身没有K线（例如维护停机）。"""
+
+    def __init__(self, empty_from_ms: int, empty_to_ms: int) -> None:
+        super().__init__(listed_at=START, now=START + timedelta(days=30))
+        self.empty_from_ms = empty_from_ms
+        self.empty_to_ms = empty_to_ms
+
+    def fetch_klines(self, symbol: str, timeframe: str, limit: int, start_time_ms=None, end_time_ms=None):  # type: ignore[no-untyped-def]
+        rows = super().fetch_klines(symbol, timeframe, limit, start_time_ms, end_time_ms)
+        return [row for row in rows if not self.empty_from_ms <= datetime_to_ms(row["open_time"]) <= self.empty_to_ms]
+
+
+@pytest.fixture(autouse=True)
+def _reset_gap_index() -> None:
+    gap_index.reset()
+
+
+class TestFindGaps:
+    """向量化缺口扫描测试。"""
+
+    def test_detects_internal_holes(self, db: Session) -> None:
+        hours = [hour for hour in range(48) if hour not in {5, 6, 7, 30}]
+        upsert_klines(db=db, klines=_hourly(hours))
+
+        gaps = find_kline_gaps(db=db, symbol="ETHUSDT", timeframe="1h")
+        assert [(gap.start_ms, gap.end_ms, gap.missing) for gap in gaps] == [
+            (datetime_to_ms(START) + 5 * HOUR_MS, datetime_to_ms(START) + 7 * HOUR_MS, 3),
+            (datetime_to_ms(START) + 30 * HOUR_MS, datetime_to_ms(START) + 30 * HOUR_MS, 1),
+        ]
+
+    def test_continuous_series_has_no_gaps(self, db: Session) -> None:
+        upsert_klines(db=db, klines=_hourly(list(range(24))))
+        assert find_kline_gaps(db=db, symbol="ETHUSDT", timeframe="1h") == []
+
+    def test_long_gap_split_into_bounded_requests(self, db: Session) -> None:
+        upsert_klines(db=db, klines=_hourly([0, 2501]))
+        gaps = find_kline_gaps(db=db, symbol="ETHUSDT", timeframe="1h")
+        planned = plan_gap_fetches(gaps)
+        assert [request.limit for _, request in planned] == [1000, 1000, 500]
+        assert planned[-1][1].end_time_ms == gaps[0].end_ms
+        assert len(plan_gap_fetches(gaps, max_requests=2)) == 2
+
+
+class TestRepairGaps:
+    """定向区间补拉测试。"""
+
+    def test_repair_fetches_only_missing_ranges(self, db: Session) -> None:
+        hours = [hour for hour in range(48) if hour not in {5, 6, 7, 30}]
+        upsert_klines(db=db, klines=_hourly(hours))
+        client = FakeKlineClient(listed_at=START, now=START + timedelta(days=30))
+
+        result = repair_kline_gaps(db=db, symbol="ETHUSDT", timeframes=["1h"], client=client)  # type: ignore[arg-type]
+        assert result["gaps"] == 2
+        assert result["written"] == 4
+        assert sorted((call["start"], call["end"], call["limit"]) for call in client.calls) == [
+            (datetime_to_ms(START) + 5 * HOUR_MS, datetime_to_ms(START) + 7 * HOUR_MS, 3),
+            (datetime_to_ms(START) + 30 * HOUR_MS, datetime_to_ms(START) + 30 * HOUR_MS, 1),
+        ]
+        assert find_kline_gaps(db=db, symbol="ETHUSDT", timeframe="1h") == []
+
+        snapshot = gap_index.snapshot()
+        assert snapshot["rows_repaired"] == 4
+
+    def test_exchange_outage_marked_unfillable(self, db: Session) -> None:
+        upsert_klines(db=db, klines=_hourly([0, 1, 5, 6]))
+        client = EmptyRangeClient(datetime_to_ms(START) + 2 * HOUR_MS, datetime_to_ms(START) + 4 * HOUR_MS)
+
+        first = repair_kline_gaps(db=db, symbol="ETHUSDT", timeframes=["1h"], client=client)  # type: ignore[arg-type]
+        assert first["gaps"] == 1
+        assert first["written"] == 0
+
+        second = repair_kline_gaps(db=db, symbol="ETHUSDT", timeframes=["1h"], client=client)  # type: ignore[arg-type]
+        assert second["gaps"] == 0
+        assert len(client.calls) == 1
+        assert gap_index.snapshot()["series"]["ETHUSDT 1h"]["unfillable"] == 1
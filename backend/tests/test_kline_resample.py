@@ -0,0 +1,170 @@
+"""K线本地重采样单元测试。"""
+from __future__ import annotations
+
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.src.config import settings
+from backend.src.data import kline_service
+from backend.src.data.binance_client import datetime_to_ms
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.data.kline_service import get_recent_kline_arrays, upsert_klines
+from backend.src.data.resample import (
+    bucket_open_times,
+    fold_limits_into_native,
+    parse_timeframe_ms,
+    resample_klines,
+    resample_tail,
+    select_base_timeframe,
+)
+
+# 2024-01-01 是周一
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _hourly(count: int, offset: int = 0) -> list[dict[str, Any]]:
+    rows: list[dict[str, Any]] = []
+    for index in range(offset, offset + count):
+        price = 3000.0 + (index % 7) * 3 - (index % 5)
+        rows.append(
+            {
+                "symbol": "ETHUSDT",
+                "timeframe": "1h",
+                "open_time": START + timedelta(hours=index),
+                "open": price,
+                "high": price + 4 + index % 3,
+                "low": price - 4 - index % 2,
+                "close": price + 1,
+                "volume": 10.0 + index,
+            }
+        )
+    return rows
+
+
+def _arrays(rows: list[dict[str, Any]]) -> KlineArrays:
+    return KlineArrays(
+        symbol="ETHUSDT",
+        timeframe="1h",
+        open_time=np.array([datetime_to_ms(row["open_time"]) for row in rows], dtype=np.int64),
+        open=np.array([row["open"] for row in rows]),
+        high=np.array([row["high"] for row in rows]),
+        low=np.array([row["low"] for row in rows]),
+        close=np.array([row["close"] for row in rows]),
+        volume=np.array([row["volume"] for row in rows]),
+    )
+
+
+def _naive_resample(rows: list[dict[str, Any]], hours: int) -> list[tuple[Any, ...]]:
+    groups: dict[int, list[dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(datetime_to_ms(row["open_time"]) // (hours * 3_600_000), []).append(row)
+    return [
+        (
+            key * hours * 3_600_000,
+            items[0]["open"],
+            max(item["high"] for item in items),
+            min(item["low"] for item in items),
+            items[-1]["close"],
+            sum(item["volume"] for item in items),
+        )
+        for key, items in sorted(groups.items())
+    ]
+
+
+class TestBucketAlignment:
+    """UTC分桶边界与Binance一致性测试。"""
+
+    def test_intraday_buckets_align_to_utc_midnight(self) -> None:
+        times = np.array([datetime_to_ms(START + timedelta(hours=hour)) for hour in (0, 7, 8, 15, 16, 23)], dtype=np.int64)
+        buckets = bucket_open_times(times, "8h")
+        expected = [START, START, START + timedelta(hours=8), START + timedelta(hours=8), START + timedelta(hours=16), START + timedelta(hours=16)]
+        assert buckets.tolist() == [datetime_to_ms(item) for item in expected]
+
+    def test_weekly_buckets_start_on_monday(self) -> None:
+        wednesday = START + timedelta(days=2, hours=5)
+        sunday_night = START + timedelta(days=6, hours=23)
+        next_monday = START + timedelta(days=7)
+        times = np.array([datetime_to_ms(item) for item in (wednesday, sunday_night, next_monday)], dtype=np.int64)
+        assert bucket_open_times(times, "1w").tolist() == [datetime_to_ms(START)] * 2 + [datetime_to_ms(next_monday)]
+
+    def test_invalid_timeframe_rejected(self) -> None:
+        for value in ("", "1M", "0h", "h4", "4x"):
+            with pytest.raises(ValueError):
+                parse_timeframe_ms(value)
+
+    def test_base_selection_prefers_largest_aligned_native(self) -> None:
+        native = ("1h", "4h", "1d")
+        assert select_base_timeframe("8h", native) == "4h"
+        assert select_base_timeframe("2h", native) == "1h"
+        assert select_base_timeframe("3d", native) == "1d"
+        assert select_base_timeframe("1w", native) == "1d"
+        with pytest.raises(ValueError):
+            select_base_timeframe("30m", native)
+
+
+class TestResampleKlines:
+    """向量化合成结果与逐桶计算一致性测试。"""
+
+    def test_matches_naive_aggregation(self) -> None:
+        rows = _hourly(100)
+        for hours in (2, 4, 8, 24):
+            result = resample_klines(_arrays(rows), f"{hours}h")
+            actual = list(zip(result.open_time.tolist(), result.open, result.high, result.low, result.close, result.volume))
+            assert actual == _naive_resample(rows, hours)
+
+    def test_truncated_tail_drops_incomplete_first_bucket(self) -> None:
+        base = _arrays(_hourly(30, offset=3))
+        result = resample_tail(base, "4h", limit=100, truncated=True)
+        assert result.open_time[0] == datetime_to_ms(START + timedelta(hours=4))
+
+        untruncated = resample_tail(base, "4h", limit=100, truncated=False)
+        assert untruncated.open_time[0] == datetime_to_ms(START)
+
+    def test_fold_limits_moves_derived_timeframes_to_base(self) -> None:
+        folded = fold_limits_into_native({"1h": 200, "4h": 120, "1d": 90}, ("1h",))
+        assert folded == {"1h": 91 * 24}
+        assert fold_limits_into_native({"1h": 200, "1d": 90}, ("1h", "1d")) == {"1h": 200, "1d": 90}
+
+
+@pytest.fixture
+def hourly_only(monkeypatch: pytest.MonkeyPatch) -> None:
+    """只原生存储1h，其余周期全部本地合成。"""
+    monkeypatch.setattr(kline_service, "settings", replace(settings, kline_native_timeframes=("1h",)))
+
+
+@pytest.mark.usefixtures("hourly_only")
+class TestResampledReads:
+    """通过get_recent_kline_arrays读取合成周期。"""
+
+    def test_derived_timeframe_served_from_stored_base(self, db: Session) -> None:
+        rows = _hourly(72)
+        upsert_klines(db=db, klines=rows)
+
+        result = get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="8h", limit=5)
+        expected = _naive_resample(rows, 8)[-5:]
+        assert result.timeframe == "8h"
+        assert list(zip(result.open_time.tolist(), result.open, result.high, result.low, result.close, result.volume)) == expected
+
+    def test_multi_day_buckets_follow_epoch_alignment(self, db: Session) -> None:
+        upsert_klines(db=db, klines=_hourly(50))
+        derived = get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="2d", limit=3)
+
+        # 2d桶从UTC纪元起每两天一桶，2024-01-01落在2023-12-31开始的桶内
+        assert derived.open_time.tolist() == [
+            datetime_to_ms(START - timedelta(days=1)),
+            datetime_to_ms(START + timedelta(days=1)),
+        ]
+        assert derived.volume[0] == pytest.approx(sum(10.0 + index for index in range(24)))
+        assert derived.volume[1] == pytest.approx(sum(10.0 + index for index in range(24, 50)))
+
+    def test_native_timeframe_read_is_not_resampled(self, db: Session) -> None:
+        rows = _hourly(10)
+        upsert_klines(db=db, klines=rows)
+        result = get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="1h", limit=4)
+        assert result.timeframe == "1h"
+        assert result.close.tolist() == [row["close"] for row in rows[-4:]]
@@ -0,0 +1,143 @@
+"""K线存储与同步服务单元测试。"""
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from backend.src.data.binance_client import BinanceAPIError
+from backend.src.data.kline_service import (
+    bulk_upsert_klines,
+    latest_open_time,
+    sync_klines_concurrently,
+)
+from backend.src.db.models import Kline
+from backend.tests.helpers import FakeKlineClient
+
+NOW = datetime(2024, 6, 1, 12, 30, tzinfo=timezone.utc)
+
+
+class TestIncrementalSync:
+    """增量同步测试。"""
+
+    def test_empty_table_uses_fallback_limit(self, db: Session) -> None:
+        """本地无数据时按兜底数量拉取最近K线。"""
+        client = FakeKlineClient(now=NOW)
+        sync_klines_concurrently(db=db, symbols=["ETHUSDT"], limits={"1h": 200}, client=client, now=NOW)
+        assert client.calls[0]["limit"] == 200
+        assert client.calls[0]["start"] is None
+        assert db.query(Kline).count() == 200
+
+    def test_only_requests_missing_tail(self, db: Session) -> None:
+        """已有数据时只从最新open_time开始请求缺失部分和未收盘K线。"""
+        client = FakeKlineClient(now=NOW - timedelta(hours=3))
+        sync_klines_concurrently(db=db, symbols=["ETHUSDT"], limits={"1h": 200}, client=client, now=NOW)
+        last = latest_open_time(db=db, symbol="ETHUSDT", timeframe="1h")
+        assert last is not None
+
+        client.now_ms = int(NOW.timestamp() * 1000)
+        sync_klines_concurrently(db=db, symbols=["ETHUSDT"], limits={"1h": 200}, client=client, now=NOW)
+        tail_call = client.calls[-1]
+        assert tail_call["start"] == int(last.replace(tzinfo=timezone.utc).timestamp() * 1000)
+        assert tail_call["limit"] == 4
+        assert db.query(Kline).count() == 203
+
+
+class SlowKlineClient(FakeKlineClient):
+    """每次请求固定延迟的测试客户端，可指定失败的时间周期。"""
+
+    def __init__(  # type: ignore[no-untyped-def]
+        self, delay_sec: float, failing: set[str] | None = None, crashing: set[str] | None = None, **kwargs
+    ) -> None:
+        super().__init__(**kwargs)
+        self.delay_sec = delay_sec
+        self.failing = failing or set()
+        self.crashing = crashing or set()
+
+    def fetch_klines(self, symbol: str, timeframe: str, limit: int, start_time_ms=None, end_time_ms=None):  # type: ignore[no-untyped-def]
+        time.sleep(self.delay_sec)
+        if timeframe in self.failing:
+            raise BinanceAPIError(f"{timeframe} unavailable")
+        if timeframe in self.crashing:
+            raise ValueError(f"{timeframe} malformed row")
+        return super().fetch_klines(symbol, timeframe, limit, start_time_ms, end_time_ms)
+
+
+class TestSyncKlinesConcurrently:
+    """并发同步测试。"""
+
+    def test_fetches_timeframes_in_parallel(self, db: Session) -> None:
+        """三个时间周期并发拉取，总耗时应接近单个请求耗时。"""
+        client = SlowKlineClient(delay_sec=0.3, now=NOW)
+        started = time.monotonic()
+        result = sync_klines_concurrently(db=db, symbols=["ETHUSDT"], client=client, now=NOW)
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 0.8
+        assert result["errors"] == []
+        assert result["written"]["ETHUSDT"] == {"1h": 200, "4h": 120, "1d": 90}
+        assert db.query(Kline).count() == 410
+
+    def test_failed_timeframe_does_not_block_others(self, db: Session) -> None:
+        """单个时间周期失败时，其他周期仍正常写入。"""
+        client = SlowKlineClient(delay_sec=0.0, failing={"4h"}, now=NOW)
+        result = sync_klines_concurrently(db=db, symbols=["ETHUSDT"], client=client, now=NOW)
+        assert len(result["errors"]) == 1
+        assert "4h" in result["errors"][0]
+        assert set(result["written"]["ETHUSDT"]) == {"1h", "1d"}
+        assert db.query(Kline).filter(Kline.timeframe == "4h").count() == 0
+
+    def test_unexpected_error_is_recorded_per_timeframe(self, db: Session) -> None:
+        """非BinanceAPIError的意外异常同样只记入该周期的错误，已成功的周期照常写入。"""
+        client = SlowKlineClient(delay_sec=0.0, crashing={"1d"}, now=NOW)
+        result = sync_klines_concurrently(db=db, symbols=["ETHUSDT"], client=client, now=NOW)
+        assert len(result["errors"]) == 1
+        assert "1d" in result["errors"][0] and "ValueError" in result["errors"][0]
+        assert set(result["written"]["ETHUSDT"]) == {"1h", "4h"}
+        assert db.query(Kline).filter(Kline.timeframe == "1d").count() == 0
+
+
+def _bars(count: int, close_shift: float = 0.0) -> list[dict]:  # type: ignore[type-arg]
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "symbol": "ETHUSDT",
+            "timeframe": "1h",
+            "open_time": start + timedelta(hours=index),
+            "open": 100.0 + index,
+            "high": 105.0 + index,
+            "low": 95.0 + index,
+            "close": 101.0 + index + close_shift,
+            "volume": 1.0,
+        }
+        for index in range(count)
+    ]
+
+
+class TestBulkUpsertKlines:
+    """分块批量写入与变化检测测试。"""
+
+    def test_large_batch_exceeds_sqlite_variable_limit(self, db: Session) -> None:
+        """单批数万行不会触发SQLite参数上限。"""
+        stats = bulk_upsert_klines(db=db, klines=_bars(40_000))
+        assert (stats.inserted, stats.updated, stats.unchanged) == (40_000, 0, 0)
+        assert db.query(Kline).count() == 40_000
+
+    def test_identical_rows_are_not_rewritten(self, db: Session) -> None:
+        """重复写入相同OHLCV时全部计为未变化，只有变化的行被更新。"""
+        bulk_upsert_klines(db=db, klines=_bars(100))
+        rows = _bars(102)
+        rows[50]["close"] += 3.0
+
+        stats = bulk_upsert_klines(db=db, klines=rows)
+        assert (stats.inserted, stats.updated, stats.unchanged) == (2, 1, 99)
+        stored = db.query(Kline).filter(Kline.open_time == rows[50]["open_time"]).one()
+        assert stored.close == rows[50]["close"]
+
+    def test_duplicate_input_rows_keep_last(self, db: Session) -> None:
+        rows = _bars(3)
+        rows.append({**rows[1], "close": 999.0})
+        stats = bulk_upsert_klines(db=db, klines=rows)
+        assert stats.inserted == 3
+        assert db.query(Kline).filter(Kline.close == 999.0).count() == 1
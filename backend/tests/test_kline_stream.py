@@ -0,0 +1,124 @@
+"""K线推送流采集测试，使用本地websocket服务回放录制的K线消息。"""
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.src.data import kline_service
+from backend.src.data.kline_stream import KlineStreamIngestor, parse_kline_event
+from backend.src.db.database import Base
+from backend.src.db.models import Kline
+from backend.tests.helpers import FakeKlineClient
+
+websockets = pytest.importorskip("websockets")
+
+NOW = datetime(2024, 6, 1, 11, 30, tzinfo=timezone.utc)
+OPEN_MS = int(datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _event(open_ms: int, close: str, closed: bool) -> str:
+    return json.dumps(
+        {
+            "stream": "ethusdt@kline_1h",
+            "data": {
+                "e": "kline",
+                "s": "ETHUSDT",
+                "k": {"t": open_ms, "i": "1h", "o": "3000.0", "h": "3050.0", "l": "2990.0", "c": close, "v": "15.2", "x": closed},
+            },
+        }
+    )
+
+
+# 录制的推送片段：同一根1h K线的两次未收盘更新、收盘消息，以及下一根K线的首条更新
+RECORDED_EVENTS = [
+    _event(OPEN_MS, "3010.0", False),
+    _event(OPEN_MS, "3020.0", False),
+    _event(OPEN_MS, "3025.5", True),
+    _event(OPEN_MS + 3_600_000, "3026.0", False),
+]
+
+
+@pytest.fixture()
+def session_factory():  # type: ignore[no-untyped-def]
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    try:
+        yield sessionmaker(bind=engine)
+    finally:
+        engine.dispose()
+        kline_service._live_prices.clear()
+
+
+class TestParseKlineEvent:
+    def test_parses_combined_stream_payload(self) -> None:
+        kline, closed = parse_kline_event(json.loads(RECORDED_EVENTS[2]))  # type: ignore[misc]
+        assert closed is True
+        assert kline["symbol"] == "ETHUSDT"
+        assert kline["close"] == 3025.5
+        assert kline["open_time"] == datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+    def test_ignores_non_kline_messages(self) -> None:
+        assert parse_kline_event({"result": None, "id": 1}) is None
+
+
+class TestKlineStreamIngestor:
+    def test_replays_stream_and_catches_up_after_reconnect(self, session_factory) -> None:  # type: ignore[no-untyped-def]
+        """只有收盘K线落库，未收盘K线保留在内存，断线重连后再次REST补齐。"""
+
+        async def scenario() -> KlineStreamIngestor:
+            connections = 0
+
+            async def handler(connection) -> None:  # type: ignore[no-untyped-def]
+                nonlocal connections
+                connections += 1
+                if connections == 1:
+                    for event in RECORDED_EVENTS:
+                        await connection.send(event)
+                    return
+                await connection.wait_closed()
+
+            async with websockets.serve(handler, "127.0.0.1", 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                ingestor = KlineStreamIngestor(
+                    symbol="ETHUSDT",
+                    timeframes=["1h"],
+                    ws_base_url=f"ws://127.0.0.1:{port}",
+                    session_factory=session_factory,
+                    client=FakeKlineClient(now=NOW),
+                    reconnect_delay_sec=0.05,
+                )
+                task = asyncio.create_task(ingestor.run())
+                for _ in range(100):
+                    if ingestor.stats["catch_ups"] >= 2:
+                        break
+                    await asyncio.sleep(0.05)
+                ingestor.stop()
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                return ingestor
+
+        ingestor = asyncio.run(scenario())
+
+        assert ingestor.stats["connections"] >= 2
+        assert ingestor.stats["catch_ups"] >= 2
+        assert ingestor.stats["closed_written"] == 1
+        assert ingestor.live_candles["1h"]["close"] == 3026.0
+
+        db = session_factory()
+        try:
+            closed_row = db.query(Kline).filter(Kline.timeframe == "1h", Kline.close == 3025.5).one()
+            assert closed_row.high == 3050.0
+            assert kline_service.latest_price_from_db(db=db, symbol="ETHUSDT") == 3026.0
+        finally:
+            db.close()
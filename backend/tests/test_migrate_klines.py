@@ -0,0 +1,136 @@
+"""klines表整数主键迁移单元测试。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.src.data.kline_service import get_recent_kline_arrays, upsert_klines
+from backend.src.db.database import Base
+from backend.src.db.migrate_klines import migrate_klines, needs_migration
+from backend.src.db.models import Kline
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+LEGACY_SCHEMA = [
+    """
+    CREATE TABLE klines (
+        id INTEGER NOT NULL PRIMARY KEY,
+        symbol VARCHAR(24) NOT NULL,
+        timeframe VARCHAR(8) NOT NULL,
+        open_time DATETIME NOT NULL,
+        open FLOAT NOT NULL,
+        high FLOAT NOT NULL,
+        low FLOAT NOT NULL,
+        close FLOAT NOT NULL,
+        volume FLOAT NOT NULL,
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL,
+        CONSTRAINT uq_klines_symbol_tf_time UNIQUE (symbol, timeframe, open_time)
+    )
+    """,
+    "CREATE INDEX ix_klines_symbol ON klines (symbol)",
+    "CREATE INDEX ix_klines_timeframe ON klines (timeframe)",
+    "CREATE INDEX ix_klines_open_time ON klines (open_time)",
+]
+
+
+def _legacy_engine(rows: int):  # type: ignore[no-untyped-def]
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.execute(text(statement))
+        for index in range(rows):
+            open_time = (START + timedelta(hours=index)).strftime("%Y-%m-%d %H:%M:%S.%f")
+            connection.execute(
+                text(
+                    "INSERT INTO klines (symbol, timeframe, open_time, open, high, low, close, volume) "
+                    "VALUES ('ETHUSDT', '1h', :open_time, :price, :price + 5, :price - 5, :price + 1, 10)"
+                ),
+                {"open_time": open_time, "price": 3000.0 + index},
+            )
+    return engine
+
+
+class TestMigrateKlines:
+    """旧版文本时间表迁移测试。"""
+
+    def test_migrates_rows_to_epoch_ms_primary_key(self) -> None:
+        engine = _legacy_engine(rows=48)
+        assert needs_migration(engine)
+
+        result = migrate_klines(engine)
+        assert result["migrated"] and result["rows"] == 48
+        assert not needs_migration(engine)
+        assert inspect(engine).get_pk_constraint("klines")["constrained_columns"] == ["symbol", "timeframe", "open_time"]
+
+        with engine.connect() as connection:
+            raw = connection.execute(text("SELECT open_time FROM klines ORDER BY open_time LIMIT 1")).scalar_one()
+        assert raw == int(START.timestamp() * 1000)
+
+        session = sessionmaker(bind=engine)()
+        try:
+            latest = session.query(Kline).order_by(Kline.open_time.desc()).first()
+            assert latest is not None
+            assert latest.open_time == START + timedelta(hours=47)
+            assert latest.close == 3048.0
+        finally:
+            session.close()
+            engine.dispose()
+
+    def test_migration_is_idempotent(self) -> None:
+        engine = _legacy_engine(rows=3)
+        migrate_klines(engine)
+        assert migrate_klines(engine) == {"migrated": False, "reason": "already up to date"}
+        engine.dispose()
+
+    def test_new_schema_needs_no_migration(self) -> None:
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        assert not needs_migration(engine)
+        engine.dispose()
+
+
+class TestKlineQueryPlans:
+    """最近N根和区间查询应走主键索引，不需要临时排序。"""
+
+    def test_recent_and_range_queries_use_primary_key(self, db: Session) -> None:
+        plans = [
+            db.execute(
+                text(
+                    "EXPLAIN QUERY PLAN SELECT open_time, close FROM klines "
+                    "WHERE symbol = 'ETHUSDT' AND timeframe = '1h' ORDER BY open_time DESC LIMIT 200"
+                )
+            ).all(),
+            db.execute(
+                text(
+                    "EXPLAIN QUERY PLAN SELECT open_time, close FROM klines "
+                    "WHERE symbol = 'ETHUSDT' AND timeframe = '1h' AND open_time BETWEEN 0 AND 1000"
+                )
+            ).all(),
+        ]
+        for plan in plans:
+            detail = " ".join(str(row[-1]) for row in plan)
+            assert "PRIMARY KEY" in detail
+            assert "TEMP B-TREE" not in detail
+
+    def test_roundtrip_returns_utc_datetimes(self, db: Session) -> None:
+        upsert_klines(
+            db=db,
+            klines=[
+                {
+                    "symbol": "ETHUSDT",
+                    "timeframe": "1h",
+                    "open_time": datetime(2024, 5, 1, 8),
+                    "open": 1.0,
+                    "high": 2.0,
+                    "low": 0.5,
+                    "close": 1.5,
+                    "volume": 3.0,
+                }
+            ],
+        )
+        row = db.query(Kline).one()
+        assert row.open_time == datetime(2024, 5, 1, 8, tzinfo=timezone.utc)
+        arrays = get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="1h", limit=1)
+        assert arrays.open_time.tolist() == [int(row.open_time.timestamp() * 1000)]
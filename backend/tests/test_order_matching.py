@@ -0,0 +1,160 @@
+"""限价/止损挂单撮合单元测试。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.db.models import PaperOrder, Trade
+from backend.src.trading.matching import OrderBatch, match_orders
+from backend.src.trading.orders import cancel_order, match_open_orders, place_order
+from backend.src.trading.paper_engine import execute_decision, load_account_state
+
+HOUR_MS = 3_600_000
+
+
+def _candles(rows: list[tuple[float, float, float, float, float]], start_ms: int = 0) -> KlineArrays:
+    data = np.asarray(rows, dtype=np.float64).reshape(-1, 5)
+    return KlineArrays(
+        symbol="ETHUSDT",
+        timeframe="1h",
+        open_time=start_ms + np.arange(data.shape[0], dtype=np.int64) * HOUR_MS,
+        open=data[:, 0],
+        high=data[:, 1],
+        low=data[:, 2],
+        close=data[:, 3],
+        volume=data[:, 4],
+    )
+
+
+def _reference_fills(orders: OrderBatch, candles: KlineArrays, participation: float) -> np.ndarray:
+    """逐根K线逐笔订单的朴素实现，用于核对向量化结果。"""
+    result = np.zeros((len(orders), len(candles)))
+    for i in range(len(orders)):
+        remaining = orders.quantity[i]
+        triggered = False
+        for j in range(len(candles)):
+            if candles.open_time[j] < orders.active_from_ms[i] or remaining <= 0:
+                continue
+            below = (orders.side[i] > 0) != bool(orders.is_stop[i])
+            hit = candles.low[j] <= orders.price[i] if below else candles.high[j] >= orders.price[i]
+            triggered = triggered or hit
+            if not (triggered if orders.is_stop[i] else hit):
+                continue
+            capacity = candles.volume[j] * participation if participation > 0 else remaining
+            result[i, j] = min(capacity, remaining)
+            remaining -= result[i, j]
+    return result
+
+
+class TestMatchOrders:
+    """向量化撮合测试。"""
+
+    def test_limit_buy_fills_on_touch_with_participation_cap(self) -> None:
+        candles = _candles([(3000, 3010, 2990, 3000, 10), (2990, 2995, 2940, 2950, 10), (2930, 2960, 2920, 2950, 10)])
+        orders = OrderBatch.from_lists(["buy"], ["limit"], [2950.0], [1.5])
+
+        fills = match_orders(orders, candles, participation=0.1)
+        assert fills.quantity[0].tolist() == pytest.approx([0.0, 1.0, 0.5])
+        # 第三根跳空低开，按开盘价成交
+        assert fills.price[0, 1:].tolist() == [2950.0, 2930.0]
+        assert fills.filled()[0] == pytest.approx(1.5)
+        assert fills.average_price()[0] == pytest.approx((2950.0 + 0.5 * 2930.0) / 1.5)
+
+    def test_stop_becomes_market_after_trigger(self) -> None:
+        candles = _candles([(3000, 3040, 2990, 3030, 5), (3060, 3100, 3050, 3090, 5), (3090, 3095, 3000, 3010, 5)])
+        orders = OrderBatch.from_lists(["buy", "sell"], ["stop", "stop"], [3050.0, 2950.0], [1.0, 1.0])
+
+        fills = match_orders(orders, candles, participation=0.1)
+        # 买入止损在第二根触发（跳空高开按开盘价），之后即使价格回落仍按开盘价继续成交
+        assert fills.quantity[0].tolist() == pytest.approx([0.0, 0.5, 0.5])
+        assert fills.price[0, 1:].tolist() == [3060.0, 3090.0]
+        assert fills.filled()[1] == 0.0
+
+    def test_active_from_excludes_earlier_candles(self) -> None:
+        candles = _candles([(3000, 3010, 2900, 3000, 10)] * 3)
+        orders = OrderBatch.from_lists(["buy"], ["limit"], [2950.0], [5.0], active_from_ms=[HOUR_MS])
+        fills = match_orders(orders, candles, participation=0.0)
+        assert fills.quantity[0].tolist() == [0.0, 5.0, 0.0]
+
+    def test_matches_naive_reference_on_random_batch(self) -> None:
+        rng = np.random.default_rng(7)
+        closes = 3000 + np.cumsum(rng.normal(0, 15, 500))
+        opens = np.concatenate([[3000.0], closes[:-1]]) + rng.normal(0, 3, 500)
+        highs = np.maximum(opens, closes) + rng.uniform(0, 20, 500)
+        lows = np.minimum(opens, closes) - rng.uniform(0, 20, 500)
+        candles = _candles(list(zip(opens, highs, lows, closes, rng.uniform(1, 50, 500))))
+        n = 300
+        orders = OrderBatch(
+            side=rng.choice(np.array([1, -1], dtype=np.int8), n),
+            is_stop=rng.random(n) < 0.5,
+            price=3000 + rng.normal(0, 80, n),
+            quantity=rng.uniform(0.5, 20, n),
+            active_from_ms=rng.integers(0, 400, n) * HOUR_MS,
+        )
+
+        fills = match_orders(orders, candles, participation=0.05)
+        np.testing.assert_allclose(fills.quantity, _reference_fills(orders, candles, 0.05), atol=1e-9)
+        assert np.all(fills.filled() <= orders.quantity + 1e-9)
+
+
+class TestPaperOrders:
+    """挂单入账测试。"""
+
+    def test_rejects_invalid_orders(self, db: Session) -> None:
+        with pytest.raises(ValueError):
+            place_order(db=db, symbol="ETHUSDT", side="buy", order_type="iceberg", price=3000.0, quantity=1.0)
+        with pytest.raises(ValueError):
+            place_order(db=db, symbol="ETHUSDT", side="buy", order_type="limit", price=3000.0, quantity=0.0)
+
+    def test_partial_fills_accumulate_across_runs(self, db: Session) -> None:
+        order = place_order(db=db, symbol="ETHUSDT", side="buy", order_type="limit", price=2950.0, quantity=1.5)
+        start_ms = int((datetime.now(timezone.utc) + timedelta(hours=1)).timestamp() * 1000)
+        candles = _candles([(2990, 2995, 2940, 2950, 10), (2960, 2970, 2945, 2950, 10), (2950, 2955, 2900, 2920, 10)], start_ms)
+
+        first = match_open_orders(db=db, symbol="ETHUSDT", candles=candles, now_ms=start_ms + HOUR_MS, participation=0.1)
+        assert len(first["fills"]) == 1 and first["candles"] == 1
+        db.refresh(order)
+        assert order.status == "partially_filled" and order.filled_qty == pytest.approx(1.0)
+
+        # 再次撮合同一批K线不会重复成交，剩余数量在第二根成交
+        match_open_orders(db=db, symbol="ETHUSDT", candles=candles, now_ms=start_ms + 3 * HOUR_MS, participation=0.1)
+        db.refresh(order)
+        assert order.status == "filled" and order.filled_qty == pytest.approx(1.5)
+        assert order.avg_fill_price == pytest.approx(2950.0)
+        assert db.query(Trade).filter(Trade.notes == f"limit_order#{order.id}").count() == 2
+        assert load_account_state(db=db, symbol="ETHUSDT").position_qty == pytest.approx(1.5)
+
+    def test_insufficient_cash_cancels_remainder(self, db: Session) -> None:
+        order = place_order(db=db, symbol="ETHUSDT", side="buy", order_type="limit", price=3000.0, quantity=10.0)
+        start_ms = int((datetime.now(timezone.utc) + timedelta(hours=1)).timestamp() * 1000)
+        candles = _candles([(3000, 3010, 2990, 3000, 1000)], start_ms)
+
+        match_open_orders(db=db, symbol="ETHUSDT", candles=candles, now_ms=start_ms + HOUR_MS, participation=0.1)
+        db.refresh(order)
+        assert order.status == "cancelled" and order.close_reason == "insufficient_cash"
+        assert 0 < order.filled_qty < 10.0
+        assert load_account_state(db=db, symbol="ETHUSDT").cash == pytest.approx(0.0, abs=1e-6)
+
+    def test_sell_stop_closes_position_with_slippage(self, db: Session) -> None:
+        execute_decision(db=db, decision={"decision": "buy", "position_size_pct": 10}, symbol="ETHUSDT", market_price=3000.0)
+        quantity = load_account_state(db=db, symbol="ETHUSDT").position_qty
+        order = place_order(db=db, symbol="ETHUSDT", side="sell", order_type="stop", price=2900.0, quantity=quantity)
+        start_ms = int((datetime.now(timezone.utc) + timedelta(hours=1)).timestamp() * 1000)
+        candles = _candles([(2950, 2960, 2880, 2890, 1000)], start_ms)
+
+        match_open_orders(db=db, symbol="ETHUSDT", candles=candles, now_ms=start_ms + HOUR_MS)
+        db.refresh(order)
+        assert order.status == "filled"
+        assert order.avg_fill_price == pytest.approx(2900.0 * (1 - 0.0005))
+        assert load_account_state(db=db, symbol="ETHUSDT").position_qty == 0.0
+
+    def test_cancel_order(self, db: Session) -> None:
+        order = place_order(db=db, symbol="ETHUSDT", side="buy", order_type="limit", price=2900.0, quantity=1.0)
+        cancel_order(db=db, order_id=order.id)
+        assert db.get(PaperOrder, order.id).status == "cancelled"
+        with pytest.raises(ValueError):
+            cancel_order(db=db, order_id=order.id)
@@ -1,20 +1,32 @@
 """模拟交易引擎单元测试。"""
 from __future__ import annotations
 
-from datetime import datetime, timezone
+import threading
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
 
+import pytest
+from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 
-from backend.src.db.models import Trade
+from backend.src.db.database import Base
+from backend.src.db.models import AccountLedger, Trade
+from backend.src.trading import paper_engine
 from backend.src.trading.paper_engine import (
     AccountState,
-    _rebuild_account_state,
+    close_position,
     execute_decision,
     get_portfolio_snapshot,
+    load_account_state,
 )
+from backend.tests.helpers import replay_account_state
 
 
-def _add_trade(db: Session, side: str, quantity: float, price: float, pnl: float = 0.0) -> Trade:
+def _add_trade(
+    db: Session, side: str, quantity: float, price: float, pnl: float = 0.0, timestamp: datetime | None = None
+) -> Trade:
     """向测试数据库添加一笔交易记录。"""
     trade = Trade(
         symbol="ETHUSDT",
@@ -25,7 +37,7 @@ def _add_trade(db: Session, side: str, quantity: float, price: float, pnl: float
         slippage=0.005,
         pnl=pnl,
         notes="test_trade",
-        timestamp=datetime.now(timezone.utc),
+        timestamp=timestamp or datetime.now(timezone.utc),
     )
     db.add(trade)
     db.commit()
@@ -33,12 +45,26 @@ def _add_trade(db: Session, side: str, quantity: float, price: float, pnl: float
     return trade
 
 
-class TestRebuildAccountState:
-    """账户状态重建测试。"""
+@pytest.fixture()
+def two_sessions(tmp_path: Path) -> Iterator[tuple[Session, Session]]:
+    """同一个SQLite文件上的两个独立会话，模拟并发的两个写入方（分析周期、止损检查线程、API等）。"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'trades.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    first, second = Session(engine), Session(engine)
+    try:
+        yield first, second
+    finally:
+        first.close()
+        second.close()
+        engine.dispose()
+
+
+class TestLoadAccountState:
+    """账户状态读取测试。"""
 
     def test_empty_account(self, db: Session) -> None:
         """无交易记录时应返回初始余额。"""
-        state = _rebuild_account_state(db=db, symbol="ETHUSDT")
+        state = load_account_state(db=db, symbol="ETHUSDT")
         assert state.cash > 0
         assert state.position_qty == 0.0
         assert state.realized_pnl == 0.0
@@ -46,7 +72,7 @@ class TestRebuildAccountState:
     def test_single_buy(self, db: Session) -> None:
         """单笔买入后应持有仓位。"""
         _add_trade(db, "buy", quantity=1.0, price=3000.0)
-        state = _rebuild_account_state(db=db, symbol="ETHUSDT")
+        state = load_account_state(db=db, symbol="ETHUSDT")
         assert state.position_qty > 0
         assert state.cash < 10000.0  # 初始余额
 
@@ -54,7 +80,7 @@ class TestRebuildAccountState:
         """买入后全部卖出，仓位应归零。"""
         _add_trade(db, "buy", quantity=1.0, price=3000.0)
         _add_trade(db, "sell", quantity=1.0, price=3100.0, pnl=100.0)
-        state = _rebuild_account_state(db=db, symbol="ETHUSDT")
+        state = load_account_state(db=db, symbol="ETHUSDT")
         assert state.position_qty == 0.0
         assert state.realized_pnl > 0
 
@@ -140,3 +166,132 @@ class TestExecuteDecision:
         )
         assert "portfolio_before" in result
         assert "portfolio_after" in result
+
+
+class TestAccountLedger:
+    """物化账本与全量重放一致性测试。"""
+
+    def test_ledger_matches_full_replay(self, db: Session) -> None:
+        """经由执行引擎和直接写入的交易混合后，账本状态与全量重放一致。"""
+        _add_trade(db, "buy", quantity=0.5, price=3000.0)
+        execute_decision(db=db, decision={"decision": "buy", "position_size_pct": 15.0}, symbol="ETHUSDT", market_price=3100.0)
+        _add_trade(db, "buy", quantity=0.2, price=3050.0)
+        execute_decision(db=db, decision={"decision": "sell"}, symbol="ETHUSDT", market_price=3300.0)
+        execute_decision(db=db, decision={"decision": "buy", "position_size_pct": 5.0}, symbol="ETHUSDT", market_price=3200.0)
+
+        ledger_state = load_account_state(db=db, symbol="ETHUSDT")
+        replayed = replay_account_state(db=db, symbol="ETHUSDT")
+        for field in ("cash", "position_qty", "avg_entry_price", "realized_pnl", "day_realized_pnl"):
+            assert getattr(ledger_state, field) == pytest.approx(getattr(replayed, field), abs=1e-6)
+
+    def test_backdated_trade_is_applied_in_append_order(self, db: Session) -> None:
+        """补录的交易即使时间戳更早，也按写入顺序（id）排在已有交易之后计入。"""
+        _add_trade(db, "buy", quantity=1.0, price=3000.0)
+        _add_trade(db, "sell", quantity=1.0, price=3100.0)
+        load_account_state(db=db, symbol="ETHUSDT")
+        _add_trade(db, "buy", quantity=1.0, price=2000.0, timestamp=datetime.now(timezone.utc) - timedelta(days=1))
+
+        state = load_account_state(db=db, symbol="ETHUSDT")
+        assert state.position_qty == 1.0
+        assert state.avg_entry_price == 2000.0
+        assert state.realized_pnl == pytest.approx(100.0 - 0.015)
+        assert state == replay_account_state(db=db, symbol="ETHUSDT")
+
+    def test_trade_and_ledger_written_together(self, db: Session) -> None:
+        """执行引擎写入交易时账本在同一次提交中推进到该交易。"""
+        result = execute_decision(
+            db=db,
+            decision={"decision": "buy", "position_size_pct": 10.0},
+            symbol="ETHUSDT",
+            market_price=3000.0,
+        )
+        ledger = db.query(AccountLedger).filter(AccountLedger.symbol == "ETHUSDT").one()
+        assert ledger.last_trade_id == result["executed_trade"]["id"]
+        assert ledger.trade_count == 1
+        assert result["portfolio_after"]["positions"][0]["quantity"] == result["executed_trade"]["quantity"]
+
+    def test_reads_only_replay_new_trades(self, db: Session) -> None:
+        """账本追平后，后续读取只补记新增的交易。"""
+        for _ in range(5):
+            _add_trade(db, "buy", quantity=0.1, price=3000.0)
+        load_account_state(db=db, symbol="ETHUSDT")
+        ledger = db.query(AccountLedger).filter(AccountLedger.symbol == "ETHUSDT").one()
+        assert ledger.trade_count == 5
+
+        latest = _add_trade(db, "sell", quantity=0.5, price=3100.0)
+        state = load_account_state(db=db, symbol="ETHUSDT")
+        db.refresh(ledger)
+        assert ledger.last_trade_id == latest.id
+        assert ledger.trade_count == 6
+        assert state.position_qty == 0.0
+
+    def test_concurrent_writers_do_not_skip_trades(
+        self, two_sessions: tuple[Session, Session], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """一个会话读取账本后、写入前，另一个会话的交易不能插进来被跳过。"""
+        first, second = two_sessions
+        load_account_state(db=first, symbol="ETHUSDT")
+        load_ledger = paper_engine._load_ledger
+        first_loaded, second_done = threading.Event(), threading.Event()
+
+        def paused_load_ledger(db: Session, symbol: str) -> Any:
+            result = load_ledger(db=db, symbol=symbol)
+            if db is first:
+                # 读取账本后停下，给另一个会话插入交易的机会（修复前它会在这期间提交）
+                first_loaded.set()
+                second_done.wait(timeout=0.5)
+            return result
+
+        monkeypatch.setattr(paper_engine, "_load_ledger", paused_load_ledger)
+        trade = {"symbol": "ETHUSDT", "side": "buy", "quantity": 1.0, "price": 3000.0, "fee": 0.0, "slippage": 0.0, "pnl": 0.0}
+
+        def second_writer() -> None:
+            first_loaded.wait(timeout=5)
+            paper_engine._record_trade(db=second, notes="second", **trade)
+            second_done.set()
+
+        thread = threading.Thread(target=second_writer)
+        thread.start()
+        paper_engine._record_trade(db=first, notes="first", **trade)
+        thread.join(timeout=10)
+
+        monkeypatch.setattr(paper_engine, "_load_ledger", load_ledger)
+        state = load_account_state(db=first, symbol="ETHUSDT")
+        assert state == replay_account_state(db=first, symbol="ETHUSDT")
+        assert state.position_qty == 2.0
+        assert first.query(AccountLedger).one().trade_count == 2
+
+    def test_concurrent_close_sells_position_once(
+        self, two_sessions: tuple[Session, Session], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """分析周期卖出与保护单平仓同时发生时，只有一方按当时的持仓成交，不会重复卖出。"""
+        first, second = two_sessions
+        _add_trade(first, "buy", quantity=1.0, price=3000.0)
+        read_state = paper_engine.load_account_state
+        first_read, second_done = threading.Event(), threading.Event()
+
+        def paused_read(db: Session, symbol: str) -> AccountState:
+            state = read_state(db=db, symbol=symbol)
+            if db is first and not first_read.is_set():
+                first_read.set()
+                second_done.wait(timeout=0.5)
+            return state
+
+        monkeypatch.setattr(paper_engine, "load_account_state", paused_read)
+        closes: list[Any] = []
+
+        def protective_close() -> None:
+            first_read.wait(timeout=5)
+            closes.append(close_position(db=second, symbol="ETHUSDT", market_price=2900.0, notes="protective_stop_loss"))
+            second_done.set()
+
+        thread = threading.Thread(target=protective_close)
+        thread.start()
+        result = execute_decision(db=first, decision={"decision": "sell"}, symbol="ETHUSDT", market_price=3100.0)
+        thread.join(timeout=10)
+
+        monkeypatch.setattr(paper_engine, "load_account_state", read_state)
+        assert result["executed_trade"] is not None
+        assert closes == [None]
+        assert first.query(Trade).filter(Trade.side == "sell").count() == 1
+        assert load_account_state(db=first, symbol="ETHUSDT").position_qty == 0.0
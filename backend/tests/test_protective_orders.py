@@ -0,0 +1,175 @@
+"""止损/止盈保护单单元测试。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.src.data.kline_service import upsert_klines
+from backend.src.db.models import ProtectiveOrder, Trade
+from backend.src.trading.paper_engine import execute_decision, load_account_state
+from backend.src.trading.protective import (
+    STOP_LOSS,
+    TAKE_PROFIT,
+    PriceRange,
+    ProtectiveLevel,
+    ProtectiveOrderBook,
+    check_protective_orders,
+    place_protective_orders,
+    poll_protective_orders,
+    protective_book,
+    sweep_protective_orders,
+)
+from backend.tests.helpers import FakeKlineClient
+
+
+@pytest.fixture(autouse=True)
+def reset_book():  # type: ignore[no-untyped-def]
+    protective_book.reset()
+    yield
+    protective_book.reset()
+
+
+def _open_long(db: Session, price: float = 3000.0) -> None:
+    execute_decision(db=db, decision={"decision": "buy", "position_size_pct": 10}, symbol="ETHUSDT", market_price=price)
+
+
+def _level(order_id: int, kind: str, price: float, created_ms: int = 0) -> ProtectiveLevel:
+    return ProtectiveLevel(order_id=order_id, symbol="ETHUSDT", kind=kind, trigger_price=price, created_ms=created_ms)
+
+
+class TestProtectiveOrderBook:
+    """内存订单簿测试。"""
+
+    def test_claims_only_crossed_levels(self) -> None:
+        book = ProtectiveOrderBook()
+        book.loaded = True
+        for order_id, price in enumerate([2800.0, 2900.0, 2950.0], start=1):
+            book.add(_level(order_id, STOP_LOSS, price))
+        book.add(_level(4, TAKE_PROFIT, 3300.0))
+
+        assert not book.would_trigger("ETHUSDT", PriceRange.tick(2960.0))
+        assert book.claim("ETHUSDT", PriceRange.tick(2960.0)) == []
+        claimed = book.claim("ETHUSDT", PriceRange.tick(2890.0))
+        assert [level.order_id for level in claimed] == [3, 2]
+        assert book.snapshot()["open_orders"] == 2
+        assert [level.order_id for level in book.claim("ETHUSDT", PriceRange.tick(3300.0))] == [4]
+
+    def test_discarded_symbol_is_skipped(self) -> None:
+        book = ProtectiveOrderBook()
+        book.loaded = True
+        book.add(_level(1, STOP_LOSS, 2900.0))
+        book.discard_symbol("ETHUSDT")
+        assert book.claim("ETHUSDT", PriceRange.tick(2000.0)) == []
+
+    def test_candle_extremes_ignored_for_orders_placed_mid_bar(self) -> None:
+        book = ProtectiveOrderBook()
+        book.loaded = True
+        book.add(_level(1, STOP_LOSS, 2900.0, created_ms=5_000))
+        candle = PriceRange(first=3000.0, high=3010.0, low=2880.0, last=2990.0, start_ms=1_000)
+        assert book.claim("ETHUSDT", candle) == []
+        # 被推回簿中，之后的价格仍可触发
+        assert [level.order_id for level in book.claim("ETHUSDT", PriceRange.tick(2899.0))] == [1]
+
+    def test_fill_price_handles_gaps(self) -> None:
+        stop = _level(1, STOP_LOSS, 2900.0)
+        target = _level(2, TAKE_PROFIT, 3300.0)
+        assert stop.fill_price(PriceRange(first=2950.0, high=2960.0, low=2850.0, last=2870.0, start_ms=0)) == 2900.0
+        assert stop.fill_price(PriceRange(first=2850.0, high=2860.0, low=2800.0, last=2820.0, start_ms=0)) == 2850.0
+        assert target.fill_price(PriceRange(first=3350.0, high=3400.0, low=3340.0, last=3390.0, start_ms=0)) == 3350.0
+
+
+class TestProtectiveExecution:
+    """保护单触发后通过模拟交易引擎平仓。"""
+
+    def test_stop_loss_closes_position_and_cancels_target(self, db: Session) -> None:
+        _open_long(db)
+        orders = place_protective_orders(db=db, symbol="ETHUSDT", stop_loss=2900.0, take_profit=3300.0)
+        assert len(orders) == 2
+
+        assert check_protective_orders(db=db, symbol="ETHUSDT", price_range=PriceRange.tick(2950.0)) is None
+        result = check_protective_orders(db=db, symbol="ETHUSDT", price_range=PriceRange.tick(2890.0))
+
+        assert result is not None and result["kind"] == STOP_LOSS and result["status"] == "triggered"
+        assert load_account_state(db=db, symbol="ETHUSDT").position_qty == 0.0
+        sell = db.query(Trade).filter(Trade.side == "sell").one()
+        assert sell.notes == f"protective_stop_loss#{result['order_id']}"
+        assert {row.kind: row.status for row in db.query(ProtectiveOrder)} == {STOP_LOSS: "triggered", TAKE_PROFIT: "cancelled"}
+        assert check_protective_orders(db=db, symbol="ETHUSDT", price_range=PriceRange.tick(3500.0)) is None
+
+    def test_both_sides_in_one_bar_prefers_stop(self, db: Session) -> None:
+        _open_long(db)
+        place_protective_orders(db=db, symbol="ETHUSDT", stop_loss=2900.0, take_profit=3100.0)
+        order_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        candle = PriceRange(first=3000.0, high=3150.0, low=2850.0, last=3000.0, start_ms=order_ms + 60_000)
+
+        result = check_protective_orders(db=db, symbol="ETHUSDT", price_range=candle)
+        assert result is not None and result["kind"] == STOP_LOSS
+
+    def test_replacing_orders_keeps_only_latest(self, db: Session) -> None:
+        _open_long(db)
+        place_protective_orders(db=db, symbol="ETHUSDT", stop_loss=2900.0, take_profit=3300.0)
+        place_protective_orders(db=db, symbol="ETHUSDT", stop_loss=2950.0, take_profit=0.0)
+
+        assert db.query(ProtectiveOrder).filter(ProtectiveOrder.status == "open").count() == 1
+        assert check_protective_orders(db=db, symbol="ETHUSDT", price_range=PriceRange.tick(3400.0)) is None
+        assert check_protective_orders(db=db, symbol="ETHUSDT", price_range=PriceRange.tick(2940.0)) is not None
+
+    def test_without_position_order_is_cancelled(self, db: Session) -> None:
+        place_protective_orders(db=db, symbol="ETHUSDT", stop_loss=2900.0, take_profit=3300.0)
+        result = check_protective_orders(db=db, symbol="ETHUSDT", price_range=PriceRange.tick(2800.0))
+        assert result is not None and result["status"] == "cancelled" and result["trade"] is None
+        assert db.query(Trade).count() == 0
+
+    def test_book_reloads_open_orders_from_database(self, db: Session) -> None:
+        _open_long(db)
+        place_protective_orders(db=db, symbol="ETHUSDT", stop_loss=2900.0, take_profit=3300.0)
+        protective_book.reset()
+
+        result = check_protective_orders(db=db, symbol="ETHUSDT", price_range=PriceRange.tick(3310.0))
+        assert result is not None and result["kind"] == TAKE_PROFIT
+
+
+class TestProtectiveSweeps:
+    """周期补查与轮询测试。"""
+
+    def test_sweep_uses_stored_candles_after_order(self, db: Session) -> None:
+        _open_long(db)
+        place_protective_orders(db=db, symbol="ETHUSDT", stop_loss=2900.0, take_profit=3300.0)
+        start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        upsert_klines(
+            db=db,
+            klines=[
+                {
+                    "symbol": "ETHUSDT",
+                    "timeframe": "1h",
+                    "open_time": start + timedelta(hours=index),
+                    "open": 3000.0,
+                    "high": high,
+                    "low": 2950.0,
+                    "close": 3000.0,
+                    "volume": 1.0,
+                }
+                for index, high in enumerate([3400.0, 3100.0, 3320.0])
+            ],
+        )
+
+        # 第一根K线在下单前已开盘，其最高价不触发；第三根触及止盈
+        result = sweep_protective_orders(db=db, symbol="ETHUSDT")
+        assert result is not None and result["kind"] == TAKE_PROFIT
+        assert db.query(Trade).filter(Trade.side == "sell").one().price == pytest.approx(3300.0 * (1 - 0.0005))
+
+    def test_poll_skips_network_without_orders(self, db: Session) -> None:
+        client = FakeKlineClient()
+        assert poll_protective_orders(db=db, symbol="ETHUSDT", client=client) is None
+        assert client.calls == []
+
+    def test_poll_checks_recent_minute_candles(self, db: Session) -> None:
+        _open_long(db)
+        place_protective_orders(db=db, symbol="ETHUSDT", stop_loss=3100.0, take_profit=3500.0)
+        client = FakeKlineClient()
+
+        result = poll_protective_orders(db=db, symbol="ETHUSDT", client=client)
+        assert result is not None and result["kind"] == STOP_LOSS
+        assert client.calls[0]["limit"] == 2
@@ -0,0 +1,114 @@
+"""向量化回测引擎测试。"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+from ta.trend import ADXIndicator
+
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.quant.backtest import (
+    run_backtest,
+    run_backtests,
+    simulate_positions,
+    summarize_backtest,
+    target_positions,
+)
+from backend.src.quant.library import STRATEGY_CATALOG, wilder_adx
+from backend.tests.helpers import random_walk_arrays
+
+
+def _fixed(opens: list[float], closes: list[float]) -> KlineArrays:
+    count = len(opens)
+    return KlineArrays(
+        symbol="ETHUSDT",
+        timeframe="1h",
+        open_time=np.arange(count, dtype=np.int64) * 3_600_000,
+        open=np.array(opens, dtype=np.float64),
+        high=np.array(opens, dtype=np.float64) * 1.01,
+        low=np.array(opens, dtype=np.float64) * 0.99,
+        close=np.array(closes, dtype=np.float64),
+        volume=np.ones(count),
+    )
+
+
+class TestKernels:
+    """回测依赖的数组算子。"""
+
+    def test_wilder_adx_matches_ta(self) -> None:
+        klines = random_walk_arrays(1, 600, "1h", sigma=0.01, open_jitter=0.001)
+        expected = ADXIndicator(
+            high=pd.Series(klines.high), low=pd.Series(klines.low), close=pd.Series(klines.close), window=14
+        ).adx()
+        assert np.allclose(wilder_adx(klines.high, klines.low, klines.close, 14), expected.to_numpy(), atol=1e-9)
+
+    def test_short_history_adx_is_zero(self) -> None:
+        klines = random_walk_arrays(2, 20, "1h", sigma=0.01, open_jitter=0.001)
+        assert not wilder_adx(klines.high, klines.low, klines.close, 14).any()
+
+    def test_target_positions_forward_fill_last_signal(self) -> None:
+        codes = np.array([0, 1, 0, 0, -1, 0, 1], dtype=np.int8)
+        assert target_positions(codes).tolist() == [0, 1, 1, 1, 0, 0, 1]
+        assert target_positions(codes, allow_short=True).tolist() == [0, 1, 1, 1, -1, -1, 1]
+
+
+class TestSimulation:
+    """仓位模拟：收盘信号、下一根开盘成交、按换手扣成本。"""
+
+    def test_next_open_execution_with_costs(self) -> None:
+        klines = _fixed(opens=[100, 100, 110, 121], closes=[100, 110, 121, 133.1])
+        result = simulate_positions(klines, np.array([1.0, 1.0, 0.0, 0.0]), fee_pct=0.01, slippage_pct=0.0)
+        # 第0根收盘买入信号 -> 第1根开盘买入（扣1%），持有两个区间后在第3根开盘卖出（再扣1%）
+        assert np.allclose(result["equity"], [1.0, 0.99 * 1.1, 0.99 * 1.21, 0.99 * 1.21 * 0.99])
+        assert result["turnover"].sum() == 2
+
+    def test_always_long_without_costs_matches_buy_and_hold(self) -> None:
+        klines = random_walk_arrays(3, 500, "1h", sigma=0.01, open_jitter=0.001)
+        result = simulate_positions(klines, np.ones(500), fee_pct=0.0, slippage_pct=0.0)
+        assert result["equity"][-1] == pytest.approx(klines.close[-1] / klines.open[1])
+
+    def test_win_rate_counts_closed_trades(self) -> None:
+        klines = _fixed(opens=[100, 100, 110, 110, 100, 100], closes=[100, 110, 110, 100, 100, 100])
+        targets = np.array([1.0, 0.0, 1.0, 0.0, 0.0, 0.0])
+        result = summarize_backtest(klines, "ema_adx_daily", targets, fee_pct=0.0, slippage_pct=0.0)
+        assert result.trades == 2
+        assert result.win_rate == 0.5
+
+
+class TestRunBacktest:
+    """策略回测入口。"""
+
+    def test_all_strategies_produce_reports(self) -> None:
+        klines = random_walk_arrays(4, 3000, "1h", sigma=0.01, open_jitter=0.001)
+        results = run_backtests(klines, fee_pct=0.001, slippage_pct=0.0005)
+        assert [result.strategy_name for result in results] == list(STRATEGY_CATALOG)
+        for result in results:
+            assert result.bars == 3000
+            assert result.equity.shape == (3000,)
+            assert 0 <= result.max_drawdown <= 1
+            assert 0 <= result.exposure <= 1
+            payload = result.to_dict(equity_points=50)
+            assert len(payload["equity_curve"]) == 50
+            assert payload["equity_curve"][-1]["open_time_ms"] == result.end_ms
+
+    @pytest.mark.parametrize("strategy_name", list(STRATEGY_CATALOG))
+    def test_equity_uses_no_future_bars(self, strategy_name: str) -> None:
+        klines = random_walk_arrays(5, 400, "1h", sigma=0.01, open_jitter=0.001)
+        full = run_backtest(klines, strategy_name, fee_pct=0.001, slippage_pct=0.0)
+        prefix = KlineArrays(
+            symbol=klines.symbol,
+            timeframe=klines.timeframe,
+            **{name: getattr(klines, name)[:300] for name in ("open_time", "open", "high", "low", "close", "volume")},
+        )
+        partial = run_backtest(prefix, strategy_name, fee_pct=0.001, slippage_pct=0.0)
+        # 前缀最后一根按收盘价估值，之前的净值应与全量回测完全一致
+        assert np.allclose(partial.equity[:-1], full.equity[:299])
+
+    def test_unknown_strategy_raises(self) -> None:
+        with pytest.raises(ValueError):
+            run_backtest(random_walk_arrays(6, 100, "1h", sigma=0.01, open_jitter=0.001), "missing")
+
+    def test_empty_klines(self) -> None:
+        result = run_backtest(random_walk_arrays(7, 0, "1h", sigma=0.01, open_jitter=0.001), "donchian_breakout_daily")
+        assert result.bars == 0
+        assert result.to_dict(equity_points=10)["trades"] == 0
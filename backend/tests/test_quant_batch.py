@@ -0,0 +1,102 @@
+"""多标的批量信号计算测试：逐标的结果与单标的路径逐位一致。"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+from ta.trend import EMAIndicator
+
+from backend.src.quant import batch
+from backend.src.quant.batch import (
+    KlineTensor,
+    batch_donchian,
+    batch_ema,
+    batch_supertrend,
+    batch_wilder_adx,
+    batch_wilder_atr,
+    build_batch_snapshots,
+    compute_batch_signals,
+)
+from backend.src.quant.library import build_quant_snapshot, compute_signal_series, supertrend_arrays, wilder_adx, wilder_atr
+from backend.tests.helpers import random_walk_arrays
+
+
+@pytest.fixture(params=[1, 16], ids=["vectorized", "per_row"])
+def vector_min_rows(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> int:
+    """分别覆盖按时间逐列向量化和逐行调用单标的内核两条路径。"""
+    monkeypatch.setattr(batch, "VECTOR_MIN_ROWS", request.param)
+    return request.param
+
+
+class TestBatchKernels:
+    """二维内核与单标的内核逐位一致。"""
+
+    def test_kernels_match_single_asset(self, vector_min_rows: int) -> None:
+        items = [random_walk_arrays(seed, 400, symbol=f"S{seed}", flat_at=50) for seed in range(6)]
+        tensor = KlineTensor.stack(items)
+        ema = batch_ema(tensor.close, 20)
+        atr = batch_wilder_atr(tensor.high, tensor.low, tensor.close, 10)
+        adx = batch_wilder_adx(tensor.high, tensor.low, tensor.close, 14)
+        supertrend, direction = batch_supertrend(tensor.high, tensor.low, tensor.close)
+        upper, lower = batch_donchian(tensor.high, tensor.low, lookback=20)
+
+        for row, item in enumerate(items):
+            expected_ema = EMAIndicator(close=pd.Series(item.close), window=20).ema_indicator().to_numpy()
+            assert np.array_equal(ema[row], expected_ema, equal_nan=True)
+            assert np.array_equal(atr[row], wilder_atr(item.high, item.low, item.close, 10))
+            assert np.array_equal(adx[row], wilder_adx(item.high, item.low, item.close, 14))
+            expected_line, expected_direction = supertrend_arrays(item.high, item.low, item.close)
+            assert np.array_equal(supertrend[row], expected_line, equal_nan=True)
+            assert np.array_equal(direction[row], expected_direction)
+            expected_upper = pd.Series(item.high).rolling(window=20).max().shift(1).to_numpy()
+            expected_lower = pd.Series(item.low).rolling(window=20).min().shift(1).to_numpy()
+            assert np.array_equal(upper[row], expected_upper, equal_nan=True)
+            assert np.array_equal(lower[row], expected_lower, equal_nan=True)
+
+    def test_signal_codes_match_single_asset(self, vector_min_rows: int) -> None:
+        items = [random_walk_arrays(seed, 300, symbol=f"S{seed}", flat_at=50) for seed in range(10, 14)]
+        result = compute_batch_signals(KlineTensor.stack(items))
+        for name, codes in result.codes.items():
+            assert codes.shape == (4, 300)
+            for row, item in enumerate(items):
+                series = compute_signal_series(name, item)
+                assert series is not None
+                assert np.array_equal(codes[row], series.actions())
+
+
+class TestBatchSnapshots:
+    """批量快照接口。"""
+
+    def test_snapshots_match_single_asset_for_mixed_lengths(self) -> None:
+        items = [
+            random_walk_arrays(20, 200, symbol="ETHUSDT", flat_at=50),
+            random_walk_arrays(21, 200, symbol="BTCUSDT", flat_at=50),
+            random_walk_arrays(22, 45, symbol="SOLUSDT", flat_at=50),
+            random_walk_arrays(23, 0, symbol="NEWUSDT", flat_at=50),
+            random_walk_arrays(24, 200, symbol="BNBUSDT", flat_at=50),
+        ]
+        snapshots = build_batch_snapshots(items)
+        assert list(snapshots) == [item.symbol for item in items]
+        for item in items:
+            assert snapshots[item.symbol] == build_quant_snapshot(item.symbol, "1d", item)
+
+    def test_same_length_different_timeframes_are_grouped_apart(self) -> None:
+        items = [
+            random_walk_arrays(25, 120, symbol="ETHUSDT", flat_at=50),
+            random_walk_arrays(26, 120, "4h", symbol="BTCUSDT", flat_at=50),
+        ]
+        snapshots = build_batch_snapshots(items)
+        for item in items:
+            assert snapshots[item.symbol] == build_quant_snapshot(item.symbol, item.timeframe, item)
+
+    def test_duplicate_symbols_are_rejected(self) -> None:
+        items = [random_walk_arrays(27, 100, flat_at=50), random_walk_arrays(28, 100, "4h", flat_at=50)]
+        with pytest.raises(ValueError, match="ETHUSDT"):
+            build_batch_snapshots(items)
+
+    def test_stack_rejects_unequal_lengths(self) -> None:
+        with pytest.raises(ValueError):
+            KlineTensor.stack([random_walk_arrays(1, 100, symbol="A", flat_at=50), random_walk_arrays(2, 90, symbol="B", flat_at=50)])
+        tensor = KlineTensor.stack([random_walk_arrays(1, 100, symbol="A", flat_at=50), random_walk_arrays(2, 100, symbol="B", flat_at=50)])
+        assert tensor.bars == 100
+        assert np.array_equal(tensor.asset(1).close, random_walk_arrays(2, 100, symbol="B", flat_at=50).close)
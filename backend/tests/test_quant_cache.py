@@ -0,0 +1,85 @@
+"""量化信号缓存测试。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from backend.src.data.kline_service import get_recent_klines, kline_data_revision, upsert_klines
+from backend.src.quant.cache import SignalCache, cached_quant_signal_markers, cached_quant_snapshot, signal_cache
+from backend.src.quant.library import build_quant_snapshot
+
+
+def _klines(count: int, start: datetime, base: float = 3000.0) -> list[dict[str, Any]]:
+    return [
+        {
+            "symbol": "ETHUSDT",
+            "timeframe": "1d",
+            "open_time": start + timedelta(days=index),
+            "open": base + index,
+            "high": base + index + 15 + (index % 7),
+            "low": base + index - 15 - (index % 5),
+            "close": base + index + (index % 3) * 4 - 4,
+            "volume": 10.0,
+        }
+        for index in range(count)
+    ]
+
+
+class TestSignalCache:
+    """LRU行为测试。"""
+
+    def test_hits_and_evicts_least_recently_used(self) -> None:
+        cache = SignalCache(max_entries=2)
+        calls: list[str] = []
+
+        def compute(name: str) -> Any:
+            return lambda: calls.append(name) or name
+
+        cache.get_or_compute("a", compute("a"))
+        cache.get_or_compute("b", compute("b"))
+        assert cache.get_or_compute("a", compute("a")) == "a"
+        cache.get_or_compute("c", compute("c"))  # 淘汰最久未使用的b
+        cache.get_or_compute("b", compute("b"))
+
+        assert calls == ["a", "b", "c", "b"]
+        assert cache.snapshot() == {"hits": 1, "misses": 4, "evictions": 2, "entries": 2, "max_entries": 2}
+
+
+class TestCachedSnapshots:
+    """按数据版本号失效的快照缓存。"""
+
+    def test_repeated_reads_hit_until_klines_change(self, db: Session) -> None:
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        upsert_klines(db=db, klines=_klines(100, start))
+        before = dict(signal_cache.stats)
+
+        first = cached_quant_snapshot(db=db, symbol="ETHUSDT", timeframe="1d", limit=80)
+        assert cached_quant_snapshot(db=db, symbol="ETHUSDT", timeframe="1d", limit=80) is first
+        assert signal_cache.stats["hits"] == before["hits"] + 1
+        klines = get_recent_klines(db=db, symbol="ETHUSDT", timeframe="1d", limit=80)
+        assert first == build_quant_snapshot(symbol="ETHUSDT", timeframe="1d", klines=klines)
+
+        revision = kline_data_revision(db=db, symbol="ETHUSDT", timeframe="1d")
+        upsert_klines(db=db, klines=_klines(1, start + timedelta(days=100), base=2500.0))
+        assert kline_data_revision(db=db, symbol="ETHUSDT", timeframe="1d") != revision
+        second = cached_quant_snapshot(db=db, symbol="ETHUSDT", timeframe="1d", limit=80)
+        assert second is not first
+        assert second["signals"][0]["timestamp"] == (start + timedelta(days=100)).isoformat()
+
+    def test_unchanged_upsert_keeps_revision(self, db: Session) -> None:
+        rows = _klines(40, datetime(2024, 1, 1, tzinfo=timezone.utc))
+        upsert_klines(db=db, klines=rows)
+        revision = kline_data_revision(db=db, symbol="ETHUSDT", timeframe="1d")
+        upsert_klines(db=db, klines=rows)
+        assert kline_data_revision(db=db, symbol="ETHUSDT", timeframe="1d") == revision
+
+    def test_markers_cached_per_window(self, db: Session) -> None:
+        upsert_klines(db=db, klines=_klines(120, datetime(2024, 1, 1, tzinfo=timezone.utc)))
+        markers = cached_quant_signal_markers(db=db, symbol="ETHUSDT", timeframe="1d", limit=100, max_points=300)
+        assert cached_quant_signal_markers(db=db, symbol="ETHUSDT", timeframe="1d", limit=100, max_points=300) is markers
+        assert cached_quant_signal_markers(db=db, symbol="ETHUSDT", timeframe="1d", limit=120, max_points=300) is not markers
+
+    def test_missing_klines_return_none(self, db: Session) -> None:
+        assert cached_quant_snapshot(db=db, symbol="ETHUSDT", timeframe="1d", limit=80) is None
@@ -0,0 +1,184 @@
+"""增量指标引擎与全量计算的一致性及状态持久化测试。"""
+from __future__ import annotations
+
+import json
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+from ta.trend import ADXIndicator, EMAIndicator
+
+from backend.src.data.binance_client import datetime_to_ms
+from backend.src.data.kline_service import get_recent_kline_arrays, get_recent_klines, upsert_klines
+from backend.src.db.models import IndicatorState
+from backend.src.quant.incremental import IndicatorEngine, advance_indicator_state, build_incremental_snapshot
+from backend.src.quant.library import build_quant_snapshot, supertrend_arrays
+
+DAY = timedelta(days=1)
+
+
+def _walk(seed: int, count: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.02, count)))
+    open_ = np.concatenate([[3000.0], close[:-1]])
+    spread = close * rng.uniform(0.002, 0.03, count)
+    return pd.DataFrame(
+        {
+            "high": np.maximum(open_, close) + spread,
+            "low": np.minimum(open_, close) - spread,
+            "close": close,
+            "open": open_,
+        }
+    )
+
+
+def _store(db: Session, df: pd.DataFrame, start: datetime) -> None:
+    rows: list[dict[str, Any]] = [
+        {
+            "symbol": "ETHUSDT",
+            "timeframe": "1d",
+            "open_time": start + DAY * index,
+            "open": float(row.open),
+            "high": float(row.high),
+            "low": float(row.low),
+            "close": float(row.close),
+            "volume": 1.0,
+        }
+        for index, row in enumerate(df.itertuples())
+    ]
+    upsert_klines(db=db, klines=rows)
+
+
+def _same(left: float, right: float) -> bool:
+    return (math.isnan(left) and math.isnan(right)) or left == right
+
+
+class TestIndicatorEngine:
+    """逐根推进的结果与ta/全序列实现逐位一致。"""
+
+    def test_every_bar_matches_full_series(self) -> None:
+        df = _walk(3, 400)
+        expected = {
+            "fast": EMAIndicator(close=df["close"], window=20).ema_indicator().to_numpy(),
+            "slow": EMAIndicator(close=df["close"], window=50).ema_indicator().to_numpy(),
+            "adx": ADXIndicator(high=df["high"], low=df["low"], close=df["close"], window=14).adx().to_numpy(),
+            "upper": df["high"].rolling(window=20).max().shift(1).to_numpy(),
+            "lower": df["low"].rolling(window=20).min().shift(1).to_numpy(),
+        }
+        expected["supertrend"], expected["direction"] = supertrend_arrays(
+            df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy()
+        )
+
+        engine = IndicatorEngine()
+        for index, row in enumerate(df.itertuples()):
+            if index == 200:
+                # 中途序列化再恢复，后续结果不受影响
+                engine = IndicatorEngine.from_dict(json.loads(json.dumps(engine.to_dict())))
+            values = engine.update(index, row.high, row.low, row.close)
+            for name, series in expected.items():
+                assert _same(values[name], float(series[index])), (index, name)
+
+    def test_peek_does_not_change_state(self) -> None:
+        engine = IndicatorEngine()
+        for index, row in enumerate(_walk(4, 80).itertuples()):
+            engine.update(index, row.high, row.low, row.close)
+        before = engine.to_dict()
+        _, bars = engine.peek(80, 3100.0, 2900.0, 3050.0)
+        assert bars == 81
+        assert engine.to_dict() == before
+
+
+class TestIncrementalSnapshot:
+    """持久化状态下的信号快照。"""
+
+    def test_snapshot_matches_full_recompute(self, db: Session) -> None:
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        _store(db, _walk(5, 150), start=today - DAY * 149)
+
+        snapshot = build_incremental_snapshot(db=db, symbol="ETHUSDT", timeframe="1d")
+        klines = get_recent_klines(db=db, symbol="ETHUSDT", timeframe="1d", limit=150)
+        assert snapshot == build_quant_snapshot(symbol="ETHUSDT", timeframe="1d", klines=klines)
+
+        # 今天的K线未收盘，只在副本上试算，不计入持久化状态
+        state = db.query(IndicatorState).one()
+        assert state.bars == 149
+        assert state.last_open_ms == datetime_to_ms(today - DAY)
+
+    def test_advance_reads_only_new_candles(self, db: Session) -> None:
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        df = _walk(6, 120)
+        _store(db, df.iloc[:100], start=start)
+        now_ms = datetime_to_ms(start + DAY * 120)
+
+        engine, live = advance_indicator_state(db=db, symbol="ETHUSDT", timeframe="1d", now_ms=now_ms)
+        assert engine.bars == 100 and live is None
+
+        _store(db, df.iloc[100:].reset_index(drop=True), start=start + DAY * 100)
+        engine, _ = advance_indicator_state(db=db, symbol="ETHUSDT", timeframe="1d", now_ms=now_ms)
+        reference = IndicatorEngine()
+        for index, row in enumerate(df.itertuples()):
+            reference.update(datetime_to_ms(start + DAY * index), row.high, row.low, row.close)
+        assert engine.bars == 120
+        assert engine.to_dict() == reference.to_dict()
+
+    def test_earlier_history_triggers_rebuild(self, db: Session) -> None:
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        df = _walk(7, 90)
+        _store(db, df.iloc[30:].reset_index(drop=True), start=start + DAY * 30)
+        now_ms = datetime_to_ms(start + DAY * 90)
+        assert advance_indicator_state(db=db, symbol="ETHUSDT", timeframe="1d", now_ms=now_ms)[0].bars == 60
+
+        _store(db, df.iloc[:30], start=start)
+        engine, _ = advance_indicator_state(db=db, symbol="ETHUSDT", timeframe="1d", now_ms=now_ms)
+        assert engine.bars == 90
+        assert engine.first_open_ms == datetime_to_ms(start)
+
+    def test_filled_gap_triggers_rebuild(self, db: Session) -> None:
+        """已推进区间内补上的缺口会触发重建，结果与从完整历史推进相同。"""
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        df = _walk(8, 200)
+        _store(db, df.iloc[:90], start=start)
+        _store(db, df.iloc[100:].reset_index(drop=True), start=start + DAY * 100)
+        now_ms = datetime_to_ms(start + DAY * 200)
+        assert advance_indicator_state(db=db, symbol="ETHUSDT", timeframe="1d", now_ms=now_ms)[0].bars == 190
+
+        _store(db, df.iloc[90:100].reset_index(drop=True), start=start + DAY * 90)
+        engine, _ = advance_indicator_state(db=db, symbol="ETHUSDT", timeframe="1d", now_ms=now_ms)
+        reference = IndicatorEngine()
+        for index, row in enumerate(df.itertuples()):
+            reference.update(datetime_to_ms(start + DAY * index), row.high, row.low, row.close)
+        assert engine.to_dict() == reference.to_dict()
+
+    def test_revised_last_bar_triggers_rebuild(self, db: Session) -> None:
+        """同步滞后时计入的最后一根K线被改写为收盘值后，状态按新值重建。"""
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        df = _walk(9, 60)
+        partial = df.copy()
+        partial.loc[59, "close"] = partial.loc[59, "close"] * 0.97
+        _store(db, partial, start=start)
+        now_ms = datetime_to_ms(start + DAY * 60)
+        advance_indicator_state(db=db, symbol="ETHUSDT", timeframe="1d", now_ms=now_ms)
+
+        _store(db, df.iloc[59:].reset_index(drop=True), start=start + DAY * 59)
+        engine, _ = advance_indicator_state(db=db, symbol="ETHUSDT", timeframe="1d", now_ms=now_ms)
+        assert engine.bars == 60
+        assert engine.last_close == float(df.loc[59, "close"])
+
+    def test_non_native_timeframe_uses_resampled_klines(self, db: Session) -> None:
+        """非原生周期改用重采样后的K线计算，不会因为本地没有该周期的K线而全部观望。"""
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        _store(db, _walk(10, 240), start=today - DAY * 239)
+
+        snapshot = build_incremental_snapshot(db=db, symbol="ETHUSDT", timeframe="3d", fallback_limit=60)
+        klines = get_recent_kline_arrays(db=db, symbol="ETHUSDT", timeframe="3d", limit=60)
+        assert len(klines) > 0
+        assert snapshot == build_quant_snapshot(symbol="ETHUSDT", timeframe="3d", klines=klines)
+        assert db.query(IndicatorState).count() == 0
+
+    def test_no_klines_returns_hold(self, db: Session) -> None:
+        snapshot = build_incremental_snapshot(db=db, symbol="ETHUSDT", timeframe="1d")
+        assert {item["signal"] for item in snapshot["signals"]} == {"hold"}
+        assert db.query(IndicatorState).count() == 0
@@ -0,0 +1,87 @@
+"""原生指标实现与ta库的一致性测试。"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+from ta.momentum import RSIIndicator
+from ta.trend import ADXIndicator, EMAIndicator
+from ta.volatility import AverageTrueRange, BollingerBands
+
+from backend.src.quant import indicators
+
+
+def _random_walk(seed: int, count: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """带平盘段的随机游走（价格保留两位小数，覆盖相等价格和零涨跌的分支）。"""
+    rng = np.random.default_rng(seed)
+    close = np.round(3000 * np.exp(np.cumsum(rng.normal(0, 0.01, count))), 2)
+    high = np.round(close + np.abs(rng.normal(0, 5, count)), 2)
+    low = np.round(close - np.abs(rng.normal(0, 5, count)), 2)
+    flat = slice(count // 3, count // 3 + 6)
+    close[flat], high[flat], low[flat] = close[flat][0], high[flat][0], low[flat][0]
+    return high, low, close
+
+
+def _same(actual: np.ndarray, expected: pd.Series) -> bool:
+    return np.array_equal(actual, expected.to_numpy(dtype=np.float64), equal_nan=True)
+
+
+@pytest.mark.parametrize("window", [3, 14, 20])
+class TestMatchesTa:
+    def test_ema(self, window: int) -> None:
+        """EMA与ta.trend.EMAIndicator逐位一致。"""
+        _, _, close = _random_walk(1, 600)
+        assert _same(indicators.ema(close, window), EMAIndicator(pd.Series(close), window).ema_indicator())
+
+    def test_rsi(self, window: int) -> None:
+        """RSI与ta.momentum.RSIIndicator逐位一致，包括平盘段。"""
+        _, _, close = _random_walk(2, 600)
+        assert _same(indicators.rsi(close, window), RSIIndicator(pd.Series(close), window).rsi())
+
+    def test_atr_adx_and_di(self, window: int) -> None:
+        """ATR、ADX和±DI与ta逐位一致（含ta在开头填0的布局）。"""
+        high, low, close = _random_walk(3, 600)
+        h, l, c = pd.Series(high), pd.Series(low), pd.Series(close)
+        adx = ADXIndicator(h, l, c, window)
+        plus, minus = indicators.directional_indicators(high, low, close, window)
+        assert _same(indicators.wilder_atr(high, low, close, window), AverageTrueRange(h, l, c, window).average_true_range())
+        assert _same(indicators.wilder_adx(high, low, close, window), adx.adx())
+        assert _same(plus, adx.adx_pos())
+        assert _same(minus, adx.adx_neg())
+
+    def test_rolling_extremes(self, window: int) -> None:
+        """滚动极值与pandas rolling一致。"""
+        high, low, _ = _random_walk(4, 300)
+        assert _same(indicators.rolling_max(high, window), pd.Series(high).rolling(window).max())
+        assert _same(indicators.rolling_min(low, window), pd.Series(low).rolling(window).min())
+
+    def test_bollinger(self, window: int) -> None:
+        """布林带与ta一致；pandas的滚动方差有抵消误差，按1e-4的绝对容差比较（价格约3000）。"""
+        _, _, close = _random_walk(5, 600)
+        bands = BollingerBands(pd.Series(close), window, 2)
+        expected = (bands.bollinger_mavg(), bands.bollinger_hband(), bands.bollinger_lband())
+        for actual, reference in zip(indicators.bollinger_bands(close, window, 2), expected, strict=True):
+            assert np.allclose(actual, reference.to_numpy(), rtol=0, atol=1e-4, equal_nan=True)
+
+
+class TestEdgeCases:
+    def test_short_input(self) -> None:
+        """K线不足时返回全空值，而不是抛出异常。"""
+        high, low, close = _random_walk(6, 5)
+        assert np.isnan(indicators.ema(close, 14)).all()
+        assert np.isnan(indicators.rsi(close, 14)).all()
+        assert np.isnan(indicators.rolling_max(high, 14)).all()
+        assert not indicators.wilder_atr(high, low, close, 14).any()
+        assert not indicators.wilder_adx(high, low, close, 14).any()
+        assert indicators.ema(np.empty(0), 14).shape == (0,)
+
+    def test_preallocated_output(self) -> None:
+        """传入out时结果写入同一块缓冲区，重复使用不残留上次的值。"""
+        high, low, close = _random_walk(7, 200)
+        buffer = np.empty(200)
+        assert indicators.ema(close, 20, out=buffer) is buffer
+        assert np.array_equal(buffer, indicators.ema(close, 20), equal_nan=True)
+        indicators.wilder_adx(high, low, close, 14, out=buffer)
+        assert np.array_equal(buffer, indicators.wilder_adx(high, low, close, 14))
+        with pytest.raises(ValueError):
+            indicators.rsi(close, 14, out=np.empty(10))
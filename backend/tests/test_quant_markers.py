@@ -0,0 +1,126 @@
+"""信号标记由全序列差分生成，与逐前缀重算的结果逐项一致。"""
+from __future__ import annotations
+
+from typing import Any
+
+import pandas as pd
+import pytest
+from ta.trend import ADXIndicator, EMAIndicator
+
+from backend.src.quant.library import (
+    STRATEGY_CATALOG,
+    _build_dataframe,
+    _clip_strength,
+    _compute_supertrend,
+    build_quant_signal_markers,
+    build_quant_snapshot,
+    compute_signal_series,
+)
+from backend.tests.helpers import random_walk_arrays
+
+
+def _reference_latest(strategy_name: str, df: pd.DataFrame) -> tuple[str, float, str]:
+    """改写前各策略只看最后一根K线的判定逻辑，返回(signal, 未截断strength, reasoning)。"""
+    close = df["close"]
+    latest_close = float(close.iloc[-1])
+    if strategy_name == "ema_adx_daily":
+        if len(df) < 60:
+            return "hold", 0.0, ""
+        fast = float(EMAIndicator(close=close, window=20).ema_indicator().iloc[-1])
+        slow = float(EMAIndicator(close=close, window=50).ema_indicator().iloc[-1])
+        adx = float(ADXIndicator(high=df["high"], low=df["low"], close=close, window=14).adx().iloc[-1])
+        if fast <= 0 or slow <= 0:
+            return "hold", 0.0, ""
+        gap = (fast - slow) / slow
+        signal = "buy" if adx >= 25 and gap > 0 else "sell" if adx >= 25 and gap < 0 else "hold"
+        strength = abs(gap) * 14 + max(0.0, adx - 20) / 40
+        return signal, strength, f"ema_fast={fast:.2f}, ema_slow={slow:.2f}, adx={adx:.2f}, gap={gap:.4f}"
+    if strategy_name == "supertrend_daily":
+        if len(df) < 30:
+            return "hold", 0.0, ""
+        supertrend, direction = _compute_supertrend(df=df, period=10, multiplier=3.0)
+        latest = float(supertrend.iloc[-1])
+        latest_direction = int(direction.iloc[-1])
+        if latest <= 0 or latest_close <= 0:
+            return "hold", 0.0, ""
+        strength = abs((latest_close - latest) / latest_close) * 25
+        reasoning = f"close={latest_close:.2f}, supertrend={latest:.2f}, direction={latest_direction}"
+        return ("buy" if latest_direction == 1 else "sell"), strength, reasoning
+    if len(df) < 25:
+        return "hold", 0.0, ""
+    upper = float(df["high"].rolling(window=20).max().shift(1).iloc[-1])
+    lower = float(df["low"].rolling(window=20).min().shift(1).iloc[-1])
+    if upper <= 0 or lower <= 0 or latest_close <= 0:
+        return "hold", 0.0, ""
+    signal, breakout = "hold", 0.0
+    if latest_close > upper:
+        signal, breakout = "buy", (latest_close - upper) / latest_close
+    elif latest_close < lower:
+        signal, breakout = "sell", (lower - latest_close) / latest_close
+    reasoning = f"close={latest_close:.2f}, upper_prev={upper:.2f}, lower_prev={lower:.2f}, breakout={breakout:.4f}"
+    return signal, breakout * 35, reasoning
+
+
+def _reference_markers(strategy_name: str, df: pd.DataFrame) -> list[dict[str, Any]]:
+    """改写前的O(n²)实现：每根K线用df.iloc[:i+1]重算一次信号。"""
+    markers: list[dict[str, Any]] = []
+    previous = "hold"
+    meta = STRATEGY_CATALOG[strategy_name]
+    for index in range(len(df)):
+        signal, strength, reasoning = _reference_latest(strategy_name, df.iloc[: index + 1])
+        if signal == previous:
+            continue
+        previous = signal
+        if signal not in {"buy", "sell"}:
+            continue
+        markers.append(
+            {
+                "strategy_name": strategy_name,
+                "display_name": meta["display_name"],
+                "category": meta["category"],
+                "symbol": "ETHUSDT",
+                "timeframe": "1d",
+                "timestamp": df["open_time"].iloc[index].isoformat(),
+                "signal": signal,
+                "strength": _clip_strength(strength),
+                "reasoning": reasoning,
+            }
+        )
+    return markers
+
+
+class TestSignalMarkers:
+    """标记生成的一致性测试。"""
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_markers_match_prefix_recomputation(self, seed: int) -> None:
+        klines = random_walk_arrays(seed, 320).to_records()
+        df = _build_dataframe(klines)
+        markers = build_quant_signal_markers(symbol="ETHUSDT", timeframe="1d", klines=klines)
+
+        expected = [item for name in STRATEGY_CATALOG for item in _reference_markers(name, df)]
+        expected.sort(key=lambda item: (item["timestamp"], item["strategy_name"]))
+        actual = sorted(markers, key=lambda item: (item["timestamp"], item["strategy_name"]))
+        assert expected
+        assert actual == expected
+
+    def test_series_last_bar_matches_snapshot(self) -> None:
+        klines = random_walk_arrays(4, 200).to_records()
+        df = _build_dataframe(klines)
+        snapshot = build_quant_snapshot(symbol="ETHUSDT", timeframe="1d", klines=klines)
+
+        for item in snapshot["signals"]:
+            series = compute_signal_series(item["strategy_name"], df)
+            assert series is not None
+            assert series.action_at(len(df) - 1) == item["signal"]
+
+    def test_short_history_yields_no_markers(self) -> None:
+        klines = random_walk_arrays(5, 20).to_records()
+        assert build_quant_signal_markers(symbol="ETHUSDT", timeframe="1d", klines=klines) == []
+        assert compute_signal_series("ema_adx_daily", _build_dataframe(klines)) is None
+
+    def test_columnar_klines_match_record_klines(self) -> None:
+        arrays = random_walk_arrays(8, 260)
+        klines = arrays.to_records()
+        assert build_quant_snapshot("ETHUSDT", "1d", arrays) == build_quant_snapshot("ETHUSDT", "1d", klines)
+        assert build_quant_signal_markers("ETHUSDT", "1d", arrays) == build_quant_signal_markers("ETHUSDT", "1d", klines)
@@ -0,0 +1,101 @@
+"""Supertrend数组实现与原pandas逐行实现的一致性测试。"""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from ta.volatility import AverageTrueRange
+
+from backend.src.quant.library import _compute_supertrend, supertrend_arrays, wilder_atr
+
+
+def _reference_supertrend(df: pd.DataFrame, period: int = 10, multiplier: float = 3.0) -> tuple[pd.Series, pd.Series]:
+    """改写前的逐行实现（ta的ATR + .iloc递推），作为黄金基准。"""
+    atr = AverageTrueRange(high=df["high"], low=df["low"], close=df["close"], window=period).average_true_range()
+    hl2 = (df["high"] + df["low"]) / 2
+    upper = hl2 + multiplier * atr
+    lower = hl2 - multiplier * atr
+
+    final_upper = upper.copy()
+    final_lower = lower.copy()
+    supertrend: list[float] = [math.nan] * len(df)
+    direction: list[int] = [1] * len(df)
+    if len(df) > 0 and not pd.isna(atr.iloc[0]):
+        supertrend[0] = lower.iloc[0]
+
+    for index in range(1, len(df)):
+        if pd.isna(atr.iloc[index]):
+            direction[index] = direction[index - 1]
+            continue
+        prev_close = float(df["close"].iloc[index - 1])
+        prev_upper = final_upper.iloc[index - 1]
+        prev_lower = final_lower.iloc[index - 1]
+        if pd.isna(prev_upper):
+            prev_upper = upper.iloc[index - 1]
+        if pd.isna(prev_lower):
+            prev_lower = lower.iloc[index - 1]
+        current_upper = upper.iloc[index]
+        current_lower = lower.iloc[index]
+        final_upper.iloc[index] = current_upper if current_upper < prev_upper or prev_close > prev_upper else prev_upper
+        final_lower.iloc[index] = current_lower if current_lower > prev_lower or prev_close < prev_lower else prev_lower
+        prev_direction = direction[index - 1]
+        close_price = float(df["close"].iloc[index])
+        if prev_direction == -1 and close_price > float(final_upper.iloc[index]):
+            direction[index] = 1
+        elif prev_direction == 1 and close_price < float(final_lower.iloc[index]):
+            direction[index] = -1
+        else:
+            direction[index] = prev_direction
+        supertrend[index] = float(final_lower.iloc[index]) if direction[index] == 1 else float(final_upper.iloc[index])
+
+    return pd.Series(supertrend, index=df.index), pd.Series(direction, index=df.index)
+
+
+def _random_walk(seed: int, count: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.02, count)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.01, count)) * close
+    return pd.DataFrame(
+        {
+            "open": open_,
+            "high": np.maximum(open_, close) + spread,
+            "low": np.minimum(open_, close) - spread,
+            "close": close,
+        }
+    )
+
+
+class TestSupertrendKernel:
+    """数组实现必须与原实现逐位一致。"""
+
+    @pytest.mark.parametrize(("seed", "period", "multiplier"), [(1, 10, 3.0), (2, 7, 2.0), (3, 14, 1.5), (4, 10, 3.0)])
+    def test_matches_reference_exactly(self, seed: int, period: int, multiplier: float) -> None:
+        df = _random_walk(seed, 800)
+        expected_line, expected_direction = _reference_supertrend(df, period=period, multiplier=multiplier)
+        line, direction = _compute_supertrend(df, period=period, multiplier=multiplier)
+
+        np.testing.assert_array_equal(line.to_numpy(), expected_line.to_numpy())
+        np.testing.assert_array_equal(direction.to_numpy(), expected_direction.to_numpy())
+        # 随机游走中应出现多次方向翻转，确保递推的两个分支都被覆盖
+        assert np.count_nonzero(np.diff(direction.to_numpy())) > 5
+
+    def test_atr_matches_ta(self) -> None:
+        df = _random_walk(5, 300)
+        expected = AverageTrueRange(high=df["high"], low=df["low"], close=df["close"], window=14).average_true_range()
+        actual = wilder_atr(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), window=14)
+        np.testing.assert_array_equal(actual, expected.to_numpy())
+
+    def test_exposes_direction_series(self) -> None:
+        df = _random_walk(6, 200)
+        line, direction = supertrend_arrays(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy())
+        assert line.shape == direction.shape == (200,)
+        assert set(np.unique(direction).tolist()) <= {-1, 1}
+        below = direction == 1
+        assert np.all(line[below] <= df["high"].to_numpy()[below])
+
+    def test_short_input_has_no_atr(self) -> None:
+        line, direction = supertrend_arrays(np.array([2.0, 3.0]), np.array([1.0, 2.0]), np.array([1.5, 2.5]), period=10)
+        assert line.tolist() == [1.5, 2.5] and direction.tolist() == [1, 1]
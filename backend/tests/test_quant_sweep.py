@@ -0,0 +1,136 @@
+"""参数扫描测试。"""
+from __future__ import annotations
+
+import json
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.src.db.models import BacktestSweepResult
+from backend.src.quant.backtest import run_backtest
+from backend.src.quant.library import compute_signal_series, strategy_parameters
+from backend.src.quant import sweep
+from backend.src.quant.sweep import (
+    SharedKlineArrays,
+    attach_shared_klines,
+    expand_grid,
+    ranked_sweep_results,
+    run_parameter_sweep,
+)
+from backend.tests.helpers import random_walk_arrays
+
+
+class TestParameters:
+    """策略参数的合并和网格展开。"""
+
+    def test_expand_grid_fills_defaults_in_catalog_order(self) -> None:
+        combos = expand_grid("ema_adx_daily", {"adx_trigger": [20, 30], "ema_fast": [10, 15]})
+        assert combos == [
+            {"ema_fast": 10, "ema_slow": 50, "adx_window": 14, "adx_trigger": 20},
+            {"ema_fast": 10, "ema_slow": 50, "adx_window": 14, "adx_trigger": 30},
+            {"ema_fast": 15, "ema_slow": 50, "adx_window": 14, "adx_trigger": 20},
+            {"ema_fast": 15, "ema_slow": 50, "adx_window": 14, "adx_trigger": 30},
+        ]
+
+    def test_unknown_parameter_raises(self) -> None:
+        with pytest.raises(ValueError):
+            expand_grid("donchian_breakout_daily", {"window": [10]})
+        with pytest.raises(ValueError):
+            strategy_parameters("missing")
+
+    @pytest.mark.parametrize("strategy_name", ["ema_adx_daily", "supertrend_daily", "donchian_breakout_daily"])
+    def test_default_parameters_match_unparameterized_series(self, strategy_name: str) -> None:
+        klines = random_walk_arrays(1, 400, "1h", sigma=0.01)
+        plain = compute_signal_series(strategy_name, klines)
+        explicit = compute_signal_series(strategy_name, klines, parameters=strategy_parameters(strategy_name), cache={})
+        assert plain is not None and explicit is not None
+        assert np.array_equal(plain.actions(), explicit.actions())
+        assert plain.min_bars == explicit.min_bars
+
+    def test_longer_windows_raise_min_bars(self) -> None:
+        series = compute_signal_series("donchian_breakout_daily", random_walk_arrays(2, 400, "1h", sigma=0.01), parameters={"lookback": 100})
+        assert series is not None and series.min_bars == 105
+        assert compute_signal_series("donchian_breakout_daily", random_walk_arrays(2, 100, "1h", sigma=0.01), parameters={"lookback": 100}) is None
+
+    def test_cached_indicators_give_identical_backtests(self) -> None:
+        klines = random_walk_arrays(3, 600, "1h", sigma=0.01)
+        cache: dict = {}
+        for trigger in (20, 25, 30):
+            params = {"ema_fast": 10, "adx_trigger": trigger}
+            cached = run_backtest(klines, "ema_adx_daily", parameters=params, cache=cache)
+            fresh = run_backtest(klines, "ema_adx_daily", parameters=params)
+            assert np.array_equal(cached.equity, fresh.equity)
+        assert ("ema", 10) in cache and ("adx", 14) in cache
+
+
+class TestSweep:
+    """扫描执行、结果落库和排序。"""
+
+    def test_shared_memory_round_trip(self) -> None:
+        klines = random_walk_arrays(4, 300, "1h", sigma=0.01)
+        with SharedKlineArrays(klines) as shared:
+            shm, attached = attach_shared_klines(shared.descriptor)
+            try:
+                assert np.array_equal(attached.open_time, klines.open_time)
+                assert np.array_equal(attached.close, klines.close)
+                assert (attached.symbol, attached.timeframe) == ("ETHUSDT", "1h")
+            finally:
+                del attached
+                shm.close()
+
+    def test_inline_sweep_streams_rows_and_ranks(self, db: Session) -> None:
+        klines = random_walk_arrays(5, 800, "1h", sigma=0.01)
+        batches: list[int] = []
+        result = run_parameter_sweep(
+            db,
+            klines,
+            "donchian_breakout_daily",
+            {"lookback": [10, 20, 30, 40, 55]},
+            workers=1,
+            chunk_size=2,
+            on_rows=lambda rows: batches.append(len(rows)),
+        )
+        assert result.combinations == 5
+        assert batches == [2, 2, 1]
+
+        ranked = ranked_sweep_results(db, result.sweep_id, metric="sharpe")
+        assert [item["rank"] for item in ranked] == [1, 2, 3, 4, 5]
+        assert [item["sharpe"] for item in ranked] == sorted((item["sharpe"] for item in ranked), reverse=True)
+        best = run_backtest(klines, "donchian_breakout_daily", parameters=ranked[0]["parameters"])
+        assert ranked[0]["sharpe"] == round(best.sharpe, 4)
+
+        by_drawdown = ranked_sweep_results(db, result.sweep_id, metric="max_drawdown", limit=2)
+        assert by_drawdown[0]["max_drawdown_pct"] <= by_drawdown[1]["max_drawdown_pct"]
+        with pytest.raises(ValueError):
+            ranked_sweep_results(db, result.sweep_id, metric="profit")
+
+    def test_process_pool_matches_inline(self, db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+        klines = random_walk_arrays(6, 500, "1h", sigma=0.01)
+        grid = {"atr_period": [7, 10], "multiplier": [2.0, 3.0]}
+        descriptors: list[tuple[str, int, str, str]] = []
+
+        class RecordingSharedKlineArrays(SharedKlineArrays):
+            def __enter__(self) -> SharedKlineArrays:
+                descriptors.append(self.descriptor)
+                return super().__enter__()
+
+        monkeypatch.setattr(sweep, "SharedKlineArrays", RecordingSharedKlineArrays)
+        inline = run_parameter_sweep(db, klines, "supertrend_daily", grid, workers=1)
+        pooled = run_parameter_sweep(db, klines, "supertrend_daily", grid, workers=2, chunk_size=1)
+        assert pooled.workers == 2
+
+        # 扫描结束后共享内存段已被删除
+        assert len(descriptors) == 1
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=descriptors[0][0])
+
+        def rows(sweep_id: str) -> dict[str, float]:
+            records = db.execute(select(BacktestSweepResult).where(BacktestSweepResult.sweep_id == sweep_id)).scalars()
+            return {record.parameters_json: record.total_return for record in records}
+
+        assert rows(pooled.sweep_id) == rows(inline.sweep_id)
+        assert len(rows(inline.sweep_id)) == 4
+        assert json.loads(next(iter(rows(inline.sweep_id)))) in expand_grid("supertrend_daily", grid)
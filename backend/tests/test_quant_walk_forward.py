@@ -0,0 +1,74 @@
+"""滚动优化（walk-forward）测试。"""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from backend.src.ai.decision_engine import _mind_weight_map
+from backend.src.data.kline_cache import KlineArrays
+from backend.src.mind.market_mind import _deep_merge
+from backend.src.quant.library import STRATEGY_CATALOG, STRATEGY_WEIGHTS
+from backend.src.quant.walk_forward import mind_weight_patch, run_walk_forward, strategy_growth_matrix, weight_grid
+from backend.tests.helpers import random_walk_arrays
+
+
+class TestWalkForward:
+    """窗口划分、样本外统计和Market Mind补丁。"""
+
+    def test_weight_grid_is_simplex(self) -> None:
+        grid = weight_grid(3, step=0.1)
+        assert grid.shape == (66, 3)
+        assert np.allclose(grid.sum(axis=1), 1.0)
+        assert (grid >= 0).all()
+
+    def test_full_series_growth_slices_match_prefix_computation(self) -> None:
+        klines = random_walk_arrays(1, 600, drift=0.0005)
+        names = list(STRATEGY_CATALOG)
+        full = strategy_growth_matrix(klines, names, fee_pct=0.001, slippage_pct=0.0)
+        prefix = KlineArrays(
+            symbol=klines.symbol,
+            timeframe=klines.timeframe,
+            **{name: getattr(klines, name)[:400] for name in ("open_time", "open", "high", "low", "close", "volume")},
+        )
+        partial = strategy_growth_matrix(prefix, names, fee_pct=0.001, slippage_pct=0.0)
+        # 前缀最后一根按收盘价估值，其余各行与整段计算后切片完全一致
+        assert np.allclose(partial[:-1], full[:399])
+
+    def test_folds_cover_consecutive_test_windows(self) -> None:
+        klines = random_walk_arrays(2, 1000, drift=0.0005)
+        report = run_walk_forward(klines, train_bars=300, test_bars=100, fee_pct=0.001, slippage_pct=0.0)
+        assert len(report.folds) == 7
+        day = 86_400_000
+        for previous, fold in zip(report.folds, report.folds[1:]):
+            assert fold.test_start_ms == previous.test_end_ms + day
+        first = report.folds[0]
+        assert first.test_start_ms == first.train_end_ms + day
+        assert first.train_end_ms - first.train_start_ms == 299 * day
+        for fold in report.folds:
+            assert sum(fold.weights.values()) == pytest.approx(1.0)
+
+        stitched = np.prod([1 + fold.oos["total_return"] for fold in report.folds]) - 1
+        assert report.oos["total_return"] == pytest.approx(stitched)
+        payload = report.to_dict()
+        assert payload["outperforms_baseline"] == (report.oos["sharpe"] > report.baseline_oos["sharpe"])
+        assert set(payload["patch"]["strategy_weights"]) == set(STRATEGY_CATALOG)
+
+    def test_insufficient_klines_raise(self) -> None:
+        with pytest.raises(ValueError):
+            run_walk_forward(random_walk_arrays(3, 100, drift=0.0005), train_bars=365)
+        with pytest.raises(ValueError):
+            run_walk_forward(random_walk_arrays(3, 500, drift=0.0005), strategy_names=["missing"])
+
+    def test_patch_multipliers_reproduce_target_weights(self) -> None:
+        static_patch = mind_weight_patch(dict(STRATEGY_WEIGHTS), reason="static")
+        assert {name: entry["weight"] for name, entry in static_patch["strategy_weights"].items()} == {
+            name: 1.0 for name in STRATEGY_WEIGHTS
+        }
+
+        patch = mind_weight_patch({"ema_adx_daily": 0.3, "supertrend_daily": 0.7, "donchian_breakout_daily": 0.0}, reason="wf")
+        mind = _deep_merge({"strategy_weights": {"trend_following": {"weight": 0.5, "reason": "manual"}}}, patch)
+        weights = _mind_weight_map(mind)
+        assert weights["trend_following"] == 0.5
+        assert weights["ema_adx_daily"] == round(0.3 / 0.45, 4)
+        assert weights["supertrend_daily"] == 2.0
+        assert weights["donchian_breakout_daily"] == 0.0
@@ -0,0 +1,153 @@
+"""交易日志检查点与历史状态重建单元测试。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.src.db.models import AccountCheckpoint, AccountLedger, Decision, Trade
+from backend.src.trading.journal import (
+    JournalCursor,
+    account_state_as_of,
+    equity_curve,
+    extend_checkpoints,
+    iter_trades,
+)
+from backend.src.trading.paper_engine import get_portfolio_snapshot_as_of, load_account_state
+from backend.tests.helpers import replay_account_state
+
+START = datetime(2024, 2, 1, 9, tzinfo=timezone.utc)
+
+
+def _journal(db: Session, count: int) -> list[Trade]:
+    """每6小时一笔交易，买三次后全部卖出，循环往复。"""
+    trades: list[Trade] = []
+    position = 0.0
+    for index in range(count):
+        price = 3000.0 + 25 * (index % 9) - 7 * (index % 4)
+        if index % 4 == 3:
+            side, quantity = "sell", position
+            position = 0.0
+        else:
+            side, quantity = "buy", 0.1 + 0.05 * (index % 3)
+            position += quantity
+        trade = Trade(
+            symbol="ETHUSDT",
+            side=side,
+            quantity=quantity,
+            price=price,
+            fee=quantity * price * 0.001,
+            slippage=0.01,
+            pnl=0.0,
+            notes="journal_test",
+            timestamp=START + timedelta(hours=6 * index),
+        )
+        db.add(trade)
+        trades.append(trade)
+    db.commit()
+    return trades
+
+
+def _replay_prefix(db: Session, until_id: int) -> JournalCursor:
+    cursor = JournalCursor()
+    for row in iter_trades(db=db, symbol="ETHUSDT", after_id=0, until_id=until_id):
+        cursor.apply(row)
+    return cursor
+
+
+class TestCheckpoints:
+    """检查点写入与按时间点重建测试。"""
+
+    def test_checkpoint_every_interval(self, db: Session) -> None:
+        _journal(db, 25)
+        assert extend_checkpoints(db=db, symbol="ETHUSDT", interval=10) == 2
+        db.commit()
+        assert [row.trade_count for row in db.query(AccountCheckpoint).order_by(AccountCheckpoint.trade_id)] == [10, 20]
+        # 再次调用只从最近检查点继续，不重复写入
+        assert extend_checkpoints(db=db, symbol="ETHUSDT", interval=10) == 0
+
+    def test_as_of_trade_matches_prefix_replay(self, db: Session) -> None:
+        trades = _journal(db, 37)
+        extend_checkpoints(db=db, symbol="ETHUSDT", interval=8)
+        db.commit()
+
+        for target in (trades[0], trades[7], trades[15], trades[22], trades[-1]):
+            rebuilt = account_state_as_of(db=db, symbol="ETHUSDT", trade_id=target.id)
+            expected = _replay_prefix(db, target.id)
+            assert rebuilt.trade_count == expected.trade_count
+            for field in ("cash", "position_qty", "avg_entry_price", "realized_pnl", "day_realized_pnl"):
+                assert getattr(rebuilt.state, field) == pytest.approx(getattr(expected.state, field))
+
+    def test_as_of_time_uses_last_trade_before(self, db: Session) -> None:
+        trades = _journal(db, 12)
+        extend_checkpoints(db=db, symbol="ETHUSDT", interval=4)
+        db.commit()
+
+        cursor = account_state_as_of(db=db, symbol="ETHUSDT", at=START + timedelta(hours=6 * 5 + 1))
+        assert cursor.trade_id == trades[5].id
+        assert account_state_as_of(db=db, symbol="ETHUSDT", at=START - timedelta(days=1)).trade_count == 0
+
+    def test_portfolio_as_of_decision(self, db: Session) -> None:
+        trades = _journal(db, 6)
+        decision = Decision(
+            timestamp=START + timedelta(hours=13),
+            decision="buy",
+            position_size_pct=10.0,
+            entry_price=3100.0,
+            stop_loss=3000.0,
+            take_profit=3300.0,
+            confidence=0.7,
+            reasoning_json="{}",
+            model_used="test",
+            input_hash="x",
+        )
+        db.add(decision)
+        db.commit()
+
+        snapshot = get_portfolio_snapshot_as_of(db=db, symbol="ETHUSDT", decision_id=decision.id)
+        assert snapshot["trade_id"] == trades[2].id
+        assert snapshot["positions"][0]["mark_price"] == 3100.0
+        with pytest.raises(ValueError):
+            get_portfolio_snapshot_as_of(db=db, symbol="ETHUSDT", decision_id=decision.id + 1)
+
+
+class TestJournalRecovery:
+    """账本恢复与只追加约束测试。"""
+
+    def test_ledger_recovers_from_latest_checkpoint(self, db: Session) -> None:
+        _journal(db, 30)
+        load_account_state(db=db, symbol="ETHUSDT")
+        extend_checkpoints(db=db, symbol="ETHUSDT", interval=10)
+        db.query(AccountLedger).delete()
+        db.commit()
+
+        state = load_account_state(db=db, symbol="ETHUSDT")
+        expected = replay_account_state(db=db, symbol="ETHUSDT")
+        assert state.cash == pytest.approx(expected.cash)
+        assert state.position_qty == pytest.approx(expected.position_qty)
+        assert db.query(AccountLedger).one().trade_count == 30
+
+    def test_trades_are_append_only(self, db: Session) -> None:
+        trade = _journal(db, 1)[0]
+        trade.price = 1.0
+        with pytest.raises(ValueError):
+            db.commit()
+        db.rollback()
+
+        with pytest.raises(ValueError):
+            db.delete(trade)
+            db.commit()
+        db.rollback()
+
+    def test_equity_curve_has_one_point_per_day(self, db: Session) -> None:
+        _journal(db, 12)
+        extend_checkpoints(db=db, symbol="ETHUSDT", interval=5)
+        db.commit()
+
+        curve = equity_curve(db=db, symbol="ETHUSDT")
+        assert [point["date"] for point in curve] == ["2024-02-01", "2024-02-02", "2024-02-03", "2024-02-04"]
+
+        tail = equity_curve(db=db, symbol="ETHUSDT", start=START + timedelta(days=2))
+        assert tail[-1] == curve[-1]
+        assert tail[0]["date"] == "2024-02-03"